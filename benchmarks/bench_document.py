@@ -0,0 +1,75 @@
+"""Benchmark : classe de document générée vs Document générique (__getattr__)
+
+Usage : python benchmarks/bench_document.py [--number 200000]
+"""
+
+import argparse
+import bson
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from pygoose import Schema  # noqa: E402
+from pygoose.document import Document  # noqa: E402
+from pygoose.model import Model  # noqa: E402
+
+
+class OfflineModel(Model):
+    """Modèle sans collection : seules les opérations en mémoire sont mesurées"""
+
+    def _setup_collection(self):
+        self._collection = None
+
+
+def build_model() -> Model:
+    schema = Schema({
+        'name': {'type': str, 'required': True},
+        'email': {'type': str, 'email': True},
+        'age': {'type': int, 'min': 0},
+        'active': {'type': bool, 'default': True},
+    }, {'timestamps': True})
+    schema.method('label', lambda doc: f"{doc.name} <{doc.email}>")
+    return OfflineModel('BenchUser', schema)
+
+
+def run(number: int) -> None:
+    model = build_model()
+    generic = Document
+    generated = model._document_class
+    row = {'_id': 1, 'name': 'Alice', 'email': 'alice@example.com', 'age': 30}
+
+    cases = {
+        'hydratation': lambda cls: lambda: cls(model, row, from_db=True),
+        'lecture': lambda cls: (lambda doc: lambda: (doc.name, doc.email, doc.age, doc.active))(
+            cls(model, row, from_db=True)),
+        'écriture': lambda cls: (lambda doc: lambda: setattr(doc, 'age', 31))(cls(model, row, from_db=True)),
+        'méthode': lambda cls: (lambda doc: lambda: doc.label())(cls(model, row, from_db=True)),
+    }
+    for label, make in cases.items():
+        before = min(timeit.repeat(make(generic), number=number, repeat=3))
+        after = min(timeit.repeat(make(generated), number=number, repeat=3))
+        per_op = lambda total: total / number * 1e9  # noqa: E731
+        print(f"{label:<12} générique {per_op(before):8.1f} ns  générée {per_op(after):8.1f} ns"
+              f"  gain x{before / after:.1f}")
+
+
+
+def write_amplification(size: int) -> None:
+    """Taille de la mise à jour envoyée après l'ajout d'un tag à un tableau de ``size`` tags"""
+    model = OfflineModel('BenchTags', Schema({'tags': [str]}))
+    doc = model._document_class(model, {'_id': 1, 'tags': [f'tag-{i}' for i in range(size)]}, from_db=True)
+    full = {'$set': {'tags': doc.tags + ['new']}}
+    doc.tags.append('new')
+    minimal = doc._pending_update()
+    print(f"ajout d'un tag à {size} tags : $set complet {len(bson.encode(full))} octets"
+          f"  opérateurs minimaux {len(bson.encode(minimal))} octets")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--number', type=int, default=200000)
+    args = parser.parse_args()
+    run(args.number)
+    write_amplification(5000)
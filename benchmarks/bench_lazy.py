@@ -0,0 +1,63 @@
+"""Benchmark : hydratation complète vs paresseuse (BSON brut) sur de gros documents
+
+Mesure le décodage et la construction d'un document dont on ne lit que
+deux champs, comme sur une liste d'API.
+
+Usage : python benchmarks/bench_lazy.py [--items 10 1000] [--number 2000]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+import bson
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from pygoose import Schema  # noqa: E402
+from pygoose.lazy import LazyData  # noqa: E402
+from pygoose.model import Model  # noqa: E402
+
+
+class OfflineModel(Model):
+    """Modèle sans collection : seules les opérations en mémoire sont mesurées"""
+
+    def _setup_collection(self):
+        self._collection = None
+
+
+def build_raw(items: int) -> bytes:
+    document = {'_id': bson.ObjectId(), 'name': 'Alice', 'email': 'alice@example.com'}
+    for i in range(20):
+        document[f'attr{i}'] = f'value-{i}'
+    document['history'] = [{'at': i, 'event': 'login', 'ip': '10.0.0.1'} for i in range(items)]
+    return bson.encode(document)
+
+
+def run(items: int, number: int) -> None:
+    model = OfflineModel('BenchLazy', Schema({'name': str, 'email': str}, {'strict': False}))
+    raw = build_raw(items)
+
+    def eager():
+        doc = model._hydrate(bson.decode(raw))
+        return doc.name, doc.email
+
+    def lazy():
+        doc = model._hydrate(LazyData(raw))
+        return doc.name, doc.email
+
+    before = min(timeit.repeat(eager, number=number, repeat=3))
+    after = min(timeit.repeat(lazy, number=number, repeat=3))
+    per_doc = lambda total: total / number * 1e6  # noqa: E731
+    print(f"{items:>6} éléments ({len(raw):>7} octets)  complet {per_doc(before):8.2f} µs/doc"
+          f"  lazy {per_doc(after):8.2f} µs/doc  gain x{before / after:.1f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--items', type=int, nargs='*', default=[0, 10, 100, 1000])
+    parser.add_argument('--number', type=int, default=2000)
+    args = parser.parse_args()
+    for items in args.items:
+        run(items, args.number)
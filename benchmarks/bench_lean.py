@@ -0,0 +1,77 @@
+"""Benchmark : documents vs lean() vs values_list() sur une liste de résultats
+
+Le curseur est simulé en mémoire (copie de chaque document comme le ferait
+le décodage BSON) : seul le coût côté ODM est mesuré.
+
+Usage : python benchmarks/bench_lean.py [--rows 1000] [--number 20]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from pygoose import Schema  # noqa: E402
+from pygoose.model import Model  # noqa: E402
+
+
+class ListCursor:
+    def __init__(self, docs, projection=None):
+        self.docs = docs
+        self.fields = [field for field, keep in (projection or {}).items() if keep]
+
+    def __iter__(self):
+        if self.fields:
+            # Comme le serveur : seuls les champs projetés sont renvoyés
+            return ({field: doc[field] for field in self.fields} for doc in self.docs)
+        return (dict(doc) for doc in self.docs)
+
+    def close(self):
+        pass
+
+
+class ListCollection:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, filter_dict=None, projection=None):
+        return ListCursor(self.docs, projection)
+
+
+class OfflineModel(Model):
+    """Modèle branché sur une collection en mémoire"""
+
+    def _setup_collection(self):
+        self._collection = None
+
+
+def run(rows: int, number: int) -> None:
+    model = OfflineModel('BenchLean', Schema({
+        'name': str, 'email': str, 'age': int, 'city': str, 'tags': [str],
+    }, {'timestamps': True}))
+    model._collection = ListCollection([
+        {'_id': i, 'name': f'user{i}', 'email': f'user{i}@example.com', 'age': i % 90,
+         'city': 'Paris', 'tags': ['a', 'b']}
+        for i in range(rows)
+    ])
+
+    cases = {
+        'documents + to_dict': lambda: [doc.to_dict() for doc in model.find().exec()],
+        'lean()': lambda: model.find().lean().exec(),
+        'values_list()': lambda: model.find().values_list('name', 'email').exec(),
+    }
+    reference = None
+    for label, case in cases.items():
+        total = min(timeit.repeat(case, number=number, repeat=3))
+        reference = reference or total
+        print(f"{label:<20} {total / number / rows * 1e6:6.2f} µs/ligne  gain x{reference / total:.1f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--number', type=int, default=20)
+    args = parser.parse_args()
+    run(args.rows, args.number)
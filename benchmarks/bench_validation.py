@@ -0,0 +1,52 @@
+"""Benchmark : validation compilée vs boucle interprétée sur des schémas larges
+
+Usage : python benchmarks/bench_validation.py [--fields 50] [--number 20000]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from pygoose import Schema  # noqa: E402
+
+
+def build_schema(width: int) -> Schema:
+    """Schéma de ``width`` champs, dont un quart avec contraintes"""
+    definition = {}
+    for i in range(width):
+        if i % 4 == 0:
+            definition[f'f{i}'] = {'type': int, 'min': 0, 'max': 1000}
+        elif i % 4 == 1:
+            definition[f'f{i}'] = {'type': str, 'max_length': 64}
+        else:
+            definition[f'f{i}'] = str if i % 2 else int
+    return Schema(definition)
+
+
+def build_document(width: int) -> dict:
+    return {f'f{i}': (i if i % 4 in (0, 2) else f'value-{i}') for i in range(width)}
+
+
+def run(width: int, number: int) -> None:
+    schema = build_schema(width)
+    data = build_document(width)
+    schema.compile()
+
+    interpreted = min(timeit.repeat(lambda: schema._validate_interpreted(data), number=number, repeat=3))
+    compiled = min(timeit.repeat(lambda: schema.validate(data), number=number, repeat=3))
+
+    per_doc = lambda total: total / number * 1e6  # noqa: E731
+    print(f"{width:>4} champs  interprété {per_doc(interpreted):8.2f} µs/doc"
+          f"  compilé {per_doc(compiled):8.2f} µs/doc  gain x{interpreted / compiled:.1f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--fields', type=int, nargs='*', default=[10, 50, 100, 200])
+    parser.add_argument('--number', type=int, default=5000)
+    args = parser.parse_args()
+    for width in args.fields:
+        run(width, args.number)
@@ -0,0 +1,91 @@
+"""Collection en mémoire pour les benchmarks sans serveur MongoDB
+
+Les documents sont stockés encodés en BSON et décodés à chaque lecture,
+comme le ferait le driver : les mesures comprennent l'encodage et le
+décodage côté client, mais ni le réseau ni le travail du serveur. Aucun
+filtre n'est évalué (les benchmarks lisent toute la collection).
+"""
+
+from types import SimpleNamespace
+
+import bson
+from bson import ObjectId
+from bson.codec_options import DEFAULT_CODEC_OPTIONS
+from bson.raw_bson import RawBSONDocument
+from pymongo import InsertOne
+
+
+class StandInCursor:
+    def __init__(self, rows, codec_options):
+        self.rows = rows
+        self.codec_options = codec_options
+
+    def sort(self, spec):
+        return self
+
+    def skip(self, count):
+        self.rows = self.rows[count:]
+        return self
+
+    def limit(self, count):
+        self.rows = self.rows[:count]
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    def close(self):
+        pass
+
+    def __iter__(self):
+        if self.codec_options.document_class is RawBSONDocument:
+            return (RawBSONDocument(raw) for raw in self.rows)
+        codec_options = self.codec_options
+        return (bson.decode(raw, codec_options) for raw in self.rows)
+
+
+class StandInCollection:
+    """Sous-ensemble de l'API de collection pymongo utilisé par les benchmarks"""
+
+    database = None
+
+    def __init__(self, name, rows=None, codec_options=DEFAULT_CODEC_OPTIONS):
+        self.name = name
+        self.rows = rows if rows is not None else []
+        self.codec_options = codec_options
+
+    def with_options(self, codec_options=None, read_preference=None):
+        return StandInCollection(self.name, self.rows, codec_options or self.codec_options)
+
+    def load(self, documents):
+        for doc in documents:
+            doc.setdefault('_id', ObjectId())
+            self.rows.append(bson.encode(doc))
+
+    def clear(self):
+        del self.rows[:]
+
+    def find(self, filter_dict=None, projection=None):
+        return StandInCursor(self.rows, self.codec_options)
+
+    def find_one(self, filter_dict=None):
+        return next(iter(self.find(filter_dict)), None)
+
+    def insert_many(self, documents, ordered=True):
+        for doc in documents:
+            doc.setdefault('_id', ObjectId())
+            self.rows.append(bson.encode(doc))
+        return SimpleNamespace(inserted_ids=[doc['_id'] for doc in documents])
+
+    def bulk_write(self, ops, ordered=True):
+        for op in ops:
+            if isinstance(op, InsertOne):
+                self.rows.append(bson.encode(op._doc))
+            else:
+                # Encodage de la mise à jour, sans l'appliquer
+                bson.encode({'q': op._filter, 'u': op._doc})
+        return SimpleNamespace(bulk_api_result={})
+
+    def update_many(self, filter_dict, update):
+        bson.encode({'q': filter_dict, 'u': update})
+        return SimpleNamespace(modified_count=len(self.rows))
@@ -0,0 +1,322 @@
+"""Suite de benchmarks des chemins critiques de l'ODM
+
+Couvre la validation (largeur et profondeur du schéma), la construction
+des documents, l'accès aux attributs, l'hydratation des curseurs et les
+écritures en masse. Sans ``--uri``, la collection est simulée en mémoire
+(voir ``standin.py``) : seul le coût côté client est mesuré. ``--uri``
+accepte aussi ``memory:///bench`` (moteur en mémoire de pygoose, filtres
+et index compris).
+
+Usage :
+    python benchmarks/suite.py --output results.json
+    python benchmarks/suite.py --sizes 10000 100000 1000000
+    python benchmarks/suite.py --uri mongodb://localhost:27017/pygoose_bench
+    python benchmarks/suite.py --baseline results.json --threshold 0.15
+
+Avec ``--baseline``, chaque cas est comparé au résultat de référence : le
+script sort en erreur (code 1) si l'un d'eux est plus lent de plus de
+``--threshold`` (15 % par défaut).
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+
+import pymongo
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from pygoose import Schema  # noqa: E402
+from pygoose.model import Model  # noqa: E402
+from standin import StandInCollection  # noqa: E402
+
+WIDTHS = (5, 20, 50)
+DEPTHS = (0, 2)
+SIZES = (10000, 100000)
+
+
+class Case:
+    """Cas mesuré : ``make(backend)`` prépare les données et retourne la fonction chronométrée
+
+    ``ops`` est le nombre d'unités (documents, accès) traitées par appel,
+    ``number`` le nombre d'appels par mesure.
+    """
+
+    def __init__(self, group, params, make, ops=1, number=1):
+        self.group = group
+        self.params = params
+        self.make = make
+        self.ops = ops
+        self.number = number
+
+    @property
+    def name(self):
+        params = ','.join(f"{key}={value}" for key, value in self.params.items())
+        return f"{self.group}[{params}]" if params else self.group
+
+
+class OfflineModel(Model):
+    """Modèle lié à une collection simulée en mémoire"""
+
+    def __init__(self, name, schema, collection):
+        self._standin = collection
+        super().__init__(name, schema)
+
+    def _setup_collection(self):
+        self._collection = self._standin
+
+
+class StandInBackend:
+    name = 'standin'
+
+    def model(self, name, schema, documents=()):
+        collection = StandInCollection(name.lower())
+        collection.load(documents)
+        return OfflineModel(name, schema, collection)
+
+    def clear(self, model):
+        model._collection.clear()
+
+
+class MongoBackend:
+    """mongod local : chaque modèle a sa collection, vidée avant usage"""
+
+    def __init__(self, uri):
+        from pygoose import connect
+        connect(uri)
+        self.name = 'mongodb'
+
+    def model(self, name, schema, documents=()):
+        model = Model(name, schema, collection_name=f"bench_{name.lower()}")
+        collection = model._collection
+        collection.drop()
+        batch = []
+        for doc in documents:
+            batch.append(doc)
+            if len(batch) == 10000:
+                collection.insert_many(batch)
+                batch = []
+        if batch:
+            collection.insert_many(batch)
+        return model
+
+    def clear(self, model):
+        model._collection.delete_many({})
+
+
+def build_definition(width, depth):
+    """``width`` champs variés, plus une chaîne de ``depth`` sous-documents de 5 champs"""
+    definition = {}
+    for i in range(width):
+        if i % 4 == 0:
+            definition[f'f{i}'] = {'type': int, 'min': 0, 'max': 1000000}
+        elif i % 4 == 1:
+            definition[f'f{i}'] = {'type': str, 'max_length': 64}
+        else:
+            definition[f'f{i}'] = str if i % 2 else int
+    if depth:
+        definition['child'] = build_definition(5, depth - 1)
+    return definition
+
+
+def build_data(width, depth, seed=0):
+    data = {f'f{i}': (i + seed if i % 4 in (0, 2) else f'value-{i}') for i in range(width)}
+    if depth:
+        data['child'] = build_data(5, depth - 1, seed)
+    return data
+
+
+def rows(count, width=10, depth=0):
+    return (build_data(width, depth, seed) for seed in range(count))
+
+
+def validation_case(width, depth):
+    def make(backend):
+        schema = Schema(build_definition(width, depth))
+        schema.compile()
+        data = build_data(width, depth)
+        return lambda: schema.validate(data)
+    return Case('validation', {'width': width, 'depth': depth}, make, number=2000)
+
+
+def construction_case(width, source):
+    def make(backend):
+        model = backend.model(f'Construct{width}', Schema(build_definition(width, 0)))
+        data = build_data(width, 0)
+        if source == 'db':
+            data['_id'] = 1
+            return lambda: model._hydrate(data)
+        document_class = model._document_class
+        return lambda: document_class(model, data)
+    return Case('construction', {'width': width, 'source': source}, make, number=2000)
+
+
+def attribute_case():
+    fields = ('f0', 'f1', 'f2', 'f3', 'f4')
+
+    def make(backend):
+        model = backend.model('Attribute', Schema(build_definition(10, 0)))
+        doc = model._hydrate(dict(build_data(10, 0), _id=1))
+
+        def read():
+            for field in fields:
+                getattr(doc, field)
+        return read
+    return Case('attribute', {'fields': len(fields)}, make, ops=len(fields), number=20000)
+
+
+def hydration_case(size, mode):
+    def make(backend):
+        model = backend.model(f'Hydrate{size}', Schema(build_definition(10, 0)), rows(size))
+        if mode == 'lean':
+            return lambda: model.find().lean().exec()
+        if mode == 'iterate':
+            def iterate():
+                for _ in model.find():
+                    pass
+            return iterate
+        return lambda: model.find().exec()
+    return Case('hydration', {'size': size, 'mode': mode}, make, ops=size)
+
+
+def insert_case(size):
+    def make(backend):
+        model = backend.model(f'Insert{size}', Schema(build_definition(10, 0)))
+        data = list(rows(size))
+
+        def insert():
+            backend.clear(model)
+            model.create_many(data, collect_ids=False)
+        return insert
+    return Case('bulk_insert', {'size': size}, make, ops=size)
+
+
+def update_case(size):
+    def make(backend):
+        model = backend.model(f'Update{size}', Schema(build_definition(10, 0)), rows(size))
+        docs = model.find().exec()
+
+        def update():
+            for doc in docs:
+                doc.f0 += 1
+            model.bulk_save(docs)
+        return update
+    return Case('bulk_update', {'size': size}, make, ops=size)
+
+
+def build_cases(sizes):
+    cases = [validation_case(width, depth) for width in WIDTHS for depth in DEPTHS]
+    cases += [construction_case(width, source) for width in WIDTHS for source in ('new', 'db')]
+    cases.append(attribute_case())
+    cases += [hydration_case(size, mode) for size in sizes for mode in ('exec', 'iterate', 'lean')]
+    # Les écritures sont mesurées sur la plus petite taille
+    cases += [insert_case(min(sizes)), update_case(min(sizes))]
+    return cases
+
+
+def measure(case, backend, repeat, scale):
+    func = case.make(backend)
+    number = max(1, int(case.number * scale))
+    timings = timeit.repeat(func, number=number, repeat=repeat)
+    units = number * case.ops
+    return {
+        'group': case.group,
+        'params': case.params,
+        'ops': units,
+        'best_s': min(timings),
+        'median_s': statistics.median(timings),
+        'per_op_us': min(timings) / units * 1e6,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(cases, backend, repeat, scale):
+    results = {}
+    for case in cases:
+        result = results[case.name] = measure(case, backend, repeat, scale)
+        print(f"{case.name:<45} {result['per_op_us']:10.3f} µs/op", file=sys.stderr)
+    return {
+        'meta': {
+            'backend': backend.name,
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'pymongo': pymongo.version,
+            'repeat': repeat,
+            'scale': scale,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+
+
+def compare(report, baseline, threshold):
+    """Affiche les écarts avec la référence ; retourne les cas en régression"""
+    regressions = []
+    for name, result in report['results'].items():
+        reference = baseline['results'].get(name)
+        if reference is None:
+            continue
+        ratio = result['per_op_us'] / reference['per_op_us']
+        flag = ''
+        if ratio > 1 + threshold:
+            regressions.append(name)
+            flag = '  RÉGRESSION'
+        print(f"{name:<45} {reference['per_op_us']:10.3f} -> {result['per_op_us']:10.3f} µs/op"
+              f"  x{ratio:.2f}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--uri', help="mongod à utiliser (par défaut : collection simulée en mémoire)")
+    parser.add_argument('--sizes', type=int, nargs='*', default=list(SIZES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--scale', type=float, default=1.0, help="multiplie le nombre d'appels des cas rapides")
+    parser.add_argument('--filter', help="ne lance que les cas dont le nom contient cette chaîne")
+    parser.add_argument('--output', help="fichier JSON des résultats (par défaut : sortie standard)")
+    parser.add_argument('--baseline', help="résultats de référence à comparer")
+    parser.add_argument('--threshold', type=float, default=0.15)
+    args = parser.parse_args(argv)
+
+    backend = MongoBackend(args.uri) if args.uri else StandInBackend()
+    cases = build_cases(args.sizes)
+    if args.filter:
+        cases = [case for case in cases if args.filter in case.name]
+    report = run(cases, backend, args.repeat, args.scale)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            json.dump(report, output, indent=2, sort_keys=True)
+    elif not args.baseline:
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        print()
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline['meta'].get('backend') != report['meta']['backend']:
+            print("Attention : référence mesurée sur un autre backend", file=sys.stderr)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} cas en régression (seuil {args.threshold:.0%})", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
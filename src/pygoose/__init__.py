@@ -1,13 +1,15 @@
 """Pygoose - ODM Python pour MongoDB inspiré de Mongoose"""
 
-from .connection import connect, disconnect
+from .connection import connect, disconnect, get_database
 from .schema import Schema
 from .model import model
+from .indexes import sync_indexes
+from .sessions import session
 from .fields import *
 from .exceptions import *
 
 __version__ = "0.1.0"
 __all__ = [
-    'connect', 'disconnect', 'Schema', 'model',
+    'connect', 'disconnect', 'get_database', 'Schema', 'model', 'session', 'sync_indexes',
     'ValidationError', 'NotFoundError', 'DuplicateKeyError'
 ]
\ No newline at end of file
@@ -0,0 +1,298 @@
+"""Construction fluide de pipelines d'agrégation
+
+    report = (Order.pipeline()
+              .match(Order.find({'status': 'paid'}))
+              .lookup('customer')
+              .unwind('customer')
+              .group('customer.country', total=('sum', 'amount'), orders=('sum', 1))
+              .sort('-total')
+              .allow_disk_use())
+    for row in report:          # flux par lots : mémoire client bornée
+        ...
+
+Les champs s'écrivent avec leur nom du schéma (``'amount'`` devient
+``'$amount'`` là où une expression est attendue). ``match()`` accepte une
+``Query`` dont le filtre, le tri, la pagination et la projection sont
+repris. ``lookup()`` sur un champ 'ref' joint le modèle référencé. Les
+résultats sont des dicts, ou des documents du modèle avec ``hydrate()``.
+"""
+
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from .document import Document
+from .middleware import begin, instrumented
+from .populate import _get_model, resolve_ref
+from .query import DEFAULT_BATCH_SIZE, Query
+from .routing import read_preference
+
+Accumulator = Union[Dict[str, Any], Tuple[str, Any]]
+
+
+def field_ref(value: Any) -> Any:
+    """Expression d'un champ : 'amount' -> '$amount' (les autres valeurs sont gardées)"""
+    if isinstance(value, str) and not value.startswith('$'):
+        return '$' + value
+    return value
+
+
+def accumulator(spec: Accumulator) -> Dict[str, Any]:
+    """Accumulateur de $group : ('sum', 'amount') -> {'$sum': '$amount'}, ou dict brut"""
+    if isinstance(spec, dict):
+        return spec
+    operator, argument = spec
+    return {'$' + operator.lstrip('$'): field_ref(argument)}
+
+
+def sort_spec(fields: Tuple[Union[str, Dict[str, int]], ...]) -> Dict[str, int]:
+    """Spécification de $sort depuis 'champ', '-champ' ou des dicts"""
+    spec = {}
+    for field in fields:
+        if isinstance(field, dict):
+            spec.update(field)
+        else:
+            spec[field.lstrip('-')] = -1 if field.startswith('-') else 1
+    return spec
+
+
+class Pipeline:
+    """Pipeline d'agrégation d'un modèle, construite étape par étape"""
+
+    # Registre des modèles joints par lookup() (None : modèles de ``model()``)
+    _registry = None
+
+    def __init__(self, model, collection, stages: Optional[List[Dict[str, Any]]] = None):
+        self._model = model
+        self._collection = collection
+        self._stages: List[Dict[str, Any]] = list(stages or [])
+        self._options: Dict[str, Any] = {}
+        self._batch_size = DEFAULT_BATCH_SIZE
+        self._hydrate = False
+        self._read_preference = None
+
+    @property
+    def stages(self) -> List[Dict[str, Any]]:
+        """Étapes de la pipeline (copie)"""
+        return list(self._stages)
+
+    def stage(self, stage: Dict[str, Any]) -> 'Pipeline':
+        """Ajoute une étape brute"""
+        self._stages.append(stage)
+        return self
+
+    # --- étapes
+
+    def match(self, filter_dict: Union[Dict[str, Any], Query, None] = None) -> 'Pipeline':
+        """Filtre les documents ; une ``Query`` apporte aussi son tri, sa pagination et sa projection"""
+        if isinstance(filter_dict, Query):
+            self._stages.extend(filter_dict._pipeline_stages())
+            if filter_dict._read_preference is not None and self._read_preference is None:
+                self._read_preference = filter_dict._read_preference
+            return self
+        return self.stage({'$match': filter_dict or {}})
+
+    def project(self, fields: Union[str, List[str], Dict[str, Any]]) -> 'Pipeline':
+        """Garde les champs demandés (mêmes formes que ``Query.select``)"""
+        if isinstance(fields, str):
+            fields = {fields: 1}
+        elif isinstance(fields, list):
+            fields = {field: 1 for field in fields}
+        return self.stage({'$project': fields})
+
+    def add_fields(self, fields: Optional[Dict[str, Any]] = None, **expressions: Any) -> 'Pipeline':
+        """Ajoute des champs calculés ($addFields)"""
+        return self.stage({'$addFields': dict(fields or {}, **expressions)})
+
+    def unset(self, *fields: str) -> 'Pipeline':
+        """Retire des champs"""
+        return self.stage({'$unset': list(fields)})
+
+    def group(self, by: Union[str, List[str], Dict[str, Any], None] = None,
+              **accumulators: Accumulator) -> 'Pipeline':
+        """Regroupe par ``by`` (champ, liste de champs ou expression) et calcule les accumulateurs
+
+            .group('city', total=('sum', 'amount'), n=('sum', 1), top={'$max': '$amount'})
+        """
+        if isinstance(by, list):
+            key = {field.replace('.', '_'): field_ref(field) for field in by}
+        else:
+            key = field_ref(by)
+        spec = {'_id': key}
+        for name, value in accumulators.items():
+            spec[name] = accumulator(value)
+        return self.stage({'$group': spec})
+
+    def sort(self, *fields: Union[str, Dict[str, int]]) -> 'Pipeline':
+        """Trie : sort('-total', 'name') ou sort({'total': -1})"""
+        return self.stage({'$sort': sort_spec(fields)})
+
+    def skip(self, count: int) -> 'Pipeline':
+        return self.stage({'$skip': count})
+
+    def limit(self, count: int) -> 'Pipeline':
+        return self.stage({'$limit': count})
+
+    def unwind(self, field: str, preserve_empty: bool = False,
+               index_field: Optional[str] = None) -> 'Pipeline':
+        """Un résultat par élément du tableau ``field``"""
+        if not preserve_empty and index_field is None:
+            return self.stage({'$unwind': field_ref(field)})
+        spec = {'path': field_ref(field), 'preserveNullAndEmptyArrays': preserve_empty}
+        if index_field:
+            spec['includeArrayIndex'] = index_field
+        return self.stage({'$unwind': spec})
+
+    def lookup(self, source: Any, local_field: Optional[str] = None, foreign_field: str = '_id',
+               as_field: Optional[str] = None,
+               pipeline: Union[List[Dict[str, Any]], 'Pipeline', None] = None) -> 'Pipeline':
+        """Joint une autre collection ($lookup)
+
+        ``source`` est un champ 'ref' du schéma (``lookup('author')`` remplace
+        l'identifiant par un tableau contenant le document joint), un modèle
+        ou un nom de collection ; dans ces deux cas ``local_field`` est requis.
+        """
+        if isinstance(source, str) and local_field is None:
+            prefix, ref, rest = resolve_ref(self._model._schema, source)
+            if rest is not None:
+                raise ValueError(f"lookup('{source}') : un seul niveau de référence à la fois")
+            source = _get_model(ref, self._registry)
+            local_field = prefix
+            as_field = as_field or prefix
+        if local_field is None:
+            raise ValueError("lookup() : 'local_field' est requis hors champ 'ref'")
+
+        spec = {
+            'from': getattr(source, '_collection_name', source),
+            'localField': local_field,
+            'foreignField': foreign_field,
+            'as': as_field or local_field,
+        }
+        if pipeline is not None:
+            spec['pipeline'] = pipeline.stages if isinstance(pipeline, Pipeline) else pipeline
+        return self.stage({'$lookup': spec})
+
+    def count(self, field: str = 'count') -> 'Pipeline':
+        """Remplace les documents par leur nombre, dans ``field``"""
+        return self.stage({'$count': field})
+
+    def sort_by_count(self, field: str) -> 'Pipeline':
+        """Regroupe par ``field`` et trie par effectif décroissant"""
+        return self.stage({'$sortByCount': field_ref(field)})
+
+    def replace_root(self, expression: Any) -> 'Pipeline':
+        """Remplace chaque document par ``expression`` (un champ sous-document par exemple)"""
+        return self.stage({'$replaceRoot': {'newRoot': field_ref(expression)}})
+
+    def facet(self, **pipelines: Union[List[Dict[str, Any]], 'Pipeline']) -> 'Pipeline':
+        """Plusieurs sous-pipelines sur les mêmes documents, un résultat unique"""
+        return self.stage({'$facet': {
+            name: sub.stages if isinstance(sub, Pipeline) else sub
+            for name, sub in pipelines.items()
+        }})
+
+    def sample(self, size: int) -> 'Pipeline':
+        return self.stage({'$sample': {'size': size}})
+
+    # --- options d'exécution
+
+    def allow_disk_use(self, enabled: bool = True) -> 'Pipeline':
+        """Autorise le serveur à écrire sur disque les étapes trop grosses pour sa mémoire"""
+        self._options['allowDiskUse'] = enabled
+        return self
+
+    def hint(self, index: Union[str, List[Tuple[str, int]], Dict[str, int]]) -> 'Pipeline':
+        """Impose l'index du premier $match (nom ou spécification)"""
+        self._options['hint'] = dict(index) if isinstance(index, list) else index
+        return self
+
+    def max_time_ms(self, milliseconds: int) -> 'Pipeline':
+        """Interrompt l'agrégation côté serveur après ``milliseconds``"""
+        self._options['maxTimeMS'] = milliseconds
+        return self
+
+    def batch_size(self, size: int) -> 'Pipeline':
+        """Nombre de résultats par lot du curseur (mémoire client bornée par un lot)"""
+        self._batch_size = size
+        return self
+
+    def hydrate(self, enabled: bool = True) -> 'Pipeline':
+        """Construit des documents du modèle au lieu de dicts"""
+        self._hydrate = enabled
+        return self
+
+    def read_from(self, mode: Any, max_staleness: Optional[int] = None,
+                  tags: Optional[List[Dict[str, str]]] = None) -> 'Pipeline':
+        """Lit depuis les membres choisis (voir :meth:`Query.read_from`)"""
+        self._read_preference = read_preference(mode, max_staleness, tags)
+        return self
+
+    # --- exécution
+
+    def _cursor(self):
+        collection = self._collection
+        if self._read_preference is not None:
+            collection = collection.with_options(read_preference=self._read_preference)
+        options = dict(self._options)
+        if self._batch_size:
+            options['batchSize'] = self._batch_size
+        return collection.aggregate(self._stages, **options)
+
+    def _result(self, row: Dict[str, Any]) -> Any:
+        if not self._hydrate:
+            return row
+        # Les résultats remodelés ne doivent pas servir les lectures suivantes de la session
+        return self._model._hydrate(row, partial=True)
+
+    def _results(self, batch: List[Dict[str, Any]]) -> List[Any]:
+        return list(map(self._result, batch)) if self._hydrate else batch
+
+    def _batches(self) -> Iterator[List[Any]]:
+        """Itère sur les résultats par lots de ``batch_size``, construits dans l'opération en cours"""
+        operation = begin(self._model, 'aggregate')
+        if operation is not None:
+            operation.resume()
+        cursor = self._cursor()
+        try:
+            batch = []
+            for row in cursor:
+                batch.append(row)
+                if len(batch) >= (self._batch_size or DEFAULT_BATCH_SIZE):
+                    yield from Query._hand_over(self._results(batch), operation)
+                    batch = []
+            if batch:
+                yield from Query._hand_over(self._results(batch), operation)
+        finally:
+            cursor.close()
+            if operation is not None:
+                operation.pause()
+                operation.finish()
+
+    def stream(self) -> Iterator[Any]:
+        """Itère sur les résultats au fil des lots du curseur, en mémoire bornée"""
+        for results in self._batches():
+            yield from results
+
+    def __iter__(self) -> Iterator[Any]:
+        return self.stream()
+
+    @instrumented('aggregate')
+    def exec(self) -> List[Any]:
+        """Exécute la pipeline et retourne tous les résultats"""
+        return list(self.stream())
+
+    def first(self) -> Optional[Union[Dict[str, Any], Document]]:
+        """Premier résultat ou None (la pipeline n'est pas modifiée)"""
+        pipeline = self.clone().limit(1)
+        results = pipeline.exec()
+        return results[0] if results else None
+
+    def clone(self) -> 'Pipeline':
+        """Copie indépendante de la pipeline et de ses options"""
+        pipeline = type(self)(self._model, self._collection, self._stages)
+        pipeline._options = dict(self._options)
+        pipeline._batch_size = self._batch_size
+        pipeline._hydrate = self._hydrate
+        pipeline._read_preference = self._read_preference
+        return pipeline
+
+    def __repr__(self) -> str:
+        return f"<Pipeline {self._model._name} {self._stages!r}>"
@@ -0,0 +1,662 @@
+"""API asyncio de Pygoose, construite sur le client asynchrone de pymongo
+
+Les schémas sont partagés avec l'API synchrone : un même ``Schema`` peut
+servir à ``model()`` et à ``async_model()``.
+
+    User = async_model('User', UserSchema)
+    user = await User.find_one({'email': 'alice@example.com'})
+    async for post in Post.find({'author': user._id}):
+        ...
+"""
+
+from typing import Any, Awaitable, Dict, Iterable, List, Optional, Tuple, Union
+from bson import ObjectId
+from pymongo.errors import BulkWriteError as PyMongoBulkWriteError, ConnectionFailure, OperationFailure
+
+import asyncio
+import contextvars
+import inspect
+import time
+
+from .aggregation import Pipeline
+from .changes import _NOT_RESUMABLE, Change, ChangeStream, DEFAULT_AWAIT_MS, TokenStore
+from .connection import DEFAULT_ALIAS, _connections, get_async_database
+from .counters import flush_all
+from .document import Document
+from .exceptions import ChangeStreamError
+from .indexes import diff_indexes, scoped_models
+from .lazy import raw_collection
+from .middleware import add_phase, begin, count_documents, instrumented
+from .tracking import apply_inc
+from .model import Model, DEFAULT_CHUNK_SIZE
+from .pagination import DEFAULT_PAGE_SIZE, Page, page_query, split_page
+from .populate import Populator
+from .profiler import PlanSummary, current_recorder
+from .query import Query, DEFAULT_BATCH_SIZE
+from .results import BulkSaveResult, CreateManyResult, IndexSyncResult
+from .utils import chunked
+
+# Cache des modèles asynchrones (cibles des populate)
+_async_models: Dict[str, 'AsyncModel'] = {}
+
+
+async def _maybe_await(value: Any) -> Any:
+    if inspect.isawaitable(value):
+        return await value
+    return value
+
+
+def _completed(loop, value: Any) -> asyncio.Future:
+    future = loop.create_future()
+    future.set_result(value)
+    return future
+
+
+async def gather(*aws: Awaitable, concurrency: int = 10) -> List[Any]:
+    """Comme ``asyncio.gather``, avec au plus ``concurrency`` opérations simultanées"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(aw: Awaitable) -> Any:
+        async with semaphore:
+            return await aw
+
+    return await asyncio.gather(*(run(aw) for aw in aws))
+
+
+class AsyncDocument(Document):
+    """Document dont ``save()``, ``delete()`` et les hooks sont asynchrones"""
+
+    __slots__ = ()
+
+    @instrumented('save')
+    async def save(self) -> 'AsyncDocument':
+        """Sauvegarde le document"""
+        await self._run_hooks_async('pre', 'save')
+
+        count_documents(1)
+        if self._is_new:
+            result = await self._model._collection.insert_one(self._data)
+            self._data['_id'] = result.inserted_id
+            self._is_new = False
+        else:
+            update = self._pending_update()
+            if update:
+                await self._model._collection.update_one({'_id': self._data['_id']}, update)
+                self._model._invalidate({'_id': self._data['_id']})
+
+        self._mark_saved()
+        await self._run_hooks_async('post', 'save')
+        return self
+
+    @instrumented('delete')
+    async def delete(self) -> None:
+        """Supprime le document"""
+        if self._is_new:
+            raise RuntimeError("Impossible de supprimer un document non sauvegardé")
+
+        await self._run_hooks_async('pre', 'delete')
+        await self._model._collection.delete_one({'_id': self._data['_id']})
+        self._mark_deleted()
+        await self._run_hooks_async('post', 'delete')
+
+    async def inc(self, path: str, amount: Any = 1) -> 'AsyncDocument':
+        """Incrémente atomiquement ``path`` ($inc) en base et localement"""
+        if self._is_new:
+            raise RuntimeError("Impossible d'incrémenter un document non sauvegardé")
+        await self._model.inc({'_id': self._data['_id']}, path, amount)
+        apply_inc(self._data, path, amount)
+        return self
+
+    async def populate(self, path: str) -> 'AsyncDocument':
+        """Peuple un ou plusieurs champs 'ref' (séparés par des espaces)"""
+        populator = AsyncPopulator(self._model, [])
+        for field in path.split():
+            await populator.populate(self._model, [self], field)
+        return self
+
+    async def _run_hooks_async(self, when: str, action: str) -> None:
+        """Exécute les hooks, qu'ils soient des fonctions ou des coroutines"""
+        hooks = getattr(self._schema, f"{when}_hooks", {}).get(action, [])
+        if not hooks:
+            return
+        started = time.perf_counter()
+        for hook in hooks:
+            await _maybe_await(hook(self))
+        add_phase('hooks', time.perf_counter() - started)
+
+
+class AsyncPopulator(Populator):
+    """Résolution des références pour les modèles asynchrones"""
+
+    _registry = _async_models
+
+    async def hydrate(self, batch: List[Dict[str, Any]], partial: bool = False) -> List[Document]:
+        self._trim()
+        documents = self._build(batch, partial)
+        for path in self._paths:
+            await self.populate(self._model, documents, path)
+        return documents
+
+    async def populate(self, model, documents: List[Document], path: str) -> None:
+        target, prefix, rest, ids = self._plan(model, documents, path)
+        mapping = await self._fetch(target, ids)
+        found = self._apply(documents, prefix, rest, mapping)
+        if rest:
+            await self.populate(target, found, rest)
+
+    async def _fetch(self, target, ids: set) -> Dict[Any, Document]:
+        missing = self._missing(target, ids)
+        if missing:
+            async for doc_data in target._collection.find({'_id': {'$in': missing}}):
+                self._load(target, doc_data)
+        return self._resolved(target, ids, missing)
+
+
+class AsyncQuery(Query):
+    """Requête itérable avec ``async for`` et exécutée avec ``await``"""
+
+    async def _abatches(self, batch_size: Optional[int] = None, stages: List[Dict[str, Any]] = None,
+                        convert=None):
+        """Itère sur les documents bruts par lots de ``batch_size`` (un seul lot si None)
+
+        ``convert`` (coroutine) transforme chaque lot dans l'opération en cours (voir :meth:`Query._batches`).
+        """
+        recorder = current_recorder()
+        operation = begin(self._model, 'find')
+        if operation is not None:
+            operation.resume()
+        elapsed = 0.0
+        started = time.perf_counter()
+        # aggregate() est une coroutine côté asyncio, find() non
+        cursor = await _maybe_await(self._cursor(batch_size, stages))
+        try:
+            batch = []
+            async for doc_data in cursor:
+                batch.append(self._row(doc_data))
+                if batch_size and len(batch) >= batch_size:
+                    elapsed += time.perf_counter() - started
+                    # None pendant que l'appelant a la main : son temps n'est pas compté
+                    started = None
+                    count_documents(len(batch))
+                    if convert is not None:
+                        batch = await convert(batch)
+                    if operation is not None:
+                        operation.pause()
+                    try:
+                        yield batch
+                    finally:
+                        if operation is not None:
+                            operation.resume()
+                    started = time.perf_counter()
+                    batch = []
+            if batch:
+                elapsed += time.perf_counter() - started
+                started = None
+                count_documents(len(batch))
+                if convert is not None:
+                    batch = await convert(batch)
+                if operation is not None:
+                    operation.pause()
+                try:
+                    yield batch
+                finally:
+                    if operation is not None:
+                        operation.resume()
+                started = time.perf_counter()
+        finally:
+            await cursor.close()
+            if operation is not None:
+                operation.pause()
+                operation.finish()
+            if started is not None:
+                elapsed += time.perf_counter() - started
+            # Aussi quand l'itération est abandonnée avant la fin (aclose())
+            if recorder is not None:
+                await recorder.aobserve(self, elapsed)
+
+    async def explain(self, verbosity: str = 'executionStats') -> PlanSummary:
+        """Résumé du plan choisi par le serveur (voir :meth:`Query.explain`)"""
+        database = self._collection.database
+        options = {'read_preference': self._read_preference} if self._read_preference is not None else {}
+        return PlanSummary(await database.command({'explain': self._explain_command(), 'verbosity': verbosity},
+                                                  **options))
+
+    async def stream(self, batch_size: int = DEFAULT_BATCH_SIZE):
+        """Itère sur les documents au fil des lots du curseur, en mémoire bornée"""
+        partial = bool(self._effective_projection())
+        populator = None
+        if self._populate_fields:
+            populator = AsyncPopulator(self._model, self._populate_fields, self._lookup_fields)
+        stages = populator.stages() if populator else None
+
+        async def convert(batch: List[Dict[str, Any]]) -> List[Any]:
+            if populator is None:
+                return list(self._results(batch, partial))
+            return list(self._populated_results(await populator.hydrate(batch, partial)))
+
+        async for results in self._abatches(batch_size, stages, convert):
+            for result in results:
+                yield result
+
+    @instrumented('paginate')
+    async def paginate_after(self, token: Optional[str] = None, size: int = DEFAULT_PAGE_SIZE) -> Page:
+        """Page de ``size`` résultats située après ``token`` (pagination par clé)"""
+        query, sort = page_query(self, token, size)
+        populator = None
+        if query._populate_fields:
+            populator = AsyncPopulator(self._model, query._populate_fields, query._lookup_fields)
+        stages = populator.stages() if populator else None
+        rows = [row async for batch in query._abatches(None, stages) for row in batch]
+        rows, next_token = split_page(rows, sort, size)
+
+        partial = bool(query._effective_projection())
+        if populator is None:
+            return Page(list(query._results(rows, partial)), next_token)
+        return Page(list(query._populated_results(await populator.hydrate(rows, partial))), next_token)
+
+    def __aiter__(self):
+        return self.stream()
+
+    def __iter__(self):
+        raise TypeError("Requête asyncio : utiliser 'async for'")
+
+    @instrumented('find')
+    async def exec(self) -> List[Document]:
+        """Exécute la requête et retourne les documents"""
+        return [doc async for doc in self.stream(batch_size=None)]
+
+    @instrumented('find')
+    async def first(self) -> Optional[Document]:
+        """Retourne le premier document ou None"""
+        results = await self.limit(1).exec()
+        return results[0] if results else None
+
+    @instrumented('count')
+    async def count(self) -> int:
+        """Compte les documents correspondants"""
+        return await self._read_collection().count_documents(self._filter)
+
+
+class AsyncPipeline(Pipeline):
+    """Pipeline itérable avec ``async for`` et exécutée avec ``await``"""
+
+    _registry = _async_models
+
+    async def _abatches(self):
+        """Itère sur les résultats par lots de ``batch_size``, construits dans l'opération en cours"""
+        operation = begin(self._model, 'aggregate')
+        if operation is not None:
+            operation.resume()
+        cursor = await self._cursor()
+        try:
+            batch = []
+            async for row in cursor:
+                batch.append(row)
+                if len(batch) >= (self._batch_size or DEFAULT_BATCH_SIZE):
+                    count_documents(len(batch))
+                    batch = self._results(batch)
+                    if operation is not None:
+                        operation.pause()
+                    try:
+                        yield batch
+                    finally:
+                        if operation is not None:
+                            operation.resume()
+                    batch = []
+            if batch:
+                count_documents(len(batch))
+                batch = self._results(batch)
+                if operation is not None:
+                    operation.pause()
+                try:
+                    yield batch
+                finally:
+                    if operation is not None:
+                        operation.resume()
+        finally:
+            await cursor.close()
+            if operation is not None:
+                operation.pause()
+                operation.finish()
+
+    async def stream(self):
+        """Itère sur les résultats au fil des lots du curseur, en mémoire bornée"""
+        async for results in self._abatches():
+            for result in results:
+                yield result
+
+    def __aiter__(self):
+        return self.stream()
+
+    def __iter__(self):
+        raise TypeError("Pipeline asyncio : utiliser 'async for'")
+
+    @instrumented('aggregate')
+    async def exec(self) -> List[Any]:
+        """Exécute la pipeline et retourne tous les résultats"""
+        return [row async for row in self.stream()]
+
+    async def first(self) -> Optional[Any]:
+        """Premier résultat ou None (la pipeline n'est pas modifiée)"""
+        results = await self.clone().limit(1).exec()
+        return results[0] if results else None
+
+
+class AsyncChangeStream(ChangeStream):
+    """Flux de modifications itérable avec ``async for`` (voir :class:`pygoose.changes.ChangeStream`)"""
+
+    async def _acall(self, action):
+        for attempt in range(self._retries + 1):
+            try:
+                return await action()
+            except ConnectionFailure:
+                if attempt == self._retries:
+                    raise
+                await self._adiscard()
+                await asyncio.sleep(min(0.1 * 2 ** attempt, 5))
+            except OperationFailure as e:
+                if e.code in _NOT_RESUMABLE:
+                    await self._adiscard()
+                    raise ChangeStreamError(f"Flux de modifications {self.name} non reprenable : {e}") from e
+                raise
+
+    async def _adiscard(self) -> None:
+        cursor, self._cursor = self._cursor, None
+        if cursor is not None:
+            await cursor.close()
+
+    async def _aopen(self) -> None:
+        if self._cursor is None:
+            self._cursor = await self._model._collection.watch(self._pipeline, **self._watch_options())
+
+    async def open(self) -> 'AsyncChangeStream':
+        await self._acall(self._aopen)
+        return self
+
+    async def _try_next(self) -> Optional[Dict[str, Any]]:
+        await self._aopen()
+        return await self._cursor.try_next()
+
+    async def try_next(self) -> Optional[Change]:
+        """Prochaine modification, ou None après ``max_await_time_ms`` sans modification"""
+        self._acknowledge()
+        event = await self._acall(self._try_next)
+        if event is not None and event['operationType'] == 'invalidate':
+            await self._adiscard()
+        return self._received(event)
+
+    def __aiter__(self) -> 'AsyncChangeStream':
+        return self
+
+    async def __anext__(self) -> Change:
+        while True:
+            change = await self.try_next()
+            if change is not None:
+                return change
+
+    def __iter__(self):
+        raise TypeError("Flux asyncio : utiliser 'async for'")
+
+    async def close(self) -> None:
+        self._acknowledge()
+        await self._adiscard()
+
+    async def __aenter__(self) -> 'AsyncChangeStream':
+        return await self.open()
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        await self.close()
+
+
+class AsyncModel(Model):
+    """Modèle adossé au client asynchrone de pymongo"""
+
+    _document_class = AsyncDocument
+
+    def _setup_collection(self):
+        """Configure la collection (les index se créent avec ``await sync_indexes()``)"""
+        self._collection = self._route(get_async_database(self._alias, self._db_name)[self._collection_name])
+
+    async def sync_indexes(self, dry_run: bool = False, drop: bool = False) -> IndexSyncResult:
+        """Crée les index déclarés manquants (voir :meth:`Model.sync_indexes`)"""
+        collection = self._collection
+        existing = [info async for info in await _maybe_await(collection.list_indexes())]
+        result, missing = diff_indexes(self, existing, dry_run)
+        if dry_run:
+            result.created = [spec.name for spec in missing]
+            result.dropped = list(result.undeclared) if drop else []
+            return result
+
+        if drop:
+            for name in result.undeclared:
+                await collection.drop_index(name)
+                result.dropped.append(name)
+        for spec in missing:
+            try:
+                await collection.create_index(spec.keys, **spec.options)
+            except OperationFailure as e:
+                result.conflicts[spec.name] = str(e)
+            else:
+                result.created.append(spec.name)
+        return result
+
+    async def create_indexes(self) -> None:
+        """Crée les index déclarés manquants"""
+        await self.sync_indexes()
+
+    @instrumented('create')
+    async def create(self, data: Dict[str, Any]) -> AsyncDocument:
+        """Crée et sauvegarde un nouveau document"""
+        return await self._document_class(self, data).save()
+
+    @instrumented('create_many')
+    async def create_many(self, data_list: Iterable[Dict[str, Any]], chunk_size: int = DEFAULT_CHUNK_SIZE,
+                          ordered: bool = False, pipeline: bool = False,
+                          collect_ids: bool = True) -> CreateManyResult:
+        """Crée plusieurs documents par lots de ``chunk_size``
+
+        Avec ``pipeline=True`` la validation du lot suivant tourne dans un
+        thread pendant que l'insertion du lot courant est attendue.
+        """
+        result = CreateManyResult(collect_ids)
+        loop = asyncio.get_running_loop()
+        chunks = chunked(data_list, chunk_size)
+
+        def validate(pending):
+            if pending is None:
+                return None
+            if pipeline:
+                # Copie du contexte : la validation reste attribuée à l'opération en cours
+                return loop.run_in_executor(None, contextvars.copy_context().run, self._validate_chunk, *pending)
+            return _completed(loop, self._validate_chunk(*pending))
+
+        future = validate(next(chunks, None))
+        while future is not None:
+            validated = await future
+            future = validate(next(chunks, None))
+            if not await self._insert_chunk(validated, ordered, result):
+                break
+        if future is not None:
+            future.cancel()
+        return result
+
+    async def _insert_chunk(self, validated, ordered: bool, result: CreateManyResult) -> bool:
+        indexes, documents, errors = self._ordered_prefix(validated, ordered)
+        result.errors.update(errors)
+
+        failed = {}
+        if documents:
+            count_documents(len(documents))
+            try:
+                await self._collection.insert_many(documents, ordered=ordered)
+            except PyMongoBulkWriteError as e:
+                failed = self._bulk_failures(e.details, len(documents), ordered)
+        self._record_inserts(indexes, documents, failed, result)
+        return not (ordered and result.errors)
+
+    @instrumented('bulk_save')
+    async def bulk_save(self, documents: Iterable[Document], ordered: bool = False,
+                        chunk_size: int = DEFAULT_CHUNK_SIZE) -> BulkSaveResult:
+        """Sauvegarde plusieurs documents en quelques appels bulk_write"""
+        result = BulkSaveResult()
+        chunks = chunked(documents, chunk_size)
+        for start, chunk in chunks:
+            ops, pending = self._bulk_ops(await self._bulk_pre_hooks(chunk, start, result, ordered))
+            failed = {}
+            if ops:
+                count_documents(len(ops))
+                try:
+                    await self._collection.bulk_write(ops, ordered=ordered)
+                except PyMongoBulkWriteError as e:
+                    failed = self._bulk_failures(e.details, len(ops), ordered, result)
+            await self._bulk_post_hooks(self._bulk_finish(pending, failed, result), result)
+            if ordered and result.errors:
+                self._bulk_skip(chunks, result)
+                break
+        return result
+
+    async def _bulk_pre_hooks(self, chunk: List[AsyncDocument], start: int, result: BulkSaveResult,
+                              ordered: bool = False) -> List[Tuple[int, AsyncDocument]]:
+        """Exécute les hooks pré-sauvegarde (fonctions ou coroutines)"""
+        ready = []
+        for index, doc in enumerate(chunk, start):
+            try:
+                await doc._run_hooks_async('pre', 'save')
+            except Exception as e:
+                if self._bulk_hook_failed(index, e, start + len(chunk), result, ordered):
+                    break
+                continue
+            ready.append((index, doc))
+        return ready
+
+    @staticmethod
+    async def _bulk_post_hooks(saved: List[Tuple[int, AsyncDocument]], result: BulkSaveResult) -> None:
+        """Exécute les hooks post-sauvegarde (fonctions ou coroutines)"""
+        for index, doc in saved:
+            try:
+                await doc._run_hooks_async('post', 'save')
+            except Exception as e:
+                result.errors[index] = e
+
+    def find(self, filter_dict: Dict[str, Any] = None) -> AsyncQuery:
+        """Retourne un objet AsyncQuery pour construire la requête"""
+        query = AsyncQuery(self, self._collection)
+        if filter_dict:
+            query.find(filter_dict)
+        return query
+
+    @instrumented('find_one')
+    async def find_one(self, filter_dict: Dict[str, Any] = None, lazy: bool = False) -> Optional[AsyncDocument]:
+        """Trouve un seul document"""
+        doc, key = self._find_in_memory(filter_dict)
+        if doc is not None:
+            return doc
+
+        collection = raw_collection(self._collection) if lazy else self._collection
+        doc_data = await collection.find_one(filter_dict or {})
+        if doc_data:
+            count_documents(1)
+            return self._remember(key, self._row(doc_data, lazy))
+        return None
+
+    async def find_by_id(self, doc_id: Union[str, ObjectId]) -> Optional[AsyncDocument]:
+        """Trouve un document par son ID"""
+        doc_id = self._parse_id(doc_id)
+        if doc_id is None:
+            return None
+        return await self.find_one({'_id': doc_id})
+
+    @instrumented('update_one')
+    async def update_one(self, filter_dict: Dict[str, Any], update: Dict[str, Any]) -> int:
+        """Met à jour un document"""
+        result = await self._collection.update_one(filter_dict, self._stamp_update(update))
+        self._invalidate(filter_dict)
+        return result.modified_count
+
+    @instrumented('update_many')
+    async def update_many(self, filter_dict: Dict[str, Any], update: Dict[str, Any]) -> int:
+        """Met à jour plusieurs documents"""
+        result = await self._collection.update_many(filter_dict, self._stamp_update(update))
+        self._invalidate(filter_dict)
+        return result.modified_count
+
+    @instrumented('inc')
+    async def inc(self, filter_dict: Dict[str, Any], path: str, amount: Any = 1) -> int:
+        """Incrémente atomiquement ``path`` ($inc) sur les documents du filtre
+
+        Le mode différé (``buffered``) n'existe que pour les modèles synchrones.
+        """
+        return await self.update_many(filter_dict, {'$inc': {path: amount}})
+
+    @instrumented('delete_one')
+    async def delete_one(self, filter_dict: Dict[str, Any]) -> int:
+        """Supprime un document"""
+        result = await self._collection.delete_one(filter_dict)
+        self._invalidate(filter_dict)
+        return result.deleted_count
+
+    @instrumented('delete_many')
+    async def delete_many(self, filter_dict: Dict[str, Any]) -> int:
+        """Supprime plusieurs documents"""
+        result = await self._collection.delete_many(filter_dict)
+        self._invalidate(filter_dict)
+        return result.deleted_count
+
+    @instrumented('count')
+    async def count(self, filter_dict: Dict[str, Any] = None) -> int:
+        """Compte les documents"""
+        return await self._collection.count_documents(filter_dict or {})
+
+    @instrumented('aggregate')
+    async def aggregate(self, pipeline: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Exécute une pipeline d'agrégation"""
+        cursor = await self._collection.aggregate(pipeline)
+        return await cursor.to_list()
+
+    def pipeline(self, stages: Optional[List[Dict[str, Any]]] = None) -> AsyncPipeline:
+        """Retourne un objet AsyncPipeline pour construire l'agrégation"""
+        return AsyncPipeline(self, self._collection, stages)
+
+    def watch(self, filter_dict: Union[Dict[str, Any], List[Dict[str, Any]]] = None,
+              full_document: Optional[str] = None, token_store: Optional[TokenStore] = None,
+              name: Optional[str] = None, batch_size: Optional[int] = None,
+              max_await_time_ms: Optional[int] = DEFAULT_AWAIT_MS) -> AsyncChangeStream:
+        """Flux des modifications de la collection (voir :meth:`Model.watch`)"""
+        return AsyncChangeStream(self, filter_dict, full_document, token_store, name, batch_size, max_await_time_ms)
+
+
+def async_model(name: str, schema, collection_name: str = None,
+                alias: str = DEFAULT_ALIAS, db: str = None) -> AsyncModel:
+    """Crée ou retourne un modèle asynchrone (lié à la connexion ``alias`` et à la base ``db``)"""
+    if name in _async_models:
+        return _async_models[name]
+
+    model_instance = AsyncModel(name, schema, collection_name, alias, db)
+    _async_models[name] = model_instance
+
+    # Ajouter les méthodes statiques du schéma
+    for method_name, method_func in schema.statics.items():
+        setattr(model_instance, method_name, method_func.__get__(model_instance, AsyncModel))
+
+    return model_instance
+
+
+async def sync_indexes(models: Iterable[AsyncModel] = None, dry_run: bool = False, drop: bool = False,
+                       databases: Optional[Iterable[str]] = None) -> Dict[str, IndexSyncResult]:
+    """Synchronise les index des modèles asynchrones (par défaut tous ceux déclarés)
+
+    Comme :func:`pygoose.sync_indexes`, les vues ``using()`` et celles sur ``databases`` sont incluses.
+    """
+    models = scoped_models(_async_models.values() if models is None else models, databases)
+    results = await asyncio.gather(*(model.sync_indexes(dry_run=dry_run, drop=drop) for _, model in models))
+    return {label: result for (label, _), result in zip(models, results)}
+
+
+async def disconnect() -> None:
+    """Ferme les clients asynchrones puis les connexions synchrones"""
+    for connection in list(_connections.values()):
+        if connection._async_client is not None:
+            await connection._async_client.close()
+    flush_all()
+    for connection in list(_connections.values()):
+        connection.disconnect()
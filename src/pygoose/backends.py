@@ -0,0 +1,78 @@
+"""Moteurs de stockage : le client est choisi selon le schéma de l'URI
+
+    connect('mongodb://localhost:27017/app')   # pymongo
+    connect('memory:///app')                   # moteur en mémoire (voir pygoose.memory)
+
+Un moteur fournit un client dont les bases (``client[nom]``) donnent des
+collections offrant l'API de pymongo utilisée par les modèles : ``find``
+(curseur avec sort/skip/limit/batch_size), ``find_one``, ``insert_one``,
+``insert_many``, ``update_one``, ``update_many``, ``delete_one``,
+``delete_many``, ``count_documents``, ``aggregate``, ``bulk_write``,
+``with_options``, ``list_indexes``, ``create_index``, ``drop_index``,
+``watch`` (flux de modifications) et ``database.command`` pour ``explain``. Un nouveau moteur s'enregistre avec
+``register_backend('schéma', fabrique_client, fabrique_client_async)``.
+"""
+
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlparse
+
+import pymongo
+
+
+class Backend:
+    """Fabriques des clients synchrone et asyncio d'un schéma d'URI"""
+
+    def __init__(self, scheme: str, client_factory: Callable[..., Any],
+                 async_client_factory: Optional[Callable[..., Any]] = None):
+        self.scheme = scheme
+        self.client_factory = client_factory
+        self.async_client_factory = async_client_factory
+
+    def client(self, uri: str, options: Dict[str, Any]) -> Any:
+        return self.client_factory(uri, **options)
+
+    def async_client(self, uri: str, options: Dict[str, Any]) -> Any:
+        if self.async_client_factory is None:
+            raise RuntimeError(f"Le moteur '{self.scheme}' n'a pas d'API asyncio")
+        return self.async_client_factory(uri, **options)
+
+
+_backends: Dict[str, Backend] = {}
+
+
+def register_backend(scheme: str, client_factory: Callable[..., Any],
+                     async_client_factory: Optional[Callable[..., Any]] = None) -> None:
+    """Associe le schéma d'URI ``scheme`` à des fabriques de clients ``factory(uri, **options)``"""
+    _backends[scheme] = Backend(scheme, client_factory, async_client_factory)
+
+
+def get_backend(uri: str) -> Backend:
+    """Moteur correspondant au schéma de ``uri``"""
+    scheme = urlparse(uri).scheme
+    backend = _backends.get(scheme)
+    if backend is None:
+        raise ValueError(f"Moteur de stockage inconnu pour l'URI '{scheme}://'")
+    return backend
+
+
+def _async_mongo_client(uri: str, **options: Any) -> Any:
+    try:
+        from pymongo import AsyncMongoClient
+    except ImportError:
+        raise RuntimeError("L'API asyncio nécessite pymongo>=4.10")
+    return AsyncMongoClient(uri, **options)
+
+
+def _memory_client(uri: str, **options: Any) -> Any:
+    from .memory import MemoryClient
+    return MemoryClient(uri, **options)
+
+
+def _async_memory_client(uri: str, **options: Any) -> Any:
+    from .memory import AsyncMemoryClient
+    return AsyncMemoryClient(uri, **options)
+
+
+register_backend('mongodb', pymongo.MongoClient, _async_mongo_client)
+register_backend('mongodb+srv', pymongo.MongoClient, _async_mongo_client)
+register_backend('memory', _memory_client, _async_memory_client)
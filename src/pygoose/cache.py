@@ -0,0 +1,159 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional
+
+import threading
+import time
+
+# Valeurs par défaut de l'option de schéma 'cache'
+DEFAULT_TTL = 60
+DEFAULT_MAX_ENTRIES = 10000
+
+
+class CacheStats:
+    """Compteurs d'un cache de documents"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations,
+        }
+
+    def __repr__(self) -> str:
+        return f"CacheStats({self.as_dict()})"
+
+
+class CacheBackend(ABC):
+    """Interface d'un backend de cache de documents
+
+    Les clés sont des tuples ``(espace de noms, _id)`` et les valeurs des
+    documents encodés en BSON, ce qui permet à un backend partagé (Redis,
+    memcached...) de les stocker tels quels. L'espace de noms est la
+    collection, précédée de la connexion et de la base pour une vue
+    ``using()`` : les vues d'un même modèle ne se partagent pas d'entrées.
+    """
+
+    def __init__(self):
+        self.stats = CacheStats()
+
+    @abstractmethod
+    def get(self, key: Hashable) -> Optional[bytes]:
+        """Retourne la valeur en cache ou None"""
+
+    @abstractmethod
+    def set(self, key: Hashable, value: bytes) -> None:
+        """Enregistre une valeur"""
+
+    @abstractmethod
+    def delete(self, keys: Iterable[Hashable]) -> None:
+        """Invalide des entrées"""
+
+    @abstractmethod
+    def clear(self, namespace: str = None) -> None:
+        """Vide le cache, ou seulement les entrées d'un espace de noms"""
+
+
+class MemoryCache(CacheBackend):
+    """Cache LRU en mémoire du processus avec expiration (TTL)"""
+
+    def __init__(self, ttl: float = DEFAULT_TTL, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 clock=time.monotonic):
+        super().__init__()
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= self._clock():
+                del self._entries[key]
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: bytes) -> None:
+        expires_at = self._clock() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def delete(self, keys: Iterable[Hashable]) -> None:
+        with self._lock:
+            for key in keys:
+                if self._entries.pop(key, None) is not None:
+                    self.stats.invalidations += 1
+
+    def clear(self, namespace: str = None) -> None:
+        with self._lock:
+            if namespace is None:
+                self.stats.invalidations += len(self._entries)
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[0] == namespace]:
+                del self._entries[key]
+                self.stats.invalidations += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def build_cache(options: Any) -> Optional[CacheBackend]:
+    """Construit le backend décrit par l'option de schéma 'cache'
+
+    ``{'ttl': 30, 'max_entries': 100000}`` crée un :class:`MemoryCache` ;
+    ``{'backend': backend}`` utilise un backend fourni (éventuellement partagé).
+    """
+    if not options:
+        return None
+    if options is True:
+        return MemoryCache()
+    if isinstance(options, CacheBackend):
+        return options
+    if options.get('backend') is not None:
+        return options['backend']
+    return MemoryCache(
+        ttl=options.get('ttl', DEFAULT_TTL),
+        max_entries=options.get('max_entries', DEFAULT_MAX_ENTRIES),
+    )
+
+
+def ids_in_filter(filter_dict: Dict[str, Any]) -> Optional[list]:
+    """Identifiants ciblés par un filtre, ou None s'ils ne sont pas déductibles
+
+    Les autres clés du filtre ne font que restreindre la sélection : seuls
+    ``{'_id': x}``, ``{'_id': {'$eq': x}}`` et ``{'_id': {'$in': [...]}}``
+    permettent une invalidation ciblée.
+    """
+    if not filter_dict or '_id' not in filter_dict:
+        return None
+    value = filter_dict['_id']
+    if isinstance(value, dict):
+        if list(value) == ['$eq']:
+            return [value['$eq']]
+        if list(value) == ['$in']:
+            return list(value['$in'])
+        return None
+    return [value]
@@ -0,0 +1,590 @@
+"""Flux de modifications (change streams) : caches et vues dérivées tenus à jour
+
+    stream = Config.watch(full_document='updateLookup', token_store=FileTokenStore('tokens.json'))
+    for change in stream:
+        print(change.operation, change.document_id, change.full_document)
+
+Le jeton de reprise d'une modification est enregistré dans ``token_store``
+quand la suivante est demandée (ou à la fermeture du flux) : un processus
+redémarré reprend après la dernière modification traitée, qui peut donc
+être reçue deux fois. Une coupure réseau rouvre le flux au même jeton.
+
+``ChangeDispatcher`` distribue les modifications de plusieurs modèles :
+invalidation des caches de documents du processus (option de schéma
+'cache') et vues matérialisées en mémoire, par exemple une petite
+collection de configuration indexée par nom :
+
+    dispatcher = ChangeDispatcher(token_store=FileTokenStore('tokens.json'))
+    dispatcher.invalidate_cache(User)
+    settings = dispatcher.view(Setting, key='name')
+    dispatcher.start()                 # thread de fond ; ou poll() à la demande
+    settings['theme']
+
+Les flux de modifications demandent un replica set (un seul nœud suffit :
+``mongod --replSet rs0`` puis ``rs.initiate()``) ou le moteur ``memory://``.
+"""
+
+from abc import ABC, abstractmethod
+from collections.abc import Mapping
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+import logging
+import os
+import threading
+import time
+
+from bson import json_util
+from pymongo.errors import ConnectionFailure, OperationFailure
+
+from .document import Document
+from .exceptions import ChangeStreamError
+from .memory.matching import matches
+from .utils import pluck
+
+logger = logging.getLogger(__name__)
+
+# Attente côté serveur d'un appel try_next() sans modification
+DEFAULT_AWAIT_MS = 1000
+
+# Réouvertures consécutives après une coupure avant d'abandonner
+DEFAULT_RETRIES = 5
+
+# Le jeton ne permet plus de reprendre : historique perdu, jeton invalide, erreur fatale
+_NOT_RESUMABLE = {260, 280, 286}
+
+# Opérations qui vident toute la collection
+_COLLECTION_EVENTS = ('drop', 'rename', 'dropDatabase', 'invalidate')
+
+Filter = Union[Dict[str, Any], List[Dict[str, Any]], None]
+
+
+class TokenStore(ABC):
+    """Interface de stockage des jetons de reprise, par nom de flux"""
+
+    @abstractmethod
+    def load(self, name: str) -> Optional[Dict[str, Any]]:
+        """Dernier jeton enregistré, ou None"""
+
+    @abstractmethod
+    def save(self, name: str, token: Dict[str, Any]) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, name: str) -> None:
+        ...
+
+
+class MemoryTokenStore(TokenStore):
+    """Jetons gardés dans le processus (tests, flux sans reprise après redémarrage)"""
+
+    def __init__(self):
+        self._tokens: Dict[str, Dict[str, Any]] = {}
+
+    def load(self, name: str) -> Optional[Dict[str, Any]]:
+        return self._tokens.get(name)
+
+    def save(self, name: str, token: Dict[str, Any]) -> None:
+        self._tokens[name] = token
+
+    def delete(self, name: str) -> None:
+        self._tokens.pop(name, None)
+
+
+class FileTokenStore(TokenStore):
+    """Jetons dans un fichier JSON, réécrit de façon atomique à chaque enregistrement"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._tokens: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+
+    def _read(self) -> Dict[str, Any]:
+        if self._tokens is None:
+            try:
+                with open(self.path, encoding='utf-8') as file:
+                    self._tokens = json_util.loads(file.read())
+            except FileNotFoundError:
+                self._tokens = {}
+        return self._tokens
+
+    def _write(self) -> None:
+        temporary = f"{self.path}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as file:
+            file.write(json_util.dumps(self._tokens))
+        os.replace(temporary, self.path)
+
+    def load(self, name: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._read().get(name)
+
+    def save(self, name: str, token: Dict[str, Any]) -> None:
+        with self._lock:
+            self._read()[name] = token
+            self._write()
+
+    def delete(self, name: str) -> None:
+        with self._lock:
+            if self._read().pop(name, None) is not None:
+                self._write()
+
+
+class CollectionTokenStore(TokenStore):
+    """Jetons dans une collection (pymongo), partagés par les processus d'un même service"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def load(self, name: str) -> Optional[Dict[str, Any]]:
+        row = self.collection.find_one({'_id': name})
+        return row['token'] if row else None
+
+    def save(self, name: str, token: Dict[str, Any]) -> None:
+        self.collection.replace_one({'_id': name}, {'_id': name, 'token': token,
+                                                    'updated_at': datetime.now(timezone.utc)}, upsert=True)
+
+    def delete(self, name: str) -> None:
+        self.collection.delete_one({'_id': name})
+
+
+class Change:
+    """Une modification reçue du flux (événement brut dans ``raw``)"""
+
+    __slots__ = ('model', 'raw')
+
+    def __init__(self, model, raw: Dict[str, Any]):
+        self.model = model
+        self.raw = raw
+
+    @property
+    def operation(self) -> str:
+        """'insert', 'update', 'replace', 'delete', 'drop', 'invalidate'..."""
+        return self.raw['operationType']
+
+    @property
+    def token(self) -> Dict[str, Any]:
+        return self.raw['_id']
+
+    @property
+    def document_id(self) -> Any:
+        return self.raw.get('documentKey', {}).get('_id')
+
+    @property
+    def full_document(self) -> Optional[Dict[str, Any]]:
+        """Document complet : inserts et remplacements, mises à jour avec full_document='updateLookup'"""
+        return self.raw.get('fullDocument')
+
+    @property
+    def updated_fields(self) -> Dict[str, Any]:
+        return self.raw.get('updateDescription', {}).get('updatedFields', {})
+
+    @property
+    def removed_fields(self) -> List[str]:
+        return self.raw.get('updateDescription', {}).get('removedFields', [])
+
+    def document(self) -> Optional[Document]:
+        """Document du modèle construit depuis ``full_document``, ou None"""
+        if self.full_document is None:
+            return None
+        return self.model._hydrate(dict(self.full_document), partial=True)
+
+    def __repr__(self) -> str:
+        return f"<Change {self.operation} {self.model._name} {self.document_id!r}>"
+
+
+def stream_name(model) -> str:
+    """Nom par défaut du flux d'un modèle : la collection, précédée de la connexion
+    et de la base pour une vue ``using()`` (``'tenant:tenant_42/settings'``)"""
+    return model._namespace
+
+
+def change_pipeline(filter_dict: Filter) -> List[Dict[str, Any]]:
+    """Pipeline du flux : un filtre sur les événements devient une étape $match"""
+    if filter_dict is None:
+        return []
+    if isinstance(filter_dict, list):
+        return filter_dict
+    return [{'$match': filter_dict}]
+
+
+class ChangeStream:
+    """Flux de modifications d'un modèle, rouvert après une coupure et reprenable après redémarrage"""
+
+    def __init__(self, model, filter_dict: Filter = None, full_document: Optional[str] = None,
+                 token_store: Optional[TokenStore] = None, name: Optional[str] = None,
+                 batch_size: Optional[int] = None, max_await_time_ms: Optional[int] = DEFAULT_AWAIT_MS,
+                 retries: int = DEFAULT_RETRIES):
+        self._model = model
+        self._pipeline = change_pipeline(filter_dict)
+        self._options = {key: value for key, value in (
+            ('full_document', full_document), ('batch_size', batch_size),
+            ('max_await_time_ms', max_await_time_ms)) if value is not None}
+        self._token_store = token_store
+        self.name = name or stream_name(model)
+        self._token = token_store.load(self.name) if token_store is not None else None
+        # Jeton de la dernière modification rendue, enregistré une fois celle-ci traitée
+        self._pending: Optional[Dict[str, Any]] = None
+        self._retries = retries
+        self._cursor = None
+
+    @property
+    def resume_token(self) -> Optional[Dict[str, Any]]:
+        """Position du flux : jeton de la dernière modification rendue ou constatée"""
+        return self._pending or self._token
+
+    def _watch_options(self) -> Dict[str, Any]:
+        options = dict(self._options)
+        if self._token is not None:
+            # start_after accepte aussi le jeton d'un événement 'invalidate'
+            options['start_after'] = self._token
+        return options
+
+    def open(self) -> 'ChangeStream':
+        """Ouvre le curseur : les modifications suivantes seront reçues"""
+        if self._cursor is None:
+            self._call(self._open)
+        return self
+
+    def _open(self) -> None:
+        if self._cursor is None:
+            self._cursor = self._model._collection.watch(self._pipeline, **self._watch_options())
+
+    def _call(self, action: Callable[[], Any]) -> Any:
+        """Exécute ``action`` en rouvrant le flux au dernier jeton après une coupure"""
+        for attempt in range(self._retries + 1):
+            try:
+                return action()
+            except ConnectionFailure:
+                if attempt == self._retries:
+                    raise
+                logger.warning("Flux de modifications %s interrompu, reprise (%d)", self.name, attempt + 1)
+                self._discard()
+                time.sleep(min(0.1 * 2 ** attempt, 5))
+            except OperationFailure as e:
+                if e.code in _NOT_RESUMABLE:
+                    self._discard()
+                    raise ChangeStreamError(f"Flux de modifications {self.name} non reprenable : {e}") from e
+                raise
+
+    def _discard(self) -> None:
+        if self._cursor is not None:
+            try:
+                self._cursor.close()
+            except Exception:
+                pass
+            self._cursor = None
+
+    def _save(self, token: Dict[str, Any]) -> None:
+        self._token = token
+        if self._token_store is not None:
+            self._token_store.save(self.name, token)
+
+    def _acknowledge(self) -> None:
+        """Enregistre le jeton de la modification précédente, désormais traitée"""
+        if self._pending is not None:
+            self._save(self._pending)
+            self._pending = None
+
+    def _received(self, event: Optional[Dict[str, Any]]) -> Optional[Change]:
+        if event is None:
+            # Position avancée même sans modification (postBatchResumeToken)
+            token = self._cursor.resume_token if self._cursor is not None else None
+            if token is not None and token != self._token:
+                self._save(token)
+            return None
+        self._pending = event['_id']
+        if event['operationType'] == 'invalidate':
+            # Curseur fermé par le serveur ; rouvert après l'événement au prochain appel
+            self._discard()
+        return Change(self._model, event)
+
+    def _try_next(self) -> Optional[Dict[str, Any]]:
+        self._open()
+        return self._cursor.try_next()
+
+    def try_next(self) -> Optional[Change]:
+        """Prochaine modification, ou None après ``max_await_time_ms`` sans modification"""
+        self._acknowledge()
+        return self._received(self._call(self._try_next))
+
+    def __iter__(self) -> Iterator[Change]:
+        return self
+
+    def __next__(self) -> Change:
+        while True:
+            change = self.try_next()
+            if change is not None:
+                return change
+
+    def restart(self) -> None:
+        """Oublie la position enregistrée : le flux repart des modifications à venir"""
+        self._discard()
+        self._token = None
+        self._pending = None
+        if self._token_store is not None:
+            self._token_store.delete(self.name)
+
+    def close(self) -> None:
+        self._acknowledge()
+        self._discard()
+
+    def __enter__(self) -> 'ChangeStream':
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+class MaterializedView(Mapping):
+    """Copie en mémoire d'une collection (ou d'un filtre), indexée par ``key``, tenue à jour par le flux
+
+    Les valeurs sont des dicts bruts, ou des documents avec ``hydrate=True``.
+    Les lectures ne font aucun aller-retour ; un remplacement complet
+    (chargement initial, suppression de la collection) est atomique.
+    """
+
+    def __init__(self, model, filter_dict: Optional[Dict[str, Any]] = None, key: str = '_id',
+                 hydrate: bool = False):
+        self._model = model
+        self._filter = filter_dict or {}
+        self._key = key
+        self._parts = key.split('.')
+        self._hydrate = hydrate
+        self._rows: Dict[Any, Any] = {}
+        # _id -> clé de la vue, pour retrouver l'entrée d'un document supprimé
+        self._keys: Dict[Any, Any] = {}
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    def _value(self, doc_data: Dict[str, Any]) -> Any:
+        if self._hydrate:
+            return self._model._hydrate(doc_data, partial=True)
+        return doc_data
+
+    def load(self) -> None:
+        """(Re)charge la vue depuis la collection"""
+        rows, keys = {}, {}
+        for doc_data in self._model.find(self._filter).lean():
+            key = pluck(doc_data, self._parts)
+            rows[key] = self._value(doc_data)
+            keys[doc_data['_id']] = key
+        with self._lock:
+            self._rows, self._keys = rows, keys
+        self.loaded = True
+
+    def apply(self, change: Change) -> None:
+        """Répercute une modification"""
+        operation = change.operation
+        if operation in _COLLECTION_EVENTS:
+            self.load()
+            return
+        if operation == 'delete':
+            self._discard(change.document_id)
+            return
+        if 'fullDocument' not in change.raw:
+            logger.warning("Vue %s : modification reçue sans document complet (full_document='updateLookup')",
+                           self._model._name)
+            return
+        doc_data = change.full_document
+        if doc_data is None:
+            # Document supprimé depuis la mise à jour
+            self._discard(change.document_id)
+        elif self._filter and not matches(doc_data, self._filter):
+            self._discard(change.document_id)
+        else:
+            self._put(doc_data)
+
+    __call__ = apply
+
+    def _put(self, doc_data: Dict[str, Any]) -> None:
+        key = pluck(doc_data, self._parts)
+        value = self._value(dict(doc_data))
+        with self._lock:
+            previous = self._keys.get(doc_data['_id'], key)
+            if previous != key:
+                self._rows.pop(previous, None)
+            self._rows[key] = value
+            self._keys[doc_data['_id']] = key
+
+    def _discard(self, doc_id: Any) -> None:
+        with self._lock:
+            key = self._keys.pop(doc_id, None)
+            if key is not None or doc_id in self._rows:
+                self._rows.pop(key if key is not None else doc_id, None)
+
+    def snapshot(self) -> Dict[Any, Any]:
+        """Copie de la vue à un instant donné"""
+        with self._lock:
+            return dict(self._rows)
+
+    def __getitem__(self, key: Any) -> Any:
+        return self._rows[key]
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self.snapshot())
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __repr__(self) -> str:
+        return f"<MaterializedView {self._model._name} by {self._key}: {len(self)} entrée(s)>"
+
+
+class _Subscription:
+    """Flux d'un modèle et ses abonnés"""
+
+    def __init__(self, model):
+        self.model = model
+        self.handlers: List[Callable[[Change], None]] = []
+        self.views: List[MaterializedView] = []
+        self.stream: Optional[ChangeStream] = None
+
+
+class ChangeDispatcher:
+    """Distribue les modifications de plusieurs modèles à leurs abonnés
+
+    Un flux par modèle, ouvert au premier ``poll()`` (ou par ``start()``)
+    avant le chargement des vues, pour qu'aucune écriture concurrente ne
+    soit perdue. Les jetons sont enregistrés sous ``'<name>:<collection>'``
+    (``'<name>:<alias>:<base>/<collection>'`` pour une vue ``using()``, qui a
+    son propre flux).
+    Si l'historique ne permet plus de reprendre, les vues sont rechargées,
+    les caches vidés et le flux repart des modifications à venir.
+    """
+
+    def __init__(self, token_store: Optional[TokenStore] = None, name: str = 'pygoose',
+                 max_await_time_ms: int = DEFAULT_AWAIT_MS):
+        self.token_store = token_store
+        self.name = name
+        self.max_await_time_ms = max_await_time_ms
+        # Un abonnement par modèle et par base (vues ``using()`` distinctes)
+        self._subscriptions: Dict[Tuple[Any, ...], _Subscription] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    def _subscription(self, model) -> _Subscription:
+        subscription = self._subscriptions.get(model._scope)
+        if subscription is None:
+            subscription = self._subscriptions[model._scope] = _Subscription(model)
+        elif subscription.stream is not None:
+            raise RuntimeError("Abonnements à déclarer avant le premier poll()/start()")
+        return subscription
+
+    def on(self, model, handler: Callable[[Change], None],
+           operations: Optional[Iterable[str]] = None) -> None:
+        """Appelle ``handler(change)`` pour chaque modification de ``model`` (ou des ``operations`` choisies)"""
+        if operations is not None:
+            wanted = set(operations)
+            callback = handler
+
+            def handler(change: Change) -> None:
+                if change.operation in wanted:
+                    callback(change)
+        self._subscription(model).handlers.append(handler)
+
+    def invalidate_cache(self, model) -> None:
+        """Invalide le cache de documents de ``model`` à chaque modification, locale ou non"""
+        if model.cache is None:
+            raise ValueError(f"Le modèle {model._name} n'a pas de cache (option de schéma 'cache')")
+
+        def invalidate(change: Change) -> None:
+            if change.document_id is not None:
+                model._invalidate({'_id': change.document_id})
+            elif change.operation in _COLLECTION_EVENTS:
+                model.cache.clear(model._namespace)
+        self.on(model, invalidate)
+
+    def view(self, model, filter_dict: Optional[Dict[str, Any]] = None, key: str = '_id',
+             hydrate: bool = False) -> MaterializedView:
+        """Vue matérialisée de ``model`` tenue à jour par le flux"""
+        view = MaterializedView(model, filter_dict, key, hydrate)
+        self._subscription(model).views.append(view)
+        return view
+
+    # --- exécution
+
+    def _open(self) -> None:
+        for subscription in self._subscriptions.values():
+            if subscription.stream is not None:
+                continue
+            model = subscription.model
+            full_document = 'updateLookup' if subscription.views else None
+            stream = ChangeStream(model, full_document=full_document, token_store=self.token_store,
+                                  name=f"{self.name}:{stream_name(model)}",
+                                  max_await_time_ms=self.max_await_time_ms)
+            try:
+                stream.open()
+            except ChangeStreamError:
+                logger.warning("Flux %s non reprenable : reprise aux modifications à venir", stream.name)
+                stream.restart()
+                stream.open()
+            subscription.stream = stream
+            for view in subscription.views:
+                view.load()
+
+    def _dispatch(self, subscription: _Subscription, change: Change) -> None:
+        for target in subscription.views + subscription.handlers:
+            try:
+                target(change)
+            except Exception:
+                logger.exception("Échec du traitement de %r", change)
+
+    def _recover(self, subscription: _Subscription) -> None:
+        """Historique perdu : repart de maintenant avec des vues et un cache rechargés"""
+        logger.warning("Flux %s non reprenable : rechargement des vues et des caches", subscription.stream.name)
+        subscription.stream.restart()
+        subscription.stream.open()
+        model = subscription.model
+        if model.cache is not None:
+            model.cache.clear(model._namespace)
+        for view in subscription.views:
+            view.load()
+
+    def poll(self, max_events: Optional[int] = None) -> int:
+        """Traite les modifications disponibles ; retourne leur nombre
+
+        Chaque flux sans modification attend au plus ``max_await_time_ms``.
+        """
+        self._open()
+        count = 0
+        for subscription in self._subscriptions.values():
+            while max_events is None or count < max_events:
+                try:
+                    change = subscription.stream.try_next()
+                except ChangeStreamError:
+                    self._recover(subscription)
+                    continue
+                if change is None:
+                    break
+                self._dispatch(subscription, change)
+                count += 1
+        return count
+
+    def start(self) -> threading.Thread:
+        """Traite les modifications dans un thread de fond jusqu'à ``stop()``"""
+        if self._thread is not None:
+            raise RuntimeError("Dispatcher déjà démarré")
+        # Ouvert ici : les vues sont chargées au retour de start()
+        self._open()
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name=f"{self.name}-changes", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                self.poll()
+            except Exception:
+                logger.exception("Erreur du dispatcher de modifications %s", self.name)
+                self._stopping.wait(1)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Arrête le thread de fond et ferme les flux (jetons enregistrés)"""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        for subscription in self._subscriptions.values():
+            if subscription.stream is not None:
+                subscription.stream.close()
+                subscription.stream = None
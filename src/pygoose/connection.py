@@ -1,23 +1,40 @@
+import os
 import pymongo
 from typing import Optional, Dict, Any
 from urllib.parse import urlparse
+from .backends import get_backend
+from .counters import flush_all
+
+# Alias de la connexion utilisée par défaut par les modèles
+DEFAULT_ALIAS = 'default'
 
 class Connection:
-    _instance: Optional['Connection'] = None
-    _client: Optional[pymongo.MongoClient] = None
-    _database: Optional[pymongo.database.Database] = None
+    """Connexion MongoDB nommée (alias)
+
+    Le client est créé au premier accès (aucune requête réseau dans
+    ``connect()``) et recréé dans un processus fils après ``fork`` : un
+    ``MongoClient`` ne doit pas être partagé entre processus. Chaque alias
+    a son propre client, donc son propre pool (``maxPoolSize``, ...).
+    """
+    # Incrémenté à chaque (re)connexion : les collections liées aux modèles sont alors recréées
+    generation: int = 0
     
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-        return cls._instance
+    def __init__(self, alias: str = DEFAULT_ALIAS):
+        self.alias = alias
+        self._client: Optional[pymongo.MongoClient] = None
+        self._databases: Dict[str, pymongo.database.Database] = {}
+        self._async_client = None
+        self._uri: Optional[str] = None
+        self._db_name: Optional[str] = None
+        self._options: Dict[str, Any] = {}
+        self._pid: Optional[int] = None
     
     def connect(self, uri: str, options: Dict[str, Any] = None) -> None:
-        """Établit la connexion à MongoDB"""
+        """Enregistre la connexion à MongoDB ; le client est créé à la première requête"""
         if options is None:
             options = {}
-        
-        self._client = pymongo.MongoClient(uri, **options)
+        # Valide le schéma de l'URI (mongodb://, memory://...) sans créer de client
+        get_backend(uri)
         
         # Extraire le nom de la base de données de l'URI
         parsed = urlparse(uri)
@@ -25,43 +42,118 @@ class Connection:
         if not db_name:
             raise ValueError("Nom de base de données requis dans l'URI")
         
-        self._database = self._client[db_name]
-        
-        # Tester la connexion
-        self._client.admin.command('ping')
-        print(f"Connecté à MongoDB: {db_name}")
+        self._reset()
+        self._uri = uri
+        self._db_name = db_name
+        self._options = options
+        print(f"Connexion MongoDB configurée: {db_name} ({self.alias})")
+    
+    def _reset(self) -> None:
+        """Oublie les clients ; ils seront recréés au prochain accès"""
+        self._client = None
+        self._databases = {}
+        self._async_client = None
+        self._pid = None
+        Connection.generation += 1
+    
+    def _check_pid(self) -> None:
+        """Après un fork, les clients hérités du parent sont abandonnés (sans les fermer)"""
+        if self._pid is not None and self._pid != os.getpid():
+            self._reset()
+    
+    def _require(self) -> None:
+        if self._uri is None:
+            if self.alias == DEFAULT_ALIAS:
+                raise RuntimeError("Pas de connexion à MongoDB")
+            raise RuntimeError(f"Pas de connexion à MongoDB pour l'alias '{self.alias}'")
     
     def disconnect(self) -> None:
         """Ferme la connexion"""
-        if self._client:
-            self._client.close()
-            self._client = None
-            self._database = None
-            print("Déconnecté de MongoDB")
+        if self._uri is not None:
+            if self._client is not None and self._pid == os.getpid():
+                self._client.close()
+            self._reset()
+            self._uri = None
+            self._db_name = None
+            print(f"Déconnecté de MongoDB ({self.alias})")
     
     @property
     def database(self) -> pymongo.database.Database:
-        if self._database is None:
-            raise RuntimeError("Pas de connexion à MongoDB")
-        return self._database
+        return self.get_database()
+    
+    def get_database(self, name: str = None) -> pymongo.database.Database:
+        """Base ``name`` (par défaut celle de l'URI), mise en cache par nom"""
+        client = self.client
+        name = name or self._db_name
+        database = self._databases.get(name)
+        if database is None:
+            database = self._databases[name] = client[name]
+        return database
     
     @property
     def client(self) -> pymongo.MongoClient:
+        self._check_pid()
+        self._require()
         if self._client is None:
-            raise RuntimeError("Pas de connexion à MongoDB")
+            self._client = get_backend(self._uri).client(self._uri, self._options)
+            self._pid = os.getpid()
         return self._client
 
-# Instance globale
-_connection = Connection()
+    @property
+    def async_database(self):
+        """Base de données active côté asyncio (client créé à la demande)"""
+        return self.get_async_database()
+
+    def get_async_database(self, name: str = None):
+        """Base ``name`` (par défaut celle de l'URI) pour le client asyncio"""
+        self._check_pid()
+        self._require()
+        if self._async_client is None:
+            self._async_client = get_backend(self._uri).async_client(self._uri, self._options)
+            self._pid = os.getpid()
+        return self._async_client[name or self._db_name]
+
+# Connexions par alias
+_connection = Connection(DEFAULT_ALIAS)
+_connections: Dict[str, Connection] = {DEFAULT_ALIAS: _connection}
+
+def _after_fork() -> None:
+    # Les fils repartent sans client : rien du pool du parent n'est réutilisé
+    for connection in list(_connections.values()):
+        connection._check_pid()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+def get_connection(alias: str = DEFAULT_ALIAS) -> Connection:
+    """Retourne la connexion enregistrée sous ``alias``"""
+    connection = _connections.get(alias)
+    if connection is None:
+        raise RuntimeError(f"Pas de connexion à MongoDB pour l'alias '{alias}'")
+    return connection
+
+def connect(uri: str, options: Dict[str, Any] = None, alias: str = DEFAULT_ALIAS) -> None:
+    """Connecte à MongoDB (sans requête réseau avant la première opération)
+    
+    Chaque ``alias`` a son propre client et ses réglages de pool :
+    ``connect(uri, {'maxPoolSize': 20}, alias='analytics')``.
+    """
+    if alias not in _connections:
+        _connections[alias] = Connection(alias)
+    _connections[alias].connect(uri, options)
 
-def connect(uri: str, options: Dict[str, Any] = None) -> None:
-    """Connecte à MongoDB"""
-    _connection.connect(uri, options)
+def disconnect(alias: str = None) -> None:
+    """Déconnecte de MongoDB (après envoi des incréments différés) ; toutes les connexions si ``alias`` est None"""
+    # Seuls les tampons de la connexion fermée : les autres écrivent par des connexions toujours ouvertes
+    flush_all(alias)
+    connections = _connections.values() if alias is None else [get_connection(alias)]
+    for connection in list(connections):
+        connection.disconnect()
 
-def disconnect() -> None:
-    """Déconnecte de MongoDB"""
-    _connection.disconnect()
+def get_database(alias: str = DEFAULT_ALIAS, name: str = None) -> pymongo.database.Database:
+    """Retourne la base de données active (``name`` pour une autre base du même client)"""
+    return get_connection(alias).get_database(name)
 
-def get_database() -> pymongo.database.Database:
-    """Retourne la base de données active"""
-    return _connection.database
+def get_async_database(alias: str = DEFAULT_ALIAS, name: str = None):
+    """Retourne la base de données active pour le client asyncio"""
+    return get_connection(alias).get_async_database(name)
@@ -0,0 +1,202 @@
+"""Compteurs à écriture différée pour les champs incrémentés très souvent
+
+Les incréments d'un même (document, chemin) sont cumulés en mémoire puis
+envoyés en un seul ``bulk_write`` de ``$inc`` quand ``max_pending``
+couples sont en attente ou toutes les ``interval`` secondes (thread de
+fond). Les incréments restants sont envoyés à la fermeture du processus
+et par ``pygoose.disconnect()`` (ceux des modèles de la connexion fermée
+pour ``disconnect(alias)``).
+
+    Article.inc({'_id': article_id}, 'meta.views', buffered=True)
+
+Réglages par l'option de schéma ``{'counters': {'interval': 1.0, 'max_pending': 1000}}``
+(``interval=0`` : envoi seulement au seuil, par le thread de fond, ou par
+``flush()``). Un crash du processus perd les incréments non envoyés.
+
+Un incrément refusé définitivement par le serveur (validation, ``$inc``
+sur une valeur non numérique...) est abandonné et journalisé ; seuls les
+échecs transitoires sont remis en attente pour l'envoi suivant.
+"""
+
+from typing import Any, Dict, List, Tuple
+
+import atexit
+import logging
+import os
+import threading
+import weakref
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError as PyMongoBulkWriteError
+
+logger = logging.getLogger(__name__)
+
+# Valeurs par défaut de l'option de schéma 'counters'
+DEFAULT_INTERVAL = 1.0
+DEFAULT_MAX_PENDING = 1000
+
+# Tampons actifs, vidés à la fermeture du processus
+_buffers = weakref.WeakSet()
+
+# Erreurs d'écriture transitoires (élection, arrêt, conflit, délai) : l'incrément est retenté
+_RETRYABLE_CODES = {6, 7, 50, 89, 91, 112, 189, 262, 9001, 10107, 11600, 11602, 13435, 13436}
+
+
+class CounterBuffer:
+    """Cumule les incréments d'un modèle et les envoie par lots"""
+
+    def __init__(self, model, interval: float = DEFAULT_INTERVAL,
+                 max_pending: int = DEFAULT_MAX_PENDING):
+        self._model = model
+        self.interval = interval
+        self.max_pending = max_pending
+        self._pending: Dict[Tuple[Any, str], Any] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        # Réveille le thread de fond avant l'intervalle (seuil max_pending atteint)
+        self._wake = threading.Event()
+        self._thread = None
+        # Incréments abandonnés après une erreur d'écriture définitive
+        self.dropped = 0
+        _buffers.add(self)
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, doc_id: Any, path: str, amount: Any = 1) -> None:
+        """Ajoute un incrément en attente
+
+        Au seuil ``max_pending``, le thread de fond est réveillé : l'envoi (et
+        ses erreurs) ne se fait jamais dans le thread de l'appelant.
+        """
+        key = (doc_id, path)
+        with self._lock:
+            self._pending[key] = self._pending.get(key, 0) + amount
+            full = len(self._pending) >= self.max_pending
+        if self._thread is None:
+            self._start()
+        if full:
+            self._wake.set()
+
+    def flush(self) -> int:
+        """Envoie les incréments en attente ; retourne le nombre de documents mis à jour"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+
+            by_document: Dict[Any, Dict[str, Any]] = {}
+            for (doc_id, path), amount in pending.items():
+                by_document.setdefault(doc_id, {})[path] = amount
+            ids = list(by_document)
+            ops = [
+                UpdateOne({'_id': doc_id}, self._model._stamp_update({'$inc': by_document[doc_id]}))
+                for doc_id in ids
+            ]
+            try:
+                self._model._collection.bulk_write(ops, ordered=False)
+            except PyMongoBulkWriteError as e:
+                # Seules les opérations en échec transitoire sont remises en attente
+                retry, rejected = set(), []
+                for error in e.details.get('writeErrors', []):
+                    if error.get('code') in _RETRYABLE_CODES:
+                        retry.add(ids[error['index']])
+                    else:
+                        rejected.append(error)
+                self._restore({key: amount for key, amount in pending.items() if key[0] in retry})
+                self._drop(rejected, by_document, ids)
+                raise
+            except Exception:
+                # Rien n'est perdu : les incréments sont remis en attente
+                self._restore(pending)
+                raise
+            finally:
+                self._model._invalidate({'_id': {'$in': ids}})
+            return len(ops)
+
+    def _drop(self, errors: List[Dict[str, Any]], by_document: Dict[Any, Dict[str, Any]],
+              ids: List[Any]) -> None:
+        """Abandonne les incréments refusés définitivement, en les journalisant"""
+        for error in errors:
+            doc_id = ids[error['index']]
+            self.dropped += len(by_document[doc_id])
+            logger.error("Incréments de %s abandonnés pour _id=%r %r : %s (code %s)", self._model._name,
+                         doc_id, by_document[doc_id], error.get('errmsg'), error.get('code'))
+
+    def _restore(self, pending: Dict[Tuple[Any, str], Any]) -> None:
+        with self._lock:
+            for key, amount in pending.items():
+                self._pending[key] = self._pending.get(key, 0) + amount
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name=f"pygoose-counters-{self._model._name}",
+                                            daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            # Sans intervalle, seul le seuil (ou close()) réveille le thread
+            self._wake.wait(self.interval or None)
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Échec de l'envoi des compteurs de %s", self._model._name)
+
+    def _after_fork(self) -> None:
+        """Dans un processus fils : les incréments hérités restent à la charge du parent"""
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def close(self) -> None:
+        """Arrête le thread de fond et envoie les incréments restants"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+        self._stop.clear()
+        self._wake.clear()
+        self.flush()
+
+
+def build_counters(model, options: Any) -> CounterBuffer:
+    """Construit le tampon décrit par l'option de schéma 'counters'"""
+    options = options if isinstance(options, dict) else {}
+    return CounterBuffer(
+        model,
+        interval=options.get('interval', DEFAULT_INTERVAL),
+        max_pending=options.get('max_pending', DEFAULT_MAX_PENDING),
+    )
+
+
+def flush_all(alias: str = None) -> None:
+    """Envoie les incréments en attente de tous les modèles, ou de ceux de la connexion ``alias``"""
+    for buffer in list(_buffers):
+        if alias is not None and buffer._model._alias != alias:
+            continue
+        try:
+            buffer.close()
+        except Exception:
+            logger.exception("Échec de l'envoi des compteurs de %s", buffer._model._name)
+
+
+def _after_fork() -> None:
+    for buffer in list(_buffers):
+        buffer._after_fork()
+
+
+atexit.register(flush_all)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
@@ -1,28 +1,48 @@
-from typing import Dict, Any
+from typing import Dict, Any, Callable, List
 from datetime import datetime
+import inspect
 from .exceptions import ValidationError
+from .lazy import LazyData
+from .middleware import count_documents, instrumented, timed
+from .sessions import current_session
+from .tracking import ChangeSet, TrackedDict, TrackedList, apply_inc, plain, track
+from .validation import compile_field
 
 class Document:
     """Représente un document MongoDB avec validation et méthodes"""
     
+    __slots__ = ('_model', '_schema', '_data', '_changes', '_populated', '_is_new', '__weakref__')
+    
     def __init__(self, model, data: Dict[str, Any] = None, from_db: bool = False):
         self._model = model
         self._schema = model._schema
-        self._data = {}
-        self._original_data = {}
-        self._modified_fields = set()
+        self._populated = {}
         self._is_new = not from_db
         
-        if data:
-            if from_db:
-                # Données venant de la DB, pas besoin de validation
-                self._data = data.copy()
-                self._original_data = data.copy()
-            else:
-                # Nouvelles données, validation nécessaire
-                self._data = self._schema.validate(data)
-                if self._is_new:
-                    self._modified_fields = set(self._data.keys())
+        if not data:
+            self._data = {}
+        elif from_db:
+            # Données venant de la DB, pas besoin de validation ; les
+            # valeurs d'origine sont conservées à la première écriture
+            self._data = data if isinstance(data, LazyData) else data.copy()
+        else:
+            # Nouvelles données, validation nécessaire
+            self._data = self._schema.validate(data)
+        
+        self._changes = ChangeSet(self._data)
+        if self._is_new:
+            for key in self._data:
+                self._changes.set(key)
+    
+    @property
+    def _id(self) -> Any:
+        """Identifiant du document (None tant qu'il n'est pas sauvegardé)"""
+        return self._data.get('_id')
+    
+    @property
+    def _original_data(self) -> Dict[str, Any]:
+        """Valeurs d'origine des champs modifiés depuis la dernière sauvegarde"""
+        return self._changes.originals
     
     def __getattr__(self, name: str) -> Any:
         if name.startswith('_'):
@@ -32,9 +52,13 @@ class Document:
         if name in self._schema.methods:
             return lambda *args, **kwargs: self._schema.methods[name](self, *args, **kwargs)
         
+        # Références peuplées
+        if name in self._populated:
+            return self._populated[name]
+        
         # Données du document
         if name in self._data:
-            return self._data[name]
+            return self._tracked(name, self._data[name])
         
         # Champ avec valeur par défaut
         if name in self._schema.fields:
@@ -42,7 +66,7 @@ class Document:
             if field.default is not None:
                 default_value = field.default() if callable(field.default) else field.default
                 self._data[name] = default_value
-                return default_value
+                return self._tracked(name, default_value)
         
         raise AttributeError(f"'{self.__class__.__name__}' n'a pas d'attribut '{name}'")
     
@@ -55,29 +79,44 @@ class Document:
         if name in self._schema.fields:
             try:
                 validated_value = self._schema.fields[name].validate_value(value)
-                self._data[name] = validated_value
-                self._modified_fields.add(name)
-                
-                # Mettre à jour updated_at si timestamps activés
-                if self._schema.options.get('timestamps') and name != 'updated_at':
-                    self._data['updated_at'] = datetime.now()
-                    self._modified_fields.add('updated_at')
-                    
+                self._assign(name, validated_value)
             except ValidationError as e:
                 raise ValidationError(f"Erreur dans le champ '{name}': {str(e)}", name)
         else:
             # Mode non strict
             if not self._schema.options.get('strict', True):
-                self._data[name] = value
-                self._modified_fields.add(name)
+                self._assign(name, value)
             else:
                 raise AttributeError(f"Champ '{name}' non défini dans le schéma")
     
+    def _tracked(self, name: str, value: Any) -> Any:
+        """Enveloppe un dict ou une liste du document pour en suivre les modifications"""
+        if type(value) is dict or type(value) is list:
+            value = track(value, self._changes, None, name)
+            self._data[name] = value
+        return value
+    
+    def _assign(self, name: str, value: Any) -> None:
+        """Remplace un champ de premier niveau"""
+        self._changes.snapshot(name)
+        previous = self._data.get(name)
+        if isinstance(previous, (TrackedDict, TrackedList)):
+            previous._changes = None
+        if isinstance(value, (TrackedDict, TrackedList)):
+            # Valeur suivie par un autre document ou un autre champ
+            value = plain(value)
+        self._data[name] = value
+        self._changes.set(name)
+        if self._populated:
+            self._populated.pop(name, None)
+    
+    @instrumented('save')
     def save(self) -> 'Document':
         """Sauvegarde le document"""
         # Hooks pré-sauvegarde
         self._run_hooks('pre', 'save')
         
+        count_documents(1)
         if self._is_new:
             # Insertion
             result = self._model._collection.insert_one(self._data)
@@ -85,21 +124,45 @@ class Document:
             self._is_new = False
         else:
             # Mise à jour
-            if self._modified_fields:
-                update_data = {k: self._data[k] for k in self._modified_fields}
-                self._model._collection.update_one(
-                    {'_id': self._data['_id']},
-                    {'$set': update_data}
-                )
+            update = self._pending_update()
+            if update:
+                self._model._collection.update_one({'_id': self._data['_id']}, update)
+                self._model._invalidate({'_id': self._data['_id']})
         
-        self._modified_fields.clear()
-        self._original_data = self._data.copy()
+        self._mark_saved()
         
         # Hooks post-sauvegarde
         self._run_hooks('post', 'save')
         
         return self
     
+    def _pending_update(self) -> Dict[str, Any]:
+        """Opérateurs de mise à jour correspondant aux modifications en attente"""
+        if not self._changes:
+            return {}
+        # updated_at est posé une fois à la sauvegarde plutôt qu'à chaque écriture
+        if self._schema.options.get('timestamps') and not self._changes.touches('updated_at'):
+            self._data['updated_at'] = datetime.now()
+            self._changes.set('updated_at')
+        return self._changes.update()
+    
+    def _mark_saved(self) -> None:
+        """Remet à zéro le suivi des modifications après une sauvegarde"""
+        self._changes.clear()
+        
+        session = current_session()
+        if session is not None:
+            session.add(self)
+    
+    def _mark_deleted(self) -> None:
+        """Invalide les références au document après sa suppression"""
+        self._model._invalidate({'_id': self._data['_id']})
+        
+        session = current_session()
+        if session is not None:
+            session.discard(self)
+    
+    @instrumented('delete')
     def delete(self) -> None:
         """Supprime le document"""
         if self._is_new:
@@ -109,10 +172,31 @@ class Document:
         self._run_hooks('pre', 'delete')
         
         self._model._collection.delete_one({'_id': self._data['_id']})
+        self._mark_deleted()
         
         # Hooks post-suppression
         self._run_hooks('post', 'delete')
     
+    def inc(self, path: str, amount: Any = 1, buffered: bool = False) -> 'Document':
+        """Incrémente atomiquement ``path`` ($inc) en base et localement
+        
+        Avec ``buffered=True`` l'incrément est cumulé en mémoire et envoyé
+        plus tard (voir :mod:`pygoose.counters`).
+        """
+        if self._is_new:
+            raise RuntimeError("Impossible d'incrémenter un document non sauvegardé")
+        self._model.inc({'_id': self._data['_id']}, path, amount, buffered=buffered)
+        apply_inc(self._data, path, amount)
+        return self
+    
+    def populate(self, path: str) -> 'Document':
+        """Peuple un ou plusieurs champs 'ref' (séparés par des espaces)"""
+        from .populate import Populator
+        populator = Populator(self._model, [])
+        for field in path.split():
+            populator.populate(self._model, [self], field)
+        return self
+    
     def to_dict(self) -> Dict[str, Any]:
         """Convertit en dictionnaire"""
         return self._data.copy()
@@ -121,16 +205,101 @@ class Document:
         """Convertit en JSON"""
         import json
         from bson import json_util
-        return json.dumps(self._data, default=json_util.default)
+        return json.dumps(self.to_dict(), default=json_util.default)
     
     def is_modified(self, field: str = None) -> bool:
         """Vérifie si le document ou un champ a été modifié"""
         if field:
-            return field in self._modified_fields
-        return bool(self._modified_fields)
+            return self._changes.touches(field)
+        return bool(self._changes)
     
     def _run_hooks(self, when: str, action: str):
         """Exécute les hooks"""
         hooks = getattr(self._schema, f"{when}_hooks", {}).get(action, [])
+        if hooks:
+            timed('hooks', self._call_hooks, hooks)
+    
+    def _call_hooks(self, hooks: List[Callable]) -> None:
         for hook in hooks:
-            hook(self)
+            result = hook(self)
+            if inspect.isawaitable(result):
+                # Un hook asynchrone ne peut pas s'exécuter ici : il serait ignoré sans bruit
+                if inspect.iscoroutine(result):
+                    result.close()
+                raise TypeError(
+                    f"Le hook {getattr(hook, '__qualname__', hook)!r} est asynchrone : "
+                    f"utilisez async_model() pour le modèle {self._model._name!r}"
+                )
+
+
+class FieldDescriptor:
+    """Accès direct à un champ du schéma sur une classe de document générée"""
+    
+    __slots__ = ('name', '_validate', '_default', '_default_factory')
+    
+    def __init__(self, name: str, field):
+        self.name = name
+        self._validate = compile_field(field)
+        self._default = field.default
+        self._default_factory = field.default if callable(field.default) else None
+    
+    def __get__(self, doc, owner=None) -> Any:
+        if doc is None:
+            return self
+        populated = doc._populated
+        if populated and self.name in populated:
+            return populated[self.name]
+        try:
+            value = doc._data[self.name]
+        except KeyError:
+            value = self._missing(doc)
+        if type(value) is dict or type(value) is list:
+            value = doc._tracked(self.name, value)
+        return value
+    
+    def _missing(self, doc) -> Any:
+        """Valeur par défaut d'un champ absent des données"""
+        if self._default is None:
+            raise AttributeError(f"'{type(doc).__name__}' n'a pas d'attribut '{self.name}'")
+        value = self._default_factory() if self._default_factory else self._default
+        doc._data[self.name] = value
+        return value
+    
+    def __set__(self, doc, value: Any) -> None:
+        try:
+            value = self._validate(value)
+        except ValidationError as e:
+            raise ValidationError(f"Erreur dans le champ '{self.name}': {str(e)}", self.name)
+        doc._assign(self.name, value)
+
+
+def build_document_class(name: str, schema, base: type = Document) -> type:
+    """Génère la classe de document d'un modèle
+    
+    Chaque champ du schéma devient un descripteur et chaque méthode du
+    schéma une vraie méthode : l'accès ne passe plus par ``__getattr__``.
+    Les champs ou méthodes ajoutés au schéma après coup restent
+    accessibles par ``__getattr__``.
+    """
+    namespace = {'__slots__': (), '__module__': base.__module__}
+    for field_name, field in schema.fields.items():
+        # Les noms privés ou déjà utilisés par Document gardent l'accès générique
+        if not field_name.startswith('_') and not hasattr(base, field_name):
+            namespace[field_name] = FieldDescriptor(field_name, field)
+    for method_name, func in schema.methods.items():
+        if not hasattr(base, method_name):
+            namespace[method_name] = func
+    if schema.options.get('strict', True):
+        # Champs à descripteur et attributs privés (slots) : affectation directe ;
+        # les autres noms (champs ajoutés après coup) passent par la validation générique
+        direct = frozenset(field for field, value in namespace.items() if isinstance(value, FieldDescriptor))
+        fallback = base.__setattr__
+        
+        def __setattr__(doc, attribute: str, value: Any) -> None:
+            if attribute in direct or attribute.startswith('_'):
+                object.__setattr__(doc, attribute, value)
+            else:
+                fallback(doc, attribute, value)
+        
+        namespace['__setattr__'] = __setattr__
+    return type(f"{name}Document", (base,), namespace)
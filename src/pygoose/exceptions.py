@@ -7,6 +7,10 @@ class ValidationError(PyMongooseError):
     def __init__(self, message: str, field: str = None):
         self.field = field
         super().__init__(message)
+    
+    def __reduce__(self):
+        # Conserve ``field`` lors du passage entre processus
+        return (self.__class__, (str(self), self.field))
 
 class NotFoundError(PyMongooseError):
     """Document non trouvé"""
@@ -15,3 +19,13 @@ class NotFoundError(PyMongooseError):
 class DuplicateKeyError(PyMongooseError):
     """Clé dupliquée"""
     pass
+
+class BulkWriteError(PyMongooseError):
+    """Échec d'une partie des documents d'une écriture groupée"""
+    def __init__(self, message: str, errors: dict = None):
+        self.errors = errors or {}
+        super().__init__(message)
+
+class ChangeStreamError(PyMongooseError):
+    """Flux de modifications impossible à reprendre depuis le jeton enregistré"""
+    pass
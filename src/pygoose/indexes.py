@@ -0,0 +1,226 @@
+"""Synchronisation des index déclarés dans les schémas
+
+La déclaration d'un modèle ne crée plus d'index : la synchronisation est
+une étape explicite, à lancer au déploiement ou au démarrage.
+
+    pygoose.connect(uri)
+    pygoose.sync_indexes()                       # crée les index manquants
+    report = pygoose.sync_indexes(dry_run=True)  # ce qui serait fait, sans rien modifier
+    pygoose.sync_indexes(background=True)        # dans un thread, sans bloquer le démarrage
+
+Les index déclarés (``Schema.index`` et champs ``unique``) sont comparés à
+``list_indexes()`` : seuls les index manquants sont créés. Les index en
+base absents du schéma ne sont supprimés qu'avec ``drop=True``, et un index
+de mêmes clés mais d'options différentes est signalé comme conflit sans
+être modifié.
+
+Chaque base où un modèle est utilisé a ses propres index : les vues
+``Model.using('tenant_42')`` déjà créées dans le processus sont
+synchronisées avec leur modèle, et ``databases=`` ajoute les bases que le
+processus n'a pas encore touchées (nouveaux clients au déploiement) :
+
+    pygoose.sync_indexes(databases=[f"tenant_{id}" for id in tenant_ids])
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import logging
+import threading
+
+from pymongo.errors import OperationFailure
+
+from .results import IndexSyncResult
+from .utils import index_keys
+
+logger = logging.getLogger(__name__)
+
+# Options qui distinguent deux index de mêmes clés
+_COMPARED_OPTIONS = ('unique', 'sparse', 'expireAfterSeconds', 'partialFilterExpression', 'collation')
+_BOOLEAN_OPTIONS = ('unique', 'sparse')
+
+
+class IndexSpec:
+    """Index déclaré : clés et options passées à ``create_index``"""
+
+    def __init__(self, keys: List[Tuple[str, Any]], options: Dict[str, Any] = None):
+        self.keys = keys
+        self.options = dict(options or {})
+        self.name = self.options.get('name') or index_name(keys)
+
+    def __repr__(self) -> str:
+        return f"IndexSpec({self.keys!r}, {self.options!r})"
+
+
+def index_name(keys: List[Tuple[str, Any]]) -> str:
+    """Nom donné par MongoDB à un index sans option ``name``"""
+    return '_'.join(f"{field}_{direction}" for field, direction in keys)
+
+
+def _signature(keys: Iterable[Tuple[str, Any]], weights: Optional[Dict[str, Any]] = None) -> Tuple:
+    """Clés comparables d'un index, déclaré ou lu en base
+
+    Un index texte est stocké sous les clés ``_fts``/``_ftsx`` ; ses champs
+    se retrouvent dans ``weights``.
+    """
+    keys = [(field, int(direction) if isinstance(direction, float) else direction) for field, direction in keys]
+    text = sorted(weights) if weights else sorted(field for field, direction in keys if direction == 'text')
+    plain = tuple(
+        (field, direction) for field, direction in keys
+        if direction != 'text' and field not in ('_fts', '_ftsx')
+    )
+    return plain + ((('$text', tuple(text)),) if text else ())
+
+
+def _unique_paths(schema, fields: Dict[str, Any] = None, prefix: str = '') -> Iterable[str]:
+    """Chemins des champs déclarés ``unique``, sous-documents compris"""
+    if fields is None:
+        fields = schema.fields
+    for name, field in fields.items():
+        path = prefix + name
+        if field.unique:
+            yield path
+        nested = field.options.get('nested_schema')
+        if isinstance(nested, dict):
+            subfields = {key: schema._parse_field(value) for key, value in nested.items()}
+            yield from _unique_paths(schema, subfields, path + '.')
+
+
+def declared_indexes(schema) -> List[IndexSpec]:
+    """Index déclarés par un schéma, y compris ceux des champs ``unique``"""
+    specs = [IndexSpec(index_keys(fields), options) for fields, options in schema.indexes]
+    signatures = {_signature(spec.keys) for spec in specs}
+    for path in _unique_paths(schema):
+        keys = [(path, 1)]
+        # Un index explicite sur le même champ l'emporte
+        if _signature(keys) not in signatures:
+            specs.append(IndexSpec(keys, {'unique': True}))
+    return specs
+
+
+def _option_conflict(spec: IndexSpec, info: Dict[str, Any]) -> Optional[str]:
+    """Différence entre un index déclaré et l'index de mêmes clés en base, ou None"""
+    if 'name' in spec.options and info['name'] != spec.name:
+        return f"index existant sous le nom '{info['name']}'"
+    for option in _COMPARED_OPTIONS:
+        wanted, current = spec.options.get(option), info.get(option)
+        if option in _BOOLEAN_OPTIONS:
+            wanted, current = bool(wanted), bool(current)
+        elif option == 'collation' and wanted and current:
+            # La collation lue en base est complétée par les valeurs par défaut
+            current = {key: current.get(key) for key in wanted}
+        if wanted != current:
+            return f"option '{option}' : {current!r} en base, {wanted!r} déclaré"
+    return None
+
+
+def diff_indexes(model, existing: Iterable[Dict[str, Any]],
+                 dry_run: bool = False) -> Tuple[IndexSyncResult, List[IndexSpec]]:
+    """Compare les index déclarés du modèle à ``existing`` (sortie de ``list_indexes``)
+
+    Retourne le résultat (index non déclarés et conflits renseignés) et
+    les index à créer.
+    """
+    result = IndexSyncResult(model._name, dry_run)
+    by_signature, by_name = {}, {}
+    for info in existing:
+        if info['name'] == '_id_':
+            continue
+        by_signature[_signature(info['key'].items(), info.get('weights'))] = info
+        by_name[info['name']] = info
+
+    missing, matched = [], set()
+    for spec in declared_indexes(model._schema):
+        info = by_signature.get(_signature(spec.keys))
+        if info is None:
+            if spec.name in by_name:
+                matched.add(spec.name)
+                result.conflicts[spec.name] = "nom déjà utilisé par un index sur d'autres clés"
+            else:
+                missing.append(spec)
+            continue
+        matched.add(info['name'])
+        reason = _option_conflict(spec, info)
+        if reason:
+            result.conflicts[spec.name] = reason
+
+    result.undeclared = [name for name in by_name if name not in matched]
+    return result, missing
+
+
+def sync_model_indexes(model, dry_run: bool = False, drop: bool = False) -> IndexSyncResult:
+    """Crée les index manquants d'un modèle (et supprime les non déclarés avec ``drop``)"""
+    collection = model._collection
+    result, missing = diff_indexes(model, collection.list_indexes(), dry_run)
+    if dry_run:
+        result.created = [spec.name for spec in missing]
+        result.dropped = list(result.undeclared) if drop else []
+        return result
+
+    if drop:
+        # Avant les créations, pour libérer les noms
+        for name in result.undeclared:
+            collection.drop_index(name)
+            result.dropped.append(name)
+    for spec in missing:
+        try:
+            collection.create_index(spec.keys, **spec.options)
+        except OperationFailure as e:
+            result.conflicts[spec.name] = str(e)
+        else:
+            result.created.append(spec.name)
+    return result
+
+
+def scoped_models(models: Iterable[Any], databases: Optional[Iterable[str]] = None) -> List[Tuple[str, Any]]:
+    """(nom, modèle) des modèles, de leurs vues ``using()`` et de leurs vues sur ``databases``
+
+    Une entrée par base ; le nom d'une vue porte sa connexion et sa base.
+    """
+    databases = list(databases or [])
+    seen, result = set(), []
+    for model in models:
+        entries = [(model._name, model)]
+        for view in [*model._views.values(), *(model.using(db) for db in databases)]:
+            entries.append((f"{view._name}@{view._alias}/{view._db_name or ''}", view))
+        for label, candidate in entries:
+            if candidate._scope not in seen:
+                seen.add(candidate._scope)
+                result.append((label, candidate))
+    return result
+
+
+def _sync_all(models: List[Tuple[str, Any]], dry_run: bool, drop: bool) -> Dict[str, IndexSyncResult]:
+    results = {}
+    for label, model in models:
+        result = results[label] = model.sync_indexes(dry_run=dry_run, drop=drop)
+        for name, reason in result.conflicts.items():
+            logger.warning("Index %s de %s non synchronisé : %s", name, label, reason)
+    return results
+
+
+def _run_in_background(models: List[Tuple[str, Any]], dry_run: bool, drop: bool) -> None:
+    try:
+        _sync_all(models, dry_run, drop)
+    except Exception:
+        logger.exception("Échec de la synchronisation des index")
+
+
+def sync_indexes(models: Iterable[Any] = None, dry_run: bool = False, drop: bool = False,
+                 background: bool = False, databases: Optional[Iterable[str]] = None):
+    """Synchronise les index de ``models`` (par défaut tous les modèles déclarés)
+
+    Les vues ``using()`` des modèles et leurs vues sur ``databases`` sont
+    synchronisées aussi. Retourne un dict nom du modèle (``'User@default/tenant_42'``
+    pour une vue) -> :class:`IndexSyncResult`, ou le thread lancé avec
+    ``background=True`` (les erreurs y sont journalisées).
+    """
+    if models is None:
+        from .model import _models as registry
+        models = registry.values()
+    models = scoped_models(models, databases)
+    if background:
+        thread = threading.Thread(target=_run_in_background, args=(models, dry_run, drop),
+                                  name="pygoose-indexes", daemon=True)
+        thread.start()
+        return thread
+    return _sync_all(models, dry_run, drop)
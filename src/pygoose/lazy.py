@@ -0,0 +1,194 @@
+"""Hydratation paresseuse depuis le BSON brut
+
+Un :class:`LazyData` garde le buffer BSON renvoyé par le serveur et ne
+décode un champ qu'au premier accès : lire deux champs d'un gros document
+ne coûte qu'un parcours des en-têtes de premier niveau et le décodage de
+ces deux valeurs.
+
+    for user in User.find().lazy():
+        print(user.name)
+"""
+
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import struct
+
+import bson
+from bson.codec_options import CodecOptions, DEFAULT_CODEC_OPTIONS
+from bson.errors import InvalidBSON
+from bson.raw_bson import RawBSONDocument
+
+_INT32 = struct.Struct('<i')
+
+# Taille des valeurs de taille fixe, par type d'élément BSON
+_FIXED_SIZES = {
+    0x01: 8,   # double
+    0x06: 0,   # undefined
+    0x07: 12,  # ObjectId
+    0x08: 1,   # booléen
+    0x09: 8,   # date
+    0x0A: 0,   # null
+    0x10: 4,   # int32
+    0x11: 8,   # timestamp
+    0x12: 8,   # int64
+    0x13: 16,  # decimal128
+    0x7F: 0,   # maxkey
+    0xFF: 0,   # minkey
+}
+# Chaînes : int32 puis contenu ; documents, tableaux, code avec portée : taille totale
+_STRING_TYPES = (0x02, 0x0D, 0x0E)
+_SIZED_TYPES = (0x03, 0x04, 0x0F)
+
+_MISSING = object()
+
+
+def _value_size(raw: bytes, element_type: int, start: int) -> int:
+    """Taille en octets de la valeur d'un élément BSON commençant à ``start``"""
+    size = _FIXED_SIZES.get(element_type)
+    if size is not None:
+        return size
+    if element_type in _STRING_TYPES:
+        return 4 + _INT32.unpack_from(raw, start)[0]
+    if element_type in _SIZED_TYPES:
+        return _INT32.unpack_from(raw, start)[0]
+    if element_type == 0x05:
+        return 5 + _INT32.unpack_from(raw, start)[0]
+    if element_type == 0x0B:
+        pattern_end = raw.index(b'\x00', start)
+        return raw.index(b'\x00', pattern_end + 1) + 1 - start
+    if element_type == 0x0C:
+        return 4 + _INT32.unpack_from(raw, start)[0] + 12
+    raise InvalidBSON(f"Type d'élément BSON inconnu {element_type:#x}")
+
+
+def scan(raw: bytes, position: int = 4) -> Iterator[Tuple[str, int, int]]:
+    """Produit (nom, début, fin) des éléments de premier niveau, sans décoder les valeurs"""
+    end = len(raw) - 1
+    while position < end:
+        name_end = raw.index(b'\x00', position + 1)
+        value_start = name_end + 1
+        value_end = value_start + _value_size(raw, raw[position], value_start)
+        yield raw[position + 1:name_end].decode('utf-8'), position, value_end
+        position = value_end
+
+
+def raw_collection(collection):
+    """Vue de la collection renvoyant des ``RawBSONDocument``"""
+    codec_options = collection.codec_options.with_options(document_class=RawBSONDocument)
+    return collection.with_options(codec_options=codec_options)
+
+
+class LazyData(MutableMapping):
+    """Données d'un document décodées champ par champ depuis le BSON brut
+
+    Les valeurs décodées ou écrites sont conservées : une liste lue puis
+    modifiée sur place reste modifiée.
+    """
+
+    __slots__ = ('_raw', '_codec_options', '_offsets', '_scanner', '_values', '_deleted')
+
+    def __init__(self, raw: bytes, codec_options: CodecOptions = DEFAULT_CODEC_OPTIONS):
+        self._raw = raw
+        # Les valeurs sont décodées en dict, quel que soit le codec du curseur
+        if codec_options.document_class is RawBSONDocument:
+            codec_options = codec_options.with_options(document_class=dict)
+        self._codec_options = codec_options
+        self._offsets: Dict[str, Tuple[int, int]] = {}
+        self._scanner = scan(raw)
+        self._values = {}
+        self._deleted = set()
+
+    @property
+    def raw(self) -> bytes:
+        """BSON d'origine (sans les modifications)"""
+        return self._raw
+
+    @property
+    def decoded(self) -> int:
+        """Nombre de champs décodés ou écrits"""
+        return len(self._values)
+
+    def _span(self, key: str) -> Optional[Tuple[int, int]]:
+        """Position d'un élément ; le buffer n'est parcouru que jusqu'à lui"""
+        span = self._offsets.get(key)
+        if span is None and self._scanner is not None:
+            for name, start, end in self._scanner:
+                self._offsets[name] = (start, end)
+                if name == key:
+                    return start, end
+            self._scanner = None
+        return span
+
+    def _index(self) -> Dict[str, Tuple[int, int]]:
+        """Positions de tous les éléments"""
+        if self._scanner is not None:
+            for name, start, end in self._scanner:
+                self._offsets[name] = (start, end)
+            self._scanner = None
+        return self._offsets
+
+    def _decode(self, key: str) -> Any:
+        span = self._span(key)
+        if span is None or key in self._deleted:
+            return _MISSING
+        start, end = span
+        element = _INT32.pack(end - start + 5) + self._raw[start:end] + b'\x00'
+        return bson.decode(element, self._codec_options)[key]
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return self._values[key]
+        except KeyError:
+            pass
+        value = self._decode(key)
+        if value is _MISSING:
+            raise KeyError(key)
+        self._values[key] = value
+        return value
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self._values[key] = value
+        self._deleted.discard(key)
+
+    def __delitem__(self, key: str) -> None:
+        if key not in self:
+            raise KeyError(key)
+        self._values.pop(key, None)
+        self._deleted.add(key)
+
+    def __contains__(self, key: object) -> bool:
+        if key in self._values:
+            return True
+        return key not in self._deleted and self._span(key) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        for key in self._index():
+            if key not in self._deleted:
+                yield key
+        for key in self._values:
+            if key not in self._offsets:
+                yield key
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __bool__(self) -> bool:
+        # Évite un parcours complet : un BSON vide fait 5 octets
+        if self._values:
+            return True
+        if not self._deleted:
+            return len(self._raw) > 5
+        return any(True for _ in self)
+
+    def copy(self) -> Dict[str, Any]:
+        """Copie entièrement décodée sous forme de dict"""
+        # Un décodage complet en C est plus rapide que champ par champ
+        decoded = bson.decode(self._raw, self._codec_options)
+        decoded.update(self._values)
+        for key in self._deleted:
+            decoded.pop(key, None)
+        return decoded
+
+    def __repr__(self) -> str:
+        return f"LazyData({len(self)} champs, {len(self._values)} décodés)"
@@ -0,0 +1,25 @@
+"""Moteur de stockage en mémoire, pour des tests et benchmarks sans serveur
+
+    pygoose.connect('memory:///test')   # même API, aucune connexion réseau
+    ...
+    pygoose.memory.reset()              # efface toutes les données
+
+Le moteur implémente l'API de collection de pymongo utilisée par pygoose :
+filtres (égalité, $eq/$ne/$in/$nin, $gt/$gte/$lt/$lte, $exists, $and/$or/
+$nor, $not, $regex, $size, $all, $elemMatch, $type, $mod, $expr),
+opérateurs de mise à jour ($set, $unset, $inc, $mul, $min/$max, $rename,
+$push/$addToSet avec $each, $pull/$pullAll, $pop, $setOnInsert,
+$currentDate), tri, skip, limit, projections, agrégation (voir
+:mod:`.aggregation`), index et flux de modifications (``watch()``, voir
+:mod:`.changes`). Les index déclarés (``sync_indexes()``) gardent les
+recherches par égalité et par intervalle sous-linéaires et font respecter
+l'unicité.
+
+Hors périmètre : transactions, recherche texte, opérateurs positionnels et
+requêtes géographiques (OperationFailure).
+"""
+
+from .aio import AsyncMemoryClient
+from .client import MemoryClient, MemoryCollection, MemoryCursor, MemoryDatabase, reset
+
+__all__ = ['MemoryClient', 'AsyncMemoryClient', 'MemoryDatabase', 'MemoryCollection', 'MemoryCursor', 'reset']
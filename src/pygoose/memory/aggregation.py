@@ -0,0 +1,436 @@
+"""Pipeline d'agrégation du moteur en mémoire
+
+Étapes : $match, $project, $addFields/$set, $unset, $sort, $skip, $limit,
+$unwind, $group, $count, $sortByCount, $lookup (champs local/étranger),
+$replaceRoot/$replaceWith, $facet, $sample. Les expressions couvrent les
+références de champ, les opérateurs arithmétiques, de comparaison, de
+chaîne et de tableau courants, $cond et $ifNull.
+"""
+
+from typing import Any, Callable, Dict, Iterable, List
+import random
+
+from .matching import matches, truthy, unsupported
+from .projection import project
+from .values import compare, copy_value, equals, rank, sort_key, values
+
+
+def _path(doc: Any, path: str) -> Any:
+    """Valeur d'un chemin d'expression (tableau des valeurs à travers les tableaux)"""
+    current = doc
+    for part in path.split('.'):
+        if isinstance(current, dict):
+            if part not in current:
+                return None
+            current = current[part]
+        elif isinstance(current, list):
+            current = [item[part] for item in current if isinstance(item, dict) and part in item]
+        else:
+            return None
+    return current
+
+
+def _divide(a, b):
+    if b == 0:
+        raise unsupported("La division par zéro")
+    return a / b
+
+
+_ARITHMETIC: Dict[str, Callable] = {
+    '$subtract': lambda a, b: a - b,
+    '$divide': _divide,
+    '$mod': lambda a, b: a % b,
+    '$pow': lambda a, b: a ** b,
+}
+
+_COMPARISON: Dict[str, Callable[[int], bool]] = {
+    '$eq': lambda cmp: cmp == 0,
+    '$ne': lambda cmp: cmp != 0,
+    '$gt': lambda cmp: cmp > 0,
+    '$gte': lambda cmp: cmp >= 0,
+    '$lt': lambda cmp: cmp < 0,
+    '$lte': lambda cmp: cmp <= 0,
+}
+
+
+def evaluate(expression: Any, doc: Dict[str, Any], variables: Dict[str, Any] = None) -> Any:
+    """Valeur d'une expression d'agrégation pour ``doc``"""
+    variables = variables or {}
+    if isinstance(expression, str):
+        if expression.startswith('$$'):
+            name, _, rest = expression[2:].partition('.')
+            if name in ('ROOT', 'CURRENT'):
+                base = doc
+            elif name in variables:
+                base = variables[name]
+            else:
+                raise unsupported(f"La variable $${name}")
+            return _path(base, rest) if rest else base
+        if expression.startswith('$'):
+            return _path(doc, expression[1:])
+        return expression
+    if isinstance(expression, list):
+        return [evaluate(item, doc, variables) for item in expression]
+    if not isinstance(expression, dict):
+        return expression
+    if len(expression) == 1:
+        op, argument = next(iter(expression.items()))
+        if op.startswith('$'):
+            return _operator(op, argument, doc, variables)
+    return {key: evaluate(value, doc, variables) for key, value in expression.items()}
+
+
+def _args(argument: Any, doc, variables) -> List[Any]:
+    if isinstance(argument, list):
+        return [evaluate(item, doc, variables) for item in argument]
+    return [evaluate(argument, doc, variables)]
+
+
+def _operator(op: str, argument: Any, doc, variables) -> Any:
+    if op == '$literal':
+        return argument
+    if op == '$cond':
+        if isinstance(argument, dict):
+            condition, then, otherwise = argument['if'], argument['then'], argument['else']
+        else:
+            condition, then, otherwise = argument
+        chosen = then if truthy(evaluate(condition, doc, variables)) else otherwise
+        return evaluate(chosen, doc, variables)
+    if op == '$ifNull':
+        args = argument if isinstance(argument, list) else [argument]
+        for item in args:
+            value = evaluate(item, doc, variables)
+            if value is not None:
+                return value
+        return None
+    if op == '$map':
+        items = evaluate(argument['input'], doc, variables)
+        name = argument.get('as', 'this')
+        return None if items is None else [
+            evaluate(argument['in'], doc, dict(variables, **{name: item})) for item in items]
+    if op == '$filter':
+        items = evaluate(argument['input'], doc, variables)
+        name = argument.get('as', 'this')
+        return None if items is None else [
+            item for item in items if truthy(evaluate(argument['cond'], doc, dict(variables, **{name: item})))]
+
+    args = _args(argument, doc, variables)
+    if op in ('$add', '$multiply'):
+        if any(arg is None for arg in args):
+            return None
+        total = 0 if op == '$add' else 1
+        for arg in args:
+            total = total + arg if op == '$add' else total * arg
+        return total
+    if op in _ARITHMETIC:
+        if any(arg is None for arg in args):
+            return None
+        return _ARITHMETIC[op](*args)
+    if op in _COMPARISON:
+        return _COMPARISON[op](compare(args[0], args[1]))
+    if op == '$cmp':
+        return compare(args[0], args[1])
+    if op == '$and':
+        return all(truthy(arg) for arg in args)
+    if op == '$or':
+        return any(truthy(arg) for arg in args)
+    if op == '$not':
+        return not truthy(args[0])
+    if op == '$in':
+        return any(equals(args[0], item) for item in args[1])
+    if op == '$abs':
+        return None if args[0] is None else abs(args[0])
+    if op in ('$sum', '$avg', '$min', '$max'):
+        items = args[0] if len(args) == 1 and isinstance(args[0], list) else args
+        return _reduce(op, items)
+    if op == '$concat':
+        return None if any(arg is None for arg in args) else ''.join(args)
+    if op == '$toLower':
+        return '' if args[0] is None else str(args[0]).lower()
+    if op == '$toUpper':
+        return '' if args[0] is None else str(args[0]).upper()
+    if op == '$toString':
+        return None if args[0] is None else str(args[0])
+    if op == '$strLenCP':
+        return len(args[0])
+    if op == '$substrCP':
+        return args[0][args[1]:args[1] + args[2]]
+    if op == '$size':
+        if not isinstance(args[0], list):
+            raise unsupported("$size sur une valeur qui n'est pas un tableau")
+        return len(args[0])
+    if op == '$arrayElemAt':
+        items, index = args
+        if items is None:
+            return None
+        return items[index] if -len(items) <= index < len(items) else None
+    if op in ('$first', '$last'):
+        items = args[0]
+        if not items:
+            return None
+        return items[0] if op == '$first' else items[-1]
+    if op == '$concatArrays':
+        return None if any(arg is None for arg in args) else [item for arg in args for item in arg]
+    if op == '$slice':
+        items = args[0]
+        if len(args) == 2:
+            count = args[1]
+            return items[count:] if count < 0 else items[:count]
+        return items[args[1]:args[1] + args[2]]
+    raise unsupported(f"L'opérateur d'expression {op}")
+
+
+def _reduce(op: str, items: Iterable[Any]) -> Any:
+    numbers = [item for item in items if rank(item) == 2 and not isinstance(item, bool)]
+    if op == '$sum':
+        return sum(numbers)
+    if op == '$avg':
+        return sum(numbers) / len(numbers) if numbers else None
+    present = [item for item in items if item is not None]
+    if not present:
+        return None
+    key = lambda item: sort_key(item)  # noqa: E731
+    return min(present, key=key) if op == '$min' else max(present, key=key)
+
+
+# --- étapes
+
+
+def _project(doc: Dict[str, Any], spec: Dict[str, Any]) -> Dict[str, Any]:
+    """$project : inclusion, exclusion ou champs calculés"""
+    if all(_flag(value) is False for value in spec.values()):
+        return project(doc, spec)
+    result = {}
+    if _flag(spec.get('_id', True)) is not False and '_id' in doc:
+        result['_id'] = doc['_id']
+    for key, value in spec.items():
+        flag = _flag(value)
+        if key == '_id' and flag is not None:
+            continue
+        if flag is True:
+            _copy_path(doc, result, key)
+        elif flag is False:
+            raise unsupported("Le mélange d'inclusion et d'exclusion dans $project")
+        else:
+            _set_path(result, key, evaluate(value, doc))
+    return result
+
+
+def _flag(value: Any):
+    """True (inclusion), False (exclusion) ou None (expression)"""
+    if isinstance(value, bool) or rank(value) == 2:
+        return bool(value)
+    return None
+
+
+def _copy_path(source: Dict[str, Any], target: Dict[str, Any], path: str) -> None:
+    head, _, rest = path.partition('.')
+    if head not in source:
+        return
+    value = source[head]
+    if not rest:
+        target[head] = copy_value(value)
+    elif isinstance(value, dict):
+        _copy_path(value, target.setdefault(head, {}), rest)
+    elif isinstance(value, list):
+        items = target.setdefault(head, [{} for item in value if isinstance(item, dict)])
+        for item, out in zip([item for item in value if isinstance(item, dict)], items):
+            _copy_path(item, out, rest)
+
+
+def _set_path(doc: Dict[str, Any], path: str, value: Any) -> None:
+    parts = path.split('.')
+    for part in parts[:-1]:
+        if not isinstance(doc.get(part), dict):
+            doc[part] = {}
+        doc = doc[part]
+    doc[parts[-1]] = value
+
+
+def _unset_path(doc: Dict[str, Any], path: str) -> None:
+    parts = path.split('.')
+    for part in parts[:-1]:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(parts[-1], None)
+
+
+def sort_documents(docs: List[Dict[str, Any]], spec: Any) -> List[Dict[str, Any]]:
+    """Tri stable multi-clés ; un tableau est trié sur son plus petit (ou plus grand) élément"""
+    items = list(spec.items()) if isinstance(spec, dict) else list(spec)
+    docs = list(docs)
+    for field, direction in reversed(items):
+        if isinstance(direction, dict):
+            raise unsupported("Le tri par $meta")
+        descending = direction < 0
+
+        def key(doc, field=field, descending=descending):
+            found = values(doc, field)
+            if not found:
+                return (1,)
+            keys = []
+            for value in found:
+                if not isinstance(value, list):
+                    keys.append(sort_key(value))
+                elif value:
+                    keys.extend(sort_key(item) for item in value)
+                else:
+                    keys.append((1,))
+            return max(keys) if descending else min(keys)
+        docs.sort(key=key, reverse=descending)
+    return docs
+
+
+def _unwind(docs: List[Dict[str, Any]], spec: Any) -> List[Dict[str, Any]]:
+    if isinstance(spec, str):
+        spec = {'path': spec}
+    path = spec['path'][1:]
+    keep_empty = spec.get('preserveNullAndEmptyArrays', False)
+    index_field = spec.get('includeArrayIndex')
+    result = []
+    for doc in docs:
+        value = _path(doc, path)
+        if isinstance(value, list) and value:
+            for position, item in enumerate(value):
+                out = copy_value(doc)
+                _set_path(out, path, item)
+                if index_field:
+                    out[index_field] = position
+                result.append(out)
+        elif value is not None and not isinstance(value, list):
+            out = copy_value(doc)
+            if index_field:
+                out[index_field] = None
+            result.append(out)
+        elif keep_empty:
+            out = copy_value(doc)
+            if index_field:
+                out[index_field] = None
+            result.append(out)
+    return result
+
+
+def _group(docs: List[Dict[str, Any]], spec: Dict[str, Any]) -> List[Dict[str, Any]]:
+    groups: Dict[Any, Dict[str, Any]] = {}
+    members: Dict[Any, List[Dict[str, Any]]] = {}
+    for doc in docs:
+        group_id = evaluate(spec['_id'], doc)
+        key = sort_key(group_id)
+        if key not in groups:
+            groups[key] = {'_id': group_id}
+            members[key] = []
+        members[key].append(doc)
+    result = []
+    for key, group in groups.items():
+        rows = members[key]
+        for field, accumulator in spec.items():
+            if field == '_id':
+                continue
+            (op, expression), = accumulator.items()
+            group[field] = _accumulate(op, expression, rows)
+        result.append(group)
+    return result
+
+
+def _accumulate(op: str, expression: Any, rows: List[Dict[str, Any]]) -> Any:
+    if op == '$count':
+        return len(rows)
+    evaluated = [evaluate(expression, row) for row in rows]
+    if op in ('$sum', '$avg', '$min', '$max'):
+        return _reduce(op, evaluated)
+    if op == '$push':
+        return evaluated
+    if op == '$addToSet':
+        result = []
+        for value in evaluated:
+            if not any(equals(value, item) for item in result):
+                result.append(value)
+        return result
+    if op == '$first':
+        return evaluated[0] if evaluated else None
+    if op == '$last':
+        return evaluated[-1] if evaluated else None
+    raise unsupported(f"L'accumulateur {op}")
+
+
+def run_pipeline(docs: List[Dict[str, Any]], pipeline: List[Dict[str, Any]], database) -> List[Dict[str, Any]]:
+    """Applique les étapes de ``pipeline`` aux documents (copiés au besoin)"""
+    docs = list(docs)
+    for stage in pipeline:
+        (name, spec), = stage.items()
+        if name == '$match':
+            docs = [doc for doc in docs if matches(doc, spec)]
+        elif name == '$project':
+            docs = [_project(doc, spec) for doc in docs]
+        elif name in ('$addFields', '$set'):
+            result = []
+            for doc in docs:
+                out = copy_value(doc)
+                for key, expression in spec.items():
+                    _set_path(out, key, evaluate(expression, doc))
+                result.append(out)
+            docs = result
+        elif name == '$unset':
+            fields = [spec] if isinstance(spec, str) else spec
+            result = []
+            for doc in docs:
+                out = copy_value(doc)
+                for field in fields:
+                    _unset_path(out, field)
+                result.append(out)
+            docs = result
+        elif name == '$sort':
+            docs = sort_documents(docs, spec)
+        elif name == '$skip':
+            docs = docs[spec:]
+        elif name == '$limit':
+            docs = docs[:spec]
+        elif name == '$unwind':
+            docs = _unwind(docs, spec)
+        elif name == '$group':
+            docs = _group(docs, spec)
+        elif name == '$count':
+            docs = [{spec: len(docs)}] if docs else []
+        elif name == '$sortByCount':
+            docs = sort_documents(_group(docs, {'_id': spec, 'count': {'$sum': 1}}), [('count', -1)])
+        elif name == '$lookup':
+            docs = _lookup(docs, spec, database)
+        elif name in ('$replaceRoot', '$replaceWith'):
+            expression = spec['newRoot'] if name == '$replaceRoot' else spec
+            docs = [evaluate(expression, doc) for doc in docs]
+        elif name == '$facet':
+            docs = [{key: run_pipeline(docs, sub, database) for key, sub in spec.items()}]
+        elif name == '$sample':
+            docs = random.sample(docs, min(spec['size'], len(docs)))
+        else:
+            raise unsupported(f"L'étape {name}")
+    return docs
+
+
+def _lookup(docs: List[Dict[str, Any]], spec: Dict[str, Any], database) -> List[Dict[str, Any]]:
+    if 'localField' not in spec or 'pipeline' in spec:
+        raise unsupported("$lookup avec pipeline")
+    foreign = database[spec['from']]._rows()
+    by_key: Dict[Any, List[Dict[str, Any]]] = {}
+    for row in foreign:
+        found = values(row, spec['foreignField'])
+        keys = {sort_key(value) for value in (found[0] if found and isinstance(found[0], list) else found)} \
+            if found else {(1,)}
+        for key in keys:
+            by_key.setdefault(key, []).append(row)
+    result = []
+    for doc in docs:
+        local = values(doc, spec['localField'])
+        local_values = [item for value in local for item in (value if isinstance(value, list) else [value])] \
+            if local else [None]
+        joined, seen = [], set()
+        for value in local_values:
+            for row in by_key.get(sort_key(value), ()):
+                if id(row) not in seen:
+                    seen.add(id(row))
+                    joined.append(copy_value(row))
+        out = copy_value(doc)
+        out[spec['as']] = joined
+        result.append(out)
+    return result
@@ -0,0 +1,144 @@
+"""Façade asyncio du moteur en mémoire (API de l'AsyncMongoClient de pymongo)"""
+
+from typing import Any, List, Optional
+
+from .changes import AsyncMemoryChangeStream
+from .client import MemoryClient, MemoryCollection, MemoryDatabase, MemorySession
+
+# Méthodes de collection qui sont des coroutines côté pymongo asyncio
+_COROUTINES = (
+    'insert_one', 'insert_many', 'update_one', 'update_many', 'replace_one', 'delete_one', 'delete_many',
+    'find_one', 'find_one_and_update', 'find_one_and_replace', 'find_one_and_delete', 'count_documents',
+    'estimated_document_count', 'distinct', 'bulk_write', 'create_index', 'create_indexes', 'drop_index',
+    'drop_indexes', 'drop', 'index_information',
+)
+
+
+class AsyncMemoryCursor:
+    """Curseur itérable avec ``async for``"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._cursor, name)
+        if name in ('sort', 'skip', 'limit', 'batch_size', 'max_time_ms', 'hint', 'comment', 'collation'):
+            def chained(*args, **kwargs):
+                attr(*args, **kwargs)
+                return self
+            return chained
+        return attr
+
+    def __aiter__(self) -> 'AsyncMemoryCursor':
+        return self
+
+    async def __anext__(self) -> Any:
+        try:
+            return next(self._cursor)
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def next(self) -> Any:
+        return await self.__anext__()
+
+    async def to_list(self, length: Optional[int] = None) -> List[Any]:
+        return self._cursor.to_list(length)
+
+    async def close(self) -> None:
+        self._cursor.close()
+
+
+class AsyncMemorySession(MemorySession):
+    async def end_session(self) -> None:
+        self.has_ended = True
+
+
+def _coroutine(name: str):
+    async def method(self, *args, **kwargs):
+        return getattr(self._collection, name)(*args, **kwargs)
+    method.__name__ = name
+    return method
+
+
+class AsyncMemoryCollection:
+    def __init__(self, database: 'AsyncMemoryDatabase', collection: MemoryCollection):
+        self.database = database
+        self._collection = collection
+
+    name = property(lambda self: self._collection.name)
+    full_name = property(lambda self: self._collection.full_name)
+    codec_options = property(lambda self: self._collection.codec_options)
+    read_preference = property(lambda self: self._collection.read_preference)
+
+    def with_options(self, **options: Any) -> 'AsyncMemoryCollection':
+        return AsyncMemoryCollection(self.database, self._collection.with_options(**options))
+
+    def find(self, *args, **kwargs) -> AsyncMemoryCursor:
+        return AsyncMemoryCursor(self._collection.find(*args, **kwargs))
+
+    async def aggregate(self, pipeline, **kwargs) -> AsyncMemoryCursor:
+        return AsyncMemoryCursor(self._collection.aggregate(pipeline, **kwargs))
+
+    async def list_indexes(self, **kwargs) -> AsyncMemoryCursor:
+        return AsyncMemoryCursor(self._collection.list_indexes(**kwargs))
+
+    async def watch(self, *args, **kwargs) -> AsyncMemoryChangeStream:
+        return AsyncMemoryChangeStream(self._collection.watch(*args, **kwargs))
+
+
+for _name in _COROUTINES:
+    setattr(AsyncMemoryCollection, _name, _coroutine(_name))
+
+
+class AsyncMemoryDatabase:
+    def __init__(self, client: 'AsyncMemoryClient', database: MemoryDatabase):
+        self.client = client
+        self._database = database
+        self.name = database.name
+
+    def __getitem__(self, name: str) -> AsyncMemoryCollection:
+        return AsyncMemoryCollection(self, self._database[name])
+
+    def get_collection(self, name: str, **kwargs) -> AsyncMemoryCollection:
+        return AsyncMemoryCollection(self, self._database.get_collection(name, **kwargs))
+
+    async def command(self, *args, **kwargs) -> Any:
+        return self._database.command(*args, **kwargs)
+
+    async def list_collection_names(self, **kwargs) -> List[str]:
+        return self._database.list_collection_names(**kwargs)
+
+    async def drop_collection(self, name: Any, **kwargs) -> None:
+        self._database.drop_collection(name, **kwargs)
+
+    async def watch(self, *args, **kwargs) -> AsyncMemoryChangeStream:
+        return AsyncMemoryChangeStream(self._database.watch(*args, **kwargs))
+
+
+class AsyncMemoryClient:
+    """Client asyncio du moteur en mémoire : mêmes données que :class:`MemoryClient`"""
+
+    def __init__(self, host: str = 'memory://', **options: Any):
+        self._client = MemoryClient(host, **options)
+        self._databases = {}
+
+    def __getitem__(self, name: str) -> AsyncMemoryDatabase:
+        return self.get_database(name)
+
+    def get_database(self, name: str, **kwargs) -> AsyncMemoryDatabase:
+        database = self._databases.get(name)
+        if database is None:
+            database = self._databases[name] = AsyncMemoryDatabase(self, self._client[name])
+        return database
+
+    def start_session(self, causal_consistency: Optional[bool] = None, **kwargs) -> AsyncMemorySession:
+        return AsyncMemorySession(self._client, causal_consistency)
+
+    async def drop_database(self, name: Any, **kwargs) -> None:
+        self._client.drop_database(name)
+
+    async def watch(self, *args, **kwargs) -> AsyncMemoryChangeStream:
+        return AsyncMemoryChangeStream(self._client.watch(*args, **kwargs))
+
+    async def close(self) -> None:
+        pass
@@ -0,0 +1,242 @@
+"""Flux de modifications du moteur en mémoire
+
+Chaque hôte ``memory://`` garde un journal borné de ses écritures, comme
+l'oplog d'un replica set : un flux ouvert par ``watch()`` lit les
+événements postérieurs à sa position et peut reprendre après un jeton
+(``resume_after`` / ``start_after``) tant que celui-ci est encore dans le
+journal. Au-delà, l'ouverture échoue comme sur le serveur
+(ChangeStreamHistoryLost, code 286).
+"""
+
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional, Tuple
+import asyncio
+import threading
+import time
+
+from bson import Timestamp
+from pymongo.errors import OperationFailure
+
+from .matching import matches, unsupported
+from .values import copy_value, equals, sort_key
+
+# Nombre d'événements conservés par hôte
+DEFAULT_HISTORY = 10000
+
+# Valeurs de full_document qui relisent le document courant sur une mise à jour
+_LOOKUP = ('updateLookup', 'whenAvailable', 'required')
+
+
+def _token(sequence: int) -> Dict[str, str]:
+    return {'_data': f"{sequence:016X}"}
+
+
+def _sequence(token: Any) -> int:
+    try:
+        return int(token['_data'], 16)
+    except (TypeError, KeyError, ValueError):
+        raise OperationFailure(f"Jeton de reprise invalide : {token!r}", code=260)
+
+
+def update_description(old_doc: Dict[str, Any], new_doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Champs (de premier niveau) modifiés et retirés entre deux versions d'un document"""
+    updated = {key: value for key, value in new_doc.items()
+               if key not in old_doc or not equals(old_doc[key], value)}
+    removed = [key for key in old_doc if key not in new_doc]
+    return {'updatedFields': updated, 'removedFields': removed, 'truncatedArrays': []}
+
+
+class ChangeLog:
+    """Journal des écritures d'un hôte"""
+
+    def __init__(self, history: int = DEFAULT_HISTORY):
+        self.events: Deque[Tuple[int, Dict[str, Any]]] = deque(maxlen=history)
+        self.sequence = 0
+        self.condition = threading.Condition()
+
+    def record(self, namespace: str, operation: str, document_id: Any = None,
+               **fields: Any) -> None:
+        """Ajoute un événement ; les documents passés ne doivent plus être modifiés"""
+        database, _, collection = namespace.partition('.')
+        with self.condition:
+            self.sequence += 1
+            now = datetime.now(timezone.utc)
+            event = {
+                '_id': _token(self.sequence),
+                'operationType': operation,
+                'clusterTime': Timestamp(int(now.timestamp()), self.sequence & 0xFFFFFFFF),
+                'wallTime': now.replace(tzinfo=None, microsecond=now.microsecond // 1000 * 1000),
+                'ns': {'db': database, 'coll': collection} if collection else {'db': database},
+            }
+            if document_id is not None:
+                event['documentKey'] = {'_id': document_id}
+            event.update(fields)
+            self.events.append((self.sequence, event))
+            self.condition.notify_all()
+
+    def since(self, sequence: int) -> List[Tuple[int, Dict[str, Any]]]:
+        """Événements postérieurs à ``sequence``"""
+        with self.condition:
+            if sequence < self.sequence - len(self.events):
+                raise OperationFailure("Le jeton de reprise n'est plus dans le journal des modifications",
+                                       code=286)
+            if not self.events or sequence >= self.sequence:
+                return []
+            first = self.events[0][0]
+            return list(self.events)[max(0, sequence + 1 - first):]
+
+    def wait(self, sequence: int, timeout: float) -> None:
+        """Attend un événement postérieur à ``sequence`` pendant au plus ``timeout`` secondes"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.sequence > sequence, timeout)
+
+
+class MemoryChangeStream:
+    """Flux de modifications (API de ``pymongo.change_stream.ChangeStream``)"""
+
+    def __init__(self, server, database: Optional[str], collection: Optional[str],
+                 pipeline: Optional[List[Dict[str, Any]]] = None, full_document: Optional[str] = None,
+                 resume_after: Any = None, start_after: Any = None, max_await_time_ms: Optional[int] = None,
+                 **kwargs: Any):
+        self._server = server
+        self._log: ChangeLog = server.changes
+        self._database = database
+        self._collection = collection
+        self._filters = []
+        for stage in pipeline or []:
+            if list(stage) != ['$match']:
+                raise unsupported(f"L'étape {next(iter(stage))} dans un flux de modifications")
+            self._filters.append(stage['$match'])
+        self._full_document = full_document
+        self._await = (1000 if max_await_time_ms is None else max_await_time_ms) / 1000
+
+        token = start_after or resume_after
+        if token is None:
+            self._position = self._log.sequence
+        else:
+            self._position = _sequence(token)
+            self._log.since(self._position)
+        self._resume_token = token or _token(self._position)
+        self._pending: Deque[Dict[str, Any]] = deque()
+        self._alive = True
+
+    @property
+    def alive(self) -> bool:
+        return self._alive
+
+    @property
+    def resume_token(self) -> Dict[str, str]:
+        return self._resume_token
+
+    def _watches(self, event: Dict[str, Any]) -> bool:
+        ns = event['ns']
+        if self._database is not None and ns['db'] != self._database:
+            return False
+        return self._collection is None or ns.get('coll') in (None, self._collection)
+
+    def _lookup(self, event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        ns = event['ns']
+        store = self._server.store(ns['db'], ns['coll'], create=False)
+        if store is None:
+            return None
+        return store.docs.get(sort_key(event['documentKey']['_id']))
+
+    def _shape(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        event = dict(event)
+        if event['operationType'] == 'update' and self._full_document in _LOOKUP:
+            event['fullDocument'] = self._lookup(event)
+        return copy_value(event)
+
+    def _poll(self) -> Optional[Dict[str, Any]]:
+        """Prochain événement déjà journalisé, sans attendre"""
+        if self._pending:
+            return self._deliver(self._pending.popleft())
+        for sequence, event in self._log.since(self._position):
+            self._position = sequence
+            if not self._watches(event):
+                continue
+            shaped = self._shape(event)
+            selected = not self._filters or all(matches(shaped, spec) for spec in self._filters)
+            if self._collection is not None and event['operationType'] in ('drop', 'dropDatabase'):
+                # Comme sur le serveur, la suppression de la collection invalide le flux
+                self._pending.append({'_id': _token(sequence), 'operationType': 'invalidate',
+                                      'clusterTime': event['clusterTime'], 'wallTime': event['wallTime']})
+                return self._deliver(shaped if selected else self._pending.popleft())
+            if selected:
+                return self._deliver(shaped)
+        # Position avancée même sans événement retenu (postBatchResumeToken)
+        self._resume_token = _token(self._position)
+        return None
+
+    def _deliver(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        self._resume_token = event['_id']
+        if event['operationType'] == 'invalidate':
+            self._alive = False
+        return event
+
+    def try_next(self) -> Optional[Dict[str, Any]]:
+        """Prochain événement, ou None après ``max_await_time_ms`` sans modification"""
+        if not self._alive:
+            return None
+        event = self._poll()
+        if event is None:
+            self._log.wait(self._position, self._await)
+            event = self._poll()
+        return event
+
+    def next(self) -> Dict[str, Any]:
+        while self._alive:
+            event = self.try_next()
+            if event is not None:
+                return event
+        raise StopIteration
+
+    __next__ = next
+
+    def __iter__(self) -> 'MemoryChangeStream':
+        return self
+
+    def close(self) -> None:
+        self._alive = False
+
+    def __enter__(self) -> 'MemoryChangeStream':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+class AsyncMemoryChangeStream:
+    """Flux de modifications itérable avec ``async for``"""
+
+    def __init__(self, stream: MemoryChangeStream):
+        self._stream = stream
+
+    alive = property(lambda self: self._stream.alive)
+    resume_token = property(lambda self: self._stream.resume_token)
+
+    async def try_next(self) -> Optional[Dict[str, Any]]:
+        stream = self._stream
+        deadline = time.monotonic() + stream._await
+        while stream.alive:
+            event = stream._poll()
+            if event is not None or time.monotonic() >= deadline:
+                return event
+            await asyncio.sleep(0.01)
+        return None
+
+    async def next(self) -> Dict[str, Any]:
+        while self._stream.alive:
+            event = await self.try_next()
+            if event is not None:
+                return event
+        raise StopAsyncIteration
+
+    __anext__ = next
+
+    def __aiter__(self) -> 'AsyncMemoryChangeStream':
+        return self
+
+    async def close(self) -> None:
+        self._stream.close()
@@ -0,0 +1,740 @@
+"""Client, bases et collections du moteur en mémoire (API de pymongo)"""
+
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from itertools import islice
+from urllib.parse import urlparse
+import threading
+import time
+
+import bson
+from bson import ObjectId
+from bson.codec_options import DEFAULT_CODEC_OPTIONS
+from bson.raw_bson import RawBSONDocument
+from pymongo import DeleteMany, DeleteOne, InsertOne, ReplaceOne, ReturnDocument, UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, InvalidOperation, OperationFailure, WriteError
+from pymongo.read_preferences import Primary
+from pymongo.results import BulkWriteResult, DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+
+from .aggregation import run_pipeline, sort_documents
+from .changes import ChangeLog, MemoryChangeStream
+from .matching import equality_fields, matches, unsupported
+from .projection import project
+from .storage import Store
+from .updates import apply_update, is_update, replace, updated
+from .values import copy_value, expand, sort_key, store_value, values
+
+
+class _Server:
+    """Données d'un hôte ``memory://`` : partagées par tous ses clients"""
+
+    def __init__(self):
+        self.databases: Dict[str, Dict[str, Store]] = {}
+        self.changes = ChangeLog()
+        self.lock = threading.Lock()
+
+    def store(self, database: str, collection: str, create: bool = True) -> Optional[Store]:
+        with self.lock:
+            collections = self.databases.get(database)
+            if collections is None:
+                if not create:
+                    return None
+                collections = self.databases[database] = {}
+            store = collections.get(collection)
+            if store is None and create:
+                store = collections[collection] = Store(f"{database}.{collection}", self.changes)
+            return store
+
+
+_servers: Dict[str, _Server] = {}
+_servers_lock = threading.Lock()
+
+
+def _server(host: str) -> _Server:
+    with _servers_lock:
+        server = _servers.get(host)
+        if server is None:
+            server = _servers[host] = _Server()
+        return server
+
+
+def reset(host: str = None) -> None:
+    """Efface les données de l'hôte ``host`` (par défaut : de tous les hôtes)"""
+    with _servers_lock:
+        if host is None:
+            _servers.clear()
+        else:
+            _servers.pop(host, None)
+
+
+def _index_keys(keys: Any, direction: Any = 1) -> List[Tuple[str, Any]]:
+    if isinstance(keys, str):
+        return [(keys, direction)]
+    if isinstance(keys, dict):
+        return list(keys.items())
+    return [(key, 1) if isinstance(key, str) else tuple(key) for key in keys]
+
+
+class MemorySession:
+    """Session factice : les opérations du moteur sont déjà séquentielles"""
+
+    def __init__(self, client: 'MemoryClient', causal_consistency: Optional[bool] = None):
+        self.client = client
+        self.causal_consistency = bool(causal_consistency) if causal_consistency is not None else True
+        self.has_ended = False
+
+    def end_session(self) -> None:
+        self.has_ended = True
+
+    def start_transaction(self, *args, **kwargs):
+        raise unsupported("Les transactions")
+
+    def with_transaction(self, *args, **kwargs):
+        raise unsupported("Les transactions")
+
+    def __enter__(self) -> 'MemorySession':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.end_session()
+
+
+class MemoryClient:
+    """Client du moteur en mémoire, créé pour les URI ``memory://[hôte]/base``
+
+    Les données vivent dans le processus et sont partagées par les clients
+    d'un même hôte ; ``reset()`` les efface.
+    """
+
+    def __init__(self, host: str = 'memory://', **options: Any):
+        parsed = urlparse(host)
+        self.host = parsed.netloc
+        self.options = options
+        self._server = _server(self.host)
+        self._databases: Dict[str, MemoryDatabase] = {}
+
+    def __getitem__(self, name: str) -> 'MemoryDatabase':
+        return self.get_database(name)
+
+    def __getattr__(self, name: str) -> 'MemoryDatabase':
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self.get_database(name)
+
+    def get_database(self, name: str, codec_options=None, read_preference=None, **kwargs) -> 'MemoryDatabase':
+        database = self._databases.get(name)
+        if database is None:
+            database = self._databases[name] = MemoryDatabase(self, name)
+        return database
+
+    def list_database_names(self, session=None) -> List[str]:
+        return sorted(self._server.databases)
+
+    def drop_database(self, name: Any, session=None) -> None:
+        name = getattr(name, 'name', name)
+        with self._server.lock:
+            collections = self._server.databases.pop(name, None)
+        if collections is not None:
+            for collection in collections:
+                self._server.changes.record(f"{name}.{collection}", 'drop')
+            self._server.changes.record(name, 'dropDatabase')
+
+    def start_session(self, causal_consistency: Optional[bool] = None, **kwargs) -> MemorySession:
+        return MemorySession(self, causal_consistency)
+
+    def watch(self, pipeline: Optional[List[Dict[str, Any]]] = None, full_document: Optional[str] = None,
+              resume_after: Any = None, max_await_time_ms: Optional[int] = None, batch_size: Optional[int] = None,
+              session=None, start_after: Any = None, **kwargs) -> MemoryChangeStream:
+        return MemoryChangeStream(self._server, None, None, pipeline, full_document,
+                                  resume_after, start_after, max_await_time_ms)
+
+    def close(self) -> None:
+        pass
+
+    def __repr__(self) -> str:
+        return f"MemoryClient('memory://{self.host}')"
+
+
+class MemoryDatabase:
+    def __init__(self, client: MemoryClient, name: str):
+        self.client = client
+        self.name = name
+
+    def __getitem__(self, name: str) -> 'MemoryCollection':
+        return MemoryCollection(self, name)
+
+    def __getattr__(self, name: str) -> 'MemoryCollection':
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return MemoryCollection(self, name)
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, MemoryDatabase) and (self.client, self.name) == (other.client, other.name)
+
+    def __hash__(self) -> int:
+        return hash(self.name)
+
+    def get_collection(self, name: str, codec_options=None, read_preference=None, **kwargs) -> 'MemoryCollection':
+        return MemoryCollection(self, name, codec_options)
+
+    def list_collection_names(self, session=None, **kwargs) -> List[str]:
+        return sorted(self.client._server.databases.get(self.name, {}))
+
+    def drop_collection(self, name: Any, session=None, **kwargs) -> None:
+        name = getattr(name, 'name', name)
+        with self.client._server.lock:
+            store = self.client._server.databases.get(self.name, {}).pop(name, None)
+        if store is not None:
+            self.client._server.changes.record(store.namespace, 'drop')
+
+    def watch(self, pipeline: Optional[List[Dict[str, Any]]] = None, full_document: Optional[str] = None,
+              resume_after: Any = None, max_await_time_ms: Optional[int] = None, batch_size: Optional[int] = None,
+              session=None, start_after: Any = None, **kwargs) -> MemoryChangeStream:
+        return MemoryChangeStream(self.client._server, self.name, None, pipeline, full_document,
+                                  resume_after, start_after, max_await_time_ms)
+
+    def command(self, command: Any, value: Any = 1, session=None, **kwargs) -> Dict[str, Any]:
+        if isinstance(command, str):
+            command = {command: value}
+        name = next(iter(command))
+        if name in ('ping', 'hello', 'isMaster', 'ismaster'):
+            return {'ok': 1.0}
+        if name == 'explain':
+            return self._explain(command['explain'], command.get('verbosity', 'queryPlanner'))
+        raise unsupported(f"La commande {name}")
+
+    def _explain(self, find: Dict[str, Any], verbosity: str) -> Dict[str, Any]:
+        if 'find' not in find:
+            raise unsupported("explain hors commande find")
+        collection = self[find['find']]
+        started = time.perf_counter()
+        store = collection._store
+        with store.lock:
+            keys, index_name = store.candidates(find.get('filter'))
+            examined = len(store.docs) if keys is None else len(keys)
+        if index_name is None:
+            plan = {'stage': 'COLLSCAN', 'filter': find.get('filter', {})}
+        else:
+            key_pattern = {'_id': 1} if index_name == '_id_' else dict(store.indexes[index_name].keys)
+            plan = {'stage': 'FETCH', 'inputStage': {'stage': 'IXSCAN', 'indexName': index_name,
+                                                      'keyPattern': key_pattern}}
+        if find.get('sort'):
+            plan = {'stage': 'SORT', 'sortPattern': find['sort'], 'inputStage': plan}
+        result = {'queryPlanner': {'namespace': store.namespace, 'winningPlan': plan}, 'ok': 1.0}
+        if verbosity != 'queryPlanner':
+            cursor = collection.find(find.get('filter'), find.get('projection'), sort=find.get('sort'),
+                                     skip=find.get('skip', 0), limit=find.get('limit', 0))
+            returned = sum(1 for _ in cursor)
+            result['executionStats'] = {
+                'nReturned': returned,
+                'totalKeysExamined': 0 if index_name is None else examined,
+                'totalDocsExamined': examined,
+                'executionTimeMillis': int((time.perf_counter() - started) * 1000),
+            }
+        return result
+
+
+class MemoryCursor:
+    """Curseur de ``find`` ; la requête s'exécute à la première lecture"""
+
+    def __init__(self, collection: 'MemoryCollection', filter_dict: Any = None, projection: Any = None,
+                 sort: Any = None, skip: int = 0, limit: int = 0):
+        self.collection = collection
+        self._filter = filter_dict or {}
+        self._projection = projection
+        self._sort = _index_keys(sort) if sort else None
+        self._skip = skip
+        self._limit = limit
+        self._iterator: Optional[Iterator] = None
+        self.alive = True
+
+    def _check(self) -> None:
+        if self._iterator is not None:
+            raise InvalidOperation("Le curseur a déjà été utilisé")
+
+    def sort(self, key_or_list: Any, direction: Any = None) -> 'MemoryCursor':
+        self._check()
+        self._sort = _index_keys(key_or_list, direction if direction is not None else 1)
+        return self
+
+    def skip(self, count: int) -> 'MemoryCursor':
+        self._check()
+        self._skip = count
+        return self
+
+    def limit(self, count: int) -> 'MemoryCursor':
+        self._check()
+        self._limit = count
+        return self
+
+    def batch_size(self, size: int) -> 'MemoryCursor':
+        return self
+
+    def max_time_ms(self, max_time_ms: Optional[int]) -> 'MemoryCursor':
+        return self
+
+    def hint(self, index: Any) -> 'MemoryCursor':
+        return self
+
+    def comment(self, comment: Any) -> 'MemoryCursor':
+        return self
+
+    def collation(self, collation: Any) -> 'MemoryCursor':
+        return self
+
+    def clone(self) -> 'MemoryCursor':
+        return MemoryCursor(self.collection, self._filter, self._projection, self._sort, self._skip, self._limit)
+
+    def rewind(self) -> 'MemoryCursor':
+        self._iterator = None
+        self.alive = True
+        return self
+
+    def close(self) -> None:
+        self.alive = False
+        self._iterator = iter(())
+
+    def explain(self) -> Dict[str, Any]:
+        command = {'find': self.collection.name, 'filter': self._filter}
+        if self._sort:
+            command['sort'] = dict(self._sort)
+        return self.collection.database._explain(command, 'executionStats')
+
+    def _documents(self) -> Iterator[Dict[str, Any]]:
+        limit = abs(self._limit)
+        if self._sort:
+            docs = sort_documents(self.collection._matching(self._filter), self._sort)
+            docs = docs[self._skip:self._skip + limit if limit else None]
+        else:
+            # Sans tri, le filtrage s'arrête dès la limite atteinte
+            docs = self.collection._candidates(self._filter)
+            if self._filter:
+                docs = (doc for doc in docs if matches(doc, self._filter))
+            if self._skip or limit:
+                docs = islice(docs, self._skip, self._skip + limit if limit else None)
+        output = self.collection._output
+        projection = self._projection
+        for doc in docs:
+            yield output(project(doc, projection) if projection else copy_value(doc))
+
+    def __iter__(self) -> 'MemoryCursor':
+        return self
+
+    def __next__(self) -> Any:
+        if self._iterator is None:
+            self._iterator = self._documents()
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            self.alive = False
+            raise
+
+    def next(self) -> Any:
+        return self.__next__()
+
+    def to_list(self, length: Optional[int] = None) -> List[Any]:
+        if length is None:
+            return list(self)
+        return [doc for _, doc in zip(range(length), self)]
+
+    def __enter__(self) -> 'MemoryCursor':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+class MemoryCommandCursor:
+    """Curseur des résultats d'``aggregate``"""
+
+    def __init__(self, documents: List[Any]):
+        self._iterator = iter(documents)
+        self.alive = True
+
+    def __iter__(self) -> 'MemoryCommandCursor':
+        return self
+
+    def __next__(self) -> Any:
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            self.alive = False
+            raise
+
+    def next(self) -> Any:
+        return self.__next__()
+
+    def batch_size(self, size: int) -> 'MemoryCommandCursor':
+        return self
+
+    def to_list(self, length: Optional[int] = None) -> List[Any]:
+        if length is None:
+            return list(self)
+        return [doc for _, doc in zip(range(length), self)]
+
+    def close(self) -> None:
+        self.alive = False
+        self._iterator = iter(())
+
+    def __enter__(self) -> 'MemoryCommandCursor':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+def _bulk_details() -> Dict[str, Any]:
+    return {'writeErrors': [], 'writeConcernErrors': [], 'nInserted': 0, 'nUpserted': 0,
+            'nMatched': 0, 'nModified': 0, 'nRemoved': 0, 'upserted': []}
+
+
+class MemoryCollection:
+    """Collection du moteur en mémoire, avec le sous-ensemble de l'API pymongo utilisé par pygoose"""
+
+    def __init__(self, database: MemoryDatabase, name: str, codec_options=None, read_preference=None):
+        self.database = database
+        self.name = name
+        self.codec_options = codec_options or DEFAULT_CODEC_OPTIONS
+        self.read_preference = read_preference or Primary()
+
+    @property
+    def _store(self) -> Store:
+        # Résolu à chaque accès : une collection supprimée puis recréée reste visible
+        return self.database.client._server.store(self.database.name, self.name)
+
+    @property
+    def full_name(self) -> str:
+        return f"{self.database.name}.{self.name}"
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, MemoryCollection) and (self.database, self.name) == (other.database, other.name)
+
+    def __hash__(self) -> int:
+        return hash(self.full_name)
+
+    def __repr__(self) -> str:
+        return f"MemoryCollection({self.full_name!r})"
+
+    def with_options(self, codec_options=None, read_preference=None, write_concern=None,
+                     read_concern=None) -> 'MemoryCollection':
+        return MemoryCollection(self.database, self.name, codec_options or self.codec_options,
+                                read_preference or self.read_preference)
+
+    # --- lecture
+
+    def _output(self, doc: Dict[str, Any]) -> Any:
+        document_class = self.codec_options.document_class
+        if document_class is dict:
+            return doc
+        if document_class is RawBSONDocument:
+            return RawBSONDocument(bson.encode(doc), self.codec_options)
+        return document_class(doc)
+
+    def _candidates(self, filter_dict: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Documents stockés (non copiés) pouvant satisfaire le filtre, dans l'ordre d'insertion"""
+        store = self._store
+        with store.lock:
+            store.expire()
+            keys, _ = store.candidates(filter_dict)
+            if keys is None:
+                return list(store.docs.values())
+            positions = store.positions
+            return [store.docs[key] for key in sorted(keys, key=positions.__getitem__)]
+
+    def _matching(self, filter_dict: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Documents stockés (non copiés) satisfaisant le filtre"""
+        docs = self._candidates(filter_dict)
+        if filter_dict:
+            docs = [doc for doc in docs if matches(doc, filter_dict)]
+        return docs
+
+    def _rows(self) -> List[Dict[str, Any]]:
+        return self._matching({})
+
+    def find(self, filter: Any = None, projection: Any = None, skip: int = 0, limit: int = 0,
+             sort: Any = None, session=None, **kwargs) -> MemoryCursor:
+        return MemoryCursor(self, filter, projection, sort, skip, limit)
+
+    def find_one(self, filter: Any = None, *args, **kwargs) -> Any:
+        if filter is not None and not isinstance(filter, dict):
+            filter = {'_id': filter}
+        kwargs.pop('limit', None)
+        return next(iter(self.find(filter, *args, limit=1, **kwargs)), None)
+
+    def count_documents(self, filter: Dict[str, Any], session=None, skip: int = 0, limit: int = 0,
+                        **kwargs) -> int:
+        count = max(len(self._matching(filter)) - skip, 0)
+        return min(count, limit) if limit else count
+
+    def estimated_document_count(self, **kwargs) -> int:
+        return len(self._store.docs)
+
+    def distinct(self, key: str, filter: Dict[str, Any] = None, session=None, **kwargs) -> List[Any]:
+        result, seen = [], set()
+        for doc in self._matching(filter or {}):
+            for value in expand(values(doc, key)):
+                if isinstance(value, list):
+                    continue
+                marker = sort_key(value)
+                if marker not in seen:
+                    seen.add(marker)
+                    result.append(copy_value(value))
+        return result
+
+    def aggregate(self, pipeline: List[Dict[str, Any]], session=None, **kwargs) -> MemoryCommandCursor:
+        pipeline = list(pipeline)
+        first = pipeline[0] if pipeline else {}
+        # Un $match initial profite des index
+        docs = self._matching(first['$match']) if '$match' in first else self._rows()
+        if '$match' in first:
+            pipeline = pipeline[1:]
+        results = run_pipeline(docs, pipeline, self.database)
+        return MemoryCommandCursor([self._output(copy_value(doc)) for doc in results])
+
+    # --- écriture
+
+    def _insert(self, document: Dict[str, Any]) -> Any:
+        if not isinstance(document, dict):
+            raise TypeError("Le document à insérer doit être un dict")
+        # Comme pymongo, l'_id généré est ajouté au document fourni
+        if '_id' not in document:
+            document['_id'] = ObjectId()
+        stored = store_value(document)
+        if next(iter(stored)) != '_id':
+            # Le serveur stocke l'_id en tête du document
+            stored = dict({'_id': stored.pop('_id')}, **stored)
+        self._store.insert(stored)
+        return document['_id']
+
+    def insert_one(self, document: Dict[str, Any], bypass_document_validation: bool = False,
+                   session=None, **kwargs) -> InsertOneResult:
+        with self._store.lock:
+            return InsertOneResult(self._insert(document), True)
+
+    def insert_many(self, documents: Iterable[Dict[str, Any]], ordered: bool = True,
+                    bypass_document_validation: bool = False, session=None, **kwargs) -> InsertManyResult:
+        requests = [InsertOne(document) for document in documents]
+        if not requests:
+            raise TypeError("documents doit être une liste non vide")
+        self.bulk_write(requests, ordered)
+        return InsertManyResult([request._doc['_id'] for request in requests], True)
+
+    def _update(self, filter_dict: Dict[str, Any], update: Any, upsert: bool, multi: bool,
+                replacement: bool, sort: Any = None) -> Tuple[int, int, Any]:
+        """Applique une mise à jour ; retourne (trouvés, modifiés, _id inséré)"""
+        if isinstance(update, list):
+            raise unsupported("Les mises à jour par pipeline")
+        if replacement and is_update(update):
+            raise ValueError("Un document de remplacement ne peut pas contenir d'opérateurs $")
+        if not replacement and not is_update(update):
+            raise ValueError("La mise à jour ne doit contenir que des opérateurs $")
+        store = self._store
+        with store.lock:
+            docs = self._matching(filter_dict)
+            if sort:
+                docs = sort_documents(docs, _index_keys(sort))
+            if not multi:
+                docs = docs[:1]
+            modified = 0
+            for doc in docs:
+                new_doc = replace(doc, update) if replacement else updated(doc, update)
+                if sort_key(new_doc) != sort_key(doc):
+                    store.replace(sort_key(doc['_id']), new_doc, replacement)
+                    modified += 1
+            if docs or not upsert:
+                return len(docs), modified, None
+            new_doc = self._upserted(filter_dict, update, replacement)
+            store.insert(new_doc)
+            return 0, 0, new_doc['_id']
+
+    @staticmethod
+    def _upserted(filter_dict: Dict[str, Any], update: Dict[str, Any], replacement: bool) -> Dict[str, Any]:
+        fields = equality_fields(filter_dict)
+        doc: Dict[str, Any] = {}
+        if replacement:
+            doc = {key: store_value(value) for key, value in update.items()}
+            if '_id' not in doc and '_id' in fields:
+                doc['_id'] = store_value(fields['_id'])
+        else:
+            if fields:
+                apply_update(doc, {'$set': fields}, inserting=True)
+            apply_update(doc, update, inserting=True)
+        if '_id' not in doc:
+            doc = dict({'_id': ObjectId()}, **doc)
+        return doc
+
+    def update_one(self, filter: Dict[str, Any], update: Any, upsert: bool = False, session=None,
+                   sort: Any = None, **kwargs) -> UpdateResult:
+        matched, modified, upserted = self._update(filter, update, upsert, False, False, sort)
+        return _update_result(matched, modified, upserted)
+
+    def update_many(self, filter: Dict[str, Any], update: Any, upsert: bool = False, session=None,
+                    **kwargs) -> UpdateResult:
+        matched, modified, upserted = self._update(filter, update, upsert, True, False)
+        return _update_result(matched, modified, upserted)
+
+    def replace_one(self, filter: Dict[str, Any], replacement: Dict[str, Any], upsert: bool = False,
+                    session=None, **kwargs) -> UpdateResult:
+        matched, modified, upserted = self._update(filter, replacement, upsert, False, True)
+        return _update_result(matched, modified, upserted)
+
+    def _delete(self, filter_dict: Dict[str, Any], multi: bool) -> int:
+        store = self._store
+        with store.lock:
+            docs = self._matching(filter_dict)
+            if not multi:
+                docs = docs[:1]
+            for doc in docs:
+                store.delete(sort_key(doc['_id']))
+            return len(docs)
+
+    def delete_one(self, filter: Dict[str, Any], session=None, **kwargs) -> DeleteResult:
+        return DeleteResult({'n': self._delete(filter, False)}, True)
+
+    def delete_many(self, filter: Dict[str, Any], session=None, **kwargs) -> DeleteResult:
+        return DeleteResult({'n': self._delete(filter, True)}, True)
+
+    def _find_and_modify(self, filter_dict: Dict[str, Any], sort: Any, apply) -> Any:
+        """Applique ``apply`` au premier document trouvé (ou à None), sous le verrou de la collection"""
+        with self._store.lock:
+            docs = self._matching(filter_dict)
+            if sort:
+                docs = sort_documents(docs, _index_keys(sort))
+            return apply(docs[0] if docs else None)
+
+    def find_one_and_update(self, filter: Dict[str, Any], update: Any, projection: Any = None,
+                            sort: Any = None, upsert: bool = False,
+                            return_document: bool = ReturnDocument.BEFORE, session=None, **kwargs) -> Any:
+        return self._find_and_write(filter, update, projection, sort, upsert, return_document, False)
+
+    def find_one_and_replace(self, filter: Dict[str, Any], replacement: Dict[str, Any], projection: Any = None,
+                             sort: Any = None, upsert: bool = False,
+                             return_document: bool = ReturnDocument.BEFORE, session=None, **kwargs) -> Any:
+        return self._find_and_write(filter, replacement, projection, sort, upsert, return_document, True)
+
+    def _find_and_write(self, filter_dict, update, projection, sort, upsert, return_document, replacement):
+        if replacement and is_update(update):
+            raise ValueError("Un document de remplacement ne peut pas contenir d'opérateurs $")
+        if not replacement and not is_update(update):
+            raise ValueError("La mise à jour ne doit contenir que des opérateurs $")
+        store = self._store
+
+        def apply(doc):
+            if doc is None:
+                if not upsert:
+                    return None
+                new_doc = self._upserted(filter_dict, update, replacement)
+                store.insert(new_doc)
+                return new_doc if return_document == ReturnDocument.AFTER else None
+            new_doc = replace(doc, update) if replacement else updated(doc, update)
+            store.replace(sort_key(doc['_id']), new_doc, replacement)
+            return new_doc if return_document == ReturnDocument.AFTER else doc
+
+        result = self._find_and_modify(filter_dict, sort, apply)
+        return None if result is None else self._output(project(result, projection))
+
+    def find_one_and_delete(self, filter: Dict[str, Any], projection: Any = None, sort: Any = None,
+                            session=None, **kwargs) -> Any:
+        store = self._store
+
+        def apply(doc):
+            if doc is not None:
+                store.delete(sort_key(doc['_id']))
+            return doc
+
+        result = self._find_and_modify(filter, sort, apply)
+        return None if result is None else self._output(project(result, projection))
+
+    def bulk_write(self, requests: List[Any], ordered: bool = True, bypass_document_validation: bool = False,
+                   session=None, **kwargs) -> BulkWriteResult:
+        details = _bulk_details()
+        with self._store.lock:
+            for index, request in enumerate(requests):
+                try:
+                    self._bulk_one(request, index, details)
+                except (DuplicateKeyError, WriteError) as e:
+                    details['writeErrors'].append({'index': index, 'code': e.code, 'errmsg': str(e),
+                                                   'op': getattr(request, '_doc', None)})
+                    if ordered:
+                        break
+        if details['writeErrors']:
+            raise BulkWriteError(details)
+        return BulkWriteResult(details, True)
+
+    def _bulk_one(self, request: Any, index: int, details: Dict[str, Any]) -> None:
+        if isinstance(request, InsertOne):
+            self._insert(request._doc)
+            details['nInserted'] += 1
+        elif isinstance(request, (UpdateOne, UpdateMany, ReplaceOne)):
+            if getattr(request, '_array_filters', None):
+                raise unsupported("arrayFilters")
+            matched, modified, upserted = self._update(
+                request._filter, request._doc, request._upsert, isinstance(request, UpdateMany),
+                isinstance(request, ReplaceOne))
+            details['nMatched'] += matched
+            details['nModified'] += modified
+            if upserted is not None:
+                details['nUpserted'] += 1
+                details['upserted'].append({'index': index, '_id': upserted})
+        elif isinstance(request, (DeleteOne, DeleteMany)):
+            details['nRemoved'] += self._delete(request._filter, isinstance(request, DeleteMany))
+        else:
+            raise TypeError(f"Opération bulk_write inconnue : {request!r}")
+
+    # --- index
+
+    def create_index(self, keys: Any, session=None, **kwargs) -> str:
+        for option in ('background', 'comment', 'maxTimeMS'):
+            kwargs.pop(option, None)
+        with self._store.lock:
+            return self._store.create_index(_index_keys(keys), kwargs)
+
+    def create_indexes(self, indexes: List[Any], session=None, **kwargs) -> List[str]:
+        names = []
+        for model in indexes:
+            document = dict(model.document)
+            keys = list(document.pop('key').items())
+            names.append(self.create_index(keys, **document))
+        return names
+
+    def list_indexes(self, session=None, **kwargs) -> MemoryCommandCursor:
+        infos = [{'v': 2, 'key': {'_id': 1}, 'name': '_id_'}]
+        infos.extend(index.info() for index in self._store.indexes.values())
+        return MemoryCommandCursor(infos)
+
+    def index_information(self, session=None, **kwargs) -> Dict[str, Dict[str, Any]]:
+        information = {}
+        for info in self.list_indexes():
+            info = dict(info)
+            name = info.pop('name')
+            info['key'] = list(info['key'].items())
+            information[name] = info
+        return information
+
+    def drop_index(self, index_or_name: Any, session=None, **kwargs) -> None:
+        name = index_or_name
+        if not isinstance(name, str):
+            name = '_'.join(f"{field}_{direction}" for field, direction in _index_keys(index_or_name))
+        if name == '_id_':
+            raise OperationFailure("L'index _id_ ne peut pas être supprimé", code=72)
+        with self._store.lock:
+            self._store.drop_index(name)
+
+    def drop_indexes(self, session=None, **kwargs) -> None:
+        with self._store.lock:
+            self._store.indexes.clear()
+
+    def drop(self, session=None, **kwargs) -> None:
+        self.database.drop_collection(self.name)
+
+    def watch(self, pipeline: Optional[List[Dict[str, Any]]] = None, full_document: Optional[str] = None,
+              resume_after: Any = None, max_await_time_ms: Optional[int] = None, batch_size: Optional[int] = None,
+              session=None, start_after: Any = None, **kwargs) -> MemoryChangeStream:
+        return MemoryChangeStream(self.database.client._server, self.database.name, self.name, pipeline,
+                                  full_document, resume_after, start_after, max_await_time_ms)
+
+
+def _update_result(matched: int, modified: int, upserted: Any) -> UpdateResult:
+    raw = {'n': matched + (1 if upserted is not None else 0), 'nModified': modified}
+    if upserted is not None:
+        raw['upserted'] = upserted
+    return UpdateResult(raw, True)
@@ -0,0 +1,188 @@
+"""Évaluation des filtres de requête MongoDB"""
+
+from typing import Any, Dict, List
+import re
+
+from bson.regex import Regex
+from pymongo.errors import OperationFailure
+
+from .values import _PATTERN, expand, rank, sort_key, values
+
+_TYPE_ALIASES = {
+    'double': 2, 'int': 2, 'long': 2, 'decimal': 2, 'number': 2, 'string': 3, 'object': 4,
+    'array': 5, 'binData': 6, 'objectId': 7, 'bool': 8, 'date': 9, 'timestamp': 10,
+    'regex': 11, 'null': 1, 'minKey': 0, 'maxKey': 127,
+}
+_TYPE_NUMBERS = {1: 'double', 2: 'string', 3: 'object', 4: 'array', 5: 'binData', 7: 'objectId',
+                 8: 'bool', 9: 'date', 10: 'null', 11: 'regex', 16: 'int', 17: 'timestamp',
+                 18: 'long', 19: 'decimal', -1: 'minKey', 127: 'maxKey'}
+
+RANGE_OPERATORS = {
+    '$gt': lambda cmp: cmp > 0,
+    '$gte': lambda cmp: cmp >= 0,
+    '$lt': lambda cmp: cmp < 0,
+    '$lte': lambda cmp: cmp <= 0,
+}
+
+
+def unsupported(what: str) -> OperationFailure:
+    return OperationFailure(f"{what} non supporté par le moteur en mémoire", code=115)
+
+
+def is_operator_dict(condition: Any) -> bool:
+    return isinstance(condition, dict) and bool(condition) and all(
+        isinstance(key, str) and key.startswith('$') for key in condition)
+
+
+def compile_regex(pattern: Any, options: str = '') -> Any:
+    if isinstance(pattern, Regex):
+        return pattern.try_compile()
+    if isinstance(pattern, _PATTERN):
+        return pattern
+    flags = 0
+    for option in options or '':
+        flags |= {'i': re.IGNORECASE, 'm': re.MULTILINE, 's': re.DOTALL, 'x': re.VERBOSE}.get(option, 0)
+    return re.compile(pattern, flags)
+
+
+def matches(doc: Dict[str, Any], filter_dict: Dict[str, Any]) -> bool:
+    """Le document satisfait-il le filtre ?"""
+    for key, condition in (filter_dict or {}).items():
+        if key == '$and':
+            if not all(matches(doc, sub) for sub in condition):
+                return False
+        elif key == '$or':
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+        elif key == '$nor':
+            if any(matches(doc, sub) for sub in condition):
+                return False
+        elif key == '$expr':
+            from .aggregation import evaluate
+            if not truthy(evaluate(condition, doc)):
+                return False
+        elif key == '$comment':
+            continue
+        elif key.startswith('$'):
+            raise unsupported(f"L'opérateur {key}")
+        elif not match_field(values(doc, key), condition):
+            return False
+    return True
+
+
+def truthy(value: Any) -> bool:
+    """Vérité au sens des expressions d'agrégation (null, false et 0 sont faux)"""
+    if value is None or value is False:
+        return False
+    return not (rank(value) == 2 and value == 0)
+
+
+def match_field(found: List[Any], condition: Any) -> bool:
+    """Les valeurs ``found`` d'un champ satisfont-elles la condition ?"""
+    if is_operator_dict(condition):
+        return all(_operator(found, op, argument, condition) for op, argument in condition.items())
+    return _equal(found, condition)
+
+
+def _equal(found: List[Any], expected: Any) -> bool:
+    if isinstance(expected, (_PATTERN, Regex)):
+        return _regex(found, compile_regex(expected))
+    if expected is None:
+        return not found or any(value is None for value in expand(found))
+    key = sort_key(expected)
+    return any(sort_key(value) == key for value in expand(found))
+
+
+def _regex(found: List[Any], pattern) -> bool:
+    return any(isinstance(value, str) and pattern.search(value) for value in expand(found))
+
+
+def _compare(found: List[Any], argument: Any, test) -> bool:
+    argument_rank, argument_key = rank(argument), sort_key(argument)
+    for value in expand(found):
+        if rank(value) == argument_rank:
+            value_key = sort_key(value)
+            if test((value_key > argument_key) - (value_key < argument_key)):
+                return True
+    return False
+
+
+def _elem_match(element: Any, condition: Dict[str, Any]) -> bool:
+    if is_operator_dict(condition) and not any(key in ('$and', '$or', '$nor') for key in condition):
+        return all(_operator([element], op, argument, condition) for op, argument in condition.items())
+    return isinstance(element, dict) and matches(element, condition)
+
+
+def _type_matches(value: Any, alias: Any) -> bool:
+    if isinstance(alias, int):
+        alias = _TYPE_NUMBERS.get(alias)
+    if alias == 'int':
+        return isinstance(value, int) and not isinstance(value, bool) and -2 ** 31 <= value < 2 ** 31
+    if alias == 'long':
+        return isinstance(value, int) and not isinstance(value, bool)
+    if alias == 'double':
+        return isinstance(value, float)
+    if alias not in _TYPE_ALIASES:
+        raise OperationFailure(f"Type inconnu pour $type : {alias!r}", code=2)
+    return rank(value) == _TYPE_ALIASES[alias]
+
+
+def _operator(found: List[Any], op: str, argument: Any, condition: Dict[str, Any]) -> bool:
+    if op == '$eq':
+        return _equal(found, argument)
+    if op == '$ne':
+        return not _equal(found, argument)
+    if op in RANGE_OPERATORS:
+        return _compare(found, argument, RANGE_OPERATORS[op])
+    if op == '$in':
+        return any(_equal(found, expected) for expected in argument)
+    if op == '$nin':
+        return not any(_equal(found, expected) for expected in argument)
+    if op == '$exists':
+        return bool(found) == bool(argument)
+    if op == '$regex':
+        return _regex(found, compile_regex(argument, condition.get('$options', '')))
+    if op == '$options':
+        return True
+    if op == '$not':
+        if isinstance(argument, (_PATTERN, Regex)):
+            return not _regex(found, compile_regex(argument))
+        return not match_field(found, argument)
+    if op == '$size':
+        return any(isinstance(value, list) and len(value) == argument for value in found)
+    if op == '$all':
+        return bool(argument) and all(
+            any(_elem_match(value, expected['$elemMatch']) for value in expand(found))
+            if isinstance(expected, dict) and '$elemMatch' in expected else _equal(found, expected)
+            for expected in argument)
+    if op == '$elemMatch':
+        return any(isinstance(value, list) and any(_elem_match(element, argument) for element in value)
+                   for value in found)
+    if op == '$type':
+        aliases = argument if isinstance(argument, list) else [argument]
+        return any(_type_matches(value, alias) for value in expand(found) for alias in aliases)
+    if op == '$mod':
+        divisor, remainder = argument
+        return any(rank(value) == 2 and not isinstance(value, bool) and int(value) % divisor == remainder
+                   for value in expand(found))
+    if op == '$comment':
+        return True
+    raise unsupported(f"L'opérateur {op}")
+
+
+def equality_fields(filter_dict: Dict[str, Any]) -> Dict[str, Any]:
+    """Champs fixés par égalité dans un filtre (document créé par un upsert)"""
+    fields = {}
+    for key, condition in (filter_dict or {}).items():
+        if key == '$and':
+            for sub in condition:
+                fields.update(equality_fields(sub))
+        elif key.startswith('$'):
+            continue
+        elif is_operator_dict(condition):
+            if '$eq' in condition:
+                fields[key] = condition['$eq']
+        elif not isinstance(condition, (_PATTERN, Regex)):
+            fields[key] = condition
+    return fields
+
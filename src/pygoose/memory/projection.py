@@ -0,0 +1,108 @@
+"""Projections de ``find`` : inclusion, exclusion et ``$slice``"""
+
+from typing import Any, Dict, Optional
+
+from .matching import unsupported
+from .values import copy_value
+
+
+def _is_slice(value: Any) -> bool:
+    return isinstance(value, dict) and set(value) == {'$slice'}
+
+
+def _include(source: Any, spec: Dict[str, Any]) -> Any:
+    if isinstance(source, list):
+        return [_include(item, spec) for item in source if isinstance(item, dict)]
+    if not isinstance(source, dict):
+        return None
+    result = {}
+    for key, sub in spec.items():
+        if key not in source:
+            continue
+        if sub is True:
+            result[key] = copy_value(source[key])
+        else:
+            value = _include(source[key], sub)
+            if value is not None:
+                result[key] = value
+    return result
+
+
+def _exclude(source: Any, spec: Dict[str, Any]) -> Any:
+    if isinstance(source, list):
+        return [_exclude(item, spec) if isinstance(item, dict) else copy_value(item) for item in source]
+    result = {}
+    for key, value in source.items():
+        sub = spec.get(key)
+        if sub is True:
+            continue
+        result[key] = _exclude(value, sub) if isinstance(sub, dict) and isinstance(value, (dict, list)) \
+            else copy_value(value)
+    return result
+
+
+def _tree(paths) -> Dict[str, Any]:
+    """Arbre des chemins pointés ({'a.b': 1} -> {'a': {'b': True}})"""
+    tree: Dict[str, Any] = {}
+    for path in paths:
+        node = tree
+        parts = path.split('.')
+        for part in parts[:-1]:
+            child = node.get(part)
+            if child is True:
+                break
+            node = node.setdefault(part, {})
+        else:
+            node[parts[-1]] = True
+    return tree
+
+
+def _slice(doc: Dict[str, Any], path: str, argument: Any) -> None:
+    parts = path.split('.')
+    for part in parts[:-1]:
+        doc = doc.get(part) if isinstance(doc, dict) else None
+    if not isinstance(doc, dict) or not isinstance(doc.get(parts[-1]), list):
+        return
+    items = doc[parts[-1]]
+    if isinstance(argument, list):
+        skip, count = argument
+        start = skip if skip >= 0 else max(len(items) + skip, 0)
+        doc[parts[-1]] = items[start:start + count]
+    else:
+        doc[parts[-1]] = items[argument:] if argument < 0 else items[:argument]
+
+
+def project(doc: Dict[str, Any], projection: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Copie de ``doc`` réduite à la projection"""
+    if not projection:
+        return copy_value(doc)
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+    slices = {key: value['$slice'] for key, value in projection.items() if _is_slice(value)}
+    flags = {}
+    for key, value in projection.items():
+        if key in slices:
+            continue
+        if isinstance(value, dict):
+            raise unsupported(f"La projection {value!r}")
+        flags[key] = bool(value)
+    keep_id = flags.pop('_id', True)
+    included = [key for key, value in flags.items() if value]
+    excluded = [key for key, value in flags.items() if not value]
+    if included and excluded:
+        raise unsupported("Le mélange d'inclusion et d'exclusion dans une projection")
+
+    if included:
+        result = _include(doc, _tree(included))
+        if keep_id and '_id' in doc:
+            result = dict({'_id': doc['_id']}, **result)
+        for key in slices:
+            # $slice seul n'exclut pas, mais avec des inclusions il inclut son champ
+            top = key.split('.')[0]
+            if top in doc and top not in result:
+                result[top] = copy_value(doc[top])
+    else:
+        result = _exclude(doc, _tree(excluded + ([] if keep_id else ['_id'])))
+    for key, argument in slices.items():
+        _slice(result, key, argument)
+    return result
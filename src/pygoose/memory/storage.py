@@ -0,0 +1,369 @@
+"""Stockage d'une collection en mémoire et index secondaires
+
+Chaque index associe la clé de tri BSON de la valeur de son premier champ
+aux documents qui la portent, dans une table de hachage (égalité, ``$in``)
+et dans une liste triée (intervalles, par bissection). Les index composés
+ne servent qu'à l'unicité sur l'ensemble de leurs champs ; la recherche
+utilise leur premier champ. Sur un index multiclé (tableaux), un
+intervalle à deux bornes ne restreint les candidats que par sa borne basse :
+chaque borne peut être satisfaite par un élément différent.
+"""
+
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
+import threading
+
+from bson.regex import Regex
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+from .changes import ChangeLog, update_description
+from .matching import is_operator_dict, matches
+from .values import _PATTERN, NULL_KEY, expand, rank, sort_key, values
+
+_RANGE_BOUNDS = ('$gt', '$gte', '$lt', '$lte')
+
+
+class MemoryIndex:
+    """Index secondaire : table de hachage et liste triée sur le premier champ"""
+
+    def __init__(self, name: str, keys: List[Tuple[str, Any]], options: Dict[str, Any] = None):
+        self.name = name
+        self.keys = keys
+        self.options = dict(options or {})
+        self.field = keys[0][0]
+        self.unique = bool(self.options.get('unique'))
+        self.sparse = bool(self.options.get('sparse'))
+        self.partial = self.options.get('partialFilterExpression')
+        self.text = any(direction == 'text' for _, direction in keys)
+        # Un index hashed ne sait pas répondre aux intervalles
+        self.ordered = keys[0][1] != 'hashed' and not self.text
+        # Un document au moins a porté plusieurs valeurs (tableau) sur le premier champ ; jamais remis à False
+        self.multikey = False
+        self._hash: Dict[Tuple, Set[Tuple]] = {}
+        self._sorted_keys: List[Tuple] = []
+        self._sorted_ids: List[Tuple] = []
+        self._unique: Dict[Tuple, Tuple] = {}
+
+    @property
+    def searchable(self) -> bool:
+        """Utilisable pour restreindre les candidats d'une requête"""
+        return self.partial is None and not self.text
+
+    def _covers(self, doc: Dict[str, Any]) -> bool:
+        if self.partial is not None and not matches(doc, self.partial):
+            return False
+        if self.sparse and not any(values(doc, field) for field, _ in self.keys):
+            return False
+        return True
+
+    def entry_keys(self, doc: Dict[str, Any]) -> List[Tuple]:
+        """Clés du premier champ (une par élément pour un tableau)"""
+        found = values(doc, self.field)
+        if not found:
+            return [NULL_KEY]
+        keys = []
+        for value in expand(found):
+            key = sort_key(value)
+            if key not in keys:
+                keys.append(key)
+        return keys
+
+    def unique_key(self, doc: Dict[str, Any]) -> Tuple:
+        parts = []
+        for field, _ in self.keys:
+            found = values(doc, field)
+            parts.append(sort_key(found[0]) if found else NULL_KEY)
+        return tuple(parts)
+
+    def check(self, doc_key: Tuple, doc: Dict[str, Any], namespace: str) -> None:
+        """Lève DuplicateKeyError si ``doc`` viole l'unicité de l'index"""
+        if not self.unique or not self._covers(doc):
+            return
+        owner = self._unique.get(self.unique_key(doc))
+        if owner is not None and owner != doc_key:
+            dup = ', '.join(f"{field}: {values(doc, field)[0]!r}" if values(doc, field) else f"{field}: null"
+                            for field, _ in self.keys)
+            message = f"E11000 duplicate key error collection: {namespace} index: {self.name} dup key: {{ {dup} }}"
+            raise DuplicateKeyError(message, 11000, {'code': 11000, 'errmsg': message,
+                                                     'keyPattern': dict(self.keys)})
+
+    def add(self, doc_key: Tuple, doc: Dict[str, Any]) -> None:
+        if not self._covers(doc):
+            return
+        if not self.multikey:
+            found = values(doc, self.field)
+            self.multikey = len(found) > 1 or any(isinstance(value, list) for value in found)
+        for key in self.entry_keys(doc):
+            self._hash.setdefault(key, set()).add(doc_key)
+            if self.ordered:
+                position = bisect_right(self._sorted_keys, key)
+                self._sorted_keys.insert(position, key)
+                self._sorted_ids.insert(position, doc_key)
+        if self.unique:
+            self._unique[self.unique_key(doc)] = doc_key
+
+    def remove(self, doc_key: Tuple, doc: Dict[str, Any]) -> None:
+        if not self._covers(doc):
+            return
+        for key in self.entry_keys(doc):
+            bucket = self._hash.get(key)
+            if bucket is not None:
+                bucket.discard(doc_key)
+                if not bucket:
+                    del self._hash[key]
+            if self.ordered:
+                position = bisect_left(self._sorted_keys, key)
+                while position < len(self._sorted_keys) and self._sorted_keys[position] == key:
+                    if self._sorted_ids[position] == doc_key:
+                        del self._sorted_keys[position]
+                        del self._sorted_ids[position]
+                        break
+                    position += 1
+        if self.unique and self._unique.get(self.unique_key(doc)) == doc_key:
+            del self._unique[self.unique_key(doc)]
+
+    def equal(self, value: Any) -> Set[Tuple]:
+        return set(self._hash.get(sort_key(value), ()))
+
+    def range(self, low: Optional[Tuple], low_inclusive: bool,
+              high: Optional[Tuple], high_inclusive: bool) -> Set[Tuple]:
+        """Documents dont une clé est dans l'intervalle (bornes None : ouvertes)"""
+        keys = self._sorted_keys
+        start = 0 if low is None else (bisect_left if low_inclusive else bisect_right)(keys, low)
+        end = len(keys) if high is None else (bisect_right if high_inclusive else bisect_left)(keys, high)
+        return set(self._sorted_ids[start:end])
+
+    def info(self) -> Dict[str, Any]:
+        """Description de l'index au format de ``list_indexes``"""
+        info = {'v': 2, 'key': dict(self.keys), 'name': self.name}
+        if self.text:
+            info['key'] = {'_fts': 'text', '_ftsx': 1}
+            info['weights'] = {field: 1 for field, direction in self.keys if direction == 'text'}
+        for option, value in self.options.items():
+            if option != 'name':
+                info[option] = value
+        return info
+
+
+def _type_bounds(value: Any) -> Tuple[Tuple, Tuple]:
+    """Clés extrêmes du type de ``value`` (les intervalles ne franchissent pas les types)"""
+    type_rank = rank(value)
+    return (type_rank,), (type_rank, float('inf')) if type_rank == 2 else (type_rank + 1,)
+
+
+class Store:
+    """Documents d'une collection, indexés par _id et par les index secondaires"""
+
+    def __init__(self, namespace: str, log: Optional[ChangeLog] = None):
+        self.namespace = namespace
+        # Journal des modifications de l'hôte (flux ouverts par watch())
+        self.log = log
+        self.docs: Dict[Tuple, Dict[str, Any]] = {}
+        # Rang d'insertion : ordre naturel des candidats trouvés par index
+        self.positions: Dict[Tuple, int] = {}
+        self._inserted = 0
+        self.indexes: Dict[str, MemoryIndex] = {}
+        self.lock = threading.RLock()
+
+    # --- écriture
+
+    def insert(self, doc: Dict[str, Any]) -> None:
+        """Insère ``doc`` (déjà copié, avec _id)"""
+        doc_key = sort_key(doc['_id'])
+        if doc_key in self.docs:
+            message = (f"E11000 duplicate key error collection: {self.namespace} index: _id_ "
+                       f"dup key: {{ _id: {doc['_id']!r} }}")
+            raise DuplicateKeyError(message, 11000, {'code': 11000, 'errmsg': message, 'keyPattern': {'_id': 1}})
+        for index in self.indexes.values():
+            index.check(doc_key, doc, self.namespace)
+        self.docs[doc_key] = doc
+        self.positions[doc_key] = self._inserted
+        self._inserted += 1
+        for index in self.indexes.values():
+            index.add(doc_key, doc)
+        if self.log is not None:
+            self.log.record(self.namespace, 'insert', doc['_id'], fullDocument=doc)
+
+    def replace(self, doc_key: Tuple, new_doc: Dict[str, Any], replacement: bool = False) -> None:
+        """Remplace un document ; ``replacement`` distingue replace_one d'une mise à jour par opérateurs"""
+        old_doc = self.docs[doc_key]
+        for index in self.indexes.values():
+            index.check(doc_key, new_doc, self.namespace)
+        for index in self.indexes.values():
+            index.remove(doc_key, old_doc)
+            index.add(doc_key, new_doc)
+        self.docs[doc_key] = new_doc
+        if self.log is None:
+            return
+        if replacement:
+            self.log.record(self.namespace, 'replace', new_doc['_id'], fullDocument=new_doc)
+        else:
+            self.log.record(self.namespace, 'update', new_doc['_id'],
+                            updateDescription=update_description(old_doc, new_doc))
+
+    def delete(self, doc_key: Tuple) -> None:
+        doc = self.docs.pop(doc_key)
+        del self.positions[doc_key]
+        for index in self.indexes.values():
+            index.remove(doc_key, doc)
+        if self.log is not None:
+            self.log.record(self.namespace, 'delete', doc['_id'])
+
+    def clear(self) -> None:
+        self.docs.clear()
+        self.positions.clear()
+        for name, index in list(self.indexes.items()):
+            self.indexes[name] = MemoryIndex(index.name, index.keys, index.options)
+
+    # --- index
+
+    def create_index(self, keys: List[Tuple[str, Any]], options: Dict[str, Any]) -> str:
+        index = MemoryIndex(options.get('name') or '_'.join(f"{field}_{direction}" for field, direction in keys),
+                            keys, options)
+        existing = self.indexes.get(index.name)
+        if existing is not None:
+            if existing.keys != keys or existing.unique != index.unique:
+                raise OperationFailure(f"Un index nommé '{index.name}' existe déjà avec d'autres options",
+                                       code=85)
+            return index.name
+        for doc_key, doc in self.docs.items():
+            index.check(doc_key, doc, self.namespace)
+            index.add(doc_key, doc)
+        self.indexes[index.name] = index
+        return index.name
+
+    def drop_index(self, name: str) -> None:
+        if name not in self.indexes:
+            raise OperationFailure(f"Index introuvable : {name}", code=27)
+        del self.indexes[name]
+
+    # --- expiration (index TTL)
+
+    def expire(self) -> None:
+        for index in self.indexes.values():
+            seconds = index.options.get('expireAfterSeconds')
+            if seconds is None or not index.ordered:
+                continue
+            cutoff = sort_key(datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=seconds))
+            for doc_key in index.range((9,), True, cutoff, False):
+                if doc_key in self.docs:
+                    self.delete(doc_key)
+
+    # --- planification
+
+    def candidates(self, filter_dict: Dict[str, Any]) -> Tuple[Optional[Set[Tuple]], Optional[str]]:
+        """Clés des documents pouvant satisfaire le filtre, ou None (parcours complet)
+
+        Retourne aussi le nom de l'index utilisé. Les candidats sont ensuite
+        vérifiés par ``matches`` : un sur-ensemble suffit.
+        """
+        sets, used = [], None
+        for key, condition in (filter_dict or {}).items():
+            found, name = None, None
+            if key == '$and':
+                for sub in condition:
+                    found, name = self.candidates(sub)
+                    if found is not None:
+                        sets.append(found)
+                        used = used or name
+                continue
+            if key == '$or':
+                found, name = self._union(condition)
+            elif key == '_id':
+                found, name = self._id_lookup(condition), '_id_'
+            elif not key.startswith('$'):
+                index = self._index_for(key)
+                if index is not None:
+                    found, name = self._lookup(index, condition), index.name
+            if found is not None:
+                sets.append(found)
+                used = used or name
+        if not sets:
+            return None, None
+        sets.sort(key=len)
+        result = sets[0]
+        for other in sets[1:]:
+            result = result & other
+        return result, used
+
+    def _union(self, branches: List[Dict[str, Any]]) -> Tuple[Optional[Set[Tuple]], Optional[str]]:
+        result, used = set(), None
+        for branch in branches:
+            found, name = self.candidates(branch)
+            if found is None:
+                return None, None
+            result |= found
+            used = used or name
+        return result, used
+
+    def _index_for(self, field: str) -> Optional[MemoryIndex]:
+        for index in self.indexes.values():
+            if index.field == field and index.searchable:
+                return index
+        return None
+
+    def _id_lookup(self, condition: Any) -> Optional[Set[Tuple]]:
+        if not is_operator_dict(condition):
+            if isinstance(condition, (dict, list, _PATTERN)) or condition is None:
+                return None
+            key = sort_key(condition)
+            return {key} if key in self.docs else set()
+        if '$eq' in condition and not isinstance(condition['$eq'], (dict, list, _PATTERN)):
+            key = sort_key(condition['$eq'])
+            return {key} if key in self.docs else set()
+        if '$in' in condition and not any(isinstance(value, (dict, list, _PATTERN)) or value is None
+                                          for value in condition['$in']):
+            return {key for key in map(sort_key, condition['$in']) if key in self.docs}
+        return None
+
+    def _lookup(self, index: MemoryIndex, condition: Any) -> Optional[Set[Tuple]]:
+        if not is_operator_dict(condition):
+            return self._equal(index, condition)
+        if '$eq' in condition:
+            return self._equal(index, condition['$eq'])
+        if '$in' in condition:
+            result = set()
+            for value in condition['$in']:
+                found = self._equal(index, value)
+                if found is None:
+                    return None
+                result |= found
+            return result
+        bounds = [op for op in _RANGE_BOUNDS if op in condition]
+        if bounds and index.ordered:
+            return self._range(index, condition, bounds)
+        return None
+
+    @staticmethod
+    def _equal(index: MemoryIndex, value: Any) -> Optional[Set[Tuple]]:
+        if isinstance(value, (_PATTERN, Regex)):
+            return None
+        # Un index creux n'indexe pas les documents sans le champ
+        if value is None and index.sparse:
+            return None
+        return index.equal(value)
+
+    @staticmethod
+    def _range(index: MemoryIndex, condition: Dict[str, Any], bounds: List[str]) -> Optional[Set[Tuple]]:
+        low = high = None
+        low_inclusive = high_inclusive = True
+        for op in bounds:
+            value = condition[op]
+            if value is None or isinstance(value, (dict, list)):
+                return None
+            if op in ('$gt', '$gte'):
+                low, low_inclusive = sort_key(value), op == '$gte'
+            else:
+                high, high_inclusive = sort_key(value), op == '$lte'
+        type_low, type_high = _type_bounds(condition[bounds[0]])
+        if index.multikey and low is not None and high is not None:
+            # Chaque borne peut être satisfaite par un élément différent du tableau :
+            # une seule borne restreint les candidats, ``matches`` vérifie l'autre
+            high = None
+        if low is None:
+            low, low_inclusive = type_low, True
+        if high is None:
+            high, high_inclusive = type_high, False
+        return index.range(low, low_inclusive, high, high_inclusive)
+
@@ -0,0 +1,246 @@
+"""Application des opérateurs de mise à jour MongoDB"""
+
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+
+from bson.timestamp import Timestamp
+from pymongo.errors import WriteError
+
+from .matching import is_operator_dict, match_field, matches, unsupported
+from .values import compare, copy_value, equals, rank, sort_key, store_value
+
+
+def is_update(update: Dict[str, Any]) -> bool:
+    """Document d'opérateurs ($set...) plutôt que document de remplacement"""
+    return bool(update) and all(key.startswith('$') for key in update)
+
+
+def _error(message: str) -> WriteError:
+    return WriteError(message, code=9)
+
+
+def _immutable_id() -> WriteError:
+    # ImmutableField, comme le serveur
+    return WriteError("Le champ '_id' est immuable", code=66)
+
+
+def _container(doc: Dict[str, Any], path: str, create: bool) -> Tuple[Any, str]:
+    """Conteneur (dict ou liste) du dernier segment de ``path``, ou (None, clé) s'il n'existe pas"""
+    parts = path.split('.')
+    current = doc
+    for part in parts[:-1]:
+        if part.startswith('$'):
+            raise unsupported(f"L'opérateur positionnel {part}")
+        if isinstance(current, list):
+            if not part.isdigit():
+                raise _error(f"Impossible de créer le champ '{part}' dans un tableau ({path})")
+            index = int(part)
+            if index >= len(current):
+                if not create:
+                    return None, parts[-1]
+                current.extend([None] * (index + 1 - len(current)))
+            if current[index] is None and create:
+                current[index] = {}
+            current = current[index]
+        elif isinstance(current, dict):
+            if part not in current or current[part] is None:
+                if not create:
+                    return None, parts[-1]
+                current[part] = {}
+            current = current[part]
+        else:
+            raise _error(f"Impossible de créer le champ '{part}' dans une valeur scalaire ({path})")
+    if not isinstance(current, (dict, list)):
+        raise _error(f"Impossible de créer le champ '{parts[-1]}' dans une valeur scalaire ({path})")
+    if parts[-1].startswith('$'):
+        raise unsupported(f"L'opérateur positionnel {parts[-1]}")
+    return current, parts[-1]
+
+
+def _get(container: Any, key: str, default: Any = None) -> Any:
+    if isinstance(container, list):
+        index = int(key)
+        return container[index] if index < len(container) else default
+    return container.get(key, default)
+
+
+def _has(container: Any, key: str) -> bool:
+    if isinstance(container, list):
+        return key.isdigit() and int(key) < len(container)
+    return key in container
+
+
+def _put(container: Any, key: str, value: Any) -> None:
+    if isinstance(container, list):
+        index = int(key)
+        if index >= len(container):
+            container.extend([None] * (index + 1 - len(container)))
+        container[index] = value
+    else:
+        container[key] = value
+
+
+def _number(value: Any, op: str, path: str) -> Any:
+    if rank(value) != 2 or isinstance(value, bool):
+        raise _error(f"{op} sur le champ non numérique '{path}'")
+    return value
+
+
+def _array(container: Any, key: str, op: str, path: str) -> List[Any]:
+    current = _get(container, key)
+    if current is None and not _has(container, key):
+        current = []
+        _put(container, key, current)
+    if not isinstance(current, list):
+        raise _error(f"{op} sur le champ '{path}' qui n'est pas un tableau")
+    return current
+
+
+def _now(spec: Any) -> Any:
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    if isinstance(spec, dict) and spec.get('$type') == 'timestamp':
+        return Timestamp(int(now.replace(tzinfo=timezone.utc).timestamp()), 1)
+    return store_value(now)
+
+
+def _sort_elements(elements: List[Any], spec: Any) -> None:
+    if isinstance(spec, dict):
+        for field, direction in reversed(list(spec.items())):
+            elements.sort(key=lambda item: sort_key(item.get(field) if isinstance(item, dict) else None),
+                          reverse=direction < 0)
+    else:
+        elements.sort(key=sort_key, reverse=spec < 0)
+
+
+def _push(array: List[Any], argument: Any) -> None:
+    if not (isinstance(argument, dict) and '$each' in argument):
+        array.append(store_value(argument))
+        return
+    items = [store_value(item) for item in argument['$each']]
+    position = argument.get('$position')
+    if position is None:
+        array.extend(items)
+    else:
+        if position < 0:
+            position = max(len(array) + position, 0)
+        array[position:position] = items
+    if '$sort' in argument:
+        _sort_elements(array, argument['$sort'])
+    if '$slice' in argument:
+        count = argument['$slice']
+        array[:] = array[count:] if count < 0 else array[:count]
+
+
+def _pull_match(element: Any, condition: Any) -> bool:
+    if is_operator_dict(condition):
+        return match_field([element], condition)
+    if isinstance(condition, dict):
+        return isinstance(element, dict) and matches(element, condition)
+    return equals(element, condition)
+
+
+def apply_update(doc: Dict[str, Any], update: Dict[str, Any], inserting: bool = False) -> None:
+    """Applique les opérateurs de ``update`` à ``doc`` (modifié en place)"""
+    for op, fields in update.items():
+        if not isinstance(fields, dict):
+            raise _error(f"{op} attend un document")
+        if op == '$setOnInsert' and not inserting:
+            continue
+        for path, argument in fields.items():
+            _apply(doc, op, path, argument)
+
+
+def _apply(doc: Dict[str, Any], op: str, path: str, argument: Any) -> None:
+    if op in ('$set', '$setOnInsert'):
+        container, key = _container(doc, path, True)
+        _put(container, key, store_value(argument))
+    elif op == '$unset':
+        container, key = _container(doc, path, False)
+        if container is not None and _has(container, key):
+            if isinstance(container, list):
+                container[int(key)] = None
+            else:
+                del container[key]
+    elif op in ('$inc', '$mul'):
+        _number(argument, op, path)
+        container, key = _container(doc, path, True)
+        if _has(container, key):
+            current = _number(_get(container, key), op, path)
+            _put(container, key, current + argument if op == '$inc' else current * argument)
+        else:
+            _put(container, key, argument if op == '$inc' else type(argument)(0))
+    elif op in ('$min', '$max'):
+        container, key = _container(doc, path, True)
+        if not _has(container, key):
+            _put(container, key, store_value(argument))
+        else:
+            order = compare(argument, _get(container, key))
+            if (op == '$min' and order < 0) or (op == '$max' and order > 0):
+                _put(container, key, store_value(argument))
+    elif op == '$rename':
+        container, key = _container(doc, path, False)
+        if container is not None and _has(container, key):
+            value = container.pop(key)
+            target, target_key = _container(doc, argument, True)
+            _put(target, target_key, value)
+    elif op == '$currentDate':
+        container, key = _container(doc, path, True)
+        _put(container, key, _now(argument))
+    elif op == '$push':
+        container, key = _container(doc, path, True)
+        _push(_array(container, key, op, path), argument)
+    elif op == '$addToSet':
+        container, key = _container(doc, path, True)
+        array = _array(container, key, op, path)
+        items = argument['$each'] if isinstance(argument, dict) and '$each' in argument else [argument]
+        for item in items:
+            if not any(equals(element, item) for element in array):
+                array.append(store_value(item))
+    elif op in ('$pull', '$pullAll'):
+        container, key = _container(doc, path, False)
+        if container is None or not _has(container, key):
+            return
+        array = _get(container, key)
+        if not isinstance(array, list):
+            raise _error(f"{op} sur le champ '{path}' qui n'est pas un tableau")
+        if op == '$pull':
+            array[:] = [element for element in array if not _pull_match(element, argument)]
+        else:
+            array[:] = [element for element in array if not any(equals(element, item) for item in argument)]
+    elif op == '$pop':
+        container, key = _container(doc, path, False)
+        if container is None or not _has(container, key):
+            return
+        array = _get(container, key)
+        if not isinstance(array, list):
+            raise _error(f"$pop sur le champ '{path}' qui n'est pas un tableau")
+        if array:
+            array.pop(0 if argument < 0 else -1)
+    else:
+        raise unsupported(f"L'opérateur de mise à jour {op}")
+
+
+def replace(doc: Dict[str, Any], replacement: Dict[str, Any]) -> Dict[str, Any]:
+    """Document remplaçant ``doc`` (l'_id est conservé)"""
+    if '_id' in replacement and not equals(replacement['_id'], doc['_id']):
+        raise _immutable_id()
+    new_doc = {'_id': doc['_id']}
+    for key, value in replacement.items():
+        if key != '_id':
+            new_doc[key] = store_value(value)
+    return new_doc
+
+
+def updated(doc: Dict[str, Any], update: Dict[str, Any], inserting: bool = False) -> Dict[str, Any]:
+    """Copie de ``doc`` après remplacement ou application des opérateurs
+
+    Hors insertion, l'_id ne peut changer par aucun opérateur ($set, $unset,
+    $rename, chemins sous '_id'...) : le document resterait rangé sous l'ancien.
+    """
+    if is_update(update):
+        new_doc = copy_value(doc)
+        apply_update(new_doc, update, inserting)
+        if not inserting and ('_id' not in new_doc or not equals(new_doc['_id'], doc['_id'])):
+            raise _immutable_id()
+        return new_doc
+    return replace(doc, update)
@@ -0,0 +1,155 @@
+"""Valeurs BSON côté moteur en mémoire : chemins, ordre de tri et copies"""
+
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Any, List, Tuple
+import re
+
+from bson import ObjectId
+from bson.binary import Binary
+from bson.decimal128 import Decimal128
+from bson.max_key import MaxKey
+from bson.min_key import MinKey
+from bson.regex import Regex
+from bson.timestamp import Timestamp
+
+# Clé de tri de null et des champs absents
+NULL_KEY = (1,)
+
+_PATTERN = type(re.compile(''))
+
+
+def resolve(value: Any, parts: List[str]) -> List[Any]:
+    """Valeurs atteintes par le chemin ``parts``, en traversant les tableaux comme MongoDB"""
+    if not parts:
+        return [value]
+    head, rest = parts[0], parts[1:]
+    if isinstance(value, dict):
+        if head in value:
+            return resolve(value[head], rest)
+        return []
+    if isinstance(value, list):
+        found = []
+        if head.isdigit() and int(head) < len(value):
+            found.extend(resolve(value[int(head)], rest))
+        for item in value:
+            if isinstance(item, dict):
+                found.extend(resolve(item, parts))
+        return found
+    return []
+
+
+def values(doc: Any, path: str) -> List[Any]:
+    """Valeurs du champ ``path`` (liste vide si le champ est absent)"""
+    if '.' not in path:
+        if isinstance(doc, dict) and path in doc:
+            return [doc[path]]
+        return []
+    return resolve(doc, path.split('.'))
+
+
+def expand(found: List[Any]) -> List[Any]:
+    """Valeurs trouvées et éléments des tableaux trouvés"""
+    result = []
+    for value in found:
+        result.append(value)
+        if isinstance(value, list):
+            result.extend(value)
+    return result
+
+
+def rank(value: Any) -> int:
+    """Rang du type dans l'ordre de comparaison BSON"""
+    if value is None:
+        return 1
+    if isinstance(value, bool):
+        return 8
+    if isinstance(value, (int, float, Decimal128, Decimal)):
+        return 2
+    if isinstance(value, str):
+        return 3
+    if isinstance(value, dict):
+        return 4
+    if isinstance(value, (list, tuple)):
+        return 5
+    if isinstance(value, (bytes, Binary)):
+        return 6
+    if isinstance(value, ObjectId):
+        return 7
+    if isinstance(value, datetime):
+        return 9
+    if isinstance(value, Timestamp):
+        return 10
+    if isinstance(value, (_PATTERN, Regex)):
+        return 11
+    if isinstance(value, MinKey):
+        return 0
+    if isinstance(value, MaxKey):
+        return 127
+    return 12
+
+
+def sort_key(value: Any) -> Tuple:
+    """Clé hachable et ordonnée selon l'ordre BSON (1 et 1.0 sont égaux, True et 1 non)"""
+    type_rank = rank(value)
+    if type_rank == 2:
+        if isinstance(value, Decimal128):
+            value = value.to_decimal()
+        return (2, value)
+    if type_rank in (3, 8):
+        return (type_rank, value)
+    if type_rank == 4:
+        return (4, tuple((key, sort_key(item)) for key, item in value.items()))
+    if type_rank == 5:
+        return (5, tuple(sort_key(item) for item in value))
+    if type_rank == 6:
+        return (6, len(value), bytes(value))
+    if type_rank == 7:
+        return (7, value.binary)
+    if type_rank == 9:
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return (9, value)
+    if type_rank == 10:
+        return (10, value.time, value.inc)
+    if type_rank == 11:
+        return (11, value.pattern, str(value.flags))
+    if type_rank == 12:
+        return (12, repr(value))
+    return (type_rank,)
+
+
+def equals(left: Any, right: Any) -> bool:
+    return sort_key(left) == sort_key(right)
+
+
+def compare(left: Any, right: Any) -> int:
+    """-1, 0 ou 1 selon l'ordre BSON"""
+    left_key, right_key = sort_key(left), sort_key(right)
+    return (left_key > right_key) - (left_key < right_key)
+
+
+def copy_value(value: Any) -> Any:
+    """Copie profonde des dicts et listes (les autres valeurs BSON sont immuables)"""
+    if isinstance(value, dict):
+        return {key: copy_value(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [copy_value(item) for item in value]
+    return value
+
+
+def store_value(value: Any) -> Any:
+    """Copie stockée d'une valeur, normalisée comme par un aller-retour BSON
+
+    Les dates sont ramenées en UTC naïf et tronquées à la milliseconde,
+    les tuples deviennent des listes.
+    """
+    if isinstance(value, dict):
+        return {key: store_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [store_value(item) for item in value]
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value.replace(microsecond=value.microsecond // 1000 * 1000)
+    return value
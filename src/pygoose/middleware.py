@@ -0,0 +1,395 @@
+"""Instrumentation : latence par modèle et par opération
+
+    from pygoose.middleware import instrument, PrometheusExporter
+
+    metrics = instrument(slow_ms=200, exporters=[PrometheusExporter('/var/lib/node_exporter/pygoose.prom')])
+    ...
+    metrics.export()            # ou metrics.prometheus() dans un endpoint /metrics
+
+Chaque opération (``Model.find_one``, ``Query.exec``, ``Document.save``...)
+alimente un histogramme de sa durée totale et de ses phases :
+
+- ``network`` : durée des commandes MongoDB (écouteur de commandes pymongo) ;
+- ``validate`` : validation par le schéma ;
+- ``hydrate`` : construction des documents ;
+- ``hooks`` : exécution des hooks pre/post.
+
+Le nombre de documents lus ou écrits est compté par (modèle, opération),
+ainsi que la taille des réponses du serveur avec ``measure_bytes=True``
+(chaque réponse est réencodée en BSON : à réserver au diagnostic). L'écouteur est enregistré au premier
+``instrument()`` : seuls les clients créés ensuite le voient (la connexion
+étant paresseuse, il suffit d'instrumenter avant la première requête).
+
+Désactivée, l'instrumentation ne coûte qu'un test par opération.
+"""
+
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import functools
+import inspect
+import logging
+import os
+import tempfile
+import threading
+import time
+
+import bson
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+# Bornes des histogrammes, en secondes
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Modèle des commandes exécutées hors de toute opération (index, compteurs différés...)
+UNATTRIBUTED = '-'
+
+_current: ContextVar = ContextVar('pygoose_operation', default=None)
+_active: Optional['Instrumentation'] = None
+_listener_registered = False
+
+
+class Histogram:
+    """Histogramme à bornes fixes (compte, somme et effectif par borne)"""
+
+    __slots__ = ('buckets', 'counts', 'count', 'sum')
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self) -> List[Tuple[float, int]]:
+        """Couples (borne, effectif cumulé), la dernière borne étant +inf"""
+        total, result = 0, []
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def quantile(self, q: float) -> float:
+        """Estimation d'un quantile (borne supérieure du seau qui le contient)"""
+        rank = q * self.count
+        for bound, total in self.cumulative():
+            if total >= rank:
+                return bound
+        return float('inf')
+
+
+class Metrics:
+    """Histogrammes par (modèle, opération, phase) et compteurs par (modèle, opération)"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.histograms: Dict[Tuple[str, str, str], Histogram] = {}
+        self.documents: Dict[Tuple[str, str], int] = {}
+        self.bytes: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, model: str, operation: str, phase: str, seconds: float) -> None:
+        key = (model, operation, phase)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def count(self, model: str, operation: str, documents: int = 0, size: int = 0) -> None:
+        key = (model, operation)
+        with self._lock:
+            if documents:
+                self.documents[key] = self.documents.get(key, 0) + documents
+            if size:
+                self.bytes[key] = self.bytes.get(key, 0) + size
+
+    def histogram(self, model: str, operation: str, phase: str = 'total') -> Optional[Histogram]:
+        return self.histograms.get((model, operation, phase))
+
+    def clear(self) -> None:
+        with self._lock:
+            self.histograms.clear()
+            self.documents.clear()
+            self.bytes.clear()
+
+
+class Operation:
+    """Mesure d'une opération en cours ; les phases s'y ajoutent via le contexte"""
+
+    __slots__ = ('instrumentation', 'model', 'name', 'phases', 'documents', 'bytes',
+                 'elapsed', 'failed', '_mark', '_previous')
+
+    def __init__(self, instrumentation: 'Instrumentation', model: str, name: str):
+        self.instrumentation = instrumentation
+        self.model = model
+        self.name = name
+        self.phases: Dict[str, float] = {}
+        self.documents = 0
+        self.bytes = 0
+        self.elapsed = 0.0
+        self.failed = False
+        self._mark = None
+        self._previous = None
+
+    def add(self, phase: str, seconds: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def resume(self) -> None:
+        """Rend l'opération courante et reprend le chronomètre"""
+        self._previous = _current.get()
+        _current.set(self)
+        self._mark = time.perf_counter()
+
+    def pause(self) -> None:
+        """Arrête le chronomètre (itération rendue à l'appelant)"""
+        self.elapsed += time.perf_counter() - self._mark
+        _current.set(self._previous)
+
+    def finish(self) -> None:
+        self.instrumentation._finish(self)
+
+    def __enter__(self) -> 'Operation':
+        self.resume()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.pause()
+        self.failed = exc_type is not None
+        self.finish()
+
+
+class Exporter(ABC):
+    """Destination des métriques, appelée par :meth:`Instrumentation.export`"""
+
+    @abstractmethod
+    def export(self, metrics: Metrics) -> None:
+        ...
+
+
+def _label(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _bound(value: float) -> str:
+    return '+Inf' if value == float('inf') else repr(value)
+
+
+def prometheus_text(metrics: Metrics, prefix: str = 'pygoose') -> str:
+    """Métriques au format texte de Prometheus"""
+    with metrics._lock:
+        histograms = sorted(metrics.histograms.items())
+        documents = sorted(metrics.documents.items())
+        sizes = sorted(metrics.bytes.items())
+
+    lines = [
+        f"# HELP {prefix}_operation_seconds Durée des opérations par modèle, opération et phase",
+        f"# TYPE {prefix}_operation_seconds histogram",
+    ]
+    for (model, operation, phase), histogram in histograms:
+        labels = f'model="{_label(model)}",operation="{_label(operation)}",phase="{_label(phase)}"'
+        for bound, total in histogram.cumulative():
+            lines.append(f'{prefix}_operation_seconds_bucket{{{labels},le="{_bound(bound)}"}} {total}')
+        lines.append(f'{prefix}_operation_seconds_sum{{{labels}}} {histogram.sum!r}')
+        lines.append(f'{prefix}_operation_seconds_count{{{labels}}} {histogram.count}')
+
+    for name, help_text, values in (
+        ('documents_total', "Documents lus ou écrits", documents),
+        ('response_bytes_total', "Taille des réponses du serveur", sizes),
+    ):
+        lines.append(f"# HELP {prefix}_{name} {help_text}")
+        lines.append(f"# TYPE {prefix}_{name} counter")
+        for (model, operation), value in values:
+            lines.append(f'{prefix}_{name}{{model="{_label(model)}",operation="{_label(operation)}"}} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+class PrometheusExporter(Exporter):
+    """Écrit les métriques au format Prometheus (fichier du collecteur textfile, par exemple)"""
+
+    def __init__(self, path: str = None, prefix: str = 'pygoose'):
+        self.path = path
+        self.prefix = prefix
+        self.last = ''
+
+    def export(self, metrics: Metrics) -> None:
+        self.last = prometheus_text(metrics, self.prefix)
+        if self.path:
+            # Écriture atomique : le collecteur ne lit jamais un fichier partiel
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as tmp:
+                tmp.write(self.last)
+            os.replace(tmp_path, self.path)
+
+
+class Instrumentation:
+    """Collecte les métriques des opérations et journalise les opérations lentes
+
+    ``slow_ms`` est le seuil par défaut du journal des opérations lentes
+    (None : désactivé) ; ``thresholds`` le remplace par opération
+    ('find_one') ou par modèle et opération ('User.find_one').
+    ``measure_bytes`` compte la taille des réponses ; désactivé par défaut
+    car chaque réponse est réencodée en BSON, sur le chemin de toutes les lectures.
+    """
+
+    def __init__(self, metrics: Metrics = None, slow_ms: Optional[float] = None,
+                 thresholds: Dict[str, float] = None, exporters: Iterable[Exporter] = (),
+                 measure_bytes: bool = False):
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.slow_ms = slow_ms
+        self.thresholds = dict(thresholds or {})
+        self.exporters = list(exporters)
+        self.measure_bytes = measure_bytes
+
+    def __enter__(self) -> 'Instrumentation':
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.stop()
+
+    def start(self) -> 'Instrumentation':
+        """Active l'instrumentation pour tout le processus"""
+        global _active, _listener_registered
+        if not _listener_registered:
+            monitoring.register(_CommandTimer())
+            _listener_registered = True
+        _active = self
+        return self
+
+    def stop(self) -> None:
+        global _active
+        if _active is self:
+            _active = None
+
+    def threshold(self, model: str, operation: str) -> Optional[float]:
+        """Seuil de lenteur (ms) d'une opération"""
+        return self.thresholds.get(f"{model}.{operation}", self.thresholds.get(operation, self.slow_ms))
+
+    def _finish(self, operation: Operation) -> None:
+        metrics = self.metrics
+        metrics.observe(operation.model, operation.name, 'total', operation.elapsed)
+        for phase, seconds in operation.phases.items():
+            metrics.observe(operation.model, operation.name, phase, seconds)
+        metrics.count(operation.model, operation.name, operation.documents, operation.bytes)
+
+        threshold = self.threshold(operation.model, operation.name)
+        elapsed_ms = operation.elapsed * 1000
+        if threshold is not None and elapsed_ms >= threshold:
+            phases = ', '.join(f"{phase} {seconds * 1000:.1f} ms" for phase, seconds in sorted(operation.phases.items()))
+            logger.warning("Opération lente %s.%s : %.1f ms (%s), %d document(s)%s",
+                           operation.model, operation.name, elapsed_ms, phases or "aucune phase",
+                           operation.documents, " en échec" if operation.failed else "")
+
+    def export(self) -> None:
+        """Transmet les métriques à chaque exporteur"""
+        for exporter in self.exporters:
+            exporter.export(self.metrics)
+
+    def prometheus(self) -> str:
+        """Métriques au format texte de Prometheus"""
+        return prometheus_text(self.metrics)
+
+
+class _CommandTimer(monitoring.CommandListener):
+    """Attribue la durée des commandes MongoDB à l'opération en cours"""
+
+    def started(self, event) -> None:
+        pass
+
+    def succeeded(self, event) -> None:
+        _network(event, event.reply)
+
+    def failed(self, event) -> None:
+        _network(event, None)
+
+
+def _network(event, reply: Any) -> None:
+    instrumentation = _active
+    if instrumentation is None:
+        return
+    seconds = event.duration_micros / 1e6
+    size = len(bson.encode(reply)) if reply is not None and instrumentation.measure_bytes else 0
+    operation = _current.get()
+    if operation is not None:
+        operation.add('network', seconds)
+        operation.bytes += size
+    else:
+        instrumentation.metrics.observe(UNATTRIBUTED, event.command_name, 'network', seconds)
+        instrumentation.metrics.count(UNATTRIBUTED, event.command_name, 0, size)
+
+
+def instrument(slow_ms: Optional[float] = None, thresholds: Dict[str, float] = None,
+               exporters: Iterable[Exporter] = (), measure_bytes: bool = False,
+               metrics: Metrics = None) -> Instrumentation:
+    """Active l'instrumentation et la retourne (``stop()`` pour la désactiver)"""
+    return Instrumentation(metrics, slow_ms, thresholds, exporters, measure_bytes).start()
+
+
+def current_instrumentation() -> Optional[Instrumentation]:
+    """Instrumentation active, ou None"""
+    return _active
+
+
+def begin(model, name: str) -> Optional[Operation]:
+    """Nouvelle opération sur ``model``, ou None (instrumentation inactive ou opération déjà en cours)"""
+    if _active is None or _current.get() is not None:
+        return None
+    return Operation(_active, model._name, name)
+
+
+def timed(phase: str, func: Callable, *args: Any) -> Any:
+    """Appelle ``func`` en ajoutant sa durée à la phase ``phase`` de l'opération en cours"""
+    operation = _current.get()
+    if operation is None:
+        return func(*args)
+    started = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        operation.add(phase, time.perf_counter() - started)
+
+
+def add_phase(phase: str, seconds: float) -> None:
+    """Ajoute ``seconds`` à la phase ``phase`` de l'opération en cours"""
+    operation = _current.get()
+    if operation is not None:
+        operation.add(phase, seconds)
+
+
+def count_documents(count: int) -> None:
+    """Ajoute ``count`` documents lus ou écrits à l'opération en cours"""
+    operation = _current.get()
+    if operation is not None:
+        operation.documents += count
+
+
+def instrumented(name: str):
+    """Mesure la méthode comme l'opération ``name`` de son modèle"""
+    def decorate(method):
+        if inspect.iscoroutinefunction(method):
+            @functools.wraps(method)
+            async def async_wrapper(self, *args, **kwargs):
+                operation = begin(getattr(self, '_model', self), name)
+                if operation is None:
+                    return await method(self, *args, **kwargs)
+                with operation:
+                    return await method(self, *args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            operation = begin(getattr(self, '_model', self), name)
+            if operation is None:
+                return method(self, *args, **kwargs)
+            with operation:
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorate
@@ -1,55 +1,428 @@
-from typing import Dict, Any, List, Optional, Union
+from typing import Dict, Any, Iterable, List, Optional, Tuple, Union
 from bson import ObjectId
+import bson
+import contextvars
+import copy
 from datetime import datetime
-from .connection import get_database
-from .document import Document
+from .connection import DEFAULT_ALIAS, Connection, get_database
+from .document import Document, build_document_class
+from .lazy import LazyData, raw_collection
 from .query import Query
-from .exceptions import DuplicateKeyError
-from pymongo.errors import DuplicateKeyError as PyMongoDuplicateKeyError
+from .aggregation import Pipeline
+from .changes import ChangeStream, DEFAULT_AWAIT_MS, TokenStore
+from .routing import build_read_preference, preference_key, read_preference
+from .sessions import current_session
+from .cache import CacheBackend, build_cache, ids_in_filter
+from .counters import CounterBuffer, build_counters
+from .indexes import sync_model_indexes
+from .middleware import count_documents, instrumented, timed
+from .exceptions import PyMongooseError
+from .parallel import validate_chunks
+from .validation import validate_chunk
+from .results import BulkSaveResult, CreateManyResult, IndexSyncResult, not_executed, write_error
+from .utils import chunked
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError as PyMongoBulkWriteError
+from concurrent.futures import ThreadPoolExecutor
+
+# Nombre d'opérations par appel bulk_write
+DEFAULT_CHUNK_SIZE = 1000
 
 class Model:
     """Modèle pour interagir avec une collection MongoDB"""
     
-    def __init__(self, name: str, schema, collection_name: str = None):
+    _document_class = Document
+    
+    def __init__(self, name: str, schema, collection_name: str = None,
+                 alias: str = DEFAULT_ALIAS, db: str = None):
         self._name = name
         self._schema = schema
         self._collection_name = collection_name or name.lower() + 's'
-        self._collection = None
-        self._setup_collection()
+        # Connexion (alias) et base (None : celle de l'URI) du modèle
+        self._alias = alias
+        self._db_name = db
+        self._read_preference = build_read_preference(schema.options.get('read_from'))
+        self._views = {}
+        # Collection liée à la première opération (voir _collection)
+        self._bound_collection = None
+        self._bound_generation = None
+        self._cache = build_cache(schema.options.get('cache'))
+        self._counters = None
+        self._document_class = build_document_class(name, schema, type(self)._document_class)
+    
+    @property
+    def _collection(self):
+        """Collection du modèle, résolue au premier accès et après chaque reconnexion ou fork"""
+        if self._bound_generation != Connection.generation:
+            self._setup_collection()
+        session = current_session()
+        if session is not None and session.causal:
+            return session.bind(self._bound_collection)
+        return self._bound_collection
+    
+    @_collection.setter
+    def _collection(self, collection) -> None:
+        self._bound_collection = collection
+        self._bound_generation = Connection.generation
     
     def _setup_collection(self):
         """Configure la collection MongoDB"""
-        db = get_database()
-        self._collection = db[self._collection_name]
+        db = get_database(self._alias, self._db_name)
+        self._collection = self._route(db[self._collection_name])
+    
+    def _route(self, collection):
+        """Applique la préférence de lecture du modèle à la collection"""
+        if self._read_preference is None:
+            return collection
+        return collection.with_options(read_preference=self._read_preference)
+    
+    @property
+    def _scope(self):
+        """Identifie le modèle et sa base (carte d'identité des sessions)"""
+        return (self._name, self._alias, self._db_name)
+    
+    @property
+    def _namespace(self) -> str:
+        """Collection du modèle, précédée de la connexion et de la base pour une vue
+        ``using()`` (``'tenant:tenant_42/settings'``) : espace de noms du cache et
+        nom par défaut du flux de modifications"""
+        if self._alias == DEFAULT_ALIAS and self._db_name is None:
+            return self._collection_name
+        return f"{self._alias}:{self._db_name or ''}/{self._collection_name}"
+    
+    def using(self, db: str = None, alias: str = None) -> 'Model':
+        """Modèle lié à une autre base ou connexion : ``User.using('tenant_42').find(...)``
         
-        # Créer les index
-        for index_spec, options in self._schema.indexes:
-            self._collection.create_index(index_spec, **options)
+        Les vues sont mises en cache par (alias, base, préférence de lecture) ;
+        leurs documents sont sauvegardés dans la base de la vue. Cache et
+        compteurs sont propres à chaque vue (un backend de cache partagé
+        range ses entrées par base). ``pygoose.sync_indexes()`` crée
+        les index des vues déjà créées ; ``databases=`` y ajoute les autres.
+        """
+        return self._view(alias or self._alias, db or self._db_name, self._read_preference)
+    
+    def read_from(self, mode: Any, max_staleness: Optional[int] = None,
+                  tags: Optional[List[Dict[str, str]]] = None) -> 'Model':
+        """Modèle dont toutes les lectures suivent cette préférence (voir :mod:`pygoose.routing`)"""
+        return self._view(self._alias, self._db_name, read_preference(mode, max_staleness, tags))
+    
+    def _view(self, alias: str, db: Optional[str], preference) -> 'Model':
+        key = (alias, db, preference_key(preference))
+        if key == (self._alias, self._db_name, preference_key(self._read_preference)):
+            return self
+        view = self._views.get(key)
+        if view is None:
+            view = copy.copy(self)
+            view._alias, view._db_name, view._read_preference = alias, db, preference
+            view._bound_collection = None
+            view._bound_generation = None
+            view._cache = build_cache(self._schema.options.get('cache'))
+            view._counters = None
+            for method_name, method_func in self._schema.statics.items():
+                setattr(view, method_name, method_func.__get__(view, type(view)))
+            self._views[key] = view
+        return view
     
+    def sync_indexes(self, dry_run: bool = False, drop: bool = False) -> IndexSyncResult:
+        """Crée les index déclarés manquants (voir :mod:`pygoose.indexes`)
+        
+        Avec ``dry_run`` rien n'est modifié : le résultat indique les index
+        qui seraient créés ou supprimés et les conflits.
+        """
+        return sync_model_indexes(self, dry_run, drop)
+    
+    @property
+    def cache(self) -> Optional[CacheBackend]:
+        """Cache de documents du modèle (option de schéma 'cache'), ou None"""
+        return self._cache
+    
+    @property
+    def counters(self) -> CounterBuffer:
+        """Tampon des incréments différés du modèle (option de schéma 'counters')"""
+        if self._counters is None:
+            self._counters = build_counters(self, self._schema.options.get('counters'))
+        return self._counters
+    
+    def _cache_key(self, filter_dict: Optional[Dict[str, Any]]):
+        """Clé de cache d'un filtre portant uniquement sur _id, sinon None"""
+        if self._cache is None or not filter_dict or list(filter_dict) != ['_id']:
+            return None
+        doc_id = filter_dict['_id']
+        if isinstance(doc_id, (dict, list)):
+            return None
+        return (self._namespace, doc_id)
+    
+    def _invalidate(self, filter_dict: Dict[str, Any]) -> None:
+        """Invalide les entrées de cache touchées par une écriture"""
+        if self._cache is None:
+            return
+        ids = ids_in_filter(filter_dict)
+        try:
+            if ids is not None:
+                self._cache.delete([(self._namespace, doc_id) for doc_id in ids])
+                return
+        except TypeError:
+            # _id non hachable
+            pass
+        self._cache.clear(self._namespace)
+    
+    def _hydrate(self, doc_data: Dict[str, Any], partial: bool = False) -> Document:
+        """Construit un document chargé depuis la base, via la session active"""
+        return timed('hydrate', self._build_document, doc_data, partial)
+    
+    def _build_document(self, doc_data: Dict[str, Any], partial: bool) -> Document:
+        session = current_session()
+        if session is not None:
+            existing = session.get(self, doc_data.get('_id'))
+            if existing is not None:
+                return existing
+        
+        doc = self._document_class(self, doc_data, from_db=True)
+        # Un document partiel (projection) ne doit pas servir les lectures suivantes
+        if session is not None and not partial:
+            session.add(doc)
+        return doc
+    
+    @instrumented('create')
     def create(self, data: Dict[str, Any]) -> Document:
         """Crée et sauvegarde un nouveau document"""
-        doc = Document(self, data)
+        doc = self._document_class(self, data)
         return doc.save()
     
-    def create_many(self, data_list: List[Dict[str, Any]]) -> List[Document]:
-        """Crée plusieurs documents"""
-        documents = []
-        validated_data = []
-        
-        for data in data_list:
-            validated = self._schema.validate(data)
-            validated_data.append(validated)
+    @instrumented('create_many')
+    def create_many(self, data_list: Iterable[Dict[str, Any]], chunk_size: int = DEFAULT_CHUNK_SIZE,
+                    ordered: bool = False, pipeline: bool = False,
+                    collect_ids: bool = True, workers: int = None,
+                    schema_path: str = None, start_method: str = None) -> CreateManyResult:
+        """Crée plusieurs documents par lots de ``chunk_size``
         
+        Accepte tout itérable (générateur compris) : seuls quelques lots
+        sont en mémoire à la fois. Les données invalides et les échecs
+        d'insertion sont rapportés par index dans le résultat. Avec
+        ``pipeline=True`` le lot suivant est validé pendant l'insertion du
+        lot courant ; avec ``workers=N`` les lots sont validés dans N
+        processus (voir :mod:`pygoose.parallel` pour ``schema_path`` et
+        ``start_method``).
+        """
+        result = CreateManyResult(collect_ids)
+        validated_chunks = self._validated_chunks(data_list, chunk_size, pipeline, workers, schema_path,
+                                                  start_method)
         try:
-            result = self._collection.insert_many(validated_data)
-            for i, inserted_id in enumerate(result.inserted_ids):
-                validated_data[i]['_id'] = inserted_id
-                doc = Document(self, validated_data[i], from_db=True)
-                documents.append(doc)
-        except PyMongoDuplicateKeyError:
-            raise DuplicateKeyError("Clé dupliquée lors de l'insertion")
+            for validated in validated_chunks:
+                if not self._insert_chunk(validated, ordered, result):
+                    break
+        finally:
+            validated_chunks.close()
+        return result
+    
+    def _validated_chunks(self, data_list: Iterable[Dict[str, Any]], chunk_size: int,
+                          pipeline: bool, workers: Optional[int], schema_path: Optional[str],
+                          start_method: Optional[str] = None):
+        """Lots validés dans l'ordre d'entrée, en série, en thread ou en processus"""
+        chunks = chunked(data_list, chunk_size)
+        if workers:
+            yield from validate_chunks(self._schema, chunks, workers, schema_path,
+                                       start_method=start_method)
+        elif pipeline:
+            yield from self._prefetch(chunks)
+        else:
+            for start, chunk in chunks:
+                yield self._validate_chunk(start, chunk)
+    
+    def _prefetch(self, chunks):
+        """Valide le lot suivant dans un thread pendant le traitement du lot courant
+        
+        Le thread reçoit une copie du contexte : la validation reste attribuée
+        à l'opération instrumentée en cours.
+        """
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            def submit(pending):
+                if pending is None:
+                    return None
+                return executor.submit(contextvars.copy_context().run, self._validate_chunk, *pending)
+            
+            future = submit(next(chunks, None))
+            while future is not None:
+                validated = future.result()
+                future = submit(next(chunks, None))
+                yield validated
+    
+    def _validate_chunk(self, start: int, chunk: List[Dict[str, Any]]):
+        """Valide un lot ; retourne (index d'origine, données validées, erreurs par index)"""
+        return timed('validate', validate_chunk, self._schema, start, chunk)
+    
+    def _insert_chunk(self, validated, ordered: bool, result: CreateManyResult) -> bool:
+        """Insère un lot validé ; retourne False si l'import doit s'arrêter (mode ordonné)"""
+        indexes, documents, errors = self._ordered_prefix(validated, ordered)
+        result.errors.update(errors)
+        
+        failed = {}
+        if documents:
+            count_documents(len(documents))
+            try:
+                self._collection.insert_many(documents, ordered=ordered)
+            except PyMongoBulkWriteError as e:
+                failed = self._bulk_failures(e.details, len(documents), ordered)
+        self._record_inserts(indexes, documents, failed, result)
+        return not (ordered and result.errors)
+    
+    @staticmethod
+    def _ordered_prefix(validated, ordered: bool):
+        """En mode ordonné, ne garde que les données précédant la première erreur de validation"""
+        indexes, documents, errors = validated
+        if ordered and errors:
+            first = min(errors)
+            keep = sum(1 for index in indexes if index < first)
+            return indexes[:keep], documents[:keep], {first: errors[first]}
+        return indexes, documents, errors
+    
+    @staticmethod
+    def _record_inserts(indexes: List[int], documents: List[Dict[str, Any]],
+                        failed: Dict[int, Exception], result: CreateManyResult) -> None:
+        for position, (index, data) in enumerate(zip(indexes, documents)):
+            if position in failed:
+                result.errors[index] = failed[position]
+                continue
+            result.inserted_count += 1
+            if result.inserted_ids is not None:
+                # insert_many renseigne _id dans chaque document envoyé
+                result.inserted_ids.append(data['_id'])
+    
+    @instrumented('bulk_save')
+    def bulk_save(self, documents: Iterable[Document], ordered: bool = False,
+                  chunk_size: int = DEFAULT_CHUNK_SIZE) -> BulkSaveResult:
+        """Sauvegarde plusieurs documents en quelques appels bulk_write
+        
+        Les nouveaux documents deviennent des InsertOne, les documents modifiés
+        des UpdateOne ; les échecs sont rapportés par index sans interrompre
+        le reste du lot. Avec ``ordered=True``, tout s'arrête au premier échec
+        (hook ou écriture) et les documents suivants de l'entrée sont rapportés
+        comme non exécutés.
+        """
+        result = BulkSaveResult()
+        chunks = chunked(documents, chunk_size)
+        for start, chunk in chunks:
+            ops, pending = self._bulk_ops(self._bulk_pre_hooks(chunk, start, result, ordered))
+            failed = {}
+            if ops:
+                count_documents(len(ops))
+                try:
+                    self._collection.bulk_write(ops, ordered=ordered)
+                except PyMongoBulkWriteError as e:
+                    failed = self._bulk_failures(e.details, len(ops), ordered, result)
+            self._bulk_post_hooks(self._bulk_finish(pending, failed, result), result)
+            if ordered and result.errors:
+                self._bulk_skip(chunks, result)
+                break
+        return result
+    
+    def _bulk_pre_hooks(self, chunk: List[Document], start: int, result: BulkSaveResult,
+                        ordered: bool = False) -> List[Tuple[int, Document]]:
+        """Exécute les hooks pré-sauvegarde ; retourne les (index, document) à écrire"""
+        ready = []
+        for index, doc in enumerate(chunk, start):
+            try:
+                doc._run_hooks('pre', 'save')
+            except Exception as e:
+                if self._bulk_hook_failed(index, e, start + len(chunk), result, ordered):
+                    break
+                continue
+            ready.append((index, doc))
+        return ready
+    
+    @staticmethod
+    def _bulk_hook_failed(index: int, error: Exception, end: int, result: BulkSaveResult,
+                          ordered: bool) -> bool:
+        """Rapporte l'échec d'un hook ; vrai si le lot s'arrête là (mode ordonné)
+        
+        En mode ordonné, les documents suivants du lot sont rapportés comme non exécutés.
+        """
+        result.errors[index] = error
+        if ordered:
+            for skipped in range(index + 1, end):
+                result.errors[skipped] = not_executed()
+        return ordered
+    
+    @staticmethod
+    def _bulk_ops(ready: List[Tuple[int, Document]]):
+        """Construit les opérations d'un lot
         
-        return documents
+        Retourne (opérations, [(index, document, index d'opération, _id généré)]).
+        """
+        ops, pending = [], []
+        for index, doc in ready:
+            if doc._is_new:
+                # _id attribué côté client pour le relire sans aller-retour
+                generated = '_id' not in doc._data
+                if generated:
+                    doc._data['_id'] = ObjectId()
+                pending.append((index, doc, len(ops), generated))
+                ops.append(InsertOne(doc._data))
+            else:
+                update = doc._pending_update()
+                if update:
+                    pending.append((index, doc, len(ops), False))
+                    ops.append(UpdateOne({'_id': doc._data['_id']}, update))
+                else:
+                    pending.append((index, doc, None, False))
+        return ops, pending
+    
+    @staticmethod
+    def _bulk_failures(details: Dict[str, Any], count: int, ordered: bool,
+                       result: Optional[BulkSaveResult] = None) -> Dict[int, Exception]:
+        """Erreurs par index d'opération d'un BulkWriteError pymongo
+        
+        Les writeConcernErrors sont ajoutées à ``result`` : les écritures ont eu lieu.
+        """
+        if result is not None:
+            result.write_concern_errors.extend(details.get('writeConcernErrors', []))
+        failed = {error['index']: write_error(error) for error in details.get('writeErrors', [])}
+        if ordered and failed:
+            # En mode ordonné, le serveur s'arrête à la première erreur
+            for op_index in range(min(failed) + 1, count):
+                failed.setdefault(op_index, not_executed())
+        return failed
+    
+    @staticmethod
+    def _bulk_skip(chunks, result: BulkSaveResult) -> None:
+        """Rapporte comme non exécutés les documents restants de l'entrée (mode ordonné)"""
+        for start, chunk in chunks:
+            for index in range(start, start + len(chunk)):
+                result.errors[index] = not_executed()
+    
+    def _bulk_finish(self, pending: list, failed: Dict[int, Exception],
+                     result: BulkSaveResult) -> List[Tuple[int, Document]]:
+        """Met à jour les documents écrits ; retourne les (index, document) sauvegardés"""
+        saved, updated_ids = [], []
+        for index, doc, op_index, generated in pending:
+            if op_index in failed:
+                result.errors[index] = failed[op_index]
+                if generated:
+                    doc._data.pop('_id', None)
+                continue
+            if op_index is None:
+                result.unchanged_count += 1
+            elif doc._is_new:
+                doc._is_new = False
+                result.inserted_count += 1
+            else:
+                updated_ids.append(doc._data['_id'])
+                result.updated_count += 1
+            doc._mark_saved()
+            saved.append((index, doc))
+        
+        if updated_ids:
+            self._invalidate({'_id': {'$in': updated_ids}})
+        return saved
+    
+    @staticmethod
+    def _bulk_post_hooks(saved: List[Tuple[int, Document]], result: BulkSaveResult) -> None:
+        """Exécute les hooks post-sauvegarde des documents écrits"""
+        for index, doc in saved:
+            try:
+                doc._run_hooks('post', 'save')
+            except Exception as e:
+                result.errors[index] = e
     
     def find(self, filter_dict: Dict[str, Any] = None) -> Query:
         """Retourne un objet Query pour construire la requête"""
@@ -58,80 +431,182 @@ class Model:
             query.find(filter_dict)
         return query
     
-    def find_one(self, filter_dict: Dict[str, Any] = None) -> Optional[Document]:
-        """Trouve un seul document"""
-        doc_data = self._collection.find_one(filter_dict or {})
+    @instrumented('find_one')
+    def find_one(self, filter_dict: Dict[str, Any] = None, lazy: bool = False) -> Optional[Document]:
+        """Trouve un seul document
+        
+        Avec ``lazy=True`` les champs sont décodés depuis le BSON brut au
+        premier accès (voir :mod:`pygoose.lazy`).
+        """
+        doc, key = self._find_in_memory(filter_dict)
+        if doc is not None:
+            return doc
+        
+        collection = raw_collection(self._collection) if lazy else self._collection
+        doc_data = collection.find_one(filter_dict or {})
         if doc_data:
-            return Document(self, doc_data, from_db=True)
+            count_documents(1)
+            return self._remember(key, self._row(doc_data, lazy))
         return None
     
+    def _row(self, doc_data: Any, lazy: bool) -> Dict[str, Any]:
+        """Enveloppe un résultat brut (mode lazy) sans le décoder"""
+        if lazy:
+            return LazyData(doc_data.raw, self._collection.codec_options)
+        return doc_data
+    
+    def _find_in_memory(self, filter_dict: Optional[Dict[str, Any]]):
+        """Cherche un document dans la session puis dans le cache
+        
+        Retourne (document ou None, clé de cache à renseigner ou None).
+        """
+        session = current_session()
+        if session is not None and filter_dict and list(filter_dict) == ['_id']:
+            doc = session.get(self, filter_dict['_id'])
+            if doc is not None:
+                return doc, None
+        
+        key = self._cache_key(filter_dict)
+        if key is not None:
+            cached = self._cache.get(key)
+            if cached is not None:
+                return self._hydrate(LazyData(cached)), None
+        return None, key
+    
+    def _remember(self, key, doc_data: Dict[str, Any]) -> Document:
+        """Met en cache un document lu en base puis le construit"""
+        if key is not None:
+            raw = doc_data.raw if isinstance(doc_data, LazyData) else bson.encode(doc_data)
+            self._cache.set(key, raw)
+        return self._hydrate(doc_data)
+    
     def find_by_id(self, doc_id: Union[str, ObjectId]) -> Optional[Document]:
         """Trouve un document par son ID"""
+        doc_id = self._parse_id(doc_id)
+        if doc_id is None:
+            return None
+        
+        return self.find_one({'_id': doc_id})
+    
+    @staticmethod
+    def _parse_id(doc_id: Union[str, ObjectId]) -> Optional[ObjectId]:
+        """Convertit un identifiant texte en ObjectId (None s'il est invalide)"""
         if isinstance(doc_id, str):
             try:
-                doc_id = ObjectId(doc_id)
+                return ObjectId(doc_id)
             except:
                 return None
-        
-        return self.find_one({'_id': doc_id})
+        return doc_id
     
-    def update_one(self, filter_dict: Dict[str, Any], update: Dict[str, Any]) -> int:
-        """Met à jour un document"""
-        # Ajouter updated_at si timestamps activés
+    def _stamp_update(self, update: Dict[str, Any]) -> Dict[str, Any]:
+        """Ajoute updated_at à une mise à jour si timestamps activés"""
         if self._schema.options.get('timestamps'):
             if '$set' not in update:
                 update['$set'] = {}
             update['$set']['updated_at'] = datetime.now()
+        return update
+    
+    @instrumented('update_one')
+    def update_one(self, filter_dict: Dict[str, Any], update: Dict[str, Any]) -> int:
+        """Met à jour un document"""
+        # Ajouter updated_at si timestamps activés
+        self._stamp_update(update)
         
         result = self._collection.update_one(filter_dict, update)
+        self._invalidate(filter_dict)
         return result.modified_count
     
+    @instrumented('update_many')
     def update_many(self, filter_dict: Dict[str, Any], update: Dict[str, Any]) -> int:
         """Met à jour plusieurs documents"""
-        if self._schema.options.get('timestamps'):
-            if '$set' not in update:
-                update['$set'] = {}
-            update['$set']['updated_at'] = datetime.now()
+        self._stamp_update(update)
         
         result = self._collection.update_many(filter_dict, update)
+        self._invalidate(filter_dict)
         return result.modified_count
     
+    @instrumented('inc')
+    def inc(self, filter_dict: Dict[str, Any], path: str, amount: Any = 1,
+            buffered: bool = False) -> Optional[int]:
+        """Incrémente atomiquement ``path`` ($inc) sur les documents du filtre
+        
+        Avec ``buffered=True`` les incréments sont cumulés en mémoire par
+        (_id, chemin) et envoyés par lots ; le filtre doit alors porter
+        uniquement sur _id et rien n'est retourné.
+        """
+        if not buffered:
+            return self.update_many(filter_dict, {'$inc': {path: amount}})
+        
+        ids = ids_in_filter(filter_dict)
+        if ids is None or list(filter_dict) != ['_id']:
+            raise ValueError("Incrément différé : le filtre doit porter uniquement sur _id")
+        for doc_id in ids:
+            self.counters.add(doc_id, path, amount)
+        return None
+    
+    @instrumented('delete_one')
     def delete_one(self, filter_dict: Dict[str, Any]) -> int:
         """Supprime un document"""
         result = self._collection.delete_one(filter_dict)
+        self._invalidate(filter_dict)
         return result.deleted_count
     
+    @instrumented('delete_many')
     def delete_many(self, filter_dict: Dict[str, Any]) -> int:
         """Supprime plusieurs documents"""
         result = self._collection.delete_many(filter_dict)
+        self._invalidate(filter_dict)
         return result.deleted_count
     
+    @instrumented('count')
     def count(self, filter_dict: Dict[str, Any] = None) -> int:
         """Compte les documents"""
         return self._collection.count_documents(filter_dict or {})
     
+    @instrumented('aggregate')
     def aggregate(self, pipeline: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Exécute une pipeline d'agrégation"""
         return list(self._collection.aggregate(pipeline))
     
+    def pipeline(self, stages: Optional[List[Dict[str, Any]]] = None) -> Pipeline:
+        """Retourne un objet Pipeline pour construire l'agrégation (voir :mod:`pygoose.aggregation`)"""
+        return Pipeline(self, self._collection, stages)
+    
+    def watch(self, filter_dict: Union[Dict[str, Any], List[Dict[str, Any]]] = None,
+              full_document: Optional[str] = None, token_store: Optional[TokenStore] = None,
+              name: Optional[str] = None, batch_size: Optional[int] = None,
+              max_await_time_ms: Optional[int] = DEFAULT_AWAIT_MS) -> ChangeStream:
+        """Flux des modifications de la collection, reprenable (voir :mod:`pygoose.changes`)
+        
+        ``filter_dict`` porte sur les événements (``{'operationType': 'insert'}``,
+        ``{'fullDocument.status': 'paid'}``) ; une liste est une pipeline.
+        ``full_document='updateLookup'`` joint le document courant aux mises
+        à jour. Avec ``token_store`` le flux reprend, après un redémarrage,
+        à la dernière modification traitée (jetons enregistrés sous ``name``,
+        par défaut le nom de la collection, préfixé de la connexion et de la
+        base pour une vue ``using()``).
+        """
+        return ChangeStream(self, filter_dict, full_document, token_store, name, batch_size, max_await_time_ms)
+    
     def __call__(self, *args, **kwargs) -> Document:
         """Permet d'instancier avec Model()"""
         if args:
             if isinstance(args[0], dict):
-                return Document(self, args[0])
+                return self._document_class(self, args[0])
         if kwargs:
-            return Document(self, kwargs)
-        return Document(self)
+            return self._document_class(self, kwargs)
+        return self._document_class(self)
 
 # Cache des modèles
 _models = {}
 
-def model(name: str, schema, collection_name: str = None) -> Model:
-    """Crée ou retourne un modèle"""
+def model(name: str, schema, collection_name: str = None,
+          alias: str = DEFAULT_ALIAS, db: str = None) -> Model:
+    """Crée ou retourne un modèle (lié à la connexion ``alias`` et à la base ``db``)"""
     if name in _models:
         return _models[name]
     
-    model_instance = Model(name, schema, collection_name)
+    model_instance = Model(name, schema, collection_name, alias, db)
     _models[name] = model_instance
     
     # Ajouter les méthodes statiques du schéma
@@ -0,0 +1,143 @@
+"""Pagination par clé (keyset)
+
+Au lieu de sauter ``offset`` documents côté serveur, chaque page reprend
+après les valeurs de tri du dernier document de la page précédente :
+
+    page = Post.find({'published': True}).sort('-created_at').paginate_after(size=20)
+    next_page = Post.find({'published': True}).sort('-created_at').paginate_after(page.next_token, 20)
+
+Le tri de la requête est complété par ``_id`` pour départager les égalités.
+Avec un index sur les champs du tri (par exemple
+``Schema.index([('created_at', -1), ('_id', -1)])``) le coût d'une page est
+le même à n'importe quelle profondeur. Les valeurs de tri nulles ou
+absentes sont reprises dans l'ordre BSON (avant toute autre valeur).
+"""
+
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import base64
+import copy
+
+import bson
+
+from .utils import pluck
+
+# Taille de page par défaut
+DEFAULT_PAGE_SIZE = 20
+
+class Page:
+    """Une page de résultats et le jeton de la suivante (None sur la dernière page)"""
+
+    def __init__(self, items: List[Any], next_token: Optional[str]):
+        self.items = items
+        self.next_token = next_token
+
+    @property
+    def has_more(self) -> bool:
+        return self.next_token is not None
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self.items)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __getitem__(self, index: int) -> Any:
+        return self.items[index]
+
+    def __repr__(self) -> str:
+        return f"Page({len(self.items)} résultats, has_more={self.has_more})"
+
+
+def keyset_sort(sort_spec: Optional[Sequence[Tuple[str, int]]]) -> List[Tuple[str, int]]:
+    """Tri de la requête complété par ``_id`` (même sens que le dernier champ)"""
+    sort = [(field, -1 if direction < 0 else 1) for field, direction in (sort_spec or [])]
+    if not any(field == '_id' for field, _ in sort):
+        sort.append(('_id', sort[-1][1] if sort else 1))
+    return sort
+
+
+def _after(field: str, direction: int, value: Any) -> Optional[Dict[str, Any]]:
+    """Condition « strictement après ``value`` » sur un champ, None si rien ne peut suivre
+
+    null (ou absent) trie avant toute autre valeur, et une comparaison
+    $gt / $lt avec null ne trouve rien : ces cas sont écrits explicitement.
+    """
+    if value is None:
+        return {field: {'$ne': None}} if direction > 0 else None
+    if direction > 0:
+        return {field: {'$gt': value}}
+    return {'$or': [{field: {'$lt': value}}, {field: None}]}
+
+
+def range_filter(sort: List[Tuple[str, int]], values: List[Any]) -> Dict[str, Any]:
+    """Filtre des documents situés après ``values`` dans l'ordre ``sort``
+
+    (a, b) après (x, y) : a > x, ou a = x et b > y.
+    """
+    branches = []
+    for i, (field, direction) in enumerate(sort):
+        after = _after(field, direction, values[i])
+        if after is None:
+            continue
+        branch = {sort[j][0]: {'$eq': values[j]} for j in range(i)}
+        branch.update(after)
+        branches.append(branch)
+    if not branches:
+        # Rien ne peut suivre (dernier _id en tri décroissant à null)
+        return {'_id': {'$in': []}}
+    return branches[0] if len(branches) == 1 else {'$or': branches}
+
+
+def encode_token(sort: List[Tuple[str, int]], values: List[Any]) -> str:
+    """Jeton opaque de continuation"""
+    payload = bson.encode({'s': [list(item) for item in sort], 'v': values})
+    return base64.urlsafe_b64encode(payload).rstrip(b'=').decode('ascii')
+
+
+def decode_token(token: str, sort: List[Tuple[str, int]]) -> List[Any]:
+    """Valeurs de tri d'un jeton, vérifiées contre le tri de la requête"""
+    try:
+        payload = bson.decode(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        values = payload['v']
+    except Exception:
+        raise ValueError("Jeton de pagination invalide")
+    if payload.get('s') != [list(item) for item in sort] or len(values) != len(sort):
+        raise ValueError("Jeton de pagination émis pour un autre tri")
+    return values
+
+
+def page_query(query, token: Optional[str], size: int):
+    """Copie de ``query`` restreinte à la page demandée ; retourne (requête, tri)"""
+    if size < 1:
+        raise ValueError("La taille de page doit être positive")
+    sort = keyset_sort(query._sort_spec)
+    keys = [field for field, _ in sort]
+
+    page = copy.copy(query)
+    page._sort_spec = sort
+    page._skip_count = None
+    page._limit_count = size + 1
+    if token:
+        after = range_filter(sort, decode_token(token, sort))
+        page._filter = {'$and': [query._filter, after]} if query._filter else after
+
+    # Les champs du tri doivent revenir du serveur pour construire le jeton suivant
+    if query._values_fields is not None:
+        page._values_fields = query._values_fields + [key for key in keys if key not in query._values_fields]
+    elif query._projection:
+        projection = query._projection
+        if any(value for field, value in projection.items() if field != '_id'):
+            page._projection = dict(projection, **{key: 1 for key in keys})
+        else:
+            page._projection = {field: value for field, value in projection.items() if field not in keys}
+    return page, sort
+
+
+def split_page(rows: List[Dict[str, Any]], sort: List[Tuple[str, int]], size: int):
+    """Garde ``size`` résultats bruts ; retourne (résultats, jeton suivant ou None)"""
+    if len(rows) <= size:
+        return rows, None
+    rows = rows[:size]
+    last = rows[-1]
+    return rows, encode_token(sort, [pluck(last, field.split('.')) for field, _ in sort])
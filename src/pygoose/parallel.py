@@ -0,0 +1,97 @@
+"""Validation parallèle des imports volumineux dans un pool de processus
+
+Les processus sont démarrés par 'forkserver' (ou 'spawn' là où il n'existe
+pas), jamais par 'fork' implicitement : dupliquer un processus qui a un
+client MongoDB et des threads actifs (surveillance, compteurs) peut le
+bloquer. Le schéma doit alors être sérialisable ou importable via
+``schema_path`` ('package.module:UserSchema'), auquel cas chaque processus
+le reconstruit en important le module. Les schémas contenant des lambdas
+ou des défauts comme ``datetime.now`` peuvent demander
+``start_method='fork'`` (hors Windows et macOS) pour être hérités sans
+sérialisation, en connaissance de cause.
+"""
+
+from collections import deque
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import importlib
+import multiprocessing
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+from .validation import validate_chunk
+
+# Schéma du processus de validation courant
+_worker_schema = None
+
+
+def _default_context(start_method: Optional[str] = None):
+    """Contexte de la méthode demandée, sinon 'forkserver' ou 'spawn' (jamais 'fork')"""
+    if start_method is None:
+        methods = multiprocessing.get_all_start_methods()
+        start_method = 'forkserver' if 'forkserver' in methods else 'spawn'
+    return multiprocessing.get_context(start_method)
+
+
+def _import_schema(schema_path: str):
+    """Importe un schéma désigné par 'module:attribut'"""
+    module_name, _, attribute = schema_path.partition(':')
+    if not attribute:
+        raise ValueError(f"schema_path invalide '{schema_path}', attendu 'module:attribut'")
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+def _schema_payload(schema, schema_path: Optional[str], context) -> Tuple[str, Any]:
+    """Décrit comment chaque processus obtient le schéma"""
+    if schema_path:
+        return ('path', schema_path)
+    if context.get_start_method() != 'fork':
+        try:
+            pickle.dumps(schema)
+        except Exception as e:
+            raise ValueError(
+                "Schéma non sérialisable pour la validation parallèle "
+                f"({e}) : fournir schema_path='module:attribut'"
+            )
+    return ('schema', schema)
+
+
+def _init_worker(payload: Tuple[str, Any]) -> None:
+    global _worker_schema
+    kind, value = payload
+    _worker_schema = _import_schema(value) if kind == 'path' else value
+
+
+def _validate_in_worker(start: int, chunk: List[Dict[str, Any]]):
+    return validate_chunk(_worker_schema, start, chunk)
+
+
+def validate_chunks(schema, chunks: Iterable[Tuple[int, List[Dict[str, Any]]]], workers: int,
+                    schema_path: str = None, mp_context=None,
+                    prefetch: int = None, start_method: str = None) -> Iterator[tuple]:
+    """Valide des lots ``(start, données)`` dans ``workers`` processus
+
+    Les lots validés sont produits dans l'ordre d'entrée, au format de
+    :func:`~pygoose.validation.validate_chunk`. Au plus ``prefetch`` lots
+    (2 par processus par défaut) sont en cours à la fois, ce qui borne la
+    mémoire quelle que soit la taille de l'import. ``start_method``
+    ('fork', 'spawn'...) est ignoré si ``mp_context`` est fourni.
+    """
+    context = mp_context or _default_context(start_method)
+    payload = _schema_payload(schema, schema_path, context)
+    window = prefetch or workers * 2
+
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                   initializer=_init_worker, initargs=(payload,))
+    pending = deque()
+    try:
+        for start, chunk in chunks:
+            pending.append(executor.submit(_validate_in_worker, start, chunk))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
@@ -0,0 +1,240 @@
+from collections import OrderedDict
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+from .document import Document
+from .sessions import current_session
+
+# Documents référencés gardés d'un lot à l'autre d'un flux (les plus récemment utilisés)
+MAX_LOADED = 10000
+
+
+def _ref_of(field) -> Optional[str]:
+    """Nom du modèle référencé par un champ ('ref' simple ou tableau de refs)"""
+    if field is None:
+        return None
+    ref = field.options.get('ref')
+    if ref:
+        return ref
+    item = field.options.get('array_type')
+    if isinstance(item, dict):
+        return item.get('ref')
+    return None
+
+
+def _get_model(name: str, registry: Dict[str, Any] = None):
+    """Retourne le modèle enregistré sous ``name``"""
+    if registry is None:
+        from .model import _models as registry
+    if name not in registry:
+        raise ValueError(f"Modèle '{name}' inconnu pour populate")
+    return registry[name]
+
+
+def resolve_ref(schema, path: str) -> Tuple[str, str, Optional[str]]:
+    """Découpe un chemin en (chemin du ref, modèle cible, reste à peupler sur la cible)
+
+    'meta.editor' -> ('meta.editor', 'User', None)
+    'author.company' -> ('author', 'User', 'company')
+    """
+    parts = path.split('.')
+    for i in range(1, len(parts) + 1):
+        prefix = '.'.join(parts[:i])
+        ref = _ref_of(schema.path(prefix))
+        if ref:
+            rest = '.'.join(parts[i:]) or None
+            return prefix, ref, rest
+    raise ValueError(f"Le chemin '{path}' ne contient aucun champ 'ref'")
+
+
+def _collect_ids(value: Any, parts: List[str], ids: set) -> None:
+    """Collecte les identifiants présents au chemin ``parts`` de ``value``"""
+    if isinstance(value, list):
+        for item in value:
+            _collect_ids(item, parts, ids)
+    elif parts:
+        if isinstance(value, dict):
+            _collect_ids(value.get(parts[0]), parts[1:], ids)
+    elif value is not None and not isinstance(value, (Document, dict)):
+        ids.add(value)
+
+
+def _substitute(value: Any, parts: List[str], mapping: Dict[Any, Document]) -> Any:
+    """Copie ``value`` en remplaçant les identifiants du chemin par les documents chargés"""
+    if isinstance(value, list):
+        items = (_substitute(item, parts, mapping) for item in value)
+        # Comme Mongoose, les références introuvables sont retirées des tableaux
+        return [item for item in items if item is not None]
+    if parts:
+        if not isinstance(value, dict) or parts[0] not in value:
+            return value
+        copy = dict(value)
+        copy[parts[0]] = _substitute(value[parts[0]], parts[1:], mapping)
+        return copy
+    if value is None or isinstance(value, (Document, dict)):
+        return value
+    return mapping.get(value)
+
+
+def _documents_at(value: Any, parts: List[str], found: Dict[int, Document]) -> None:
+    """Collecte les documents peuplés présents au chemin ``parts``"""
+    if isinstance(value, list):
+        for item in value:
+            _documents_at(item, parts, found)
+    elif isinstance(value, Document):
+        found[id(value)] = value
+    elif parts and isinstance(value, dict):
+        _documents_at(value.get(parts[0]), parts[1:], found)
+
+
+def _source(doc: Document, top: str) -> Any:
+    """Valeur de départ d'un champ, en tenant compte d'une population précédente"""
+    if top in doc._populated:
+        return doc._populated[top]
+    return doc._data.get(top)
+
+
+class Populator:
+    """Résout les champs 'ref' d'un flux de documents, lot par lot
+
+    Chaque chemin coûte une requête ``$in`` par lot ; les ``max_loaded``
+    documents référencés les plus récemment utilisés sont réutilisés d'un
+    lot à l'autre sans nouvel aller-retour, en mémoire bornée.
+    Les chemins demandés en mode ``lookup`` sont joints côté serveur par
+    un ``$lookup`` ajouté à la requête.
+    """
+
+    # Registre des modèles cibles (None : modèles synchrones de ``model()``)
+    _registry = None
+
+    max_loaded = MAX_LOADED
+
+    def __init__(self, model, paths: Iterable[str], lookup_paths: Iterable[str] = ()):
+        self._model = model
+        self._paths = []
+        self._lookups = []
+        self._loaded: OrderedDict = OrderedDict()
+        lookup_paths = set(lookup_paths)
+
+        for path in paths:
+            prefix, ref, rest = resolve_ref(model._schema, path)
+            if path in lookup_paths and rest is None:
+                alias = f"__populate_{len(self._lookups)}"
+                self._lookups.append((prefix, self._target(ref), alias))
+            else:
+                # Les chemins chaînés restent résolus par $in
+                self._paths.append(path)
+
+    def _target(self, ref: str):
+        """Modèle cible, lu dans la base du modèle peuplé s'ils partagent une connexion"""
+        target = _get_model(ref, self._registry)
+        model = self._model
+        if model._db_name is not None and target._db_name is None and target._alias == model._alias:
+            return target.using(model._db_name)
+        return target
+
+    def stages(self) -> List[Dict[str, Any]]:
+        """Étapes $lookup à ajouter à la pipeline de la requête"""
+        return [
+            {'$lookup': {
+                'from': target._collection_name,
+                'localField': prefix,
+                'foreignField': '_id',
+                'as': alias,
+            }}
+            for prefix, target, alias in self._lookups
+        ]
+
+    def hydrate(self, batch: List[Dict[str, Any]], partial: bool = False) -> List[Document]:
+        """Construit les documents d'un lot brut et résout leurs références"""
+        self._trim()
+        documents = self._build(batch, partial)
+        for path in self._paths:
+            self.populate(self._model, documents, path)
+        return documents
+
+    def populate(self, model, documents: List[Document], path: str) -> None:
+        """Peuple ``path`` sur ``documents`` avec une seule requête $in"""
+        target, prefix, rest, ids = self._plan(model, documents, path)
+        mapping = self._fetch(target, ids)
+        found = self._apply(documents, prefix, rest, mapping)
+        if rest:
+            self.populate(target, found, rest)
+
+    def _build(self, batch: List[Dict[str, Any]], partial: bool) -> List[Document]:
+        """Construit les documents d'un lot et affecte les jointures $lookup"""
+        joined = [[doc_data.pop(alias, []) for _, _, alias in self._lookups] for doc_data in batch]
+        documents = [self._model._hydrate(doc_data, partial) for doc_data in batch]
+
+        for i, (prefix, target, _) in enumerate(self._lookups):
+            for doc, rows in zip(documents, joined):
+                mapping = {row['_id']: self._load(target, row) for row in rows[i]}
+                self._assign(doc, prefix, mapping)
+        return documents
+
+    def _plan(self, model, documents: List[Document], path: str):
+        """Retourne (modèle cible, chemin du ref, reste du chemin, identifiants à charger)"""
+        prefix, ref, rest = resolve_ref(model._schema, path)
+        target = self._target(ref)
+        parts = prefix.split('.')
+
+        ids = set()
+        for doc in documents:
+            _collect_ids(_source(doc, parts[0]), parts[1:], ids)
+        return target, prefix, rest, ids
+
+    def _apply(self, documents: List[Document], prefix: str, rest: Optional[str],
+               mapping: Dict[Any, Document]) -> List[Document]:
+        """Affecte les documents chargés et retourne ceux à peupler ensuite"""
+        for doc in documents:
+            self._assign(doc, prefix, mapping)
+        if not rest:
+            return []
+        parts = prefix.split('.')
+        found = {}
+        for doc in documents:
+            _documents_at(doc._populated.get(parts[0]), parts[1:], found)
+        return list(found.values())
+
+    def _assign(self, doc: Document, prefix: str, mapping: Dict[Any, Document]) -> None:
+        parts = prefix.split('.')
+        source = _source(doc, parts[0])
+        if source is not None:
+            doc._populated[parts[0]] = _substitute(source, parts[1:], mapping)
+
+    def _trim(self) -> None:
+        """Oublie les documents les moins récemment utilisés au-delà de ``max_loaded`` (entre deux lots)"""
+        while len(self._loaded) > self.max_loaded:
+            self._loaded.popitem(last=False)
+
+    def _load(self, target, doc_data: Dict[str, Any]) -> Document:
+        key = (target._name, doc_data['_id'])
+        if self._loaded.get(key) is None:
+            self._loaded[key] = target._hydrate(doc_data)
+        self._loaded.move_to_end(key)
+        return self._loaded[key]
+
+    def _missing(self, target, ids: set) -> List[Any]:
+        """Identifiants de ``target`` qui ne sont ni chargés ni dans la session"""
+        session = current_session()
+        if session is not None:
+            # Réutilise les documents déjà présents dans la session
+            for doc_id in ids:
+                doc = session.get(target, doc_id)
+                if doc is not None:
+                    self._loaded[(target._name, doc_id)] = doc
+        return [doc_id for doc_id in ids if (target._name, doc_id) not in self._loaded]
+
+    def _resolved(self, target, ids: set, missing: List[Any]) -> Dict[Any, Document]:
+        # Les références introuvables ne sont pas redemandées au lot suivant
+        for doc_id in missing:
+            self._loaded.setdefault((target._name, doc_id), None)
+        for doc_id in ids:
+            self._loaded.move_to_end((target._name, doc_id))
+        return {doc_id: self._loaded[(target._name, doc_id)] for doc_id in ids}
+
+    def _fetch(self, target, ids: set) -> Dict[Any, Document]:
+        """Charge les documents manquants de ``target`` en une requête"""
+        missing = self._missing(target, ids)
+        if missing:
+            for doc_data in target._collection.find({'_id': {'$in': missing}}):
+                self._load(target, doc_data)
+        return self._resolved(target, ids, missing)
@@ -0,0 +1,290 @@
+"""Plans d'exécution, enregistrement des requêtes lentes et conseils d'index
+
+    print(Post.find({'author': user_id}).sort('-created_at').explain())
+
+    with pygoose.profiler.record(threshold_ms=50) as recorder:
+        run_workload()
+    for model_name, specs in recorder.suggest_indexes().items():
+        for spec in specs:
+            print(model_name, render_index(spec))
+
+Les requêtes sont regroupées par forme : les valeurs du filtre sont
+remplacées par '?', seuls les champs et opérateurs comptent.
+
+L'enregistrement est propre au contexte qui l'active (thread, tâche
+asyncio et les tâches qu'elle crée) : deux enregistreurs actifs dans des
+requêtes concurrentes ne se mélangent pas.
+"""
+
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import json
+import threading
+
+from .utils import index_keys
+
+# Seuil par défaut au-delà duquel une requête est enregistrée
+DEFAULT_THRESHOLD_MS = 100
+
+_EQUALITY_OPERATORS = {'$eq', '$in'}
+_RANGE_OPERATORS = {'$gt', '$gte', '$lt', '$lte', '$ne', '$nin', '$regex', '$exists'}
+
+_recorder: ContextVar = ContextVar('pygoose_recorder', default=None)
+
+
+class PlanSummary:
+    """Résumé d'un plan d'exécution MongoDB"""
+
+    def __init__(self, explain: Dict[str, Any]):
+        planner = explain.get('queryPlanner', {})
+        stages = list(_stages(planner.get('winningPlan', {})))
+        index_stage = next((stage for stage in stages if stage.get('stage') in ('IXSCAN', 'EXPRESS_IXSCAN')), None)
+        names = {stage.get('stage') for stage in stages}
+        stats = explain.get('executionStats', {})
+
+        self.stages = [stage.get('stage') for stage in stages]
+        self.index = index_stage.get('indexName') if index_stage else None
+        self.index_keys = index_stage.get('keyPattern') if index_stage else None
+        self.collscan = 'COLLSCAN' in names
+        self.in_memory_sort = bool(names & {'SORT', 'SORT_KEY_GENERATOR'})
+        self.keys_examined = stats.get('totalKeysExamined')
+        self.docs_examined = stats.get('totalDocsExamined')
+        self.returned = stats.get('nReturned')
+        self.execution_ms = stats.get('executionTimeMillis')
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'index': self.index,
+            'index_keys': self.index_keys,
+            'collscan': self.collscan,
+            'in_memory_sort': self.in_memory_sort,
+            'keys_examined': self.keys_examined,
+            'docs_examined': self.docs_examined,
+            'returned': self.returned,
+            'execution_ms': self.execution_ms,
+            'stages': self.stages,
+        }
+
+    def __repr__(self) -> str:
+        return f"PlanSummary({self.as_dict()})"
+
+
+def _stages(plan: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Étapes d'un plan, de la racine aux feuilles"""
+    if not plan:
+        return
+    # Moteur SBE (MongoDB 7+) : le plan classique est sous 'queryPlan'
+    plan = plan.get('queryPlan', plan)
+    yield plan
+    if 'inputStage' in plan:
+        yield from _stages(plan['inputStage'])
+    for child in plan.get('inputStages', []):
+        yield from _stages(child)
+
+
+def normalize_filter(filter_dict: Dict[str, Any]) -> Dict[str, Any]:
+    """Forme d'un filtre : les valeurs sont remplacées par '?'"""
+    shape = {}
+    for key, value in (filter_dict or {}).items():
+        if key in ('$and', '$or', '$nor'):
+            shape[key] = [normalize_filter(sub) for sub in value]
+        elif isinstance(value, dict) and value and all(op.startswith('$') for op in value):
+            shape[key] = {
+                op: normalize_filter(operand) if op == '$elemMatch' else '?'
+                for op, operand in value.items()
+            }
+        else:
+            shape[key] = '?'
+    return shape
+
+
+def query_shape(query) -> Dict[str, Any]:
+    """Forme d'une requête (filtre normalisé, tri, champs projetés)"""
+    projection = query._effective_projection()
+    return {
+        'filter': normalize_filter(query._filter),
+        'sort': [list(item) for item in query._sort_spec or []],
+        'projection': sorted(projection) if projection else None,
+    }
+
+
+def suggest_index(shape: Dict[str, Any]) -> List[Tuple[str, int]]:
+    """Index composé pour une forme de requête, selon la règle égalité, tri, plage"""
+    equality, ranges = [], []
+    for field, condition in shape['filter'].items():
+        if field.startswith('$'):
+            # $or et $and ne sont pas analysés
+            continue
+        if condition == '?' or set(condition) <= _EQUALITY_OPERATORS:
+            equality.append(field)
+        elif set(condition) & _RANGE_OPERATORS:
+            ranges.append(field)
+
+    keys: List[Tuple[str, int]] = [(field, 1) for field in equality]
+    seen = set(equality)
+    for field, direction in shape['sort']:
+        if field not in seen:
+            keys.append((field, direction))
+            seen.add(field)
+    keys.extend((field, 1) for field in ranges if field not in seen)
+    return keys
+
+
+def _covers(index: List[Tuple[str, int]], spec: List[Tuple[str, int]]) -> bool:
+    """Vrai si ``index`` commence par les champs de ``spec``"""
+    fields = [field for field, _ in index]
+    return fields[:len(spec)] == [field for field, _ in spec]
+
+
+def render_index(spec: List[Tuple[str, int]]) -> str:
+    """Déclaration à ajouter au schéma"""
+    return f"Schema.index({spec!r})"
+
+
+class RecordedQuery:
+    """Statistiques d'une forme de requête"""
+
+    def __init__(self, model, shape: Dict[str, Any], plan: Optional[PlanSummary]):
+        self.model = model
+        self.shape = shape
+        self.plan = plan
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    @property
+    def mean_ms(self) -> float:
+        return self.total_ms / self.count if self.count else 0.0
+
+    def __repr__(self) -> str:
+        return (f"RecordedQuery({self.model._name}, {self.shape}, count={self.count}, "
+                f"max_ms={self.max_ms:.1f}, collscan={bool(self.plan and self.plan.collscan)})")
+
+
+class QueryRecorder:
+    """Enregistre les formes de requêtes lentes ou sans index
+
+    Une requête est retenue si elle dure plus de ``threshold_ms`` ou si son
+    plan est un COLLSCAN. Avec ``explain=True`` chaque nouvelle forme est
+    expliquée une fois (verbosité 'queryPlanner', sans exécution).
+    """
+
+    def __init__(self, threshold_ms: float = DEFAULT_THRESHOLD_MS, explain: bool = True):
+        self.threshold_ms = threshold_ms
+        self.explain = explain
+        self._entries: Dict[Tuple[str, str], RecordedQuery] = {}
+        self._plans: Dict[Tuple[str, str], Optional[PlanSummary]] = {}
+        self._lock = threading.Lock()
+        self._tokens = []
+
+    def __enter__(self) -> 'QueryRecorder':
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.stop()
+
+    def start(self) -> 'QueryRecorder':
+        """Active l'enregistrement dans le contexte courant"""
+        self._tokens.append(_recorder.set(self))
+        return self
+
+    def stop(self) -> None:
+        if not self._tokens:
+            return
+        token = self._tokens.pop()
+        try:
+            _recorder.reset(token)
+        except ValueError:
+            # Arrêté depuis un autre contexte que celui de start()
+            if _recorder.get() is self:
+                _recorder.set(None)
+
+    def _key(self, query) -> Tuple[Tuple[str, str], Dict[str, Any]]:
+        shape = query_shape(query)
+        return (query._model._name, json.dumps(shape, sort_keys=True, default=str)), shape
+
+    def observe(self, query, seconds: float) -> None:
+        """Prend en compte une exécution de ``query`` qui a duré ``seconds``"""
+        key, shape = self._key(query)
+        if self._needs_plan(key):
+            try:
+                plan = query.explain(verbosity='queryPlanner')
+            except Exception:
+                # Droits insuffisants ou explain non supporté : pas de plan
+                plan = None
+            self._set_plan(key, plan)
+        self._add(key, shape, query._model, seconds)
+
+    async def aobserve(self, query, seconds: float) -> None:
+        """Comme :meth:`observe`, pour une requête asyncio"""
+        key, shape = self._key(query)
+        if self._needs_plan(key):
+            try:
+                plan = await query.explain(verbosity='queryPlanner')
+            except Exception:
+                plan = None
+            self._set_plan(key, plan)
+        self._add(key, shape, query._model, seconds)
+
+    def _needs_plan(self, key: Tuple[str, str]) -> bool:
+        if not self.explain:
+            return False
+        with self._lock:
+            return key not in self._plans
+
+    def _set_plan(self, key: Tuple[str, str], plan: Optional[PlanSummary]) -> None:
+        # explain est appelé hors verrou : deux threads peuvent expliquer la même forme
+        with self._lock:
+            self._plans.setdefault(key, plan)
+
+    def _add(self, key: Tuple[str, str], shape: Dict[str, Any], model, seconds: float) -> None:
+        elapsed_ms = seconds * 1000
+        with self._lock:
+            plan = self._plans.get(key)
+            if elapsed_ms < self.threshold_ms and not (plan and plan.collscan):
+                return
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = RecordedQuery(model, shape, plan)
+            entry.count += 1
+            entry.total_ms += elapsed_ms
+            entry.max_ms = max(entry.max_ms, elapsed_ms)
+
+    def entries(self) -> List[RecordedQuery]:
+        """Formes enregistrées, les plus coûteuses d'abord"""
+        with self._lock:
+            return sorted(self._entries.values(), key=lambda entry: entry.total_ms, reverse=True)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._plans.clear()
+
+    def suggest_indexes(self) -> Dict[str, List[List[Tuple[str, int]]]]:
+        """Index composés suggérés par modèle, hors index déjà déclarés dans le schéma"""
+        suggestions: Dict[str, List[List[Tuple[str, int]]]] = {}
+        for entry in self.entries():
+            spec = suggest_index(entry.shape)
+            if not spec:
+                continue
+            declared = [index_keys(fields) for fields, _ in entry.model._schema.indexes]
+            if any(_covers(index, spec) for index in declared):
+                continue
+            specs = suggestions.setdefault(entry.model._name, [])
+            if any(_covers(other, spec) for other in specs):
+                continue
+            # Un index plus long couvre aussi ceux dont il commence par les champs
+            specs[:] = [other for other in specs if not _covers(spec, other)]
+            specs.append(spec)
+        return suggestions
+
+
+def record(threshold_ms: float = DEFAULT_THRESHOLD_MS, explain: bool = True) -> QueryRecorder:
+    """Crée un enregistreur à utiliser avec ``with`` (ou ``start()``/``stop()``)"""
+    return QueryRecorder(threshold_ms, explain)
+
+
+def current_recorder() -> Optional[QueryRecorder]:
+    """Enregistreur actif dans le contexte courant, ou None"""
+    return _recorder.get()
@@ -1,7 +1,55 @@
-from typing import Dict, Any, List, Optional, Union
+from collections.abc import Mapping
+from typing import Dict, Any, Callable, Iterable, Iterator, List, Optional, Union
 from bson import ObjectId
 from pymongo.cursor import Cursor
+from bson.raw_bson import RawBSONDocument
 from .document import Document
+from .lazy import LazyData, raw_collection
+from .middleware import Operation, begin, count_documents, instrumented
+from .pagination import DEFAULT_PAGE_SIZE, Page, page_query, split_page
+from .populate import Populator, resolve_ref
+from .profiler import PlanSummary, current_recorder
+from .routing import read_preference
+from .utils import pluck
+
+import time
+
+# Taille de lot par défaut pour l'itération en flux
+DEFAULT_BATCH_SIZE = 1000
+
+
+def _getter(field: str) -> Callable[[Mapping], Any]:
+    """Lecture d'un champ (éventuellement pointé) d'un résultat brut"""
+    if '.' not in field:
+        return lambda row: row.get(field)
+    parts = field.split('.')
+    return lambda row: pluck(row, parts)
+
+
+def _lean_row(doc_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Dict brut d'un résultat de curseur"""
+    if isinstance(doc_data, LazyData):
+        return doc_data.copy()
+    return doc_data
+
+
+def _lean_value(value: Any) -> Any:
+    if isinstance(value, Document):
+        return lean_document(value)
+    if isinstance(value, list):
+        return [_lean_value(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _lean_value(item) for key, item in value.items()}
+    return value
+
+
+def lean_document(doc: Document) -> Dict[str, Any]:
+    """Dict brut d'un document, références peuplées comprises"""
+    data = doc.to_dict()
+    for key, value in doc._populated.items():
+        data[key] = _lean_value(value)
+    return data
+
 
 class Query:
     """Constructeur de requêtes MongoDB avec API fluide"""
@@ -15,6 +63,11 @@ class Query:
         self._limit_count = None
         self._skip_count = None
         self._populate_fields = []
+        self._lookup_fields = set()
+        self._lazy = False
+        self._shape: Optional[Callable[[Dict[str, Any]], Any]] = None
+        self._values_fields: Optional[List[str]] = None
+        self._read_preference = None
     
     def find(self, filter_dict: Dict[str, Any] = None) -> 'Query':
         """Ajoute un filtre de recherche"""
@@ -58,14 +111,113 @@ class Query:
         self._skip_count = count
         return self
     
-    def populate(self, field: str) -> 'Query':
-        """Marque un champ pour population"""
-        self._populate_fields.append(field)
+    def populate(self, field: str, lookup: bool = False) -> 'Query':
+        """Marque un ou plusieurs champs (séparés par des espaces) pour population
+        
+        Avec ``lookup=True`` la jointure est faite côté serveur par ``$lookup``.
+        """
+        for path in field.split():
+            self._populate_fields.append(path)
+            if lookup:
+                self._lookup_fields.add(path)
+        return self
+    
+    def lazy(self, enabled: bool = True) -> 'Query':
+        """Construit les documents depuis le BSON brut, décodé champ par champ à l'accès"""
+        self._lazy = enabled
         return self
     
-    def exec(self) -> List[Document]:
-        """Exécute la requête et retourne les documents"""
-        cursor = self._collection.find(self._filter, self._projection)
+    def lean(self) -> 'Query':
+        """Retourne des dicts bruts au lieu de documents (ni validation, ni session, ni cache)"""
+        self._shape = _lean_row
+        self._values_fields = None
+        return self
+    
+    def values(self, *fields: str) -> 'Query':
+        """Retourne un dict limité à ``fields`` par résultat, avec projection automatique"""
+        getters = [(field, _getter(field)) for field in fields]
+        self._shape = lambda row: {field: get(row) for field, get in getters}
+        self._values_fields = list(fields)
+        return self
+    
+    def values_list(self, *fields: str, flat: bool = False) -> 'Query':
+        """Retourne un tuple des valeurs de ``fields`` par résultat
+        
+        Avec ``flat=True`` et un seul champ, retourne directement les valeurs.
+        """
+        if flat and len(fields) != 1:
+            raise ValueError("flat=True n'est possible qu'avec un seul champ")
+        if flat:
+            self._shape = _getter(fields[0])
+        elif not any('.' in field for field in fields):
+            self._shape = lambda row: tuple(map(row.get, fields))
+        else:
+            getters = [_getter(field) for field in fields]
+            self._shape = lambda row: tuple(get(row) for get in getters)
+        self._values_fields = list(fields)
+        return self
+    
+    def read_from(self, mode: Any, max_staleness: Optional[int] = None,
+                  tags: Optional[List[Dict[str, str]]] = None) -> 'Query':
+        """Lit depuis les membres choisis : 'primary', 'secondaryPreferred', 'nearest'...
+        
+        ``max_staleness`` (secondes) écarte les secondaires trop en retard.
+        Voir :mod:`pygoose.routing`.
+        """
+        self._read_preference = read_preference(mode, max_staleness, tags)
+        return self
+    
+    def _read_collection(self):
+        """Collection à interroger, avec la préférence de lecture de la requête"""
+        if self._read_preference is None:
+            return self._collection
+        return self._collection.with_options(read_preference=self._read_preference)
+    
+    def _effective_projection(self) -> Optional[Dict[str, Any]]:
+        """Projection de la requête, déduite des champs demandés par values()"""
+        if self._values_fields is None:
+            if self._projection and self._populate_fields:
+                return self._keep_refs(self._projection)
+            return self._projection
+        # Les champs peuplés sont projetés en entier pour pouvoir être résolus
+        populated = {path.split('.')[0] for path in self._populate_fields}
+        keys = set()
+        for field in self._values_fields:
+            top = field.split('.')[0]
+            keys.add(top if top in populated else field)
+        projection = {
+            key: 1 for key in keys
+            if not any(key.startswith(other + '.') for other in keys)
+        }
+        if '_id' not in projection:
+            projection['_id'] = 0
+        return projection
+    
+    def _keep_refs(self, projection: Dict[str, Any]) -> Dict[str, Any]:
+        """Projection complétée des champs 'ref' à peupler
+        
+        Sans eux il n'y aurait rien à joindre ($in comme $lookup, placé après le $project).
+        """
+        refs = [resolve_ref(self._model._schema, path)[0] for path in self._populate_fields]
+        if any(value for field, value in projection.items() if field != '_id'):
+            kept = {field: value for field, value in projection.items()
+                    if not any(field.startswith(ref + '.') for ref in refs)}
+            for ref in refs:
+                if not any(ref == field or ref.startswith(field + '.') for field in kept):
+                    kept[ref] = 1
+            return kept
+        return {field: value for field, value in projection.items()
+                if not any(ref == field or ref.startswith(field + '.') for ref in refs)}
+    
+    def _cursor(self, batch_size: Optional[int] = None, stages: List[Dict[str, Any]] = None):
+        """Construit le curseur pymongo avec les options de la requête"""
+        collection = self._read_collection()
+        if self._lazy:
+            collection = raw_collection(collection)
+        if stages:
+            return self._aggregate_cursor(collection, stages, batch_size)
+        
+        cursor = collection.find(self._filter, self._effective_projection())
         
         if self._sort_spec:
             cursor = cursor.sort(self._sort_spec)
@@ -73,20 +225,184 @@ class Query:
             cursor = cursor.skip(self._skip_count)
         if self._limit_count:
             cursor = cursor.limit(self._limit_count)
+        if batch_size:
+            cursor = cursor.batch_size(batch_size)
+        
+        return cursor
+    
+    def _aggregate_cursor(self, collection, stages: List[Dict[str, Any]], batch_size: Optional[int] = None):
+        """Traduit la requête en pipeline d'agrégation suivie de ``stages``"""
+        pipeline = self._pipeline_stages()
+        pipeline.extend(stages)
         
-        documents = []
-        for doc_data in cursor:
-            doc = Document(self._model, doc_data, from_db=True)
-            # TODO: Implémenter la population
-            documents.append(doc)
+        options = {'batchSize': batch_size} if batch_size else {}
+        return collection.aggregate(pipeline, **options)
+    
+    def _pipeline_stages(self) -> List[Dict[str, Any]]:
+        """Étapes d'agrégation équivalentes au filtre, au tri, à la pagination et à la projection"""
+        pipeline = [{'$match': self._filter}]
+        if self._sort_spec:
+            pipeline.append({'$sort': dict(self._sort_spec)})
+        if self._skip_count:
+            pipeline.append({'$skip': self._skip_count})
+        if self._limit_count:
+            pipeline.append({'$limit': self._limit_count})
+        projection = self._effective_projection()
+        if projection:
+            pipeline.append({'$project': projection})
+        return pipeline
+    
+    def _explain_command(self) -> Dict[str, Any]:
+        """Commande find équivalente à la requête, pour explain"""
+        command = {'find': self._collection.name, 'filter': self._filter}
+        projection = self._effective_projection()
+        if projection:
+            command['projection'] = projection
+        if self._sort_spec:
+            command['sort'] = dict(self._sort_spec)
+        if self._skip_count:
+            command['skip'] = self._skip_count
+        if self._limit_count:
+            command['limit'] = self._limit_count
+        return command
+    
+    def explain(self, verbosity: str = 'executionStats') -> PlanSummary:
+        """Résumé du plan choisi par le serveur : index, clés et documents examinés, tri en mémoire
         
-        return documents
+        Avec la verbosité par défaut la requête est exécutée pour obtenir
+        les compteurs ; 'queryPlanner' ne fait que la planifier.
+        """
+        database = self._collection.database
+        options = {'read_preference': self._read_preference} if self._read_preference is not None else {}
+        return PlanSummary(database.command({'explain': self._explain_command(), 'verbosity': verbosity}, **options))
+    
+    def _row(self, doc_data: Any) -> Dict[str, Any]:
+        """Données brutes d'un résultat, enveloppées sans décodage en mode lazy"""
+        if isinstance(doc_data, RawBSONDocument):
+            return LazyData(doc_data.raw, self._collection.codec_options)
+        return doc_data
+    
+    def _batches(self, batch_size: Optional[int] = None, stages: List[Dict[str, Any]] = None,
+                 convert: Optional[Callable[[List[Dict[str, Any]]], List[Any]]] = None) -> Iterator[List[Any]]:
+        """Itère sur les documents bruts par lots de ``batch_size`` (un seul lot si None)
+        
+        ``convert`` transforme chaque lot (documents, population) avant qu'il
+        soit rendu, pour que ce temps compte dans l'opération en cours.
+        """
+        recorder = current_recorder()
+        # Itération directe (hors exec()) : l'opération ne couvre que le temps passé ici
+        operation = begin(self._model, 'find')
+        if operation is not None:
+            operation.resume()
+        # Seul le temps passé dans le curseur est mesuré, pas celui de l'appelant
+        elapsed = 0.0
+        started = time.perf_counter()
+        cursor = self._cursor(batch_size, stages)
+        try:
+            batch = []
+            for doc_data in cursor:
+                batch.append(self._row(doc_data))
+                if batch_size and len(batch) >= batch_size:
+                    elapsed += time.perf_counter() - started
+                    # None pendant que l'appelant a la main : son temps n'est pas compté
+                    started = None
+                    yield from self._hand_over(convert(batch) if convert else batch, operation)
+                    started = time.perf_counter()
+                    batch = []
+            if batch:
+                elapsed += time.perf_counter() - started
+                started = None
+                yield from self._hand_over(convert(batch) if convert else batch, operation)
+                started = time.perf_counter()
+        finally:
+            cursor.close()
+            if operation is not None:
+                operation.pause()
+                operation.finish()
+            if started is not None:
+                elapsed += time.perf_counter() - started
+            # Aussi quand l'itération est abandonnée avant la fin (close())
+            if recorder is not None:
+                recorder.observe(self, elapsed)
+    
+    @staticmethod
+    def _hand_over(batch: List[Dict[str, Any]], operation: Optional[Operation]) -> Iterator[List[Dict[str, Any]]]:
+        """Rend un lot à l'appelant, chronomètre de l'opération arrêté pendant ce temps"""
+        count_documents(len(batch))
+        if operation is None:
+            yield batch
+            return
+        operation.pause()
+        try:
+            yield batch
+        finally:
+            operation.resume()
+    
+    def _results(self, batch: List[Dict[str, Any]], partial: bool) -> Iterable[Any]:
+        """Résultats d'un lot brut : documents, ou valeurs brutes (lean, values)"""
+        if self._shape is None:
+            return (self._model._hydrate(doc_data, partial) for doc_data in batch)
+        return map(self._shape, batch)
+    
+    def _populated_results(self, documents: List[Document]) -> Iterable[Any]:
+        """Résultats d'un lot de documents peuplés"""
+        if self._shape is None:
+            return documents
+        return (self._shape(lean_document(doc)) for doc in documents)
+    
+    def stream(self, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[Any]:
+        """Itère sur les résultats au fil des lots du curseur, en mémoire bornée"""
+        partial = bool(self._effective_projection())
+        # Les références sont résolues lot par lot
+        populator = self._populator()
+        stages = populator.stages() if populator else None
+        
+        def convert(batch: List[Dict[str, Any]]) -> List[Any]:
+            if populator is None:
+                return list(self._results(batch, partial))
+            return list(self._populated_results(populator.hydrate(batch, partial)))
+        
+        for results in self._batches(batch_size, stages, convert):
+            yield from results
+    
+    def _populator(self) -> Optional[Populator]:
+        if not self._populate_fields:
+            return None
+        return Populator(self._model, self._populate_fields, self._lookup_fields)
+    
+    @instrumented('paginate')
+    def paginate_after(self, token: Optional[str] = None, size: int = DEFAULT_PAGE_SIZE) -> Page:
+        """Page de ``size`` résultats située après ``token`` (pagination par clé)
+        
+        ``token`` est le ``next_token`` de la page précédente (None pour la
+        première). Voir :mod:`pygoose.pagination`.
+        """
+        query, sort = page_query(self, token, size)
+        populator = query._populator()
+        stages = populator.stages() if populator else None
+        rows = [row for batch in query._batches(None, stages) for row in batch]
+        rows, next_token = split_page(rows, sort, size)
+        
+        partial = bool(query._effective_projection())
+        if populator is None:
+            return Page(list(query._results(rows, partial)), next_token)
+        return Page(list(query._populated_results(populator.hydrate(rows, partial))), next_token)
+    
+    def __iter__(self) -> Iterator[Document]:
+        return self.stream()
+    
+    @instrumented('find')
+    def exec(self) -> List[Any]:
+        """Exécute la requête et retourne les documents (ou les valeurs brutes)"""
+        return list(self.stream(batch_size=None))
     
+    @instrumented('find')
     def first(self) -> Optional[Document]:
         """Retourne le premier document ou None"""
         results = self.limit(1).exec()
         return results[0] if results else None
     
+    @instrumented('count')
     def count(self) -> int:
         """Compte les documents correspondants"""
-        return self._collection.count_documents(self._filter)
\ No newline at end of file
+        return self._read_collection().count_documents(self._filter)
\ No newline at end of file
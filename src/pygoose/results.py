@@ -0,0 +1,115 @@
+from typing import Any, Dict, List
+
+from .exceptions import BulkWriteError, DuplicateKeyError, PyMongooseError
+
+
+def write_error(details: Dict[str, Any]) -> PyMongooseError:
+    """Convertit une erreur d'écriture pymongo (writeErrors) en exception Pygoose"""
+    message = details.get('errmsg', "Erreur d'écriture")
+    if details.get('code') == 11000:
+        return DuplicateKeyError(message)
+    return PyMongooseError(message)
+
+
+def not_executed() -> PyMongooseError:
+    """Erreur des documents non envoyés après un échec en mode ordonné"""
+    return PyMongooseError("Non exécuté après une erreur (ordered=True)")
+
+
+class BulkSaveResult:
+    """Résultat de Model.bulk_save
+
+    ``errors`` associe l'index du document dans l'entrée à l'exception qui
+    l'a empêché d'être sauvegardé ; les autres documents sont bien écrits.
+    ``write_concern_errors`` liste les writeConcernErrors du serveur : les
+    écritures ont eu lieu sur le primaire sans l'acquittement demandé.
+    """
+
+    def __init__(self):
+        self.inserted_count = 0
+        self.updated_count = 0
+        self.unchanged_count = 0
+        self.errors: Dict[int, Exception] = {}
+        self.write_concern_errors: List[Dict[str, Any]] = []
+
+    @property
+    def saved_count(self) -> int:
+        return self.inserted_count + self.updated_count + self.unchanged_count
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors and not self.write_concern_errors
+
+    def raise_on_error(self) -> None:
+        """Lève BulkWriteError si au moins un document a échoué ou si l'acquittement a échoué"""
+        if self.errors:
+            raise BulkWriteError(f"{len(self.errors)} document(s) non sauvegardé(s)", self.errors)
+        if self.write_concern_errors:
+            raise BulkWriteError(f"Write concern non satisfait : "
+                                 f"{self.write_concern_errors[0].get('errmsg', '')}")
+
+    def __repr__(self) -> str:
+        return (f"BulkSaveResult(inserted={self.inserted_count}, updated={self.updated_count}, "
+                f"unchanged={self.unchanged_count}, errors={len(self.errors)}, "
+                f"write_concern_errors={len(self.write_concern_errors)})")
+
+
+class CreateManyResult:
+    """Résultat de Model.create_many
+
+    ``errors`` associe l'index de la donnée dans l'entrée à son erreur
+    (ValidationError ou erreur d'écriture). ``inserted_ids`` n'est rempli
+    que si ``collect_ids`` est vrai, pour garder une mémoire constante sur
+    les imports volumineux.
+    """
+
+    def __init__(self, collect_ids: bool = True):
+        self.inserted_count = 0
+        self.inserted_ids: List[Any] = [] if collect_ids else None
+        self.errors: Dict[int, Exception] = {}
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def raise_on_error(self) -> None:
+        """Lève BulkWriteError si au moins une donnée n'a pas été insérée"""
+        if self.errors:
+            raise BulkWriteError(f"{len(self.errors)} document(s) non inséré(s)", self.errors)
+
+    def __len__(self) -> int:
+        return self.inserted_count
+
+    def __repr__(self) -> str:
+        return f"CreateManyResult(inserted={self.inserted_count}, errors={len(self.errors)})"
+
+
+class IndexSyncResult:
+    """Résultat de la synchronisation des index d'un modèle
+
+    ``created`` et ``dropped`` listent les index créés et supprimés (ceux
+    qui le seraient en mode ``dry_run``). ``undeclared`` liste les index
+    présents en base mais absents du schéma, supprimés seulement avec
+    ``drop=True``. ``conflicts`` associe le nom d'un index déclaré à la
+    raison pour laquelle il ne peut pas être créé tel quel.
+    """
+
+    def __init__(self, model_name: str, dry_run: bool = False):
+        self.model_name = model_name
+        self.dry_run = dry_run
+        self.created: List[str] = []
+        self.dropped: List[str] = []
+        self.undeclared: List[str] = []
+        self.conflicts: Dict[str, str] = {}
+
+    @property
+    def ok(self) -> bool:
+        return not self.conflicts
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.created or self.dropped)
+
+    def __repr__(self) -> str:
+        return (f"IndexSyncResult({self.model_name}, created={self.created}, dropped={self.dropped}, "
+                f"undeclared={self.undeclared}, conflicts={len(self.conflicts)}, dry_run={self.dry_run})")
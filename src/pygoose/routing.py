@@ -0,0 +1,64 @@
+"""Routage des lectures vers les secondaires
+
+    report = Order.find({'status': 'paid'}).read_from('secondaryPreferred', max_staleness=120).exec()
+    Reports = Order.read_from('secondary')     # toutes les lectures de ce modèle
+    Schema({...}, {'read_from': {'mode': 'secondaryPreferred', 'max_staleness': 120}})
+
+Les écritures vont toujours au primaire. Pour relire ses propres écritures
+depuis un secondaire, les faire dans une session causale :
+
+    with pygoose.session(causal=True):
+        order.save()
+        Order.read_from('secondary').find_one({'_id': order._id})  # voit l'écriture
+
+MongoDB ne garantit cette lecture qu'avec une écriture et une lecture
+'majority' : la session causale les applique aux collections qui ne fixent
+pas d'autre niveau. Une collection configurée avec ``w=1`` ou une lecture
+'local' perd la garantie.
+"""
+
+from typing import Any, Dict, List, Optional
+
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+
+_MODES = {
+    'primary': Primary,
+    'primarypreferred': PrimaryPreferred,
+    'secondary': Secondary,
+    'secondarypreferred': SecondaryPreferred,
+    'nearest': Nearest,
+}
+
+
+def read_preference(mode: Any, max_staleness: Optional[int] = None,
+                    tags: Optional[List[Dict[str, str]]] = None):
+    """Préférence de lecture pymongo
+
+    ``mode`` s'écrit comme dans MongoDB ('secondaryPreferred') ou en
+    snake_case ; ``max_staleness`` est en secondes (90 au minimum côté
+    serveur). Une préférence pymongo est retournée telle quelle.
+    """
+    if not isinstance(mode, str):
+        return mode
+    mode_class = _MODES.get(mode.replace('_', '').lower())
+    if mode_class is None:
+        raise ValueError(f"Préférence de lecture inconnue '{mode}'")
+    if mode_class is Primary:
+        if max_staleness is not None or tags:
+            raise ValueError("Le primaire n'accepte ni max_staleness ni tags")
+        return Primary()
+    return mode_class(tag_sets=tags, max_staleness=-1 if max_staleness is None else max_staleness)
+
+
+def build_read_preference(option: Any):
+    """Préférence décrite par l'option de schéma 'read_from', ou None"""
+    if option is None:
+        return None
+    if isinstance(option, dict):
+        return read_preference(option['mode'], option.get('max_staleness'), option.get('tags'))
+    return read_preference(option)
+
+
+def preference_key(preference) -> Optional[str]:
+    """Clé comparable d'une préférence (les préférences pymongo ne sont pas hachables)"""
+    return None if preference is None else repr(preference.document)
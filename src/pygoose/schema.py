@@ -1,8 +1,10 @@
-from typing import Dict, Any, List, Callable, Union
+from typing import Dict, Any, List, Callable, Optional, Union
 from datetime import datetime
 from bson import ObjectId
 from .fields import Field
 from .exceptions import ValidationError
+from .middleware import timed
+from .validation import compile_schema
 
 class Schema:
     """Définit la structure et les règles de validation des documents"""
@@ -17,6 +19,7 @@ class Schema:
         self.methods = {}
         self.statics = {}
         self.plugins = {}
+        self._validator = None
         
         # Parser la définition du schéma
         self._parse_definition()
@@ -54,6 +57,7 @@ class Schema:
         elif isinstance(field_def, dict):
             if 'type' in field_def:
                 # Définition complète: {'type': str, 'required': True, ...}
+                field_def = dict(field_def)
                 field_type = field_def.pop('type')
                 if isinstance(field_type, str):
                     if field_type == 'datetime':
@@ -73,8 +77,45 @@ class Schema:
         else:
             return Field()
     
+    def path(self, path: str) -> Optional[Field]:
+        """Retourne le champ d'un chemin pointé ('meta.editor'), ou None"""
+        parts = path.split('.')
+        field = self.fields.get(parts[0])
+        for part in parts[1:]:
+            if field is None:
+                return None
+            nested = field.options.get('nested_schema')
+            item = field.options.get('array_type')
+            if nested is None and isinstance(item, dict) and 'type' not in item:
+                # Tableau de sous-documents: [{'name': str, ...}]
+                nested = item
+            if not isinstance(nested, dict) or part not in nested:
+                return None
+            field = self._parse_field(nested[part])
+        return field
+    
+    def compile(self) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+        """Compile le validateur spécialisé du schéma
+
+        Appelé automatiquement à la première validation ; à rappeler si
+        ``fields`` est modifié après coup.
+        """
+        self._validator = compile_schema(self)
+        return self._validator
+    
+    def __getstate__(self) -> Dict[str, Any]:
+        # Le validateur généré n'est pas sérialisable : il est recompilé à la demande
+        state = self.__dict__.copy()
+        state['_validator'] = None
+        return state
+    
     def validate(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """Valide un document selon le schéma"""
+        validator = self._validator or self.compile()
+        return timed('validate', validator, data)
+    
+    def _validate_interpreted(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Validation de référence champ par champ, sans compilation"""
         validated_data = {}
         
         for field_name, field in self.fields.items():
@@ -0,0 +1,214 @@
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+import functools
+import inspect
+
+from pymongo.read_concern import ReadConcern
+from pymongo.write_concern import WriteConcern
+
+_current: ContextVar = ContextVar('pygoose_session', default=None)
+
+# Opérations de collection qui acceptent une session pymongo
+_SESSION_METHODS = frozenset({
+    'find', 'find_one', 'count_documents', 'aggregate', 'distinct',
+    'insert_one', 'insert_many', 'update_one', 'update_many', 'replace_one',
+    'delete_one', 'delete_many', 'bulk_write',
+    'find_one_and_update', 'find_one_and_replace', 'find_one_and_delete',
+})
+
+
+class BoundCollection:
+    """Collection dont les opérations s'exécutent dans une session pymongo"""
+
+    __slots__ = ('_collection', '_session')
+
+    def __init__(self, collection, client_session):
+        self._collection = collection
+        self._session = client_session
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._collection, name)
+        if name in _SESSION_METHODS:
+            return functools.partial(attr, session=self._session)
+        return attr
+
+    def with_options(self, **options) -> 'BoundCollection':
+        return BoundCollection(self._collection.with_options(**options), self._session)
+
+
+def _majority(collection):
+    """Lectures et écritures 'majority', sauf niveau déjà fixé sur la collection
+
+    Sans elles, une lecture causale sur un secondaire peut ne pas voir une
+    écriture acquittée par le seul primaire.
+    """
+    options = {}
+    read_concern = getattr(collection, 'read_concern', None)
+    if read_concern is None or read_concern.level is None:
+        options['read_concern'] = ReadConcern('majority')
+    write_concern = getattr(collection, 'write_concern', None)
+    if write_concern is None or write_concern.is_server_default:
+        options['write_concern'] = WriteConcern('majority')
+    return collection.with_options(**options) if options else collection
+
+
+class Session:
+    """Unité de travail : carte d'identité des documents chargés dans une portée
+
+    Dans un bloc ``with pygoose.session():`` un même document (modèle, _id)
+    n'est chargé et construit qu'une fois ; les lectures suivantes le
+    servent depuis la mémoire.
+
+    Avec ``causal=True`` les opérations du bloc passent par une session
+    pymongo à cohérence causale (une par client) : une lecture sur un
+    secondaire voit les écritures faites avant elle dans le bloc. MongoDB ne
+    le garantit qu'avec des lectures et écritures 'majority' : c'est le
+    niveau appliqué aux collections du bloc qui n'en fixent pas d'autre.
+    Une session causale utilisée par des modèles asyncio se ferme avec
+    ``async with``.
+    """
+
+    def __init__(self, flush: bool = False, causal: bool = False):
+        self.flush_on_exit = flush
+        self.causal = causal
+        self._identity: Dict[Tuple[str, Any], Any] = {}
+        self._tokens = []
+        self._client_sessions: Dict[int, Tuple[Any, Any]] = {}
+        # Collections liées, par collection d'origine (gardée pour que son id reste valide)
+        self._bound: Dict[int, Tuple[Any, BoundCollection]] = {}
+
+    def __enter__(self) -> 'Session':
+        self._tokens.append(_current.set(self))
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        try:
+            if exc_type is None and self.flush_on_exit:
+                self.flush()
+        finally:
+            self._leave()
+
+    async def __aenter__(self) -> 'Session':
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        try:
+            if exc_type is None and self.flush_on_exit:
+                await self.flush_async()
+        finally:
+            if len(self._tokens) == 1:
+                # Sessions du client asyncio : end_session() est une coroutine
+                for _, client_session in self._client_sessions.values():
+                    result = client_session.end_session()
+                    if inspect.isawaitable(result):
+                        await result
+                self._client_sessions.clear()
+            self._leave()
+
+    def _leave(self) -> None:
+        _current.reset(self._tokens.pop())
+        if not self._tokens:
+            self.clear()
+            self._bound.clear()
+            client_sessions = [client_session for _, client_session in self._client_sessions.values()]
+            self._client_sessions.clear()
+            pending = False
+            for client_session in client_sessions:
+                result = client_session.end_session()
+                if inspect.isawaitable(result):
+                    # Session du client asyncio : elle ne peut être fermée que par 'async with'
+                    if inspect.iscoroutine(result):
+                        result.close()
+                    pending = True
+            if pending:
+                raise RuntimeError("Session causale avec modèles asyncio : utiliser 'async with'")
+
+    def bind(self, collection):
+        """``collection`` liée à la session pymongo causale de son client (créée au premier usage)"""
+        if collection is None:
+            return None
+        entry = self._bound.get(id(collection))
+        if entry is not None:
+            return entry[1]
+        client = collection.database.client
+        client_entry = self._client_sessions.get(id(client))
+        if client_entry is None:
+            client_entry = self._client_sessions[id(client)] = (client, client.start_session(causal_consistency=True))
+        bound = BoundCollection(_majority(collection), client_entry[1])
+        self._bound[id(collection)] = (collection, bound)
+        return bound
+
+    def get(self, model, doc_id: Any):
+        """Retourne le document déjà chargé pour (modèle, _id), ou None"""
+        try:
+            return self._identity.get((model._scope, doc_id))
+        except TypeError:
+            # _id non hachable
+            return None
+
+    def add(self, doc) -> None:
+        """Enregistre un document dans la carte d'identité"""
+        doc_id = doc._data.get('_id')
+        if doc_id is not None:
+            try:
+                self._identity.setdefault((doc._model._scope, doc_id), doc)
+            except TypeError:
+                pass
+
+    def discard(self, doc) -> None:
+        """Retire un document de la carte d'identité"""
+        try:
+            self._identity.pop((doc._model._scope, doc._data.get('_id')), None)
+        except TypeError:
+            pass
+
+    def dirty(self) -> List[Any]:
+        """Documents chargés et modifiés depuis leur dernière sauvegarde"""
+        return [doc for doc in self._identity.values() if doc.is_modified()]
+
+    def _dirty_by_model(self) -> Dict[Any, List[Any]]:
+        groups: Dict[Any, List[Any]] = {}
+        for doc in self.dirty():
+            groups.setdefault(doc._model, []).append(doc)
+        return groups
+
+    def flush(self) -> None:
+        """Sauvegarde les documents modifiés, un bulk_write groupé par modèle"""
+        for model, documents in self._dirty_by_model().items():
+            result = model.bulk_save(documents)
+            if inspect.isawaitable(result):
+                result.close()
+                raise RuntimeError("Session avec documents asyncio : utiliser 'async with'")
+            result.raise_on_error()
+
+    async def flush_async(self) -> None:
+        """Sauvegarde les documents modifiés (modèles asyncio compris)"""
+        for model, documents in self._dirty_by_model().items():
+            result = model.bulk_save(documents)
+            if inspect.isawaitable(result):
+                result = await result
+            result.raise_on_error()
+
+    def clear(self) -> None:
+        """Vide la carte d'identité"""
+        self._identity.clear()
+
+    def __len__(self) -> int:
+        return len(self._identity)
+
+
+def session(flush: bool = False, causal: bool = False) -> Session:
+    """Ouvre une session (carte d'identité) à utiliser avec ``with`` ou ``async with``
+
+    Avec ``flush=True`` les documents modifiés sont sauvegardés à la sortie
+    du bloc s'il se termine sans erreur. Avec ``causal=True`` les lectures
+    voient les écritures du bloc, même routées vers un secondaire (lectures
+    et écritures 'majority', voir :class:`Session`).
+    """
+    return Session(flush, causal)
+
+
+def current_session() -> Optional[Session]:
+    """Retourne la session active dans le contexte courant, ou None"""
+    return _current.get()
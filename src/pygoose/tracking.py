@@ -0,0 +1,484 @@
+"""Suivi fin des modifications d'un document
+
+Les dicts et listes d'un document sont remplacés à la lecture par des
+:class:`TrackedDict` / :class:`TrackedList` qui notent chaque modification
+sous forme de chemin pointé ('meta.views', 'items.3.qty'). La sauvegarde
+n'envoie alors que les opérateurs minimaux :
+
+    post.tags.append('python')      # {'$push': {'tags': {'$each': ['python']}}}
+    post.meta['views'] = 10         # {'$set': {'meta.views': 10}}
+    del post.meta['draft']          # {'$unset': {'meta.draft': ''}}
+    post.tags.remove('old')         # {'$pull': {'tags': {'$in': ['old']}}}
+
+Quand deux opérations ne peuvent pas être combinées dans une même mise à
+jour (un ``$push`` et un ``$pull`` sur le même tableau, une suppression par
+position...), le tableau ou le sous-document entier est remplacé par ``$set``.
+
+Une affectation, même ``post.meta['views'] += 1``, envoie la nouvelle valeur
+(``$set``) : deux processus qui incrémentent le même champ s'écrasent. Pour
+un compteur, utiliser ``post.inc('meta.views')`` ($inc atomique).
+"""
+
+from typing import Any, Dict, Iterator, List, Optional
+
+_PATH_STORES = ('_set', '_unset', '_push', '_pull')
+
+
+def _ancestors(path: str) -> Iterator[str]:
+    """'a.b.c' -> 'a', 'a.b'"""
+    index = path.find('.')
+    while index != -1:
+        yield path[:index]
+        index = path.find('.', index + 1)
+
+
+def _under(key: str, path: str) -> bool:
+    return key == path or key.startswith(path + '.')
+
+
+def get_path(data: Any, path: str) -> Any:
+    """Valeur au chemin pointé ``path`` (les index de tableau sont acceptés)"""
+    value = data
+    for part in path.split('.'):
+        if isinstance(value, list):
+            value = value[int(part)]
+        else:
+            value = value[part]
+    return value
+
+
+def apply_inc(data: Any, path: str, amount: Any) -> None:
+    """Reporte localement un $inc déjà envoyé, sans le noter comme modification"""
+    parts = path.split('.')
+    container = data
+    for part in parts[:-1]:
+        if isinstance(container, list):
+            container = list.__getitem__(container, int(part))
+            continue
+        child = dict.get(container, part) if isinstance(container, dict) else container.get(part)
+        if child is None:
+            # Comme $inc, crée les sous-documents manquants
+            child = {}
+            _store(container, part, child)
+        container = child
+    key = parts[-1]
+    if isinstance(container, list):
+        index = int(key)
+        list.__setitem__(container, index, list.__getitem__(container, index) + amount)
+    else:
+        current = dict.get(container, key) if isinstance(container, dict) else container.get(key)
+        _store(container, key, (current or 0) + amount)
+
+
+def _store(container: Any, key: str, value: Any) -> None:
+    if isinstance(container, dict):
+        dict.__setitem__(container, key, value)
+    else:
+        container[key] = value
+
+
+def plain(value: Any) -> Any:
+    """Copie profonde des dicts et listes, sans suivi"""
+    if isinstance(value, dict):
+        return {key: plain(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [plain(item) for item in value]
+    return value
+
+
+class ChangeSet:
+    """Modifications en attente d'un document, par chemin pointé
+
+    Garde aussi la valeur d'origine des champs modifiés, copiée à la
+    première écriture seulement (copie à l'écriture).
+    """
+
+    __slots__ = ('_data', 'originals', '_nested') + _PATH_STORES
+
+    def __init__(self, data):
+        self._data = data
+        self.originals: Dict[str, Any] = {}
+        self._set = set()
+        self._unset = set()
+        self._push: Dict[str, List[Any]] = {}
+        self._pull: Dict[str, List[Any]] = {}
+        # Vrai dès qu'un chemin imbriqué est noté
+        self._nested = False
+
+    def __bool__(self) -> bool:
+        return bool(self._set or self._unset or self._push or self._pull)
+
+    def snapshot(self, field: str, in_place: bool = False) -> None:
+        """Conserve la valeur d'origine de ``field`` avant sa première modification
+
+        ``in_place`` : la valeur va être modifiée sur place et doit être copiée.
+        """
+        if field not in self.originals:
+            value = self._data.get(field)
+            self.originals[field] = plain(value) if in_place else value
+
+    def paths(self) -> List[str]:
+        """Chemins modifiés"""
+        return [path for store in _PATH_STORES for path in getattr(self, store)]
+
+    def touches(self, path: str) -> bool:
+        """Vrai si ``path``, un de ses parents ou un de ses enfants est modifié"""
+        return any(_under(key, path) or _under(path, key) for key in self.paths())
+
+    def clear(self) -> None:
+        """Oublie les modifications (après une sauvegarde)"""
+        self.originals = {}
+        self._set.clear()
+        self._unset.clear()
+        self._push.clear()
+        self._pull.clear()
+        self._nested = False
+
+    def _target(self, path: str) -> Optional[str]:
+        """Chemin où noter une écriture sur ``path``
+
+        None si un parent est déjà remplacé en entier ; un parent portant un
+        opérateur de tableau s'il faut le remplacer en entier.
+        """
+        for ancestor in _ancestors(path):
+            if ancestor in self._set or ancestor in self._unset:
+                return None
+            if ancestor in self._push or ancestor in self._pull:
+                return ancestor
+        return path
+
+    def _discard_under(self, path: str) -> None:
+        for store in _PATH_STORES:
+            paths = getattr(self, store)
+            for key in [key for key in paths if _under(key, path)]:
+                if isinstance(paths, set):
+                    paths.discard(key)
+                else:
+                    del paths[key]
+
+    def _has_under(self, path: str) -> bool:
+        prefix = path + '.'
+        return any(key.startswith(prefix) for key in self.paths())
+
+    def _replace(self, path: str) -> None:
+        """Note un remplacement complet de ``path`` ($set de sa valeur courante)"""
+        self._discard_under(path)
+        self._set.add(path)
+
+    def set(self, path: str) -> None:
+        """Note l'affectation de ``path``"""
+        if '.' not in path:
+            # Champ de premier niveau : cas le plus courant
+            if path not in self._set:
+                if self._nested or self._unset or self._push or self._pull:
+                    self._discard_under(path)
+                self._set.add(path)
+            return
+        self._nested = True
+        target = self._target(path)
+        if target is not None:
+            self._replace(target)
+
+    def unset(self, path: str) -> None:
+        """Note la suppression de ``path``"""
+        self._nested = self._nested or '.' in path
+        target = self._target(path)
+        if target is None:
+            return
+        self._discard_under(target)
+        if target == path:
+            self._unset.add(path)
+        else:
+            self._set.add(target)
+
+    def _combine(self, path: str, conflicts: tuple) -> bool:
+        """Vrai si l'opération peut être combinée à celles en attente ; sinon remplace ce qu'il faut"""
+        self._nested = self._nested or '.' in path
+        target = self._target(path)
+        if target is None or path in self._set:
+            return False
+        if target != path:
+            self._replace(target)
+            return False
+        if any(path in getattr(self, other) for other in conflicts) or self._has_under(path):
+            self._replace(path)
+            return False
+        return True
+
+    def push(self, path: str, items: List[Any]) -> None:
+        """Note l'ajout d'éléments en fin de tableau"""
+        if self._combine(path, ('_pull', '_unset')):
+            self._push.setdefault(path, []).extend(items)
+
+    def pull(self, path: str, values: List[Any]) -> None:
+        """Note le retrait de toutes les occurrences de ``values`` d'un tableau"""
+        if self._combine(path, ('_push', '_unset')):
+            self._pull.setdefault(path, []).extend(values)
+
+    def update(self) -> Dict[str, Any]:
+        """Opérateurs de mise à jour MongoDB correspondant aux modifications"""
+        update: Dict[str, Any] = {}
+        sets, unsets = {}, {path: '' for path in self._unset}
+        for path in self._set:
+            try:
+                sets[path] = get_path(self._data, path)
+            except (KeyError, IndexError, ValueError, TypeError):
+                unsets[path] = ''
+        if sets:
+            update['$set'] = sets
+        if unsets:
+            update['$unset'] = unsets
+        if self._push:
+            update['$push'] = {path: {'$each': list(items)} for path, items in self._push.items()}
+        if self._pull:
+            update['$pull'] = {path: {'$in': list(values)} for path, values in self._pull.items()}
+        return update
+
+
+def track(value: Any, changes: ChangeSet, parent=None, key: Optional[str] = None) -> Any:
+    """Enveloppe un dict ou une liste pour en suivre les modifications"""
+    value_type = type(value)
+    if value_type is dict:
+        return TrackedDict(value, changes, parent, key)
+    if value_type is list:
+        return TrackedList(value, changes, parent, key)
+    return value
+
+
+def _own(value: Any) -> Any:
+    """Copie une valeur déjà suivie ailleurs avant de l'insérer"""
+    if isinstance(value, (TrackedDict, TrackedList)):
+        return plain(value)
+    return value
+
+
+def _detach(value: Any) -> None:
+    """Coupe le suivi d'une valeur retirée du document"""
+    if isinstance(value, (TrackedDict, TrackedList)):
+        value._changes = None
+
+
+class _Tracked:
+    """Position d'un conteneur suivi dans le document"""
+
+    __slots__ = ()
+
+    def _path(self) -> Optional[str]:
+        """Chemin pointé courant, ou None si le conteneur a été retiré du document"""
+        if self._changes is None:
+            return None
+        if self._parent is None:
+            return self._key
+        parent_path = self._parent._path()
+        if parent_path is None:
+            return None
+        if self._key is not None:
+            return f"{parent_path}.{self._key}"
+        # Élément de tableau : la position est recherchée à chaque écriture
+        for index, item in enumerate(self._parent):
+            if item is self:
+                return f"{parent_path}.{index}"
+        return None
+
+    def _begin(self) -> Optional[str]:
+        """Chemin courant, après copie de la valeur d'origine du champ"""
+        path = self._path()
+        if path is not None:
+            self._changes.snapshot(path.partition('.')[0], in_place=True)
+        return path
+
+    def _child(self, key: Optional[str], value: Any) -> Any:
+        if self._changes is None:
+            return value
+        return track(value, self._changes, self, key)
+
+
+class TrackedDict(_Tracked, dict):
+    """Sous-document dont les modifications sont notées dans un :class:`ChangeSet`"""
+
+    __slots__ = ('_changes', '_parent', '_key')
+
+    def __init__(self, value: dict, changes: ChangeSet, parent=None, key: Optional[str] = None):
+        dict.__init__(self, value)
+        self._changes = changes
+        self._parent = parent
+        self._key = key
+
+    def __getitem__(self, key: str) -> Any:
+        value = dict.__getitem__(self, key)
+        if type(value) is dict or type(value) is list:
+            value = self._child(key, value)
+            dict.__setitem__(self, key, value)
+        return value
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self[key] if key in self else default
+
+    def values(self) -> List[Any]:
+        return [self[key] for key in self]
+
+    def items(self) -> List[tuple]:
+        return [(key, self[key]) for key in self]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        path = self._begin()
+        _detach(dict.get(self, key))
+        dict.__setitem__(self, key, _own(value))
+        if path is not None:
+            self._changes.set(f"{path}.{key}")
+
+    def __delitem__(self, key: str) -> None:
+        path = self._begin()
+        _detach(dict.get(self, key))
+        dict.__delitem__(self, key)
+        if path is not None:
+            self._changes.unset(f"{path}.{key}")
+
+    def pop(self, key: str, *default: Any) -> Any:
+        if key not in self:
+            return dict.pop(self, key, *default)
+        value = self[key]
+        del self[key]
+        return value
+
+    def popitem(self) -> tuple:
+        key = next(reversed(self.keys()))
+        return key, self.pop(key)
+
+    def setdefault(self, key: str, default: Any = None) -> Any:
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def __ior__(self, other: Any) -> 'TrackedDict':
+        self.update(other)
+        return self
+
+    def clear(self) -> None:
+        path = self._begin()
+        for value in dict.values(self):
+            _detach(value)
+        dict.clear(self)
+        if path is not None:
+            self._changes.set(path)
+
+
+class TrackedList(_Tracked, list):
+    """Tableau dont les modifications sont notées dans un :class:`ChangeSet`"""
+
+    __slots__ = ('_changes', '_parent', '_key')
+
+    def __init__(self, value: list, changes: ChangeSet, parent=None, key: Optional[str] = None):
+        list.__init__(self, value)
+        self._changes = changes
+        self._parent = parent
+        self._key = key
+
+    def __getitem__(self, index: Any) -> Any:
+        value = list.__getitem__(self, index)
+        if isinstance(index, int) and (type(value) is dict or type(value) is list):
+            value = self._child(None, value)
+            list.__setitem__(self, index, value)
+        return value
+
+    def __iter__(self) -> Iterator[Any]:
+        for index, value in enumerate(list.__iter__(self)):
+            if type(value) is dict or type(value) is list:
+                value = self[index]
+            yield value
+
+    def _replaced(self, path: Optional[str]) -> None:
+        if path is not None:
+            self._changes.set(path)
+
+    def append(self, item: Any) -> None:
+        path = self._begin()
+        item = _own(item)
+        list.append(self, item)
+        if path is not None:
+            self._changes.push(path, [item])
+
+    def extend(self, items: Any) -> None:
+        items = [_own(item) for item in items]
+        path = self._begin()
+        list.extend(self, items)
+        if path is not None and items:
+            self._changes.push(path, items)
+
+    def __iadd__(self, items: Any) -> 'TrackedList':
+        self.extend(items)
+        return self
+
+    def insert(self, index: int, item: Any) -> None:
+        if index >= len(self):
+            self.append(item)
+            return
+        path = self._begin()
+        list.insert(self, index, _own(item))
+        self._replaced(path)
+
+    def remove(self, item: Any) -> None:
+        path = self._begin()
+        position = list.index(self, item)
+        _detach(list.__getitem__(self, position))
+        list.__delitem__(self, position)
+        if path is None:
+            return
+        if item in self:
+            # $pull retire toutes les occurrences
+            self._changes.set(path)
+        else:
+            self._changes.pull(path, [item])
+
+    def __setitem__(self, index: Any, value: Any) -> None:
+        path = self._begin()
+        if isinstance(index, int):
+            position = index + len(self) if index < 0 else index
+            _detach(list.__getitem__(self, position))
+            list.__setitem__(self, index, _own(value))
+            if path is not None:
+                self._changes.set(f"{path}.{position}")
+            return
+        list.__setitem__(self, index, value)
+        self._replaced(path)
+
+    def __delitem__(self, index: Any) -> None:
+        path = self._begin()
+        for item in (list.__getitem__(self, index) if isinstance(index, slice) else [list.__getitem__(self, index)]):
+            _detach(item)
+        list.__delitem__(self, index)
+        self._replaced(path)
+
+    def pop(self, index: int = -1) -> Any:
+        path = self._begin()
+        item = list.pop(self, index)
+        _detach(item)
+        self._replaced(path)
+        return item
+
+    def clear(self) -> None:
+        path = self._begin()
+        for item in list.__iter__(self):
+            _detach(item)
+        list.clear(self)
+        self._replaced(path)
+
+    def sort(self, *args: Any, **kwargs: Any) -> None:
+        path = self._begin()
+        list.sort(self, *args, **kwargs)
+        self._replaced(path)
+
+    def reverse(self) -> None:
+        path = self._begin()
+        list.reverse(self)
+        self._replaced(path)
+
+    def __imul__(self, count: int) -> 'TrackedList':
+        path = self._begin()
+        list.__imul__(self, count)
+        self._replaced(path)
+        return self
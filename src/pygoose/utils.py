@@ -0,0 +1,42 @@
+from collections.abc import Mapping
+from itertools import islice
+from typing import Any, Iterable, Iterator, List, Tuple
+
+
+def chunked(iterable: Iterable[Any], size: int) -> Iterator[Tuple[int, List[Any]]]:
+    """Découpe un itérable (liste ou générateur) en lots de ``size`` éléments
+
+    Produit des couples (index du premier élément, lot).
+    """
+    iterator = iter(iterable)
+    start = 0
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield start, chunk
+        start += len(chunk)
+
+
+def pluck(value: Any, parts: List[str]) -> Any:
+    """Valeur au chemin ``parts`` (None si absente), à travers les tableaux comme MongoDB"""
+    for i, part in enumerate(parts):
+        if isinstance(value, list):
+            if part.isdigit():
+                value = value[int(part)] if int(part) < len(value) else None
+            else:
+                return [pluck(item, parts[i:]) for item in value]
+        elif isinstance(value, Mapping):
+            value = value.get(part)
+        else:
+            return None
+    return value
+
+
+def index_keys(fields: Any) -> List[Tuple[str, int]]:
+    """Clés d'un index déclaré avec ``Schema.index`` (chaîne, liste ou dict)"""
+    if isinstance(fields, str):
+        return [(fields, 1)]
+    if isinstance(fields, Mapping):
+        return list(fields.items())
+    return [(field, 1) if isinstance(field, str) else tuple(field) for field in fields]
@@ -0,0 +1,216 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from .fields import Field
+from .exceptions import ValidationError
+
+import re
+
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
+
+def _check_email(value: Any) -> Any:
+    """Validation 'email' précompilée"""
+    if not EMAIL_PATTERN.match(str(value)):
+        raise ValidationError("Format email invalide")
+    return value
+
+
+def _constraints_checker(options: Dict[str, Any]) -> Optional[Callable[[Any], None]]:
+    """Construit la fonction de contraintes avec uniquement les règles présentes (None sans règle)"""
+    has_min, has_max = 'min' in options, 'max' in options
+    has_min_len, has_max_len = 'min_length' in options, 'max_length' in options
+    has_enum = 'enum' in options
+    if not (has_min or has_max or has_min_len or has_max_len or has_enum):
+        return None
+
+    min_value, max_value = options.get('min'), options.get('max')
+    min_length, max_length = options.get('min_length'), options.get('max_length')
+    enum = options.get('enum')
+
+    def check(value: Any) -> None:
+        if (has_min or has_max) and isinstance(value, (int, float)):
+            if has_min and value < min_value:
+                raise ValidationError(f"Valeur trop petite (min: {min_value})")
+            if has_max and value > max_value:
+                raise ValidationError(f"Valeur trop grande (max: {max_value})")
+        if (has_min_len or has_max_len) and isinstance(value, str):
+            if has_min_len and len(value) < min_length:
+                raise ValidationError(f"Chaîne trop courte (min: {min_length})")
+            if has_max_len and len(value) > max_length:
+                raise ValidationError(f"Chaîne trop longue (max: {max_length})")
+        if has_enum and value not in enum:
+            raise ValidationError(f"Valeur non autorisée. Valeurs possibles: {enum}")
+
+    return check
+
+
+def _custom_validator(field: Field) -> Callable[[Any], Any]:
+    """Retourne le validateur personnalisé effectif du champ, ou None"""
+    validator = field.validate
+    if not validator:
+        return None
+    if isinstance(validator, str):
+        # Seul 'email' est une validation intégrée, les autres noms sont ignorés
+        return _check_email if validator == 'email' else None
+    return validator if callable(validator) else None
+
+
+def _is_compilable(field: Field) -> bool:
+    """Indique si le champ suit la sémantique standard de Field.validate_value"""
+    if type(field).validate_value is not Field.validate_value:
+        return False
+    if type(field)._builtin_validation is not Field._builtin_validation:
+        return False
+    if type(field)._validate_constraints is not Field._validate_constraints:
+        return False
+    return field.field_type is None or isinstance(field.field_type, type)
+
+
+def _coerce(field_type: type, value: Any) -> Any:
+    """Conversion de type avec le message d'erreur de Field.validate_value"""
+    try:
+        return field_type(value)
+    except (ValueError, TypeError):
+        raise ValidationError(f"Type invalide, attendu {field_type.__name__}")
+
+
+def compile_field(field: Field) -> Callable[[Any], Any]:
+    """Compile un champ en fonction de validation spécialisée
+
+    Le résultat est équivalent à ``field.validate_value`` mais ne contient
+    que les vérifications réellement configurées sur le champ.
+    """
+    if not _is_compilable(field):
+        return field.validate_value
+
+    field_type = field.field_type
+    required = field.required
+    default = field.default
+    default_factory = default if callable(default) else None
+    custom = _custom_validator(field)
+    check = _constraints_checker(field.options)
+
+    def validate_value(value: Any) -> Any:
+        if value is None:
+            if required:
+                raise ValidationError("Champ requis")
+            return default_factory() if default_factory else default
+        if field_type is not None and not isinstance(value, field_type):
+            value = _coerce(field_type, value)
+        if custom is not None:
+            value = custom(value)
+        if check is not None:
+            check(value)
+        return value
+
+    return validate_value
+
+
+def _field_source(index: int, name: str, field: Field, namespace: Dict[str, Any]) -> list:
+    """Génère le code source de la validation d'un champ"""
+    key = repr(name)
+    lines = [f"    f = {key}", f"    v = get({key})"]
+
+    if not _is_compilable(field):
+        namespace[f'fv{index}'] = field.validate_value
+        lines.append(f"    out[{key}] = fv{index}(v)")
+        return lines
+
+    lines.append("    if v is None:")
+    if field.required:
+        lines.append("        raise ValidationError('Champ requis')")
+    elif callable(field.default):
+        namespace[f'd{index}'] = field.default
+        lines.append(f"        v = d{index}()")
+    elif field.default is not None:
+        namespace[f'd{index}'] = field.default
+        lines.append(f"        v = d{index}")
+    else:
+        lines.append("        pass")
+
+    body = []
+    if field.field_type is not None:
+        namespace[f't{index}'] = field.field_type
+        body.append(f"        if not isinstance(v, t{index}):")
+        body.append(f"            v = coerce(t{index}, v)")
+    custom = _custom_validator(field)
+    if custom is not None:
+        namespace[f'cv{index}'] = custom
+        body.append(f"        v = cv{index}(v)")
+    body.extend(_constraints_source(index, field.options, namespace))
+
+    if body:
+        lines.append("    else:")
+        lines.extend(body)
+    lines.append(f"    out[{key}] = v")
+    return lines
+
+
+def _constraints_source(index: int, options: Dict[str, Any], namespace: Dict[str, Any]) -> list:
+    """Génère en ligne les contrôles min/max, longueur et enum du champ"""
+    lines = []
+    numeric = [(key, op, label) for key, op, label in
+               (('min', '<', 'petite'), ('max', '>', 'grande')) if key in options]
+    if numeric:
+        lines.append("        if isinstance(v, (int, float)):")
+        for key, op, label in numeric:
+            namespace[f'{key}{index}'] = options[key]
+            lines.append(f"            if v {op} {key}{index}:")
+            lines.append(f"                raise ValidationError(f'Valeur trop {label} ({key}: {{{key}{index}}})')")
+    lengths = [(key, op, label, short) for key, op, label, short in
+               (('min_length', '<', 'courte', 'min'), ('max_length', '>', 'longue', 'max')) if key in options]
+    if lengths:
+        lines.append("        if isinstance(v, str):")
+        for key, op, label, short in lengths:
+            namespace[f'{key}{index}'] = options[key]
+            lines.append(f"            if len(v) {op} {key}{index}:")
+            lines.append(f"                raise ValidationError(f'Chaîne trop {label} ({short}: {{{key}{index}}})')")
+    if 'enum' in options:
+        namespace[f'enum{index}'] = options['enum']
+        lines.append(f"        if v not in enum{index}:")
+        lines.append(f"            raise ValidationError(f'Valeur non autorisée. Valeurs possibles: {{enum{index}}}')")
+    return lines
+
+
+def compile_schema(schema) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """Compile un schéma en une fonction de validation unique
+
+    Le code généré déroule la boucle sur les champs et n'inclut pour chaque
+    champ que les contrôles qu'il déclare : un champ sans contrainte se
+    résume à un ``dict.get`` et un ``isinstance``.
+    """
+    namespace = {
+        'ValidationError': ValidationError,
+        'coerce': _coerce,
+    }
+    lines = ["def validate(data):", "    get = data.get", "    out = {}", "    f = None", "    try:"]
+    body = []
+    for index, (name, field) in enumerate(schema.fields.items()):
+        body.extend(_field_source(index, name, field, namespace))
+    if not body:
+        body = ["    pass"]
+    lines.extend("    " + line for line in body)
+    lines.append("    except ValidationError as e:")
+    lines.append("        raise ValidationError(f\"Erreur dans le champ '{f}': {str(e)}\", f)")
+    if not schema.options.get('strict', True):
+        lines.append("    for key, value in data.items():")
+        lines.append("        if key not in out:")
+        lines.append("            out[key] = value")
+    lines.append("    return out")
+
+    exec(compile("\n".join(lines), f"<pygoose schema {id(schema):x}>", 'exec'), namespace)
+    return namespace['validate']
+
+
+def validate_chunk(schema, start: int, chunk: List[Dict[str, Any]]) -> Tuple[List[int], List[Dict[str, Any]], Dict[int, ValidationError]]:
+    """Valide un lot de données numérotées à partir de ``start``
+
+    Retourne (index d'origine des données valides, données validées, erreurs par index).
+    """
+    indexes, validated, errors = [], [], {}
+    for index, data in enumerate(chunk, start):
+        try:
+            validated.append(schema.validate(data))
+            indexes.append(index)
+        except ValidationError as e:
+            errors[index] = e
+    return indexes, validated, errors
@@ -0,0 +1,226 @@
+"""Collections et modèles factices pour les tests sans serveur MongoDB"""
+
+from types import SimpleNamespace
+from bson import ObjectId
+from bson.codec_options import DEFAULT_CODEC_OPTIONS
+from bson.raw_bson import RawBSONDocument
+import bson
+import operator
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError
+from src.pygoose.model import Model
+
+
+_COMPARISONS = {'$eq': operator.eq, '$gt': operator.gt, '$gte': operator.ge, '$lt': operator.lt, '$lte': operator.le}
+
+
+def _value(doc, path):
+    for part in path.split('.'):
+        if not isinstance(doc, dict):
+            return None
+        doc = doc.get(part)
+    return doc
+
+
+def matches(doc, filter_dict):
+    """Sous-ensemble des filtres MongoDB : égalité, $and, $or, $in, $gt, $gte, $lt, $lte"""
+    for key, condition in (filter_dict or {}).items():
+        if key == '$and':
+            if not all(matches(doc, sub) for sub in condition):
+                return False
+        elif key == '$or':
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+        elif isinstance(condition, dict) and condition and all(op.startswith('$') for op in condition):
+            value = _value(doc, key)
+            for op, operand in condition.items():
+                if op == '$in' and value not in operand:
+                    return False
+                if op in _COMPARISONS and (value is None or not _COMPARISONS[op](value, operand)):
+                    return False
+        elif _value(doc, key) != condition:
+            return False
+    return True
+
+
+class FakeCursor:
+    """Curseur minimal qui trace les documents consommés"""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.consumed = 0
+        self.options = {}
+        self.closed = False
+
+    def sort(self, spec):
+        self.options['sort'] = spec
+        for field, direction in reversed(spec):
+            self.docs = sorted(self.docs, key=lambda d: d[field], reverse=direction < 0)
+        return self
+
+    def skip(self, count):
+        self.docs = self.docs[count:]
+        return self
+
+    def limit(self, count):
+        self.docs = self.docs[:count]
+        return self
+
+    def batch_size(self, size):
+        self.options['batch_size'] = size
+        return self
+
+    def close(self):
+        self.closed = True
+
+    def __iter__(self):
+        for doc in self.docs:
+            self.consumed += 1
+            yield doc if isinstance(doc, RawBSONDocument) else dict(doc)
+
+
+class FakeCollection:
+    codec_options = DEFAULT_CODEC_OPTIONS
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.cursor = None
+
+    def with_options(self, codec_options):
+        return RawFakeCollection(self)
+
+    def find(self, filter_dict=None, projection=None):
+        self.queries = getattr(self, 'queries', 0) + 1
+        docs = [doc for doc in self.docs if matches(doc, filter_dict)]
+        self.cursor = FakeCursor(docs)
+        self.cursor.options['projection'] = projection
+        return self.cursor
+
+    def find_one(self, filter_dict=None):
+        return next(iter(self.find(filter_dict)), None)
+
+    def aggregate(self, pipeline, **options):
+        """Trace la pipeline ; seul un $match initial est appliqué"""
+        self.pipeline = pipeline
+        first = pipeline[0] if pipeline else {}
+        self.cursor = FakeCursor([doc for doc in self.docs if matches(doc, first.get('$match'))])
+        self.cursor.options = options
+        return self.cursor
+
+    def update_one(self, filter_dict, update):
+        self.writes = getattr(self, 'writes', 0) + 1
+        return SimpleNamespace(modified_count=1)
+
+    update_many = update_one
+
+    def delete_one(self, filter_dict):
+        self.writes = getattr(self, 'writes', 0) + 1
+        return SimpleNamespace(deleted_count=1)
+
+    delete_many = delete_one
+
+    def insert_many(self, documents, ordered=True):
+        for doc in documents:
+            doc.setdefault('_id', ObjectId())
+        self.bulk_write([InsertOne(doc) for doc in documents], ordered)
+        return SimpleNamespace(inserted_ids=[doc['_id'] for doc in documents])
+
+    def list_indexes(self):
+        return iter(getattr(self, 'indexes', [{'name': '_id_', 'key': {'_id': 1}}]))
+
+    def create_index(self, keys, **options):
+        self.indexes = list(self.list_indexes())
+        name = options.pop('name', None) or '_'.join(f"{field}_{direction}" for field, direction in keys)
+        self.indexes.append(dict(options, name=name, key=dict(keys)))
+        return name
+
+    def drop_index(self, name):
+        self.indexes = [info for info in self.list_indexes() if info['name'] != name]
+
+    def bulk_write(self, ops, ordered=True):
+        self.bulk_calls = getattr(self, 'bulk_calls', []) + [len(ops)]
+        errors = []
+        for index, op in enumerate(ops):
+            if isinstance(op, InsertOne):
+                if any(doc['_id'] == op._doc['_id'] for doc in self.docs):
+                    errors.append({'index': index, 'code': 11000, 'errmsg': 'E11000 duplicate key'})
+                    if ordered:
+                        break
+                    continue
+                self.docs.append(dict(op._doc))
+            else:
+                for doc in self.docs:
+                    if doc['_id'] == op._filter['_id']:
+                        doc.update(op._doc.get('$set', {}))
+                        for field, amount in op._doc.get('$inc', {}).items():
+                            doc[field] = doc.get(field, 0) + amount
+        # Acquittement simulé en échec (write concern non satisfait)
+        concern = getattr(self, 'write_concern_errors', [])
+        if errors or concern:
+            raise BulkWriteError({'writeErrors': errors, 'writeConcernErrors': concern})
+
+
+class RawFakeCollection:
+    """Vue d'une collection factice renvoyant des RawBSONDocument"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def find(self, filter_dict=None, projection=None):
+        cursor = self.collection.find(filter_dict, projection)
+        cursor.docs = [RawBSONDocument(bson.encode(doc)) for doc in cursor.docs]
+        return cursor
+
+    def find_one(self, filter_dict=None):
+        return next(iter(self.find(filter_dict)), None)
+
+
+class FakeModel(Model):
+    """Modèle branché sur une collection factice"""
+
+    def __init__(self, name, schema, collection):
+        self._fake_collection = collection
+        super().__init__(name, schema)
+
+    def _setup_collection(self):
+        self._collection = self._fake_collection
+
+
+class AsyncFakeCursor(FakeCursor):
+    """Curseur factice itérable avec ``async for``"""
+
+    def __aiter__(self):
+        return self._aiter()
+
+    async def _aiter(self):
+        for doc in self:
+            yield doc
+
+    async def close(self):
+        self.closed = True
+
+
+class AsyncFakeCollection(FakeCollection):
+    """Collection factice au format de l'API asyncio de pymongo"""
+
+    def find(self, filter_dict=None, projection=None):
+        cursor = super().find(filter_dict, projection)
+        self.cursor = AsyncFakeCursor(cursor.docs)
+        self.cursor.options = cursor.options
+        return self.cursor
+
+    async def find_one(self, filter_dict=None):
+        async for doc in self.find(filter_dict):
+            return doc
+        return None
+
+    async def insert_one(self, data):
+        data.setdefault('_id', len(self.docs) + 1)
+        self.docs.append(dict(data))
+        return SimpleNamespace(inserted_id=data['_id'])
+
+    async def update_one(self, filter_dict, update):
+        return FakeCollection.update_one(self, filter_dict, update)
+
+    async def bulk_write(self, ops, ordered=True):
+        return FakeCollection.bulk_write(self, ops, ordered)
@@ -0,0 +1,98 @@
+import asyncio
+import unittest
+from src.pygoose import Schema, connect, disconnect, model
+from src.pygoose.aio import async_model
+from src.pygoose.memory import reset
+from tests.fakes import FakeCollection, FakeModel
+
+
+class TestPipelineBuilder(unittest.TestCase):
+    def setUp(self):
+        self.collection = FakeCollection([{'_id': i, 'n': i, 'kind': 'odd' if i % 2 else 'even'} for i in range(10)])
+        model('PipelineAuthor', Schema({'name': str}))
+        schema = Schema({'n': int, 'kind': str, 'author': {'type': 'ObjectId', 'ref': 'PipelineAuthor'}})
+        self.model = FakeModel('PipelineItem', schema, self.collection)
+
+    def test_stages_use_schema_field_names(self):
+        pipeline = (self.model.pipeline()
+                    .match(self.model.find({'kind': 'odd'}).sort('-n').limit(3))
+                    .lookup('author')
+                    .unwind('author', preserve_empty=True)
+                    .group('author.name', total=('sum', 'n'), docs=('sum', 1), top={'$max': '$n'})
+                    .sort('-total', 'docs'))
+        self.assertEqual(pipeline.stages, [
+            {'$match': {'kind': 'odd'}},
+            {'$sort': {'n': -1}},
+            {'$limit': 3},
+            {'$lookup': {'from': 'pipelineauthors', 'localField': 'author', 'foreignField': '_id', 'as': 'author'}},
+            {'$unwind': {'path': '$author', 'preserveNullAndEmptyArrays': True}},
+            {'$group': {'_id': '$author.name', 'total': {'$sum': '$n'}, 'docs': {'$sum': 1}, 'top': {'$max': '$n'}}},
+            {'$sort': {'total': -1, 'docs': 1}},
+        ])
+        with self.assertRaises(ValueError):
+            self.model.pipeline().lookup('kind')
+
+    def test_stream_is_batched_and_passes_options(self):
+        pipeline = self.model.pipeline().match({'kind': 'even'}).allow_disk_use().hint([('kind', 1)])
+        stream = iter(pipeline.max_time_ms(500).batch_size(2))
+        self.assertEqual(next(stream), {'_id': 0, 'n': 0, 'kind': 'even'})
+        self.assertEqual(self.collection.cursor.consumed, 2)
+        self.assertEqual(self.collection.cursor.options,
+                         {'allowDiskUse': True, 'hint': {'kind': 1}, 'maxTimeMS': 500, 'batchSize': 2})
+        stream.close()
+        self.assertTrue(self.collection.cursor.closed)
+
+    def test_hydrate_and_first(self):
+        pipeline = self.model.pipeline().match({'kind': 'odd'}).hydrate()
+        docs = pipeline.exec()
+        self.assertEqual([doc.n for doc in docs], [1, 3, 5, 7, 9])
+        self.assertEqual(pipeline.first().n, 1)
+        self.assertEqual(self.collection.pipeline[-1], {'$limit': 1})
+        self.assertEqual(len(pipeline.stages), 1)
+
+
+class TestPipelineMemory(unittest.TestCase):
+    def setUp(self):
+        connect('memory:///reports')
+        self.Customer = model('PipelineCustomer', Schema({'name': str, 'country': str}))
+        self.Order = model('PipelineOrder', Schema({
+            'amount': int, 'status': str, 'customer': {'type': 'ObjectId', 'ref': 'PipelineCustomer'}}))
+        alice = self.Customer.create({'name': 'alice', 'country': 'fr'})
+        bob = self.Customer.create({'name': 'bob', 'country': 'de'})
+        self.Order.create_many([
+            {'amount': 10, 'status': 'paid', 'customer': alice._id},
+            {'amount': 30, 'status': 'paid', 'customer': alice._id},
+            {'amount': 25, 'status': 'paid', 'customer': bob._id},
+            {'amount': 99, 'status': 'open', 'customer': bob._id},
+        ])
+
+    def tearDown(self):
+        disconnect()
+        reset()
+
+    def report(self, order):
+        return (order.pipeline()
+                .match(order.find({'status': 'paid'}))
+                .lookup('customer')
+                .unwind('customer')
+                .group('customer.country', total=('sum', 'amount'))
+                .sort('-total'))
+
+    def test_report(self):
+        self.assertEqual(list(self.report(self.Order)), [{'_id': 'fr', 'total': 40}, {'_id': 'de', 'total': 25}])
+
+    def test_async_pipeline(self):
+        async_model('PipelineCustomer', self.Customer._schema, collection_name='pipelinecustomers')
+        Order = async_model('PipelineOrderAsync', self.Order._schema, collection_name='pipelineorders')
+
+        async def scenario():
+            rows = [row async for row in self.report(Order).batch_size(1)]
+            return rows, await self.report(Order).first()
+
+        rows, first = asyncio.run(scenario())
+        self.assertEqual(rows, [{'_id': 'fr', 'total': 40}, {'_id': 'de', 'total': 25}])
+        self.assertEqual(first, {'_id': 'fr', 'total': 40})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import unittest
+from src.pygoose import Schema, connect, disconnect, model
+from src.pygoose.cache import CacheBackend, MemoryCache, ids_in_filter
+from src.pygoose.memory import reset
+from tests.fakes import FakeCollection, FakeModel
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestMemoryCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = MemoryCache(ttl=None, max_entries=2)
+        cache.set(('c', 1), b'1')
+        cache.set(('c', 2), b'2')
+        cache.get(('c', 1))
+        cache.set(('c', 3), b'3')
+        self.assertIsNone(cache.get(('c', 2)))
+        self.assertEqual(cache.get(('c', 1)), b'1')
+        self.assertEqual(cache.stats.evictions, 1)
+
+    def test_incomplete_backend_is_rejected(self):
+        class GetOnly(CacheBackend):
+            def get(self, key):
+                return None
+
+        with self.assertRaises(TypeError):
+            GetOnly()
+
+    def test_ttl_expiration(self):
+        clock = FakeClock()
+        cache = MemoryCache(ttl=30, clock=clock)
+        cache.set(('c', 1), b'1')
+        clock.now = 29
+        self.assertEqual(cache.get(('c', 1)), b'1')
+        clock.now = 31
+        self.assertIsNone(cache.get(('c', 1)))
+        self.assertEqual(cache.stats.as_dict()['expirations'], 1)
+        self.assertEqual((cache.stats.hits, cache.stats.misses), (1, 1))
+
+    def test_clear_namespace(self):
+        cache = MemoryCache()
+        cache.set(('a', 1), b'1')
+        cache.set(('b', 1), b'1')
+        cache.clear('a')
+        self.assertEqual(len(cache), 1)
+
+    def test_ids_in_filter(self):
+        self.assertEqual(ids_in_filter({'_id': 1, 'status': 'a'}), [1])
+        self.assertEqual(ids_in_filter({'_id': {'$in': [1, 2]}}), [1, 2])
+        self.assertIsNone(ids_in_filter({'_id': {'$gt': 1}}))
+        self.assertIsNone(ids_in_filter({'status': 'a'}))
+
+
+class TestModelCache(unittest.TestCase):
+    def setUp(self):
+        self.collection = FakeCollection([{'_id': 1, 'name': 'alice'}, {'_id': 2, 'name': 'bob'}])
+        schema = Schema({'name': str}, {'cache': {'ttl': 30, 'max_entries': 10}})
+        self.model = FakeModel('CachedUser', schema, self.collection)
+
+    def test_read_through(self):
+        self.assertEqual(self.model.find_by_id(1).name, 'alice')
+        self.assertEqual(self.model.find_by_id(1).name, 'alice')
+        self.assertEqual(self.collection.queries, 1)
+        self.assertEqual(self.model.cache.stats.hits, 1)
+
+    def test_writes_invalidate(self):
+        doc = self.model.find_by_id(1)
+        self.model.find_by_id(2)
+        doc.name = 'alicia'
+        doc.save()
+        self.model.find_by_id(1)
+        self.model.find_by_id(2)
+        self.assertEqual(self.collection.queries, 3)
+        self.model.update_many({'name': 'x'}, {'$set': {'name': 'y'}})
+        self.assertEqual(len(self.model.cache), 0)
+
+
+
+class TestSharedCacheAcrossTenants(unittest.TestCase):
+    def setUp(self):
+        connect('memory:///cache')
+        self.cache = MemoryCache()
+        self.User = model('TenantCachedUser', Schema({'name': str}, {'cache': {'backend': self.cache}}))
+
+    def tearDown(self):
+        disconnect()
+        reset()
+
+    def test_views_do_not_share_entries(self):
+        self.User._collection.insert_one({'_id': 1, 'name': 'default'})
+        self.User.using('tenant_2')._collection.insert_one({'_id': 1, 'name': 'tenant'})
+        self.assertEqual(self.User.find_by_id(1).name, 'default')
+        self.assertEqual(self.User.using('tenant_2').find_by_id(1).name, 'tenant')
+
+        # Une invalidation d'une vue ne vide pas les entrées des autres
+        self.User.using('tenant_2').update_many({}, {'$set': {'name': 'renamed'}})
+        self.assertEqual(self.User.using('tenant_2').find_by_id(1).name, 'renamed')
+        self.assertIn(('tenantcachedusers', 1), self.cache._entries)
+
+
+if __name__ == '__main__':
+    unittest.main()
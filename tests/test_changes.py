@@ -0,0 +1,149 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from src.pygoose import Schema, connect, disconnect, model
+from src.pygoose.aio import async_model
+from src.pygoose.changes import ChangeDispatcher, FileTokenStore, MemoryTokenStore
+from src.pygoose.memory import reset
+
+# URI d'un replica set local (un nœud suffit) pour les tests sur un vrai serveur
+REPLICA_SET_URI = os.environ.get('PYGOOSE_TEST_REPLICA_SET')
+
+
+class ChangeStreamScenarios:
+    """Scénarios communs au moteur en mémoire et à un replica set local"""
+
+    uri = None
+
+    def setUp(self):
+        connect(self.uri)
+        self.Setting = model('ChangeSetting', Schema({'name': str, 'value': str, 'scope': str}, {'cache': True}))
+        self.Setting.delete_many({})
+        # Écritures d'un autre service : directement sur la collection, sans passer par le modèle
+        self.other_service = self.Setting._collection
+
+    def tearDown(self):
+        disconnect()
+
+    def test_watch_resumes_from_stored_token(self):
+        tokens = MemoryTokenStore()
+        stream = self.Setting.watch({'operationType': {'$in': ['insert', 'update']}}, full_document='updateLookup',
+                                    token_store=tokens, max_await_time_ms=50).open()
+        self.other_service.insert_one({'name': 'theme', 'value': 'dark'})
+        self.other_service.update_one({'name': 'theme'}, {'$set': {'value': 'light'}})
+        self.other_service.delete_one({'name': 'theme'})
+        self.other_service.insert_one({'name': 'lang', 'value': 'fr'})
+
+        first = stream.try_next()
+        self.assertEqual((first.operation, first.full_document['value']), ('insert', 'dark'))
+        self.assertEqual(first.document().name, 'theme')
+        stream.close()
+
+        # Redémarrage : la première modification est traitée, la suivante ne l'est pas encore
+        stream = self.Setting.watch({'operationType': {'$in': ['insert', 'update']}}, full_document='updateLookup',
+                                    token_store=tokens, max_await_time_ms=50)
+        update = stream.try_next()
+        self.assertEqual((update.operation, update.updated_fields), ('update', {'value': 'light'}))
+        self.assertIsNone(update.full_document)
+        self.assertEqual(stream.try_next().full_document['name'], 'lang')
+        self.assertIsNone(stream.try_next())
+        stream.close()
+
+    def test_dispatcher_keeps_views_and_caches_fresh(self):
+        self.other_service.insert_many([{'name': 'theme', 'value': 'dark', 'scope': 'ui'},
+                                        {'name': 'lang', 'value': 'fr', 'scope': 'ui'},
+                                        {'name': 'debug', 'value': 'off', 'scope': 'ops'}])
+        theme_id = self.Setting.find_one({'name': 'theme'})._id
+        self.Setting.find_by_id(theme_id)
+
+        dispatcher = ChangeDispatcher(MemoryTokenStore(), max_await_time_ms=50)
+        dispatcher.invalidate_cache(self.Setting)
+        ui = dispatcher.view(self.Setting, {'scope': 'ui'}, key='name')
+        dispatcher.poll()
+        self.assertEqual({name: row['value'] for name, row in ui.items()}, {'theme': 'dark', 'lang': 'fr'})
+
+        self.other_service.update_one({'_id': theme_id}, {'$set': {'value': 'light'}})
+        self.other_service.update_one({'name': 'lang'}, {'$set': {'scope': 'ops'}})
+        self.other_service.insert_one({'name': 'font', 'value': 'serif', 'scope': 'ui'})
+        self.assertEqual(dispatcher.poll(), 3)
+        self.assertEqual(ui['theme']['value'], 'light')
+        self.assertEqual(sorted(ui), ['font', 'theme'])
+        # Le cache ne sert plus l'ancienne version
+        self.assertEqual(self.Setting.find_by_id(theme_id).value, 'light')
+
+        self.other_service.delete_one({'name': 'font'})
+        dispatcher.poll()
+        self.assertEqual(list(ui), ['theme'])
+        dispatcher.stop()
+
+
+class TestMemoryChangeStreams(ChangeStreamScenarios, unittest.TestCase):
+    uri = 'memory:///changes'
+
+    def tearDown(self):
+        super().tearDown()
+        reset()
+
+    def test_file_token_store(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'tokens.json')
+            FileTokenStore(path).save('settings', {'_data': '00AB'})
+            self.assertEqual(FileTokenStore(path).load('settings'), {'_data': '00AB'})
+
+    def test_lost_history_restarts_from_now(self):
+        tokens = MemoryTokenStore()
+        tokens.save('pygoose:changesettings', {'_data': 'not-a-token'})
+        dispatcher = ChangeDispatcher(tokens, max_await_time_ms=10)
+        view = dispatcher.view(self.Setting, key='name')
+        self.other_service.insert_one({'name': 'theme', 'value': 'dark'})
+        dispatcher.poll()
+        self.assertEqual(list(view), ['theme'])
+        self.other_service.insert_one({'name': 'lang', 'value': 'fr'})
+        self.assertEqual(dispatcher.poll(), 1)
+        self.assertEqual(sorted(view), ['lang', 'theme'])
+
+    def test_drop_reloads_views(self):
+        dispatcher = ChangeDispatcher(max_await_time_ms=10)
+        view = dispatcher.view(self.Setting)
+        self.other_service.insert_one({'name': 'theme'})
+        dispatcher.poll()
+        self.assertEqual(len(view), 1)
+        self.other_service.drop()
+        dispatcher.poll()
+        self.assertEqual(len(view), 0)
+        self.other_service.insert_one({'name': 'again'})
+        dispatcher.poll()
+        self.assertEqual([row['name'] for row in view.values()], ['again'])
+
+    def test_dispatcher_separates_using_views(self):
+        tokens = MemoryTokenStore()
+        dispatcher = ChangeDispatcher(tokens, max_await_time_ms=10)
+        tenant_a = dispatcher.view(self.Setting.using('tenant_a'), key='name')
+        tenant_b = dispatcher.view(self.Setting.using('tenant_b'), key='name')
+        self.Setting.using('tenant_b')._collection.insert_one({'name': 'theme', 'value': 'dark'})
+        dispatcher.poll()
+        self.assertEqual((list(tenant_a), list(tenant_b)), ([], ['theme']))
+        dispatcher.stop()
+        self.assertEqual(sorted(tokens._tokens), ['pygoose:default:tenant_a/changesettings',
+                                                  'pygoose:default:tenant_b/changesettings'])
+
+    def test_async_watch(self):
+        Setting = async_model('ChangeSettingAsync', self.Setting._schema, collection_name='changesettings')
+
+        async def scenario():
+            async with Setting.watch(max_await_time_ms=10) as stream:
+                await Setting.create({'name': 'theme', 'value': 'dark'})
+                change = await stream.__anext__()
+                return change.operation, change.full_document['name'], await stream.try_next()
+
+        self.assertEqual(asyncio.run(scenario()), ('insert', 'theme', None))
+
+
+@unittest.skipUnless(REPLICA_SET_URI, "PYGOOSE_TEST_REPLICA_SET non défini (ex. mongodb://localhost:27017/test?replicaSet=rs0)")
+class TestReplicaSetChangeStreams(ChangeStreamScenarios, unittest.TestCase):
+    uri = REPLICA_SET_URI
+
+
+if __name__ == '__main__':
+    unittest.main()
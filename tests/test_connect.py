@@ -0,0 +1,87 @@
+import unittest
+from src.pygoose import Schema, connect, disconnect, get_database, model
+from src.pygoose.connection import _connection
+from tests.fakes import FakeCollection, FakeModel
+
+
+class TestLazyConnection(unittest.TestCase):
+    def tearDown(self):
+        disconnect()
+
+    def test_models_can_be_declared_before_connect(self):
+        Lazy = model('LazyBound', Schema({'name': str}))
+        connect('mongodb://localhost:27017/pygoose_lazy')
+        # Aucun client avant la première opération
+        self.assertIsNone(_connection._client)
+        self.assertEqual(Lazy._collection.full_name, 'pygoose_lazy.lazybounds')
+        self.assertIsNotNone(_connection._client)
+
+    def test_client_is_rebuilt_after_fork(self):
+        Forked = model('ForkedBound', Schema({'name': str}))
+        connect('mongodb://localhost:27017/pygoose_fork')
+        parent_client = Forked._collection.database.client
+        # Simule un processus fils : le PID enregistré n'est plus le nôtre
+        _connection._pid = -1
+        _connection._check_pid()
+        child_client = Forked._collection.database.client
+        self.assertIsNot(child_client, parent_client)
+        self.assertIs(Forked._collection.database.client, child_client)
+        parent_client.close()
+
+    def test_counters_are_not_inherited_by_children(self):
+        counted = FakeModel('ForkCounted', Schema({'views': int}, {'counters': {'interval': 0}}),
+                            FakeCollection([{'_id': 1, 'views': 0}]))
+        counted.inc({'_id': 1}, 'views', buffered=True)
+        counted.counters._after_fork()
+        self.assertEqual(len(counted.counters), 0)
+
+
+class TestNamedConnections(unittest.TestCase):
+    def setUp(self):
+        connect('mongodb://localhost:27017/app', {'maxPoolSize': 5})
+        connect('mongodb://localhost:27017/stats', {'maxPoolSize': 50, 'minPoolSize': 2}, alias='analytics')
+
+    def tearDown(self):
+        disconnect()
+
+    def test_models_bind_to_their_alias(self):
+        Event = model('AliasedEvent', Schema({'kind': str}), alias='analytics')
+        Account = model('AliasedAccount', Schema({'name': str}))
+        self.assertEqual(Event._collection.full_name, 'stats.aliasedevents')
+        self.assertEqual(Account._collection.full_name, 'app.aliasedaccounts')
+        pools = [m._collection.database.client.options.pool_options for m in (Account, Event)]
+        self.assertEqual([(pool.max_pool_size, pool.min_pool_size) for pool in pools], [(5, 0), (50, 2)])
+        self.assertIs(get_database('analytics'), get_database('analytics', 'stats'))
+
+    def test_using_routes_to_another_database(self):
+        schema = Schema({'name': str})
+        schema.static('tenant', lambda self: self._db_name)
+        Member = model('TenantMember', schema)
+        tenant = Member.using('tenant_42')
+        self.assertIs(Member.using('tenant_42'), tenant)
+        self.assertIs(tenant.using(), tenant)
+        self.assertEqual(tenant._collection.full_name, 'tenant_42.tenantmembers')
+        self.assertEqual(Member._collection.full_name, 'app.tenantmembers')
+        self.assertEqual((tenant.tenant(), Member.tenant()), ('tenant_42', None))
+        self.assertIs(Member.find()._collection, Member._collection)
+        self.assertEqual(tenant.using(alias='analytics')._collection.full_name, 'tenant_42.tenantmembers')
+
+    def test_disconnect_flushes_only_its_counters(self):
+        schema = Schema({'views': int}, {'counters': {'interval': 0}})
+        default = FakeModel('DefaultCounted', schema, FakeCollection([{'_id': 1, 'views': 0}]))
+        analytics = FakeModel('AnalyticsCounted', schema, FakeCollection([{'_id': 1, 'views': 0}]))
+        analytics._alias = 'analytics'
+        for counted in (default, analytics):
+            counted.inc({'_id': 1}, 'views', buffered=True)
+        disconnect('analytics')
+        self.assertEqual((len(default.counters), len(analytics.counters)), (1, 0))
+        default.counters.close()
+
+    def test_unknown_alias(self):
+        Orphan = model('OrphanModel', Schema({'name': str}), alias='missing')
+        with self.assertRaises(RuntimeError):
+            Orphan._collection
+
+
+if __name__ == '__main__':
+    unittest.main()
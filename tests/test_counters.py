@@ -0,0 +1,87 @@
+import threading
+import time
+import unittest
+from pymongo.errors import BulkWriteError
+from src.pygoose import Schema
+from tests.fakes import FakeCollection, FakeModel
+
+
+class TestCounters(unittest.TestCase):
+    def setUp(self):
+        self.collection = FakeCollection([{'_id': i, 'views': 0} for i in range(3)])
+        schema = Schema({'views': int, 'meta': dict}, {'counters': {'interval': 0, 'max_pending': 3}})
+        self.model = FakeModel('Counted', schema, self.collection)
+
+    def tearDown(self):
+        # Arrête le thread de fond sans renvoyer les incréments laissés par les tests d'échec
+        self.model.counters._pending.clear()
+        self.model.counters.close()
+
+    def test_document_inc_is_atomic_and_local(self):
+        doc = self.model.find_one({'_id': 1})
+        doc.inc('views').inc('meta.likes', 2)
+        self.assertEqual(self.collection.writes, 2)
+        self.assertEqual((doc.views, doc.meta), (1, {'likes': 2}))
+        self.assertFalse(doc.is_modified())
+
+    def test_buffered_increments_are_coalesced(self):
+        for _ in range(50):
+            self.model.inc({'_id': 0}, 'views', buffered=True)
+        self.model.inc({'_id': {'$in': [0, 1]}}, 'views', 5, buffered=True)
+        self.assertEqual(len(self.model.counters), 2)
+        self.assertEqual(self.model.counters.flush(), 2)
+        self.assertEqual(self.collection.bulk_calls, [2])
+        self.assertEqual([doc['views'] for doc in self.collection.docs], [55, 5, 0])
+
+    def wait_for(self, condition):
+        deadline = time.monotonic() + 2
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_size_threshold_wakes_background_flush(self):
+        calls = []
+        bulk_write = self.collection.bulk_write
+        self.collection.bulk_write = lambda ops, ordered=True: (calls.append(threading.current_thread()),
+                                                                bulk_write(ops, ordered))
+        for doc_id in range(3):
+            self.model.inc({'_id': doc_id}, 'views', buffered=True)
+        self.wait_for(lambda: self.collection.docs[2]['views'] == 1)
+        self.model.counters.close()
+        self.assertEqual(len(self.model.counters), 0)
+        self.assertEqual(self.collection.bulk_calls, [3])
+        self.assertIsNot(calls[0], threading.current_thread())
+
+    def test_permanent_write_errors_are_dropped(self):
+        def bulk_write(ops, ordered=True):
+            raise BulkWriteError({'writeErrors': [
+                {'index': 0, 'code': 14, 'errmsg': 'Cannot apply $inc to a value of non-numeric type'},
+                {'index': 1, 'code': 11602, 'errmsg': 'InterruptedDueToReplStateChange'}]})
+        self.collection.bulk_write = bulk_write
+        self.model.counters.add(0, 'views')
+        self.model.counters.add(1, 'views', 2)
+        with self.assertLogs('src.pygoose.counters', 'ERROR'), self.assertRaises(BulkWriteError):
+            self.model.counters.flush()
+        self.assertEqual(self.model.counters._pending, {(1, 'views'): 2})
+        self.assertEqual(self.model.counters.dropped, 1)
+
+    def test_failed_flush_keeps_increments(self):
+        self.model.inc({'_id': 0}, 'views', buffered=True)
+        self.collection.bulk_write = lambda ops, ordered=True: (_ for _ in ()).throw(ConnectionError())
+        with self.assertRaises(ConnectionError):
+            self.model.counters.flush()
+        self.assertEqual(len(self.model.counters), 1)
+
+    def test_background_flush(self):
+        self.model.counters.interval = 0.01
+        self.model.inc({'_id': 2}, 'views', 3, buffered=True)
+        self.wait_for(lambda: self.collection.docs[2]['views'] == 3)
+        self.model.counters.close()
+        self.assertEqual(self.collection.docs[2]['views'], 3)
+
+    def test_buffered_requires_id_filter(self):
+        with self.assertRaises(ValueError):
+            self.model.inc({'views': 0}, 'views', buffered=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
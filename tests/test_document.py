@@ -0,0 +1,97 @@
+import unittest
+from datetime import datetime
+import bson
+from src.pygoose import Schema, ValidationError
+from src.pygoose.document import Document, FieldDescriptor
+from src.pygoose.lazy import LazyData
+from tests.fakes import FakeCollection, FakeModel
+
+
+class TestDocumentClass(unittest.TestCase):
+    def setUp(self):
+        self.schema = Schema({
+            'name': {'type': str, 'max_length': 5},
+            'tags': {'type': list, 'default': list},
+        }, {'timestamps': True})
+        self.schema.method('shout', lambda doc: doc.name.upper())
+        self.collection = FakeCollection([{'_id': 1, 'name': 'bob'}])
+        self.model = FakeModel('Person', self.schema, self.collection)
+
+    def test_generated_class(self):
+        cls = self.model._document_class
+        self.assertTrue(issubclass(cls, Document))
+        self.assertEqual(cls.__name__, 'PersonDocument')
+        self.assertIsInstance(cls.__dict__['name'], FieldDescriptor)
+        doc = self.model.find_one({'_id': 1})
+        self.assertIsInstance(doc, cls)
+        self.assertFalse(hasattr(doc, '__dict__'))
+
+    def test_field_access(self):
+        doc = self.model.find_one({'_id': 1})
+        self.assertEqual((doc.name, doc._id, doc.shout()), ('bob', 1, 'BOB'))
+        self.assertEqual(doc.tags, [])
+        doc.name = 'alice'
+        self.assertTrue(doc.is_modified('name'))
+        with self.assertRaises(ValidationError):
+            doc.name = 'too long'
+        with self.assertRaises(AttributeError):
+            doc.unknown = 1
+
+    def test_fields_added_later_are_validated(self):
+        doc = self.model.find_one({'_id': 1})
+        self.schema.fields['nick'] = self.schema._parse_field({'type': str, 'max_length': 3})
+        doc.nick = 'bo'
+        self.assertEqual(doc.to_dict()['nick'], 'bo')
+        with self.assertRaises(ValidationError):
+            doc.nick = 'bobby'
+        with self.assertRaisesRegex(AttributeError, 'non défini dans le schéma'):
+            doc.unknown = 1
+
+    def test_updated_at_stamped_on_save(self):
+        doc = self.model.find_one({'_id': 1})
+        doc.name = 'alice'
+        self.assertNotIn('updated_at', doc.to_dict())
+        doc.save()
+        self.assertIn('updated_at', doc.to_dict())
+
+
+class TestLazyData(unittest.TestCase):
+    def setUp(self):
+        self.raw = bson.encode({'_id': 1, 'name': 'bob', 'tags': ['a', 'b'], 'meta': {'x': 1},
+                                'score': 2.5, 'when': datetime(2024, 1, 1)})
+
+    def test_decodes_on_access(self):
+        data = LazyData(self.raw)
+        self.assertEqual(data.decoded, 0)
+        self.assertEqual(data['name'], 'bob')
+        self.assertEqual(data.decoded, 1)
+        self.assertEqual(list(data), ['_id', 'name', 'tags', 'meta', 'score', 'when'])
+        self.assertEqual(data.copy(), bson.decode(self.raw))
+
+    def test_writes_and_deletes(self):
+        data = LazyData(self.raw)
+        data['tags'].append('c')
+        data['extra'] = True
+        del data['meta']
+        self.assertNotIn('meta', data)
+        self.assertEqual(data.copy()['tags'], ['a', 'b', 'c'])
+        self.assertEqual(len(data), 6)
+        self.assertEqual(data.raw, self.raw)
+
+    def test_lazy_query(self):
+        collection = FakeCollection([{'_id': i, 'name': f'n{i}', 'tags': ['t'] * 50} for i in range(3)])
+        model = FakeModel('LazyPerson', Schema({'name': str, 'tags': list}), collection)
+        docs = model.find().lazy().exec()
+        self.assertIsInstance(docs[0]._data, LazyData)
+        self.assertEqual([doc.name for doc in docs], ['n0', 'n1', 'n2'])
+        self.assertEqual(docs[0]._data.decoded, 1)
+
+        doc = model.find_one({'_id': 1}, lazy=True)
+        doc.name = 'renamed'
+        self.assertEqual(doc._original_data, {'name': 'n1'})
+        self.assertEqual(doc.to_dict()['name'], 'renamed')
+        self.assertIn('"renamed"', doc.to_json())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+from src.pygoose import Schema
+from src.pygoose.indexes import declared_indexes, sync_indexes
+from tests.fakes import FakeCollection, FakeModel
+
+
+class TestIndexSync(unittest.TestCase):
+    def setUp(self):
+        self.collection = FakeCollection([])
+        schema = Schema({
+            'email': {'type': str, 'unique': True},
+            'profile': {'handle': {'type': str, 'unique': True}},
+            'author': str,
+            'created_at': int,
+        })
+        schema.index([('author', 1), ('created_at', -1)])
+        schema.index({'title': 'text'})
+        self.model = FakeModel('Post', schema, self.collection)
+
+    def test_declaring_a_model_creates_no_index(self):
+        self.assertFalse(hasattr(self.collection, 'indexes'))
+
+    def test_unique_fields_are_declared(self):
+        specs = {spec.name: spec.options for spec in declared_indexes(self.model._schema)}
+        self.assertEqual(specs, {
+            'author_1_created_at_-1': {},
+            'title_text': {},
+            'email_1': {'unique': True},
+            'profile.handle_1': {'unique': True},
+        })
+
+    def test_only_missing_indexes_are_created(self):
+        self.collection.indexes = [
+            {'name': '_id_', 'key': {'_id': 1}},
+            {'name': 'email_1', 'key': {'email': 1}, 'unique': True},
+            {'name': 'title_text', 'key': {'_fts': 'text', '_ftsx': 1}, 'weights': {'title': 1}},
+        ]
+        result = self.model.sync_indexes()
+        self.assertEqual(result.created, ['author_1_created_at_-1', 'profile.handle_1'])
+        self.assertTrue(result.ok)
+        self.assertFalse(self.model.sync_indexes().changed)
+
+    def test_dry_run_reports_drops_and_conflicts(self):
+        self.collection.indexes = [
+            {'name': '_id_', 'key': {'_id': 1}},
+            {'name': 'email_1', 'key': {'email': 1}},
+            {'name': 'legacy_1', 'key': {'legacy': 1}},
+        ]
+        result = sync_indexes([self.model], dry_run=True, drop=True)['Post']
+        self.assertEqual(result.dropped, ['legacy_1'])
+        self.assertIn('unique', result.conflicts['email_1'])
+        self.assertEqual(len(result.created), 3)
+        # Rien n'a été modifié
+        self.assertEqual(len(self.collection.indexes), 3)
+
+    def test_undeclared_indexes_are_kept_without_drop(self):
+        self.collection.indexes = [{'name': '_id_', 'key': {'_id': 1}}, {'name': 'legacy_1', 'key': {'legacy': 1}}]
+        result = self.model.sync_indexes()
+        self.assertEqual((result.undeclared, result.dropped), (['legacy_1'], []))
+        result = self.model.sync_indexes(drop=True)
+        self.assertEqual(result.dropped, ['legacy_1'])
+
+    def test_background_sync(self):
+        thread = sync_indexes([self.model], background=True)
+        thread.join()
+        self.assertEqual(len(self.collection.indexes), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,194 @@
+import asyncio
+import unittest
+from datetime import datetime
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure, WriteError
+from src.pygoose import Schema, connect, disconnect, model, sync_indexes
+from src.pygoose.aio import async_model
+from src.pygoose.memory import MemoryClient, reset
+
+
+class TestMemoryCollection(unittest.TestCase):
+    def setUp(self):
+        self.collection = MemoryClient('memory://engine')['db']['items']
+        self.collection.insert_many([
+            {'_id': 1, 'name': 'a', 'qty': 5, 'tags': ['red', 'blue'], 'meta': {'size': 'S'}},
+            {'_id': 2, 'name': 'b', 'qty': 15, 'tags': ['blue'], 'meta': {'size': 'M'}},
+            {'_id': 3, 'name': 'c', 'qty': 25.0, 'tags': [], 'score': None},
+            {'_id': 4, 'name': 'd', 'qty': '7'},
+        ])
+
+    def tearDown(self):
+        reset('engine')
+
+    def ids(self, filter_dict, **kwargs):
+        return [doc['_id'] for doc in self.collection.find(filter_dict, **kwargs)]
+
+    def test_filter_operators(self):
+        self.assertEqual(self.ids({'qty': {'$gt': 5, '$lte': 25}}), [2, 3])
+        self.assertEqual(self.ids({'qty': {'$gte': '0'}}), [4])
+        self.assertEqual(self.ids({'tags': 'blue'}), [1, 2])
+        self.assertEqual(self.ids({'tags': {'$in': ['red', 'green']}}), [1])
+        self.assertEqual(self.ids({'meta.size': {'$exists': False}}), [3, 4])
+        self.assertEqual(self.ids({'score': None}), [1, 2, 3, 4])
+        self.assertEqual(self.ids({'$or': [{'name': 'a'}, {'qty': 15}]}), [1, 2])
+        self.assertEqual(self.ids({'tags': {'$size': 0}}), [3])
+        self.assertEqual(self.ids({'name': {'$regex': '^[bc]$'}}), [2, 3])
+        self.assertEqual(self.ids({'qty': {'$not': {'$gt': 10}}}), [1, 4])
+        with self.assertRaises(OperationFailure):
+            self.ids({'$text': {'$search': 'a'}})
+
+    def test_sort_skip_limit_projection(self):
+        docs = list(self.collection.find({}, {'name': 1, '_id': 0}).sort('name', -1).skip(1).limit(2))
+        self.assertEqual(docs, [{'name': 'c'}, {'name': 'b'}])
+        self.assertEqual(self.collection.find_one({'_id': 1}, {'tags': 0, 'meta': 0}),
+                         {'_id': 1, 'name': 'a', 'qty': 5})
+
+    def test_update_operators(self):
+        result = self.collection.update_one({'_id': 1}, {
+            '$inc': {'qty': 2}, '$push': {'tags': {'$each': ['green'], '$slice': -2}},
+            '$set': {'meta.color': 'red'}, '$unset': {'name': ''}})
+        self.assertEqual((result.matched_count, result.modified_count), (1, 1))
+        self.assertEqual(self.collection.find_one({'_id': 1}),
+                         {'_id': 1, 'qty': 7, 'tags': ['blue', 'green'], 'meta': {'size': 'S', 'color': 'red'}})
+        self.collection.update_many({'tags': 'blue'}, {'$pull': {'tags': 'blue'}, '$addToSet': {'tags': 'x'}})
+        self.assertEqual(self.ids({'tags': 'x'}), [1, 2])
+        result = self.collection.update_one({'name': 'z'}, {'$setOnInsert': {'qty': 0}}, upsert=True)
+        self.assertEqual(self.collection.find_one({'_id': result.upserted_id})['name'], 'z')
+        after = self.collection.find_one_and_update({'_id': 2}, {'$mul': {'qty': 2}},
+                                                    return_document=ReturnDocument.AFTER)
+        self.assertEqual(after['qty'], 30)
+        with self.assertRaises(ValueError):
+            self.collection.update_one({'_id': 2}, {'qty': 1})
+
+    def test_id_is_immutable(self):
+        for update in ({'$set': {'_id': 9}}, {'$inc': {'_id': 1}}, {'$unset': {'_id': ''}},
+                       {'$rename': {'name': '_id'}}):
+            with self.assertRaises(WriteError) as caught:
+                self.collection.update_one({'_id': 1}, update)
+            self.assertEqual(caught.exception.code, 66)
+        self.collection.update_one({'_id': 1}, {'$set': {'_id': 1, 'name': 'z'}})
+        self.assertEqual(self.collection.find_one({'_id': 1})['name'], 'z')
+        self.assertIsNone(self.collection.find_one({'_id': 9}))
+
+    def test_dates_are_stored_like_bson(self):
+        when = datetime(2024, 1, 1, 12, 0, 0, 123456)
+        self.collection.insert_one({'_id': 9, 'when': when})
+        self.assertEqual(self.collection.find_one({'_id': 9})['when'], datetime(2024, 1, 1, 12, 0, 0, 123000))
+
+    def test_indexes_plan_and_unique(self):
+        self.collection.create_index('qty')
+        self.collection.create_index([('name', 1)], unique=True)
+        plan = self.collection.find({'qty': {'$gte': 10, '$lt': 20}}).explain()
+        self.assertEqual(plan['queryPlanner']['winningPlan']['inputStage']['indexName'], 'qty_1')
+        self.assertEqual(plan['executionStats']['totalDocsExamined'], 1)
+        self.assertEqual(self.ids({'qty': {'$in': [5, 25]}}), [1, 3])
+
+        with self.assertRaises(DuplicateKeyError):
+            self.collection.insert_one({'name': 'a'})
+        with self.assertRaises(BulkWriteError) as caught:
+            self.collection.bulk_write([UpdateOne({'_id': 2}, {'$set': {'name': 'a'}}),
+                                        UpdateOne({'_id': 3}, {'$set': {'qty': 1}})], ordered=False)
+        self.assertEqual([error['index'] for error in caught.exception.details['writeErrors']], [0])
+        self.assertEqual(self.collection.find_one({'_id': 3})['qty'], 1)
+        # L'index suit les mises à jour
+        self.assertEqual(self.ids({'qty': {'$lt': 2}}), [3])
+        self.assertEqual([info['name'] for info in self.collection.list_indexes()], ['_id_', 'qty_1', 'name_1'])
+
+    def test_index_does_not_change_results(self):
+        self.collection.insert_many([{'_id': 5, 'qty': [1, 9]}, {'_id': 6, 'qty': [3]},
+                                     {'_id': 7, 'lines': [{'qty': 1}, {'qty': 9}]}])
+        filters = [{'qty': {'$gte': 2, '$lte': 8}}, {'qty': {'$gt': 4, '$lt': 6}}, {'qty': [1, 9]},
+                   {'qty': {'$in': [3, 9]}}, {'lines.qty': {'$gte': 2, '$lte': 8}}]
+        scans = [self.ids(filter_dict) for filter_dict in filters]
+        self.collection.create_index('qty')
+        self.collection.create_index('lines.qty')
+        self.assertEqual([self.ids(filter_dict) for filter_dict in filters], scans)
+        self.assertEqual(scans[0], [1, 5, 6])
+
+    def test_aggregate(self):
+        result = list(self.collection.aggregate([
+            {'$match': {'qty': {'$type': 'number'}}},
+            {'$unwind': '$tags'},
+            {'$group': {'_id': '$tags', 'total': {'$sum': '$qty'}, 'names': {'$push': '$name'}}},
+            {'$sort': {'_id': 1}},
+        ]))
+        self.assertEqual(result, [{'_id': 'blue', 'total': 20, 'names': ['a', 'b']},
+                                  {'_id': 'red', 'total': 5, 'names': ['a']}])
+
+
+class TestMemoryBackend(unittest.TestCase):
+    def setUp(self):
+        connect('memory:///shop')
+        schema = Schema({'sku': {'type': str, 'unique': True}, 'price': int, 'category': str})
+        schema.index('price')
+        self.Product = model('MemoryProduct', schema)
+        self.Product.sync_indexes()
+
+    def tearDown(self):
+        disconnect()
+        reset()
+
+    def test_models_run_against_the_engine(self):
+        result = self.Product.create_many([{'sku': f'p{i}', 'price': i * 10, 'category': 'toy' if i % 2 else 'book'}
+                                           for i in range(20)] + [{'sku': 'p1', 'price': 1}])
+        self.assertEqual((result.inserted_count, list(result.errors)), (20, [20]))
+        cheap = self.Product.find({'price': {'$lt': 40}}).sort({'price': -1}).exec()
+        self.assertEqual([doc.sku for doc in cheap], ['p3', 'p2', 'p1', 'p0'])
+        self.assertEqual(self.Product.find({'price': {'$lt': 40}}).explain().index, 'price_1')
+
+        doc = self.Product.find_one({'sku': 'p3'})
+        doc.price = 999
+        doc.save()
+        self.assertEqual(self.Product.find_one({'price': 999}).sku, 'p3')
+        self.assertEqual(self.Product.update_many({'category': 'book'}, {'$inc': {'price': 1}}), 10)
+        self.assertEqual(self.Product.count({'category': 'book', 'price': {'$gt': 100}}), 5)
+        self.assertEqual(self.Product.aggregate([{'$group': {'_id': '$category', 'n': {'$sum': 1}}},
+                                                 {'$sort': {'_id': 1}}]),
+                         [{'_id': 'book', 'n': 10}, {'_id': 'toy', 'n': 10}])
+        self.assertEqual(self.Product.delete_many({'category': 'toy'}), 10)
+        self.assertEqual(self.Product.count(), 10)
+
+    def test_paginate_after_with_null_sort_values(self):
+        self.Product.create_many([{'sku': f'p{i}', 'price': price} for i, price in enumerate([None, None, 1, 2, 3])])
+        self.Product._collection.insert_one({'sku': 'missing'})
+        for sort in ('price', '-price'):
+            token, skus = None, []
+            while True:
+                page = self.Product.find().sort(sort).paginate_after(token, 2)
+                skus += [doc.sku for doc in page]
+                if not page.has_more:
+                    break
+                token = page.next_token
+            expected = [doc.sku for doc in self.Product.find().sort({sort.lstrip('-'): -1 if sort[0] == '-' else 1,
+                                                                     '_id': -1 if sort[0] == '-' else 1})]
+            self.assertEqual(skus, expected)
+            self.assertEqual(len(skus), 6)
+
+    def test_sync_indexes_is_idempotent(self):
+        result = self.Product.sync_indexes()
+        self.assertEqual((result.created, result.conflicts), ([], {}))
+
+    def test_sync_indexes_covers_using_views(self):
+        tenant = self.Product.using('tenant_42')
+        results = sync_indexes([self.Product], databases=['tenant_7'])
+        self.assertEqual(sorted(results), ['MemoryProduct', 'MemoryProduct@default/tenant_42',
+                                           'MemoryProduct@default/tenant_7'])
+        tenant.create({'sku': 'p1'})
+        with self.assertRaises(DuplicateKeyError):
+            tenant._collection.insert_one({'sku': 'p1'})
+        self.assertEqual(len(list(self.Product.using('tenant_7')._collection.list_indexes())), 3)
+
+    def test_async_models_share_the_data(self):
+        Async = async_model('MemoryProductAsync', self.Product._schema, collection_name='memoryproducts')
+
+        async def scenario():
+            await Async.create({'sku': 'async', 'price': 5, 'category': 'toy'})
+            return [doc.sku async for doc in Async.find({'price': {'$lte': 5}})]
+
+        self.assertEqual(asyncio.run(scenario()), ['async'])
+        self.assertEqual(self.Product.find_one({'sku': 'async'}).price, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+from types import SimpleNamespace
+from src.pygoose import Schema
+from src.pygoose.middleware import Histogram, PrometheusExporter, UNATTRIBUTED, _network, instrument
+from tests.fakes import FakeCollection, FakeModel
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        self.collection = FakeCollection([{'_id': i, 'title': f"post {i}"} for i in range(5)])
+        schema = Schema({'title': str})
+        schema.pre('save', lambda doc: None)
+        self.model = FakeModel('Post', schema, self.collection)
+        self.instrumentation = instrument()
+
+    def tearDown(self):
+        self.instrumentation.stop()
+
+    def test_records_operations_and_phases(self):
+        docs = self.model.find({}).exec()
+        self.assertEqual(len(docs), 5)
+        metrics = self.instrumentation.metrics
+        self.assertEqual(metrics.histogram('Post', 'find').count, 1)
+        self.assertEqual(metrics.histogram('Post', 'find', 'hydrate').count, 1)
+        self.assertEqual(metrics.documents[('Post', 'find')], 5)
+
+        docs[0].title = 'edited'
+        docs[0].save()
+        self.assertEqual(metrics.histogram('Post', 'save').count, 1)
+        self.assertIsNotNone(metrics.histogram('Post', 'save', 'hooks'))
+
+        self.model.create_many([{'title': 'new'}])
+        self.assertIsNotNone(metrics.histogram('Post', 'create_many', 'validate'))
+        self.assertEqual(metrics.documents[('Post', 'create_many')], 1)
+
+    def test_prefetched_validation_is_attributed(self):
+        self.model.create_many(({'title': f"new {i}"} for i in range(6)), chunk_size=2, pipeline=True)
+        metrics = self.instrumentation.metrics
+        self.assertEqual(metrics.histogram('Post', 'create_many').count, 1)
+        self.assertEqual(metrics.histogram('Post', 'create_many', 'validate').count, 1)
+        self.assertEqual(metrics.documents[('Post', 'create_many')], 6)
+
+    def test_nested_calls_count_once(self):
+        self.model.find_one({'_id': 1})
+        metrics = self.instrumentation.metrics
+        self.assertEqual(metrics.histogram('Post', 'find_one').count, 1)
+        self.assertIsNone(metrics.histogram('Post', 'find'))
+
+    def test_iteration_is_an_operation(self):
+        titles = [doc.title for doc in self.model.find({})]
+        self.assertEqual(len(titles), 5)
+        self.assertEqual(self.instrumentation.metrics.histogram('Post', 'find').count, 1)
+        # Les documents sont construits dans l'opération, pas pendant que l'appelant itère
+        self.assertEqual(self.instrumentation.metrics.histogram('Post', 'find', 'hydrate').count, 1)
+
+    def test_network_time_attributed(self):
+        event = SimpleNamespace(duration_micros=1500, command_name='find')
+        _network(event, {'ok': 1})
+        metrics = self.instrumentation.metrics
+        self.assertEqual(metrics.histogram(UNATTRIBUTED, 'find', 'network').sum, 0.0015)
+        self.assertEqual(metrics.bytes, {})
+        self.instrumentation.measure_bytes = True
+        _network(event, {'ok': 1})
+        self.assertGreater(metrics.bytes[(UNATTRIBUTED, 'find')], 0)
+
+    def test_slow_operations_logged(self):
+        self.instrumentation.thresholds['Post.find_one'] = 0
+        with self.assertLogs('src.pygoose.middleware', 'WARNING') as logs:
+            self.model.find_one({'_id': 1})
+        self.assertIn('Post.find_one', logs.output[0])
+
+    def test_disabled_records_nothing(self):
+        self.instrumentation.stop()
+        self.model.find({}).exec()
+        self.assertEqual(self.instrumentation.metrics.histograms, {})
+
+    def test_prometheus_export(self):
+        exporter = PrometheusExporter()
+        self.instrumentation.exporters.append(exporter)
+        self.model.find({}).exec()
+        self.instrumentation.export()
+        self.assertIn('pygoose_operation_seconds_bucket{model="Post",operation="find",phase="total",le="+Inf"} 1',
+                      exporter.last)
+        self.assertIn('pygoose_documents_total{model="Post",operation="find"} 5', exporter.last)
+
+
+class TestHistogram(unittest.TestCase):
+    def test_quantile(self):
+        histogram = Histogram((0.1, 1.0))
+        for value in (0.05, 0.05, 0.5, 5.0):
+            histogram.observe(value)
+        self.assertEqual(histogram.cumulative(), [(0.1, 2), (1.0, 3), (float('inf'), 4)])
+        self.assertEqual(histogram.quantile(0.5), 0.1)
+        self.assertEqual(histogram.quantile(0.99), float('inf'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,208 @@
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from unittest.mock import patch
+from src.pygoose import Schema, BulkWriteError, DuplicateKeyError, ValidationError
+from src.pygoose.aio import AsyncModel, gather
+from src.pygoose.parallel import _default_context
+from tests.fakes import AsyncFakeCollection, FakeCollection, FakeModel
+
+
+class TestBulkSave(unittest.TestCase):
+    def setUp(self):
+        self.schema = Schema({'name': str})
+        self.saved = []
+        self.schema.post('save', lambda doc: self.saved.append(doc.name))
+        self.collection = FakeCollection([{'_id': 1, 'name': 'existing'}])
+        self.model = FakeModel('BulkItem', self.schema, self.collection)
+
+    def test_inserts_and_updates_in_chunks(self):
+        existing = self.model.find_one({'_id': 1})
+        existing.name = 'renamed'
+        new_docs = [self.model({'name': f'new{i}'}) for i in range(4)]
+        result = self.model.bulk_save([existing] + new_docs, chunk_size=2)
+
+        self.assertTrue(result.ok)
+        self.assertEqual((result.inserted_count, result.updated_count), (4, 1))
+        self.assertEqual(self.collection.bulk_calls, [2, 2, 1])
+        self.assertEqual(self.collection.docs[0]['name'], 'renamed')
+        self.assertTrue(all('_id' in doc.to_dict() and not doc._is_new for doc in new_docs))
+        self.assertEqual(len(self.saved), 5)
+        self.assertFalse(existing.is_modified())
+
+    def test_reports_failures_per_document(self):
+        duplicate = self.model({'name': 'dup'})
+        duplicate._data['_id'] = 1
+        docs = [self.model({'name': 'a'}), duplicate, self.model({'name': 'b'})]
+        result = self.model.bulk_save(docs)
+
+        self.assertEqual(list(result.errors), [1])
+        self.assertIsInstance(result.errors[1], DuplicateKeyError)
+        self.assertEqual(result.inserted_count, 2)
+        self.assertTrue(duplicate._is_new)
+        self.assertEqual(self.saved, ['a', 'b'])
+
+    def test_ordered_reports_documents_never_sent(self):
+        duplicate = self.model({'name': 'dup'})
+        duplicate._data['_id'] = 1
+        docs = [self.model({'name': 'a'}), duplicate] + [self.model({'name': f'n{i}'}) for i in range(4)]
+        result = self.model.bulk_save(iter(docs), ordered=True, chunk_size=2)
+        self.assertEqual(sorted(result.errors), [1, 2, 3, 4, 5])
+        self.assertEqual(self.collection.bulk_calls, [2])
+        self.assertEqual(result.inserted_count, 1)
+
+    def test_ordered_stops_at_failing_pre_hook(self):
+        def refuse(doc):
+            if doc.name == 'bad':
+                raise ValueError('refusé')
+        self.schema.pre('save', refuse)
+        docs = [self.model({'name': name}) for name in ('a', 'bad', 'b', 'c')]
+        result = self.model.bulk_save(docs, ordered=True)
+        self.assertIsInstance(result.errors[1], ValueError)
+        self.assertEqual(sorted(result.errors), [1, 2, 3])
+        self.assertEqual(self.collection.bulk_calls, [1])
+        self.assertTrue(docs[2]._is_new and '_id' not in docs[2].to_dict())
+
+    def test_async_hook_rejected_on_sync_model(self):
+        async def on_save(doc):
+            pass
+        self.schema.pre('save', on_save)
+        doc = self.model({'name': 'a'})
+        with self.assertRaises(TypeError):
+            doc.save()
+        self.assertTrue(doc._is_new)
+
+    def test_write_concern_errors_are_reported(self):
+        self.collection.write_concern_errors = [{'code': 64, 'errmsg': 'waiting for replication timed out'}]
+        result = self.model.bulk_save([self.model({'name': 'a'})])
+        self.assertEqual(result.inserted_count, 1)
+        self.assertFalse(result.ok)
+        self.assertEqual(result.write_concern_errors[0]['code'], 64)
+        with self.assertRaises(BulkWriteError):
+            result.raise_on_error()
+
+
+class AsyncFakeModel(AsyncModel):
+    def __init__(self, name, schema, collection):
+        self._fake_collection = collection
+        super().__init__(name, schema)
+
+    def _setup_collection(self):
+        self._collection = self._fake_collection
+
+
+class TestCreateMany(unittest.TestCase):
+    def setUp(self):
+        self.collection = FakeCollection([{'_id': 'taken', 'n': 0}])
+        schema = Schema({'n': {'type': int, 'min': 0}}, {'strict': False})
+        self.model = FakeModel('ImportItem', schema, self.collection)
+
+    def rows(self):
+        yield {'n': 1}
+        yield {'n': -1}
+        yield {'_id': 'taken', 'n': 2}
+        for i in range(3, 7):
+            yield {'n': i}
+
+    def test_generator_in_chunks_with_errors(self):
+        for pipeline in (False, True):
+            with self.subTest(pipeline=pipeline):
+                self.collection.docs = [{'_id': 'taken', 'n': 0}]
+                self.collection.bulk_calls = []
+                result = self.model.create_many(self.rows(), chunk_size=3, pipeline=pipeline)
+
+                self.assertEqual(result.inserted_count, 5)
+                self.assertEqual(len(result.inserted_ids), 5)
+                self.assertEqual(sorted(result.errors), [1, 2])
+                self.assertIsInstance(result.errors[1], ValidationError)
+                self.assertIsInstance(result.errors[2], DuplicateKeyError)
+                self.assertEqual(self.collection.bulk_calls, [2, 3, 1])
+
+    def test_ordered_stops_at_first_error(self):
+        result = self.model.create_many(self.rows(), chunk_size=3, ordered=True)
+        self.assertEqual(result.inserted_count, 1)
+        self.assertEqual(list(result.errors), [1])
+
+    def test_process_pool_validation(self):
+        schema = Schema({'n': {'type': int, 'validate': lambda v: v * 10}}, {'timestamps': True})
+        model = FakeModel('ParallelItem', schema, FakeCollection([]))
+        rows = ({'n': 'x' if i == 7 else i} for i in range(20))
+        result = model.create_many(rows, chunk_size=3, workers=2, start_method='fork')
+
+        self.assertEqual(result.inserted_count, 19)
+        self.assertEqual(list(result.errors), [7])
+        self.assertEqual(result.errors[7].field, 'n')
+        self.assertEqual([doc['n'] for doc in model._collection.docs][:8], [0, 10, 20, 30, 40, 50, 60, 80])
+        self.assertIn('created_at', model._collection.docs[0])
+
+    def test_process_pool_does_not_fork_implicitly(self):
+        schema = Schema({'n': {'type': int, 'validate': lambda v: v}})
+        model = FakeModel('SpawnItem', schema, FakeCollection([]))
+        with self.assertRaises(ValueError):
+            model.create_many([{'n': 1}], workers=1, start_method='spawn')
+        self.assertNotEqual(_default_context().get_start_method(), 'fork')
+
+        pools = []
+
+        def executor(*args, **kwargs):
+            pools.append(ProcessPoolExecutor(*args, **kwargs))
+            return pools[-1]
+
+        model = FakeModel('SpawnItem', Schema({'n': int}), FakeCollection([]))
+        with patch('src.pygoose.parallel.ProcessPoolExecutor', executor):
+            result = model.create_many([{'n': 1}, {'n': 'x'}], workers=1)
+        self.assertEqual((result.inserted_count, list(result.errors)), (1, [1]))
+        self.assertNotEqual(pools[0]._mp_context.get_start_method(), 'fork')
+
+    def test_without_ids(self):
+        result = self.model.create_many(({'n': i} for i in range(5)), chunk_size=2, collect_ids=False)
+        self.assertIsNone(result.inserted_ids)
+        self.assertEqual(len(result), 5)
+
+
+class TestAsyncModel(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.schema = Schema({'name': {'type': str, 'required': True}, 'n': int})
+        self.collection = AsyncFakeCollection([{'_id': i, 'name': f'doc{i}', 'n': i} for i in range(5)])
+        self.model = AsyncFakeModel('AsyncItem', self.schema, self.collection)
+
+    async def test_find_and_stream(self):
+        doc = await self.model.find_one({'_id': 2})
+        self.assertEqual(doc.name, 'doc2')
+        names = [doc.name async for doc in self.model.find().sort('-n').limit(2)]
+        self.assertEqual(names, ['doc4', 'doc3'])
+        self.assertEqual(len(await self.model.find().exec()), 5)
+
+    async def test_save_runs_async_hooks(self):
+        calls = []
+
+        async def on_save(doc):
+            calls.append(doc.name)
+
+        self.schema.pre('save', on_save)
+        doc = await self.model.create({'name': 'new'})
+        self.assertEqual(calls, ['new'])
+        self.assertIn('_id', doc.to_dict())
+
+    async def test_bulk_save_awaits_async_hooks(self):
+        calls = []
+
+        async def before(doc):
+            calls.append(('pre', doc.name))
+
+        async def after(doc):
+            calls.append(('post', doc.name))
+
+        self.schema.pre('save', before)
+        self.schema.post('save', after)
+        result = await self.model.bulk_save([self.model({'name': 'a'}), self.model({'name': 'b'})])
+        self.assertTrue(result.ok)
+        self.assertEqual(result.inserted_count, 2)
+        self.assertEqual(calls, [('pre', 'a'), ('pre', 'b'), ('post', 'a'), ('post', 'b')])
+
+    async def test_bounded_gather(self):
+        docs = await gather(*(self.model.find_by_id(i) for i in range(5)), concurrency=2)
+        self.assertEqual([doc.n for doc in docs], list(range(5)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import threading
+import unittest
+from src.pygoose import Schema
+from src.pygoose.profiler import PlanSummary, current_recorder, normalize_filter, record, render_index
+from tests.fakes import FakeCollection, FakeModel
+
+COLLSCAN_PLAN = {
+    'queryPlanner': {'winningPlan': {'stage': 'SORT', 'inputStage': {'stage': 'COLLSCAN'}}},
+    'executionStats': {'nReturned': 2, 'totalKeysExamined': 0, 'totalDocsExamined': 50,
+                       'executionTimeMillis': 3},
+}
+INDEX_PLAN = {
+    'queryPlanner': {'winningPlan': {'queryPlan': {
+        'stage': 'FETCH',
+        'inputStage': {'stage': 'IXSCAN', 'indexName': 'author_1', 'keyPattern': {'author': 1}},
+    }}},
+}
+
+
+class FakeDatabase:
+    def __init__(self, response):
+        self.response = response
+        self.commands = []
+
+    def command(self, command):
+        self.commands.append(command)
+        return self.response
+
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.collection = FakeCollection([
+            {'_id': i, 'author': i % 2, 'created_at': i, 'score': i} for i in range(6)
+        ])
+        self.collection.name = 'posts'
+        self.collection.database = FakeDatabase(COLLSCAN_PLAN)
+        schema = Schema({'author': int, 'created_at': int, 'score': int})
+        schema.index('score')
+        self.model = FakeModel('Post', schema, self.collection)
+
+    def test_explain_summarizes_plan(self):
+        plan = self.model.find({'author': 1}).sort('-created_at').limit(5).explain()
+        self.assertTrue(plan.collscan)
+        self.assertTrue(plan.in_memory_sort)
+        self.assertIsNone(plan.index)
+        self.assertEqual((plan.docs_examined, plan.returned), (50, 2))
+        command = self.collection.database.commands[0]
+        self.assertEqual(command['verbosity'], 'executionStats')
+        self.assertEqual(command['explain'], {
+            'find': 'posts', 'filter': {'author': 1}, 'sort': {'created_at': -1}, 'limit': 5,
+        })
+
+    def test_plan_from_sbe_engine(self):
+        plan = PlanSummary(INDEX_PLAN)
+        self.assertFalse(plan.collscan)
+        self.assertEqual((plan.index, plan.index_keys), ('author_1', {'author': 1}))
+        self.assertEqual(plan.stages, ['FETCH', 'IXSCAN'])
+
+    def test_shape_ignores_values(self):
+        self.assertEqual(
+            normalize_filter({'author': 3, 'score': {'$gte': 1}, '$or': [{'a': 1}, {'b': {'$in': [1]}}]}),
+            {'author': '?', 'score': {'$gte': '?'}, '$or': [{'a': '?'}, {'b': {'$in': '?'}}]},
+        )
+
+    def test_recorder_groups_collscans_by_shape(self):
+        with record(threshold_ms=10000) as recorder:
+            self.assertIs(current_recorder(), recorder)
+            for author in (0, 1, 0):
+                self.model.find({'author': author, 'created_at': {'$gt': 1}}).sort('-score').exec()
+        self.assertIsNone(current_recorder())
+
+        entry, = recorder.entries()
+        self.assertEqual(entry.count, 3)
+        self.assertTrue(entry.plan.collscan)
+        # Un seul explain par forme, sans exécution
+        self.assertEqual([c['verbosity'] for c in self.collection.database.commands], ['queryPlanner'])
+
+        suggestions = recorder.suggest_indexes()
+        self.assertEqual(suggestions, {'Post': [[('author', 1), ('score', -1), ('created_at', 1)]]})
+        self.assertEqual(render_index(suggestions['Post'][0]),
+                         "Schema.index([('author', 1), ('score', -1), ('created_at', 1)])")
+
+    def test_indexed_fast_queries_are_not_recorded(self):
+        self.collection.database = FakeDatabase(INDEX_PLAN)
+        with record(threshold_ms=10000) as recorder:
+            self.model.find({'author': 1}).exec()
+        self.assertEqual(recorder.entries(), [])
+
+    def test_declared_and_covered_indexes_are_skipped(self):
+        with record(threshold_ms=0, explain=False) as recorder:
+            self.model.find({'score': 1}).exec()
+            self.model.find({'author': 1}).exec()
+            self.model.find({'author': 1}).sort('created_at').exec()
+        self.assertEqual(recorder.suggest_indexes(), {'Post': [[('author', 1), ('created_at', 1)]]})
+
+
+    def test_stream_closed_early_is_recorded(self):
+        with record(threshold_ms=10000) as recorder:
+            stream = self.model.find({'author': 1}).stream(batch_size=2)
+            next(stream)
+            stream.close()
+        entry, = recorder.entries()
+        self.assertTrue(entry.plan.collscan)
+        self.assertEqual(entry.count, 1)
+
+    def test_recorder_is_scoped_to_its_context(self):
+        seen = []
+        with record(threshold_ms=0, explain=False) as recorder:
+            # Une requête d'un autre thread n'est pas attribuée à cet enregistreur
+            worker = threading.Thread(target=lambda: seen.append(current_recorder()))
+            worker.start()
+            worker.join()
+            with record(threshold_ms=0, explain=False) as inner:
+                self.model.find({'author': 1}).exec()
+            self.assertIs(current_recorder(), recorder)
+        self.assertEqual(seen, [None])
+        self.assertEqual((len(inner.entries()), recorder.entries()), (1, []))
+
+
+if __name__ == '__main__':
+    unittest.main()
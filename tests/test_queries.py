@@ -0,0 +1,192 @@
+import unittest
+from src.pygoose import Schema, session
+from src.pygoose.populate import Populator
+from src.pygoose.query import Query
+from src.pygoose.model import _models
+from tests.fakes import FakeCollection, FakeModel
+
+
+class TestQueryStream(unittest.TestCase):
+    def setUp(self):
+        self.collection = FakeCollection([{'_id': i, 'n': i} for i in range(10)])
+        self.query = Query(FakeModel('Item', Schema({'n': int}), self.collection), self.collection)
+
+    def test_stream_is_lazy(self):
+        stream = self.query.stream(batch_size=3)
+        first = next(stream)
+        self.assertEqual(first.n, 0)
+        self.assertEqual(self.collection.cursor.consumed, 3)
+        self.assertEqual(self.collection.cursor.options['batch_size'], 3)
+        stream.close()
+        self.assertTrue(self.collection.cursor.closed)
+
+    def test_stream_applies_query_options(self):
+        self.query.sort('-n').skip(2).limit(4).select(['n'])
+        self.assertEqual([doc.n for doc in self.query.stream(batch_size=3)], [7, 6, 5, 4])
+        self.assertEqual(self.collection.cursor.options['projection'], {'n': 1})
+
+    def test_iter_and_exec(self):
+        self.assertEqual([doc.n for doc in self.query], list(range(10)))
+        self.assertEqual(len(self.query.exec()), 10)
+
+
+class TestLeanQueries(unittest.TestCase):
+    def setUp(self):
+        self.collection = FakeCollection([
+            {'_id': i, 'name': f'n{i}', 'meta': {'views': i * 10}, 'items': [{'sku': 'a'}, {'sku': 'b'}]}
+            for i in range(4)
+        ])
+        self.model = FakeModel('LeanItem', Schema({'name': str, 'meta': dict, 'items': list}), self.collection)
+
+    def test_lean_returns_raw_dicts(self):
+        rows = self.model.find().lean().exec()
+        self.assertEqual(rows[0], self.collection.docs[0])
+        self.assertIs(type(rows[0]), dict)
+        self.assertEqual(len(list(self.model.find().lean().lazy().stream(batch_size=2))), 4)
+
+    def test_values_with_automatic_projection(self):
+        rows = self.model.find().values('name', 'meta.views').exec()
+        self.assertEqual(rows[1], {'name': 'n1', 'meta.views': 10})
+        self.assertEqual(self.collection.cursor.options['projection'], {'name': 1, 'meta.views': 1, '_id': 0})
+
+    def test_values_list(self):
+        self.assertEqual(self.model.find().sort('-_id').values_list('_id', 'name').first(), (3, 'n3'))
+        self.assertEqual(self.model.find().values_list('name', flat=True).exec(), ['n0', 'n1', 'n2', 'n3'])
+        self.assertEqual(self.model.find().values_list('items.sku', flat=True).first(), ['a', 'b'])
+        with self.assertRaises(ValueError):
+            self.model.find().values_list('_id', 'name', flat=True)
+
+
+class TestPagination(unittest.TestCase):
+    def setUp(self):
+        self.collection = FakeCollection([{'_id': i, 'score': i % 4, 'name': f'n{i}'} for i in range(10)])
+        self.model = FakeModel('PagedItem', Schema({'score': int, 'name': str}), self.collection)
+        self.expected = [doc['_id'] for doc in sorted(self.collection.docs, key=lambda d: (-d['score'], -d['_id']))]
+
+    def pages(self, build, size=3):
+        token, pages = None, []
+        while True:
+            page = build().paginate_after(token, size)
+            pages.append(page)
+            if not page.has_more:
+                return pages
+            token = page.next_token
+
+    def test_walks_all_pages_without_skip(self):
+        pages = self.pages(lambda: self.model.find().sort('-score'))
+        self.assertEqual([len(page) for page in pages], [3, 3, 3, 1])
+        self.assertEqual([doc.to_dict()['_id'] for page in pages for doc in page], self.expected)
+        self.assertEqual(self.collection.cursor.options['sort'], [('score', -1), ('_id', -1)])
+
+    def test_with_select_and_values(self):
+        pages = self.pages(lambda: self.model.find().sort('-score').select(['name']), size=4)
+        self.assertEqual([doc.name for doc in pages[1]], [f'n{i}' for i in self.expected[4:8]])
+        self.assertEqual(self.collection.cursor.options['projection'], {'name': 1, 'score': 1, '_id': 1})
+
+        pages = self.pages(lambda: self.model.find().sort('-score').values_list('name', flat=True), size=4)
+        self.assertEqual(pages[2].items, [f'n{i}' for i in self.expected[8:]])
+
+    def test_token_is_checked(self):
+        page = self.model.find().sort('-score').paginate_after(size=2)
+        with self.assertRaises(ValueError):
+            self.model.find().sort('name').paginate_after(page.next_token, 2)
+        with self.assertRaises(ValueError):
+            self.model.find().paginate_after('not-a-token', 2)
+
+
+class TestPopulate(unittest.TestCase):
+    def setUp(self):
+        self.companies = FakeCollection([{'_id': 'c1', 'name': 'Acme'}])
+        self.users = FakeCollection([
+            {'_id': 'u1', 'name': 'alice', 'company': 'c1'},
+            {'_id': 'u2', 'name': 'bob', 'company': 'c1'},
+        ])
+        self.posts = FakeCollection([
+            {'_id': i, 'author': 'u1' if i % 2 else 'u2', 'readers': ['u2', 'u1', 'missing'],
+             'meta': {'editor': 'u1'}}
+            for i in range(6)
+        ])
+        for name, collection, definition in (
+            ('Company', self.companies, {'name': str}),
+            ('User', self.users, {'name': str, 'company': {'type': 'ObjectId', 'ref': 'Company'}}),
+            ('Post', self.posts, {
+                'author': {'type': 'ObjectId', 'ref': 'User'},
+                'readers': [{'type': 'ObjectId', 'ref': 'User'}],
+                'meta': {'editor': {'type': 'ObjectId', 'ref': 'User'}},
+            }),
+        ):
+            _models[name] = FakeModel(name, Schema(definition), collection)
+        self.addCleanup(lambda: [_models.pop(name) for name in ('Company', 'User', 'Post')])
+        self.query = Query(_models['Post'], self.posts)
+
+    def test_one_query_per_ref_field_per_batch(self):
+        docs = self.query.populate('author readers').stream(batch_size=3)
+        docs = list(docs)
+        self.assertEqual([doc.author.name for doc in docs[:2]], ['bob', 'alice'])
+        self.assertEqual([reader.name for reader in docs[0].readers], ['bob', 'alice'])
+        # Deux lots, mais les utilisateurs déjà chargés sont réutilisés
+        self.assertEqual(self.users.queries, 2)
+        self.assertIs(docs[0].author, docs[2].author)
+        self.assertEqual(docs[0].to_dict()['author'], 'u2')
+
+    def test_nested_and_chained_paths(self):
+        docs = self.query.populate('meta.editor').populate('author.company').exec()
+        self.assertEqual(docs[0].meta['editor'].name, 'alice')
+        self.assertEqual(docs[0].author.company.name, 'Acme')
+        self.assertEqual(self.companies.queries, 1)
+
+    def test_lean_with_populate(self):
+        rows = self.query.populate('author').values('author.name').exec()
+        self.assertEqual(rows[:2], [{'author.name': 'bob'}, {'author.name': 'alice'}])
+        self.assertEqual(self.posts.cursor.options['projection'], {'author': 1, '_id': 0})
+        row = Query(_models['Post'], self.posts).populate('author').lean().first()
+        self.assertEqual(row['author'], {'_id': 'u2', 'name': 'bob', 'company': 'c1'})
+
+    def test_select_keeps_populated_refs(self):
+        docs = self.query.select(['readers']).populate('author meta.editor').exec()
+        self.assertEqual(self.posts.cursor.options['projection'], {'readers': 1, 'author': 1, 'meta.editor': 1})
+        self.assertEqual((docs[0].author.name, docs[0].meta['editor'].name), ('bob', 'alice'))
+        Query(_models['Post'], self.posts).select({'author': 0, 'readers': 0}).populate('author').exec()
+        self.assertEqual(self.posts.cursor.options['projection'], {'readers': 0})
+
+    def test_loaded_references_are_bounded(self):
+        populator = Populator(_models['Post'], ['author'])
+        populator.max_loaded = 1
+        populator.hydrate([{'_id': 0, 'author': 'u1'}])
+        populator.hydrate([{'_id': 1, 'author': 'u2'}])
+        self.assertEqual(len(populator._loaded), 2)
+        docs = populator.hydrate([{'_id': 2, 'author': 'u2'}])
+        self.assertEqual(list(populator._loaded), [('User', 'u2')])
+        self.assertEqual((docs[0].author.name, self.users.queries), ('bob', 2))
+
+    def test_paginate_with_populate(self):
+        page = self.query.populate('author').paginate_after(size=4)
+        self.assertEqual([doc.author.name for doc in page], ['bob', 'alice', 'bob', 'alice'])
+        page = Query(_models['Post'], self.posts).populate('author').paginate_after(page.next_token, 4)
+        self.assertEqual(len(page), 2)
+        self.assertFalse(page.has_more)
+
+
+class TestSession(unittest.TestCase):
+    def setUp(self):
+        self.collection = FakeCollection([{'_id': i, 'n': i} for i in range(3)])
+        self.model = FakeModel('Item', Schema({'n': int}), self.collection)
+
+    def test_identity_map(self):
+        with session() as current:
+            first = self.model.find().exec()
+            second = self.model.find().exec()
+            self.assertIs(first[1], second[1])
+            self.assertIs(self.model.find_one({'_id': 1}), first[1])
+            self.assertEqual(self.collection.queries, 2)
+            self.assertEqual(len(current), 3)
+        self.assertIsNot(self.model.find().exec()[1], first[1])
+
+    def test_partial_documents_are_not_registered(self):
+        with session() as current:
+            self.model.find().select(['n']).exec()
+            self.assertEqual(len(current), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+from src.pygoose import Schema, connect, disconnect, model, session
+from src.pygoose.aio import async_model
+from src.pygoose.memory import reset
+from src.pygoose.routing import read_preference
+
+
+class TestReadRouting(unittest.TestCase):
+    def setUp(self):
+        connect('mongodb://localhost:27017/routing')
+        self.Order = model('RoutedOrder', Schema({'status': str}))
+
+    def tearDown(self):
+        disconnect()
+
+    def test_read_preference_modes(self):
+        preference = read_preference('secondary_preferred', max_staleness=120)
+        self.assertEqual(preference.document, {'mode': 'secondaryPreferred', 'maxStalenessSeconds': 120})
+        self.assertEqual(read_preference('nearest', tags=[{'dc': 'eu'}]).document,
+                         {'mode': 'nearest', 'tags': [{'dc': 'eu'}]})
+        with self.assertRaises(ValueError):
+            read_preference('anywhere')
+        with self.assertRaises(ValueError):
+            read_preference('primary', max_staleness=90)
+
+    def test_query_read_from(self):
+        cursor = self.Order.find({'status': 'paid'}).read_from('secondaryPreferred', max_staleness=90)._cursor()
+        self.assertEqual(cursor.collection.read_preference.mongos_mode, 'secondaryPreferred')
+        self.assertEqual(cursor.collection.read_preference.max_staleness, 90)
+        # La requête suivante n'est pas affectée
+        self.assertEqual(self.Order.find()._cursor().collection.read_preference.mongos_mode, 'primary')
+
+    def test_model_and_schema_defaults(self):
+        Report = model('RoutedReport', Schema({'total': int}, {'read_from': {'mode': 'secondary', 'max_staleness': 120}}))
+        self.assertEqual(Report._collection.read_preference.document,
+                         {'mode': 'secondary', 'maxStalenessSeconds': 120})
+
+        Reports = self.Order.read_from('nearest')
+        self.assertIs(self.Order.read_from('nearest'), Reports)
+        self.assertEqual(Reports._collection.read_preference.mongos_mode, 'nearest')
+        self.assertEqual(Reports.using('tenant')._collection.read_preference.mongos_mode, 'nearest')
+        self.assertEqual(self.Order._collection.read_preference.mongos_mode, 'primary')
+
+    def test_causal_session_binds_operations(self):
+        Reports = self.Order.read_from('secondary')
+        with session(causal=True):
+            collection = self.Order._collection
+            client_session = collection._session
+            self.assertTrue(client_session.options.causal_consistency)
+            # Une seule session pymongo par client, partagée par les vues
+            self.assertIs(Reports._collection._session, client_session)
+            self.assertEqual(Reports.find()._cursor().session, client_session)
+        self.assertTrue(client_session.has_ended)
+        self.assertFalse(hasattr(self.Order._collection, '_session'))
+
+    def test_causal_session_uses_majority(self):
+        with session(causal=True):
+            collection = self.Order._collection
+            self.assertIs(self.Order._collection, collection)
+            self.assertEqual(collection.read_concern.level, 'majority')
+            self.assertEqual(collection.write_concern.document, {'w': 'majority'})
+        self.assertIsNone(self.Order._collection.read_concern.level)
+
+
+class TestAsyncCausalSession(unittest.TestCase):
+    def setUp(self):
+        connect('memory:///routing')
+
+    def tearDown(self):
+        disconnect()
+        reset()
+
+    def test_sync_exit_with_async_models_is_rejected(self):
+        Order = async_model('AsyncRoutedOrder', Schema({'status': str}))
+        with self.assertRaises(RuntimeError):
+            with session(causal=True):
+                Order._collection
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+from datetime import datetime
+from src.pygoose import Schema, ValidationError
+
+
+class TestCompiledValidation(unittest.TestCase):
+    def setUp(self):
+        self.schema = Schema({
+            'username': {'type': str, 'required': True, 'min_length': 3},
+            'email': {'type': str, 'validate': 'email'},
+            'age': {'type': int, 'min': 13, 'max': 120},
+            'role': {'type': str, 'enum': ['user', 'admin'], 'default': 'user'},
+            'score': float,
+            'tags': [str],
+            'last_login': 'datetime',
+        }, {'timestamps': True})
+
+    def assertSameResult(self, data):
+        compiled = self.schema.validate(data)
+        interpreted = self.schema._validate_interpreted(data)
+        compiled.pop('created_at'), interpreted.pop('created_at')
+        compiled.pop('updated_at'), interpreted.pop('updated_at')
+        self.assertEqual(compiled, interpreted)
+
+    def assertSameError(self, data):
+        with self.assertRaises(ValidationError) as compiled:
+            self.schema.validate(data)
+        with self.assertRaises(ValidationError) as interpreted:
+            self.schema._validate_interpreted(data)
+        self.assertEqual(str(compiled.exception), str(interpreted.exception))
+        self.assertEqual(compiled.exception.field, interpreted.exception.field)
+
+    def test_valid_documents(self):
+        self.assertSameResult({'username': 'alice', 'age': '42', 'score': 3})
+        self.assertSameResult({'username': 'bob', 'email': 'bob@example.com', 'role': 'admin'})
+
+    def test_defaults(self):
+        data = self.schema.validate({'username': 'alice'})
+        self.assertEqual(data['role'], 'user')
+        self.assertIsNone(data['age'])
+        self.assertIsInstance(data['created_at'], datetime)
+
+    def test_errors_match_interpreted(self):
+        self.assertSameError({})
+        self.assertSameError({'username': 'al'})
+        self.assertSameError({'username': 'alice', 'age': 7})
+        self.assertSameError({'username': 'alice', 'age': 'abc'})
+        self.assertSameError({'username': 'alice', 'email': 'invalid'})
+        self.assertSameError({'username': 'alice', 'role': 'root'})
+
+    def test_non_strict_keeps_extra_fields(self):
+        schema = Schema({'name': str}, {'strict': False})
+        self.assertEqual(schema.validate({'name': 'a', 'extra': 1}), {'name': 'a', 'extra': 1})
+
+    def test_recompile_after_field_change(self):
+        schema = Schema({'name': str})
+        schema.validate({'name': 'a'})
+        schema.fields['count'] = schema._parse_field({'type': int, 'default': 0})
+        schema.compile()
+        self.assertEqual(schema.validate({'name': 'a'}), {'name': 'a', 'count': 0})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+from src.pygoose import Schema
+from tests.fakes import FakeCollection, FakeModel
+
+
+class TestNestedTracking(unittest.TestCase):
+    def setUp(self):
+        schema = Schema({
+            'title': str,
+            'tags': [str],
+            'meta': {'type': dict, 'default': dict},
+            'items': list,
+        })
+        self.collection = FakeCollection([{
+            '_id': 1, 'title': 't', 'tags': ['a', 'b', 'c'],
+            'meta': {'views': 1, 'draft': True, 'seo': {'slug': 't'}},
+            'items': [{'sku': 'x', 'qty': 1}, {'sku': 'y', 'qty': 2}],
+        }])
+        self.model = FakeModel('Article', schema, self.collection)
+        self.doc = self.model.find_one({'_id': 1})
+
+    def test_minimal_operators(self):
+        doc = self.doc
+        doc.tags.append('d')
+        doc.meta['views'] = 2
+        doc.meta['seo']['slug'] = 'new'
+        del doc.meta['draft']
+        doc.items[1]['qty'] += 1
+
+        self.assertEqual(doc._pending_update(), {
+            '$set': {'meta.views': 2, 'meta.seo.slug': 'new', 'items.1.qty': 3},
+            '$unset': {'meta.draft': ''},
+            '$push': {'tags': {'$each': ['d']}},
+        })
+        self.assertTrue(doc.is_modified('meta'))
+        self.assertTrue(doc.is_modified('meta.seo.slug'))
+        self.assertFalse(doc.is_modified('title'))
+
+    def test_pull_and_conflicts(self):
+        doc = self.doc
+        doc.tags.remove('b')
+        self.assertEqual(doc._pending_update(), {'$pull': {'tags': {'$in': ['b']}}})
+
+        doc.tags.append('z')
+        self.assertEqual(doc._pending_update(), {'$set': {'tags': ['a', 'c', 'z']}})
+
+    def test_positions_follow_list_changes(self):
+        doc = self.doc
+        second = doc.items[1]
+        doc.items.pop(0)
+        doc.save()
+
+        second['qty'] = 5
+        self.assertEqual(doc._pending_update(), {'$set': {'items.0.qty': 5}})
+
+    def test_top_level_assignment_wins(self):
+        doc = self.doc
+        meta = doc.meta
+        meta['views'] = 3
+        doc.meta = {'views': 10}
+        meta['views'] = 4
+        self.assertEqual(doc._pending_update(), {'$set': {'meta': {'views': 10}}})
+
+    def test_copy_on_write_snapshot(self):
+        doc = self.doc
+        self.assertEqual(doc._original_data, {})
+        doc.tags.append('d')
+        self.assertEqual(doc._original_data, {'tags': ['a', 'b', 'c']})
+        doc.save()
+        self.assertEqual(doc._original_data, {})
+        self.assertFalse(doc.is_modified())
+
+
+if __name__ == '__main__':
+    unittest.main()